@@ -8,6 +8,7 @@
 
 from flask import Flask, jsonify, render_template, send_from_directory
 from flask_cors import CORS
+import atexit
 import os
 import sys
 
@@ -15,12 +16,14 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from trading.real_max_client import RealMaxClient
+from data.max_transport import close_max_transport
 
 app = Flask(__name__)
 CORS(app)
 
-# 初始化MAX客戶端
+# 初始化MAX客戶端（各請求共用同一個保持連接的連接池）
 max_client = RealMaxClient()
+atexit.register(close_max_transport)
 
 @app.route('/')
 def index():
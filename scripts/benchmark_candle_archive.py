@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K線檔案庫基準測試 - 測量三年1分鐘K線的追加與記憶體映射載入耗時
+在臨時目錄中生成數據，結束後自動清除
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.candle_archive import CandleArchive
+
+
+def main():
+    parser = argparse.ArgumentParser(description='K線檔案庫基準測試')
+    parser.add_argument('--rows', type=int, default=3 * 365 * 1440, help='K線數量（預設三年1分鐘K線）')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    close = 3400000 + np.cumsum(rng.normal(0, 2000, args.rows))
+    df = pd.DataFrame({
+        'timestamp': 1_600_000_000 + np.arange(args.rows, dtype=np.int64) * 60,
+        'open': close, 'high': close + 500, 'low': close - 500, 'close': close,
+        'volume': rng.gamma(2.0, 1.0, args.rows)
+    })
+
+    print(f"📊 K線檔案庫基準測試 ({args.rows:,} 條)")
+    print("-" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CandleArchive(tmp)
+
+        start = time.perf_counter()
+        archive.append('btctwd', '1m', df)
+        elapsed = time.perf_counter() - start
+        print(f"首次寫入:     {elapsed:8.2f} s   {args.rows / elapsed:>12,.0f} 條/秒")
+
+        tail = df.iloc[-1:].copy()
+        tail['timestamp'] += 60
+        start = time.perf_counter()
+        archive.append('btctwd', '1m', tail)
+        print(f"追加1根:      {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+        start = time.perf_counter()
+        columns = archive.load('btctwd', '1m')
+        elapsed = time.perf_counter() - start
+        print(f"全量映射:     {elapsed * 1000:8.2f} ms")
+
+        start = time.perf_counter()
+        total = float(columns['close'].sum())
+        elapsed = time.perf_counter() - start
+        print(f"全量掃描:     {elapsed * 1000:8.2f} ms   (sum={total:.3e})")
+
+        start = time.perf_counter()
+        frame = archive.load_dataframe('btctwd', '1m')
+        elapsed = time.perf_counter() - start
+        print(f"DataFrame:    {elapsed * 1000:8.2f} ms   ({len(frame):,} 條)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+網格引擎基準測試 - 在500層網格上回放100萬筆行情
+比較二分定位穿越 + 增量績效與逐層掃描 + 全量重算的每筆行情處理耗時
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.trading.grid_trading_engine import GridConfig, GridTradingEngine
+from scripts.test_grid_crossing import LinearScanGridEngine
+
+
+def generate_ticks(count: int, seed: int) -> list:
+    """圍繞基準價震盪的逐筆價格（均值回歸，保證持續穿越網格）"""
+    rng = np.random.default_rng(seed)
+    log_price = np.zeros(count)
+    shocks = rng.normal(0, 0.0004, count)
+    for i in range(1, count):
+        log_price[i] = log_price[i - 1] * 0.9995 + shocks[i]
+    return (3500000 * np.exp(log_price)).tolist()
+
+
+def create_engine(engine_class, levels: int) -> GridTradingEngine:
+    config = GridConfig(pair="BTCTWD", base_price=3500000, grid_spacing=0.05, grid_levels=levels,
+                        order_amount=10000, upper_limit=5000000, lower_limit=2000000, max_position=100.0)
+    engine = engine_class(config)
+    engine.simulated_order_latency = 0
+    engine.set_balance(100000000)
+    engine.initialize_grid()
+    return engine
+
+
+async def replay(engine: GridTradingEngine, ticks: list) -> int:
+    triggered = 0
+    for price in ticks:
+        result = await engine.update_price(price)
+        triggered += len(result['triggered_actions'])
+    return triggered
+
+
+def measure(engine_class, levels: int, ticks: list):
+    engine = create_engine(engine_class, levels)
+    start = time.perf_counter()
+    triggered = asyncio.run(replay(engine, ticks))
+    return time.perf_counter() - start, triggered
+
+
+def main():
+    parser = argparse.ArgumentParser(description='網格引擎基準測試')
+    parser.add_argument('--ticks', type=int, default=1000000, help='回放行情筆數')
+    parser.add_argument('--levels', type=int, default=500, help='網格層級數')
+    parser.add_argument('--legacy-ticks', type=int, default=20000,
+                        help='逐層掃描參考實現回放的筆數（0 表示跳過）')
+    parser.add_argument('--seed', type=int, default=7, help='隨機種子')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    ticks = generate_ticks(args.ticks, args.seed)
+
+    print(f"📊 網格引擎基準測試: {args.levels} 層網格, {args.ticks:,} 筆行情")
+    print("-" * 72)
+    elapsed, triggered = measure(GridTradingEngine, args.levels, ticks)
+    fast_us = elapsed / args.ticks * 1e6
+    print(f"二分定位 + 增量績效   {elapsed:>9.2f} s  {fast_us:>8.2f} µs/筆  "
+          f"{args.ticks / elapsed:>10,.0f} 筆/秒  觸發 {triggered}")
+
+    if args.legacy_ticks > 0:
+        sample = ticks[:args.legacy_ticks]
+        elapsed, triggered = measure(LinearScanGridEngine, args.levels, sample)
+        slow_us = elapsed / len(sample) * 1e6
+        print(f"逐層掃描 + 全量重算   {elapsed:>9.2f} s  {slow_us:>8.2f} µs/筆  "
+              f"{len(sample) / elapsed:>10,.0f} 筆/秒  觸發 {triggered} (前 {len(sample):,} 筆)")
+        print(f"⚡ 每筆行情加速 {slow_us / fast_us:.1f}x，"
+              f"逐層掃描回放全部行情預計 {slow_us * args.ticks / 1e6:,.0f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技術指標核心微基準 - 比較原逐行 iloc 迴圈與向量化核心的耗時
+預設使用約一年份的5分鐘K線 (105,120根)
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core import indicator_kernels as kernels
+from scripts.test_indicator_kernels import legacy_ema, legacy_obv
+
+
+def create_benchmark_klines(rows: int) -> pd.DataFrame:
+    """創建基準測試K線"""
+    rng = np.random.default_rng(42)
+    close = np.round(3400000 + np.cumsum(rng.normal(0, 2000, rows)), -2)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=rows, freq='5min'),
+        'close': close,
+        'volume': rng.integers(1, 1000, rows).astype(float)
+    })
+
+
+def time_call(func, *args, repeat: int = 1) -> float:
+    """返回最佳耗時（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='技術指標核心微基準')
+    parser.add_argument('--rows', type=int, default=105120, help='K線數量')
+    parser.add_argument('--legacy-rows', type=int, default=10000,
+                        help='舊迴圈實際測量的K線數量（結果線性外推到 --rows）')
+    args = parser.parse_args()
+
+    df = create_benchmark_klines(args.rows)
+    legacy_df = df.iloc[:min(args.legacy_rows, args.rows)]
+    scale = len(df) / len(legacy_df)
+
+    print(f"📊 技術指標核心微基準 ({len(df):,} 根K線)")
+    print("-" * 60)
+
+    cases = [
+        ('OBV', lambda d: legacy_obv(d), lambda d: kernels.obv(d['close'], d['volume'])),
+        ('EMA(first)', lambda d: legacy_ema(d['close'], 12), lambda d: kernels.ema(d['close'], 12)),
+        ('EMA(sma)', lambda d: legacy_ema(d['close'], 26, 1.0, 'sma'),
+         lambda d: kernels.ema(d['close'], 26, 1.0, 'sma')),
+    ]
+
+    for name, legacy, kernel in cases:
+        legacy_time = time_call(legacy, legacy_df) * scale
+        kernel_time = time_call(kernel, df, repeat=5)
+        print(f"{name:<12} 舊迴圈: {legacy_time * 1000:>10.1f} ms   "
+              f"核心: {kernel_time * 1000:>8.2f} ms   加速: {legacy_time / kernel_time:>8.0f}x")
+
+    for name, kernel in [
+        ('RSI', lambda d: kernels.rsi(d['close'])),
+        ('Bollinger', lambda d: kernels.bollinger_bands(d['close'])),
+        ('VolumeRatio', lambda d: kernels.volume_ratio(d['volume'])),
+    ]:
+        print(f"{name:<12} 核心: {time_call(kernel, df, repeat=5) * 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K線存儲基準測試 - 測量批量寫入與範圍讀取吞吐量
+預設向 data/market_history.db 寫入100萬條基準K線（獨立的market名稱），結束後清除
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.kline_storage import get_kline_storage
+
+BENCHMARK_MARKET = 'benchmark_btctwd'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='K線存儲基準測試')
+    parser.add_argument('--db-path', default='data/market_history.db', help='數據庫路徑')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='寫入K線數量')
+    parser.add_argument('--keep', action='store_true', help='保留基準數據')
+    args = parser.parse_args()
+
+    storage = get_kline_storage(args.db_path)
+
+    rng = np.random.default_rng(42)
+    timestamps = 1_600_000_000 + np.arange(args.rows, dtype=np.int64) * 60
+    close = 3400000 + np.cumsum(rng.normal(0, 2000, args.rows))
+    volume = rng.gamma(2.0, 1.0, args.rows)
+
+    print(f"📊 K線存儲基準測試: {args.db_path} ({args.rows:,} 條)")
+    print("-" * 60)
+
+    try:
+        start = time.perf_counter()
+        storage.upsert_arrays(BENCHMARK_MARKET, '1m', timestamps,
+                              close, close + 500, close - 500, close, volume)
+        elapsed = time.perf_counter() - start
+        print(f"批量寫入:     {elapsed:8.2f} s   {args.rows / elapsed:>12,.0f} 條/秒")
+
+        start = time.perf_counter()
+        storage.upsert_arrays(BENCHMARK_MARKET, '1m', timestamps,
+                              close, close + 500, close - 500, close, volume)
+        elapsed = time.perf_counter() - start
+        print(f"重複upsert:   {elapsed:8.2f} s   {args.rows / elapsed:>12,.0f} 條/秒")
+
+        start = time.perf_counter()
+        arrays = storage.read_arrays(BENCHMARK_MARKET, '1m')
+        elapsed = time.perf_counter() - start
+        print(f"全範圍讀取:   {elapsed:8.2f} s   {len(arrays['close']) / elapsed:>12,.0f} 條/秒")
+
+        start = time.perf_counter()
+        for _ in range(100):
+            storage.read_arrays(BENCHMARK_MARKET, '1m', limit=1440)
+        elapsed = (time.perf_counter() - start) / 100
+        print(f"最新1440條:   {elapsed * 1000:8.2f} ms")
+
+        window_start = int(timestamps[args.rows // 2])
+        start = time.perf_counter()
+        arrays = storage.read_arrays(BENCHMARK_MARKET, '1m', start=window_start,
+                                     end=window_start + 7 * 86400)
+        elapsed = time.perf_counter() - start
+        print(f"7天範圍讀取:  {elapsed * 1000:8.2f} ms   ({len(arrays['close']):,} 條)")
+
+    finally:
+        if not args.keep:
+            storage.delete_before(BENCHMARK_MARKET, int(timestamps[-1]) + 1)
+            storage.vacuum()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+信號引擎基準測試 - 在1k/10k/100k根1分鐘K線上測量所有策略信號引擎
+結果追加到JSON歷史，吞吐量相對同機器歷史中位數下降超過閾值時以退出碼1結束
+"""
+
+import argparse
+import sys
+from functools import partial
+from pathlib import Path
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.signal_benchmark import (ENGINE_SPECS, BenchmarkHistory, SignalEngineBenchmark,
+                                       recorded_dataset, synthetic_dataset)
+
+
+def print_result(result):
+    """打印單行結果"""
+    if result.status != 'ok':
+        print(f"{result.engine:<32} {result.bars:>8,}  {result.status:<8} {result.error}")
+        return
+    realtime = '✅' if result.realtime_1m_ok else '🐢'
+    print(f"{result.engine:<32} {result.bars:>8,}  {result.wall_time:>9.3f} s "
+          f"{result.bars_per_second:>12,.0f} 根/秒 {result.signals:>6} 信號 "
+          f"{result.peak_memory_mb:>8.1f} MB  1m {realtime}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='信號引擎基準測試')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='K線數量')
+    parser.add_argument('--engines', nargs='+', choices=[spec.name for spec in ENGINE_SPECS],
+                        help='只測試指定引擎')
+    parser.add_argument('--dataset', choices=['synthetic', 'recorded'], default='synthetic',
+                        help='合成K線或K線歸檔中的真實1分鐘K線')
+    parser.add_argument('--market', default='btctwd', help='真實K線的交易對')
+    parser.add_argument('--seed', type=int, default=20240101, help='合成K線隨機種子')
+    parser.add_argument('--repeat', type=int, default=1, help='計時重複次數（取最佳值）')
+    parser.add_argument('--max-seconds', type=float, default=120.0, help='單次運行預計耗時上限')
+    parser.add_argument('--no-memory', action='store_true', help='不測量峰值內存')
+    parser.add_argument('--history', default='reports/benchmarks/signal_engines_history.json',
+                        help='JSON歷史文件')
+    parser.add_argument('--threshold', type=float, default=0.25, help='允許的吞吐量下降比例')
+    parser.add_argument('--no-save', action='store_true', help='不寫入歷史')
+    parser.add_argument('--note', help='本次運行備註')
+    args = parser.parse_args()
+
+    if args.dataset == 'synthetic':
+        factory = partial(synthetic_dataset, seed=args.seed)
+    else:
+        factory = partial(recorded_dataset, market=args.market)
+
+    benchmark = SignalEngineBenchmark(args.engines, repeat=args.repeat, measure_memory=not args.no_memory,
+                                      max_seconds=args.max_seconds)
+    history = BenchmarkHistory(args.history)
+
+    print(f"📊 信號引擎基準測試 ({args.dataset}, {len(benchmark.specs)} 個引擎)")
+    print("-" * 100)
+    results = benchmark.run(factory, args.sizes, progress=print_result)
+    if not results:
+        print("⚠️ 沒有可用的數據集（真實K線數量不足？）")
+        return 1
+
+    regressions = history.find_regressions(results, args.threshold)
+    if not args.no_save:
+        history.append(results, note=args.note)
+        print(f"💾 結果已追加到 {args.history}")
+
+    slow = sorted({result.engine for result in results if result.realtime_1m_ok is False})
+    if slow:
+        print(f"🐢 無法在1分鐘K線上實時重算 {benchmark.realtime_window_bars} 根窗口的引擎: {', '.join(slow)}")
+
+    if regressions:
+        print(f"❌ 吞吐量退化超過 {args.threshold:.0%}:")
+        for item in regressions:
+            if item['status'] != 'ok':
+                print(f"   {item['engine']} @ {item['bars']:,}: 基線 {item['baseline_bars_per_second']:,.0f} 根/秒，"
+                      f"本次 {item['status']} ({item['error']})")
+                continue
+            print(f"   {item['engine']} @ {item['bars']:,}: {item['baseline_bars_per_second']:,.0f} → "
+                  f"{item['bars_per_second']:,.0f} 根/秒 ({item['change']:+.1%})")
+        return 1
+
+    print("✅ 沒有吞吐量退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,6 +30,7 @@ import pandas as pd
 
 # 導入核心模組
 from src.data.live_macd_service import LiveMACDService
+from src.data.candle_archive import fetch_klines_archived
 from src.core.improved_trading_signals import detect_improved_trading_signals
 
 # Telegram通知功能（如需要可以啟用）
@@ -226,7 +227,7 @@ class CleanMACDBacktestGUI:
             service = LiveMACDService()
             
             # 獲取更多數據以獲得更好的回測結果
-            klines = await service._fetch_klines("btctwd", "60", 1000)
+            klines = await fetch_klines_archived(service, "btctwd", "60", 1000)
             
             if klines is None:
                 self.update_status("❌ 無法獲取歷史數據")
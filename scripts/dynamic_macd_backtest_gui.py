@@ -18,6 +18,7 @@ import pandas as pd
 
 # 導入核心模組
 from src.data.live_macd_service import LiveMACDService
+from src.data.candle_archive import fetch_klines_archived
 from src.core.dynamic_trading_signals import detect_dynamic_trading_signals
 
 class DynamicMACDBacktestGUI:
@@ -249,7 +250,7 @@ class DynamicMACDBacktestGUI:
             total_data_points = data_points_per_day * 7 + 100  # 7天 + 緩衝數據
             
             # 獲取數據
-            klines = await service._fetch_klines("btctwd", str(timeframe_minutes), total_data_points)
+            klines = await fetch_klines_archived(service, "btctwd", str(timeframe_minutes), total_data_points)
             
             if klines is None:
                 self.update_status("❌ 無法獲取歷史數據")
@@ -18,6 +18,7 @@ import pandas as pd
 
 # 直接使用已驗證的LiveMACDService
 from src.data.live_macd_service import LiveMACDService
+from src.data.candle_archive import fetch_klines_archived
 
 class EnhancedMACDBacktestGUI:
     """增強版MACD回測GUI - 7天歷史數據 + 交易信號檢測"""
@@ -183,7 +184,7 @@ class EnhancedMACDBacktestGUI:
             
             # 獲取7天的數據 (7天 * 24小時 = 168筆數據，加上計算MACD需要的額外數據)
             # 使用更大的limit確保獲得足夠的歷史數據
-            klines = await service._fetch_klines("btctwd", "60", 400)
+            klines = await fetch_klines_archived(service, "btctwd", "60", 400)
             
             if klines is None:
                 self.update_status("❌ 無法獲取歷史數據")
@@ -18,6 +18,7 @@ import pandas as pd
 
 # 導入核心模組
 from src.data.live_macd_service import LiveMACDService
+from src.data.candle_archive import fetch_klines_archived
 from src.core.improved_hybrid_trading_signals import detect_improved_hybrid_trading_signals
 
 class ImprovedHybridMACDBacktestGUI:
@@ -259,7 +260,8 @@ class ImprovedHybridMACDBacktestGUI:
             
             # 獲取1小時數據（7天）
             hourly_limit = 7 * 24  # 7天的小時數
-            hourly_klines = await macd_service._fetch_klines(
+            hourly_klines = await fetch_klines_archived(
+                macd_service,
                 market="btctwd",
                 period="60",
                 limit=hourly_limit
@@ -280,7 +282,8 @@ class ImprovedHybridMACDBacktestGUI:
             
             # 獲取短時間週期數據（7天）
             dynamic_limit = (7 * 24 * 60) // int(self.dynamic_timeframe)  # 7天的數據點數
-            dynamic_klines = await macd_service._fetch_klines(
+            dynamic_klines = await fetch_klines_archived(
+                macd_service,
                 market="btctwd",
                 period=self.dynamic_timeframe,
                 limit=dynamic_limit
@@ -18,6 +18,7 @@ import pandas as pd
 
 # 導入核心模組
 from src.data.live_macd_service import LiveMACDService
+from src.data.candle_archive import fetch_klines_archived
 from src.core.improved_trading_signals import detect_improved_trading_signals
 
 class ImprovedMACDBacktestGUI:
@@ -196,7 +197,7 @@ class ImprovedMACDBacktestGUI:
             service = LiveMACDService()
             
             # 獲取7天的數據 (7天 * 24小時 = 168筆數據，加上計算MACD需要的額外數據)
-            klines = await service._fetch_klines("btctwd", "60", 400)
+            klines = await fetch_klines_archived(service, "btctwd", "60", 400)
             
             if klines is None:
                 self.update_status("❌ 無法獲取歷史數據")
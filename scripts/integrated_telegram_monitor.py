@@ -45,24 +45,17 @@ class IntegratedTelegramMonitor:
     
     def _calculate_macd_data(self, df):
         """計算MACD數據的輔助方法"""
-        import numpy as np
-        
-        prices = df['close'].tolist()
-        timestamps = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
-        
-        macd_line, signal_line, hist = self.macd_calculator.calculate_macd(prices, timestamps)
+        # 每分鐘輪詢同一批K線：增量狀態只提交新收盤的K線，不再每次重算整個窗口
+        macd_line, signal_line, hist = self.macd_calculator.stream_macd_series(
+            df['timestamp'].tolist(), df['close'].tolist()
+        )
         
-        # 創建包含MACD數據的DataFrame
+        # 創建包含MACD數據的DataFrame（數據不足的K線為NaN）
         macd_df = df.copy()
         macd_df['datetime'] = df['timestamp']
-        
-        # 填充MACD數據（前面的數據用NaN填充）
-        macd_len = len(macd_line)
-        total_len = len(df)
-        
-        macd_df['macd'] = [np.nan] * (total_len - macd_len) + macd_line
-        macd_df['macd_signal'] = [np.nan] * (total_len - macd_len) + signal_line
-        macd_df['macd_hist'] = [np.nan] * (total_len - macd_len) + hist
+        macd_df['macd'] = macd_line
+        macd_df['macd_signal'] = signal_line
+        macd_df['macd_hist'] = hist
         
         # 移除NaN行
         macd_df = macd_df.dropna().reset_index(drop=True)
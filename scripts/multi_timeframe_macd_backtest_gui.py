@@ -19,6 +19,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.data.live_macd_service import LiveMACDService
+from src.data.candle_archive import fetch_klines_archived
 from src.core.multi_timeframe_trading_signals import detect_multi_timeframe_trading_signals
 
 class MultiTimeframeMACDBacktestGUI:
@@ -225,7 +226,7 @@ class MultiTimeframeMACDBacktestGUI:
                 self.status_var.set("正在獲取1小時MACD數據...")
                 self.root.update()
                 
-                self.hourly_data = loop.run_until_complete(self.macd_service._fetch_klines("btctwd", "60", 400))  # 獲取更多數據以確保有足夠的歷史數據
+                self.hourly_data = loop.run_until_complete(fetch_klines_archived(self.macd_service, "btctwd", "60", 400))  # 獲取更多數據以確保有足夠的歷史數據
                 if self.hourly_data is None or self.hourly_data.empty:
                     raise Exception("無法獲取1小時數據")
                 
@@ -243,7 +244,7 @@ class MultiTimeframeMACDBacktestGUI:
                     self.status_var.set(f"正在獲取{timeframe}數據...")
                     self.root.update()
                     
-                    df = loop.run_until_complete(self.macd_service._fetch_klines("btctwd", minutes, 2400))  # 獲取更多數據以確保有足夠的歷史數據
+                    df = loop.run_until_complete(fetch_klines_archived(self.macd_service, "btctwd", minutes, 2400))  # 獲取更多數據以確保有足夠的歷史數據
                     if df is not None and not df.empty:
                         # 確保datetime列存在
                         if 'datetime' not in df.columns and 'timestamp' in df.columns:
@@ -267,9 +268,8 @@ class MultiTimeframeMACDBacktestGUI:
                 self.root.after(0, lambda: self.status_var.set("數據載入完成"))
                 
             finally:
-                # 關閉aiohttp會話
-                if self.macd_service.session:
-                    loop.run_until_complete(self.macd_service.session.close())
+                # 關閉服務（連接池由共用傳輸層管理）
+                loop.run_until_complete(self.macd_service.close())
                 loop.close()
             
         except Exception as e:
@@ -30,6 +30,7 @@ import pandas as pd
 
 # 導入核心模組
 from src.data.live_macd_service import LiveMACDService
+from src.data.candle_archive import fetch_klines_archived
 from src.core.improved_trading_signals import detect_improved_trading_signals
 from src.core.multi_timeframe_trading_signals import detect_multi_timeframe_trading_signals
 
@@ -330,7 +331,7 @@ class MultiTimeframeMACDBacktestGUI:
             service = LiveMACDService()
             
             # 獲取7天的數據 (7天 * 24小時 = 168筆數據，加上計算MACD需要的額外數據)
-            klines = await service._fetch_klines("btctwd", "60", 400)
+            klines = await fetch_klines_archived(service, "btctwd", "60", 400)
             
             if klines is None:
                 self.update_status("❌ 無法獲取歷史數據")
@@ -471,7 +472,7 @@ class MultiTimeframeMACDBacktestGUI:
             timeframe_dfs = {}
             
             # 1小時數據 - 增加數據量以獲得更多歷史數據
-            hourly_klines = await service._fetch_klines("btctwd", "60", 1000)  # 增加到1000根K線
+            hourly_klines = await fetch_klines_archived(service, "btctwd", "60", 1000)  # 增加到1000根K線
             if hourly_klines is not None:
                 hourly_df = service._calculate_macd(hourly_klines, 12, 26, 9)
                 if hourly_df is not None:
@@ -484,14 +485,14 @@ class MultiTimeframeMACDBacktestGUI:
                     timeframe_dfs['30m'] = hourly_ma_df.tail(500).reset_index(drop=True)  # 保持30m的key但使用1小時數據，顯示更多數據
             
             # 15分鐘數據 - 增加數據量
-            fifteen_klines = await service._fetch_klines("btctwd", "15", 4000)  # 增加數據量
+            fifteen_klines = await fetch_klines_archived(service, "btctwd", "15", 4000)  # 增加數據量
             if fifteen_klines is not None:
                 fifteen_df = service._calculate_macd(fifteen_klines, 12, 26, 9)
                 if fifteen_df is not None:
                     timeframe_dfs['15m'] = fifteen_df.tail(2000).reset_index(drop=True)  # 顯示更多數據
             
             # 5分鐘數據 - 增加數據量
-            five_klines = await service._fetch_klines("btctwd", "5", 6000)  # 增加數據量
+            five_klines = await fetch_klines_archived(service, "btctwd", "5", 6000)  # 增加數據量
             if five_klines is not None:
                 five_df = service._calculate_macd(five_klines, 12, 26, 9)
                 if five_df is not None:
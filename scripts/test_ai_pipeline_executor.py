@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試AI流水線DAG執行器 - 依賴排序、階段並行、模型並發上限與五AI流水線接入
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.ai.ai_pipeline_executor import AIPipelineExecutor, PipelineStage
+from src.ai.enhanced_ai_manager import EnhancedAIManager
+from src.ai.llm_response_cache import LLMResponseCache
+
+MODEL_LATENCY = 0.05
+
+
+class FakeOllamaClient:
+    """以阻塞sleep模擬推理延遲的同步客戶端，並記錄每個模型的最大並發數"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = defaultdict(int)
+        self.max_active = defaultdict(int)
+        self.calls = 0
+        self.prompts = []
+
+    def chat(self, model, messages, options):
+        with self.lock:
+            self.calls += 1
+            self.prompts.append(messages[-1]['content'] if messages else '')
+            self.active[model] += 1
+            self.max_active[model] = max(self.max_active[model], self.active[model])
+        time.sleep(MODEL_LATENCY)
+        with self.lock:
+            self.active[model] -= 1
+        return {'message': {'content': '建議: BUY\n信心度: 70%\n風險評分: 0.4'}}
+
+
+def sleep_stage(seconds: float, result: str):
+    async def run(dependencies):
+        await asyncio.sleep(seconds)
+        return result, sorted(dependencies)
+    return run
+
+
+def test_topological_order_and_validation():
+    """階段按依賴排序，未知依賴與循環依賴會報錯"""
+    stages = [
+        PipelineStage('c', sleep_stage(0, 'c'), ('a', 'b')),
+        PipelineStage('b', sleep_stage(0, 'b'), ('a',)),
+        PipelineStage('a', sleep_stage(0, 'a')),
+    ]
+    assert [stage.name for stage in AIPipelineExecutor.topological_order(stages)] == ['a', 'b', 'c']
+
+    for invalid in ([PipelineStage('a', sleep_stage(0, 'a'), ('missing',))],
+                    [PipelineStage('a', sleep_stage(0, 'a'), ('b',)),
+                     PipelineStage('b', sleep_stage(0, 'b'), ('a',))]):
+        try:
+            AIPipelineExecutor.topological_order(invalid)
+            assert False, "應拒絕無效的流水線"
+        except ValueError:
+            pass
+
+
+def test_independent_stages_run_concurrently():
+    """只依賴同一階段的兩個階段並行執行，耗時接近關鍵路徑"""
+    executor = AIPipelineExecutor()
+    stages = [
+        PipelineStage('scanner', sleep_stage(0.05, 'scanner')),
+        PipelineStage('analyst', sleep_stage(0.1, 'analyst'), ('scanner',)),
+        PipelineStage('trend', sleep_stage(0.1, 'trend'), ('scanner',)),
+        PipelineStage('risk', sleep_stage(0.05, 'risk'), ('scanner', 'analyst', 'trend')),
+    ]
+
+    start = time.perf_counter()
+    results = asyncio.run(executor.run_graph(stages))
+    elapsed = time.perf_counter() - start
+
+    assert results['risk'] == ('risk', ['analyst', 'scanner', 'trend'])
+    assert elapsed < 0.28
+    assert executor.get_latency_stats()['stages']['analyst']['count'] == 1
+    executor.shutdown()
+
+
+def test_blocking_calls_respect_model_concurrency():
+    """阻塞調用在線程池中執行且不超過模型並發上限"""
+    client = FakeOllamaClient()
+    executor = AIPipelineExecutor(max_workers=8, model_concurrency={'qwen:7b': 2})
+
+    async def run_all():
+        await asyncio.gather(*(executor.run_blocking('qwen:7b', client.chat, model='qwen:7b',
+                                                     messages=[], options={}) for _ in range(6)))
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+
+    assert client.max_active['qwen:7b'] == 2
+    assert elapsed >= 3 * MODEL_LATENCY
+    assert executor.get_latency_stats()['models']['qwen:7b']['count'] == 6
+    executor.shutdown()
+
+
+def test_five_pair_cycle_uses_critical_path():
+    """五個交易對的五AI流水線不阻塞事件循環，耗時遠小於串行總和"""
+    manager = EnhancedAIManager(response_cache=LLMResponseCache())
+    manager.ollama_client = FakeOllamaClient()
+    pairs = ['BTCTWD', 'ETHTWD', 'LTCTWD', 'BCHTWD', 'XRPTWD']
+    market_data = {'current_price': 1500000, 'rsi': 60, 'macd': 0.02}
+
+    async def run_cycle():
+        return await asyncio.gather(*(manager._analyze_single_pair(pair, market_data) for pair in pairs))
+
+    start = time.perf_counter()
+    decisions = asyncio.run(run_cycle())
+    elapsed = time.perf_counter() - start
+
+    serial_time = len(pairs) * len(manager.ai_models) * MODEL_LATENCY
+    assert manager.ollama_client.calls == len(pairs) * len(manager.ai_models)
+    assert all(len(decision.ai_responses) == 5 for decision in decisions)
+    assert elapsed < serial_time / 2
+    assert all(count <= 2 for count in manager.ollama_client.max_active.values())
+    assert set(manager.get_enhanced_performance_stats()['pipeline_latency']['stages']) == set(manager.ai_models)
+    manager.pipeline_executor.shutdown()
+
+
+def test_multi_pair_entry_uses_pipeline():
+    """多交易對入口經由DAG流水線分析每個支持的交易對並使用多交易對提示詞"""
+    manager = EnhancedAIManager(response_cache=LLMResponseCache())
+    manager.ollama_client = FakeOllamaClient()
+    pairs = ['BTCTWD', 'ETHTWD', 'LTCTWD', 'BCHTWD']
+    multi_pair_data = {pair: {'current_price': 1500000, 'rsi': 60, 'macd': 0.02,
+                              'price_change_5m': 1.0, 'volatility': 0.03} for pair in pairs}
+    multi_pair_data['XRPTWD'] = dict(multi_pair_data['BTCTWD'])
+
+    start = time.perf_counter()
+    decisions = asyncio.run(manager.analyze_multi_pair_market(multi_pair_data))
+    elapsed = time.perf_counter() - start
+
+    assert sorted(decisions) == sorted(pairs)
+    assert all(len(decision.ai_responses) == 5 and all(r.success for r in decision.ai_responses)
+               for decision in decisions.values())
+    assert manager.ollama_client.calls == len(pairs) * len(manager.ai_models)
+    assert all('多交易對' in prompt for prompt in manager.ollama_client.prompts)
+    assert elapsed < len(pairs) * len(manager.ai_models) * MODEL_LATENCY / 2
+    stage_stats = manager.get_enhanced_performance_stats()['pipeline_latency']['stages']
+    assert all(stage_stats[stage]['count'] == len(pairs) for stage in manager.ai_models)
+    manager.pipeline_executor.shutdown()
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_topological_order_and_validation,
+        test_independent_stages_run_concurrently,
+        test_blocking_calls_respect_model_concurrency,
+        test_five_pair_cycle_uses_critical_path,
+        test_multi_pair_entry_uses_pipeline,
+    ]
+
+    print("🧪 開始測試AI流水線DAG執行器...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試套利貨幣圖 - 增量搜索的盈利環與全量枚舉一致、套利檢測器由報價自動發現環形套利
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.strategies.arbitrage_graph import CurrencyGraph, split_pair
+from src.strategies.arbitrage_opportunity_detector import (
+    ArbitrageConfig, ArbitrageOpportunityDetector, ArbitrageType, PriceData
+)
+
+CURRENCIES = ["TWD", "USDT", "BTC", "ETH", "LTC", "BCH", "XRP"]
+
+
+def random_market(currencies, pair_count: int, seed: int):
+    """以一組真實價值為中心、帶隨機錯價的交易對報價生成器"""
+    rng = np.random.default_rng(seed)
+    values = dict(zip(currencies, np.exp(rng.uniform(-3, 3, len(currencies)))))
+    quotes = [f"{base}/{quote}" for base, quote in itertools.permutations(currencies, 2)]
+    rng.shuffle(quotes)
+    pairs, seen = [], set()
+    for pair in quotes:
+        base, quote = pair.split('/')
+        if frozenset((base, quote)) not in seen:
+            seen.add(frozenset((base, quote)))
+            pairs.append(pair)
+    pairs = pairs[:pair_count]
+
+    def tick(pair):
+        base, quote = pair.split('/')
+        mid = values[base] / values[quote] * math.exp(rng.normal(0, 0.004))
+        half_spread = mid * rng.uniform(0.0001, 0.0008)
+        return mid - half_spread, mid + half_spread, rng.uniform(0.5, 5)
+
+    return pairs, tick, rng
+
+
+def brute_force_cycles(quotes: dict, fee: float, min_length: int = 3, max_length: int = 4) -> dict:
+    """參考實現：枚舉所有長度在範圍內的簡單環並計算扣費後的對數收益"""
+    rates = {}
+    for pair, (bid, ask) in quotes.items():
+        base, quote = split_pair(pair)
+        rates[(base, quote)] = bid * (1 - fee)
+        rates[(quote, base)] = (1 - fee) / ask
+    currencies = sorted({currency for edge in rates for currency in edge})
+
+    cycles = {}
+    for length in range(min_length, max_length + 1):
+        for nodes in itertools.permutations(currencies, length):
+            if nodes[0] != min(nodes):
+                continue
+            legs = list(zip(nodes, nodes[1:] + nodes[:1]))
+            if all(leg in rates for leg in legs):
+                log_return = sum(math.log(rates[leg]) for leg in legs)
+                if log_return > 0:
+                    cycles[nodes] = log_return
+    return cycles
+
+
+def test_incremental_cycles_match_brute_force():
+    """逐筆報價增量維護的盈利環集合（含3/4腿環與收益率）與全量枚舉一致"""
+    pairs, tick, rng = random_market(CURRENCIES, 16, seed=3)
+    graph = CurrencyGraph(fee=0.001)
+    quotes = {}
+    found_lengths = set()
+    for step in range(400):
+        batch = pairs if step == 0 else rng.choice(pairs, size=rng.integers(1, 4), replace=False)
+        for pair in batch:
+            bid, ask, volume = tick(pair)
+            quotes[pair] = (bid, ask)
+            graph.update_quote(pair, bid, ask, volume, volume)
+        if step == 250:
+            graph.remove_pair(pairs[0])
+            del quotes[pairs[0]]
+            pairs = pairs[1:]
+
+        cycles = graph.find_cycles()
+        expected = brute_force_cycles(quotes, 0.001)
+        found = {c.rotate_to(min(c.currencies)).currencies: c for c in cycles}
+        assert set(found) == set(expected), step
+        for key, cycle in found.items():
+            assert math.isclose(cycle.log_return, expected[key], rel_tol=1e-9, abs_tol=1e-12)
+            found_lengths.add(len(key))
+        assert [c.log_return for c in cycles] == sorted((c.log_return for c in cycles), reverse=True)
+
+    assert found_lengths == {3, 4}
+
+
+def test_cycle_legs_and_capacity():
+    """環的每一腿匯率、成交量與盤口上限正確，只有盤口量變化時沿用緩存並更新上限"""
+    graph = CurrencyGraph(fee=0.001)
+    graph.update_quote("BTCTWD", 3499000, 3500000, 2.0, 2.0)
+    graph.update_quote("ETHTWD", 121000, 121100, 500.0, 500.0)
+    graph.update_quote("ETHBTC", 0.0335, 0.03355, 500.0, 500.0)   # ETH 在 BTC 市場被低估
+
+    cycles = graph.find_cycles()
+    assert len(cycles) == 1
+    cycle = cycles[0].rotate_to("TWD")
+    assert cycle.currencies == ("TWD", "BTC", "ETH")
+    expected = 1 / 3500000 * 0.999 / 0.03355 * 0.999 * 121000 * 0.999
+    assert math.isclose(cycle.profit_percentage, expected - 1, rel_tol=1e-12)
+
+    legs = cycle.legs(70000)
+    assert [leg['action'] for leg in legs] == ['buy', 'buy', 'sell']
+    assert math.isclose(legs[0]['volume'], 0.02) and legs[1]['pair'] == "ETHBTC"
+    assert math.isclose(legs[2]['volume'], 0.02 * 0.999 / 0.03355 * 0.999)
+    assert math.isclose(cycle.max_input(), 2.0 * 3500000)
+
+    assert graph.update_quote("BTCTWD", 3499000, 3500000, 2.0, 0.5) == 0
+    assert math.isclose(graph.find_cycles()[0].rotate_to("TWD").max_input(), 0.5 * 3500000)
+
+    graph.update_quote("ETHBTC", 0.0346, 0.03465, 500.0, 500.0)
+    assert graph.find_cycles() == []
+
+
+def test_detector_discovers_cycles_from_quotes():
+    """套利檢測器由全部報價建圖發現環形套利，執行路徑從TWD出發並受資金上限約束"""
+    logging.disable(logging.WARNING)
+    try:
+        config = ArbitrageConfig(enabled_types=[ArbitrageType.TRIANGULAR], min_profit_percentage=0.002,
+                                 max_capital_per_trade=50000, exchanges=["max"],
+                                 trading_pairs=["BTCTWD", "ETHTWD", "ETHBTC", "USDTTWD", "BTCUSDT"])
+        detector = ArbitrageOpportunityDetector(config)
+        now = datetime.now()
+        for pair, bid, ask in [("BTCTWD", 3499000, 3500000), ("ETHTWD", 121000, 121100),
+                               ("ETHBTC", 0.0335, 0.03355), ("USDTTWD", 31.49, 31.51),
+                               ("BTCUSDT", 111000, 111050)]:
+            detector.update_price_data(PriceData(pair, "max", bid, ask, 10.0, 10.0, now))
+
+        asyncio.run(detector._detect_arbitrage_opportunities())
+        opportunities = detector.get_active_opportunities()
+    finally:
+        logging.disable(logging.NOTSET)
+
+    assert opportunities and all(opp.arbitrage_type == ArbitrageType.TRIANGULAR for opp in opportunities)
+    best = opportunities[0]
+    assert best.required_capital == 50000
+    assert best.execution_path[0]['from_currency'] == "TWD" == best.execution_path[-1]['to_currency']
+    assert all(leg['exchange'] == "max" for leg in best.execution_path)
+    assert math.isclose(best.expected_profit, 50000 * best.profit_percentage)
+    assert "ETHBTC" in best.pairs and best.profit_percentage > 0.002
+
+
+def test_detector_skips_cycles_without_base_currency():
+    """不經過TWD的盈利環不產生機會，避免以TWD資金上限套用到其他幣種的投入量"""
+    logging.disable(logging.WARNING)
+    try:
+        config = ArbitrageConfig(enabled_types=[ArbitrageType.TRIANGULAR], min_profit_percentage=0.002,
+                                 max_capital_per_trade=50000, exchanges=["max"],
+                                 trading_pairs=["BTCUSDT", "ETHUSDT", "ETHBTC"])
+        detector = ArbitrageOpportunityDetector(config)
+        now = datetime.now()
+        for pair, bid, ask in [("BTCUSDT", 111000, 111050), ("ETHUSDT", 3840, 3841),
+                               ("ETHBTC", 0.0335, 0.03355)]:
+            detector.update_price_data(PriceData(pair, "max", bid, ask, 10.0, 10.0, now))
+
+        cycles = detector.currency_graphs["max"].find_cycles()
+        assert cycles and all("TWD" not in cycle.currencies for cycle in cycles)
+        assert all(detector._calculate_cycle_opportunity("max", cycle) is None for cycle in cycles)
+        assert asyncio.run(detector._detect_triangular_arbitrage()) == []
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def main():
+    """運行所有測試並測量大圖上每筆報價的檢測延遲"""
+    tests = [
+        test_incremental_cycles_match_brute_force,
+        test_cycle_legs_and_capacity,
+        test_detector_discovers_cycles_from_quotes,
+        test_detector_skips_cycles_without_base_currency,
+    ]
+
+    print("🧪 開始測試套利貨幣圖...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    currencies = [f"C{i:02d}" for i in range(24)]
+    pairs, tick, rng = random_market(currencies, 160, seed=11)
+    graph = CurrencyGraph(fee=0.001)
+    quotes = {}
+    for pair in pairs:
+        bid, ask, volume = tick(pair)
+        quotes[pair] = (bid, ask)
+        graph.update_quote(pair, bid, ask, volume, volume)
+    graph.find_cycles()
+
+    ticks = [pairs[i] for i in rng.integers(0, len(pairs), 2000)]
+    start = time.perf_counter()
+    for pair in ticks:
+        bid, ask, volume = tick(pair)
+        quotes[pair] = (bid, ask)
+        graph.update_quote(pair, bid, ask, volume, volume)
+        graph.find_cycles()
+    incremental_us = (time.perf_counter() - start) / len(ticks) * 1e6
+    start = time.perf_counter()
+    brute_force_cycles(quotes, 0.001)
+    full_ms = (time.perf_counter() - start) * 1000
+    print(f"⏱️ {len(currencies)} 個幣種 / {len(pairs)} 個交易對: 增量檢測 {incremental_us:.0f} µs/筆，"
+          f"全量枚舉 {full_ms:.0f} ms/次")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試批量網格回測器 - 與逐筆驅動 SimpleGridEngine 的回測結果一致、多進程分塊結果不變
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.trading.batch_grid_backtester import BatchGridBacktester, build_level_matrix, simulate_grid_batch
+from src.trading.simple_grid_engine import GridConfig, create_simple_grid_engine
+
+
+async def engine_backtest(config: GridConfig, prices, balance: float = 100000.0) -> dict:
+    """參考實現：AIGridOptimizer 原有的逐筆 update_price 回測"""
+    engine = create_simple_grid_engine(config)
+    engine.set_balance(balance)
+    engine.initialize_grid()
+
+    max_drawdown, peak_balance, trade_count, total_profit = 0.0, balance, 0, 0.0
+    for price in prices:
+        result = await engine.update_price(price)
+        trade_count += len(result.get("triggered_actions", []))
+        status = engine.get_status()
+        current_balance = status["available_balance"] + status["current_position"] * price
+        total_profit = current_balance - balance
+        peak_balance = max(peak_balance, current_balance)
+        max_drawdown = max(max_drawdown, (peak_balance - current_balance) / peak_balance)
+    return {"total_profit": total_profit, "max_drawdown": max_drawdown, "trade_count": trade_count,
+            "final_position": engine.current_position, "final_balance": engine.available_balance}
+
+
+def price_path(count: int = 720, seed: int = 3) -> list:
+    """帶跳空的每小時價格路徑"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.012, count)
+    returns[rng.random(count) < 0.03] *= 6
+    return (3500000 * np.exp(np.cumsum(returns))).tolist()
+
+
+def candidate_grid(base_price: float = 3500000) -> list:
+    """與 AIGridOptimizer 相同形式的候選配置（間距 x 層級 x 倉位上限 x 基準價）"""
+    configs = []
+    for spacing in (0.4, 0.8, 1.6, 2.4, 3.0):
+        for levels in (6, 8, 12, 16, 20):
+            for max_position in (0.02, 0.3):
+                for base in (base_price, base_price * 0.97):
+                    configs.append(GridConfig(pair="BTCTWD", base_price=base, grid_spacing=spacing,
+                                              grid_levels=levels, order_amount=min(100000 / levels, 20000),
+                                              upper_limit=base * 1.12, lower_limit=base * 0.88,
+                                              max_position=max_position))
+    return configs
+
+
+def test_matches_engine_backtest():
+    """每個候選的盈利、回撤、交易次數與倉位和逐筆引擎回測一致"""
+    logging.disable(logging.WARNING)
+    try:
+        prices = price_path()
+        configs = candidate_grid()
+        batch = simulate_grid_batch(configs, prices)
+        assert len(batch) == len(configs)
+        assert sum(result["trade_count"] for result in batch) > 0
+
+        for config, result in zip(configs, batch):
+            expected = asyncio.run(engine_backtest(config, prices))
+            assert result["trade_count"] == expected["trade_count"], config
+            for key in ("total_profit", "max_drawdown", "final_position", "final_balance"):
+                assert np.isclose(result[key], expected[key], rtol=1e-9, atol=1e-6), (key, config)
+            assert result["grid_utilization"] == expected["trade_count"] / len(prices)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_level_matrix_and_range_utilization():
+    """網格價格矩陣按價格升序、超出上下限的層級被丟棄並以NaN填充"""
+    narrow = GridConfig("BTCTWD", 100.0, 5.0, 10, 10.0, upper_limit=111.0, lower_limit=79.0)
+    wide = GridConfig("BTCTWD", 100.0, 1.0, 4, 10.0, upper_limit=200.0, lower_limit=50.0)
+    matrix = build_level_matrix([narrow, wide])
+    assert np.allclose(matrix[0], [80.0, 85.0, 90.0, 95.0, 105.0, 110.0])
+    assert np.allclose(matrix[1, :4], [98.0, 99.0, 101.0, 102.0]) and np.isnan(matrix[1, 4:]).all()
+
+    results = simulate_grid_batch([narrow, wide], [100.0, 120.0, 95.0, 60.0])
+    assert results[0]["range_utilization"] == 0.5 and results[1]["range_utilization"] == 1.0
+    assert simulate_grid_batch([narrow], [])[0] == {"error": "無歷史價格數據"}
+
+
+def test_process_fan_out_matches_single_process():
+    """多進程分塊回測與單進程結果一致且順序不變"""
+    prices = price_path(300, seed=9)
+    configs = candidate_grid()
+    single = BatchGridBacktester().run(configs, prices)
+    parallel = BatchGridBacktester(workers=2, min_chunk_size=20).run(configs, prices)
+    assert parallel == single
+
+
+def main():
+    """運行所有測試並比較批量回測與逐筆引擎回測耗時"""
+    tests = [
+        test_matches_engine_backtest,
+        test_level_matrix_and_range_utilization,
+        test_process_fan_out_matches_single_process,
+    ]
+
+    print("🧪 開始測試批量網格回測器...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    prices, configs = price_path(), candidate_grid()
+    logging.disable(logging.WARNING)
+    start = time.perf_counter()
+    for config in configs:
+        asyncio.run(engine_backtest(config, prices))
+    engine_time = time.perf_counter() - start
+    logging.disable(logging.NOTSET)
+    start = time.perf_counter()
+    simulate_grid_batch(configs, prices)
+    batch_time = time.perf_counter() - start
+    print(f"⏱️ {len(configs)} 個候選 x {len(prices)} 筆價格: 逐筆引擎 {engine_time:.2f} s，"
+          f"批量回測 {batch_time * 1000:.0f} ms ({engine_time / batch_time:.0f}x)")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試列式K線檔案庫 - 追加、擴容、範圍讀取、增量同步與只補缺口的API獲取
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+import weakref
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.candle_archive import CandleArchive, INITIAL_CAPACITY, fetch_klines_archived
+from src.data.kline_storage import KlineStorage
+from src.strategy import backtest_engine
+import src.core.dynamic_trading_signals as dynamic_trading_signals
+
+
+class StubDynamicTradingSignals:
+    """DynamicTradingSignals 尚未實現，回測引擎只需在構造時能創建它"""
+
+    def __init__(self, config):
+        self.config = config
+
+
+if not hasattr(dynamic_trading_signals, 'DynamicTradingSignals'):
+    dynamic_trading_signals.DynamicTradingSignals = StubDynamicTradingSignals
+
+
+def create_test_klines(periods: int = 100, start_ts: int = 1_700_000_000, step: int = 60) -> pd.DataFrame:
+    """創建以Unix秒為時間戳的測試K線"""
+    close = np.linspace(3400000, 3500000, periods)
+    return pd.DataFrame({
+        'timestamp': start_ts + np.arange(periods, dtype=np.int64) * step,
+        'open': close - 100,
+        'high': close + 500,
+        'low': close - 500,
+        'close': close,
+        'volume': np.arange(periods, dtype=float) + 1
+    })
+
+
+def test_append_and_zero_copy_load():
+    """追加後讀取為只讀視圖，重複與過期K線被忽略，最後一根可覆蓋"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CandleArchive(tmp)
+        df = create_test_klines(100)
+
+        assert archive.append('btctwd', '1m', df) == 100
+        assert archive.append('btctwd', '1m', df.iloc[:50]) == 0
+
+        updated = df.iloc[-1:].copy()
+        updated['close'] = 1.0
+        assert archive.append('btctwd', '1m', updated) == 1
+
+        columns = archive.load('btctwd', '1m')
+        assert len(columns['timestamp']) == 100
+        assert columns['close'][-1] == 1.0
+        assert np.array_equal(columns['volume'], df['volume'].to_numpy())
+        assert not columns['close'].flags.writeable
+
+
+def test_growth_beyond_initial_capacity():
+    """超過初始容量時擴容並保留已有數據"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CandleArchive(tmp)
+        df = create_test_klines(INITIAL_CAPACITY * 2 + 10)
+
+        archive.append('btctwd', '1m', df.iloc[:1000])
+        archive.append('btctwd', '1m', df.iloc[1000:])
+
+        columns = archive.load('btctwd', '1m')
+        assert np.array_equal(columns['timestamp'], df['timestamp'].to_numpy())
+        assert np.array_equal(columns['close'], df['close'].to_numpy())
+
+
+class ViewTrackingArchive(CandleArchive):
+    """記錄 load() 返回的映射視圖在原子替換檔案時是否仍然存活"""
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.views = []
+        self.live_at_replace = []
+
+    def load(self, *args, **kwargs):
+        columns = super().load(*args, **kwargs)
+        self.views += [weakref.ref(values) for values in columns.values() if values.size]
+        return columns
+
+    def _create_file(self, *args, **kwargs):
+        gc.collect()
+        self.live_at_replace.append(sum(ref() is not None for ref in self.views))
+        return super()._create_file(*args, **kwargs)
+
+
+def test_growth_releases_views_before_replace():
+    """擴容重寫檔案前已釋放所有映射視圖（Windows 上映射中的檔案無法被替換）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = ViewTrackingArchive(tmp)
+        df = create_test_klines(INITIAL_CAPACITY + 10)
+
+        archive.append('btctwd', '1m', df.iloc[:INITIAL_CAPACITY - 5])
+        archive.append('btctwd', '1m', df.iloc[INITIAL_CAPACITY - 5:])
+        assert archive.views and archive.live_at_replace == [0, 0]
+        assert np.array_equal(archive.load('btctwd', '1m')['close'], df['close'].to_numpy())
+
+
+def test_range_load():
+    """按時間範圍讀取（含端點）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CandleArchive(tmp)
+        df = create_test_klines(100)
+        archive.append('btctwd', '1m', df)
+
+        start, end = int(df['timestamp'].iloc[10]), int(df['timestamp'].iloc[19])
+        frame = archive.load_dataframe('btctwd', '1m', start=start, end=end)
+        assert len(frame) == 10
+        assert frame['timestamp'].iloc[0] == pd.Timestamp(start, unit='s')
+        assert archive.load('ethtwd', '1m')['close'].size == 0
+
+
+def test_sync_from_storage_is_incremental():
+    """從SQLite存儲只同步最後一根之後的K線"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = KlineStorage(str(Path(tmp) / 'market.db'))
+        archive = CandleArchive(str(Path(tmp) / 'candles'))
+        df = create_test_klines(200)
+
+        storage.upsert_dataframe('btctwd', '1m', df.iloc[:150])
+        assert archive.sync_from_storage(storage, 'btctwd', '1m') == 150
+
+        storage.upsert_dataframe('btctwd', '1m', df.iloc[150:])
+        assert archive.sync_from_storage(storage, 'btctwd', '1m') == 51
+        assert archive.last_timestamp('btctwd', '1m') == int(df['timestamp'].iloc[-1])
+        storage.close()
+
+
+def test_fetch_klines_archived_requests_only_gap():
+    """檔案庫已有歷史時只向API請求缺口部分"""
+
+    class FakeService:
+        def __init__(self, klines):
+            self.klines = klines
+            self.requested = []
+
+        async def _fetch_klines(self, market, period, limit):
+            self.requested.append(limit)
+            return self.klines.iloc[-limit:].reset_index(drop=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CandleArchive(tmp)
+        now = int(time.time()) // 3600 * 3600
+        klines = create_test_klines(400, start_ts=now - 399 * 3600, step=3600)
+        service = FakeService(klines)
+
+        first = asyncio.run(fetch_klines_archived(service, 'btctwd', '60', 300, archive))
+        second = asyncio.run(fetch_klines_archived(service, 'btctwd', '60', 300, archive))
+
+        assert service.requested[0] == 300
+        assert service.requested[1] <= 3
+        assert list(second['timestamp']) == list(first['timestamp'])
+        assert 'datetime' in second.columns
+
+
+def test_fetch_klines_archived_rebuilds_stale_archive():
+    """檔案庫落後超過 limit 根時以最新K線重建，不寫入缺口"""
+
+    class FakeService:
+        def __init__(self, klines):
+            self.klines = klines
+            self.requested = []
+
+        async def _fetch_klines(self, market, period, limit):
+            self.requested.append(limit)
+            return self.klines.iloc[-limit:].reset_index(drop=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CandleArchive(tmp)
+        now = int(time.time()) // 3600 * 3600
+        klines = create_test_klines(1200, start_ts=now - 1199 * 3600, step=3600)
+        archive.append('btctwd', '1h', klines.iloc[:200])
+        service = FakeService(klines)
+
+        df = asyncio.run(fetch_klines_archived(service, 'btctwd', '60', 100, archive))
+
+        assert service.requested == [100]
+        timestamps = archive.load('btctwd', '1h')['timestamp']
+        assert np.array_equal(timestamps, klines['timestamp'].to_numpy()[-100:])
+        assert np.all(np.diff(timestamps) == 3600)
+        assert list(df['timestamp']) == list(klines['timestamp'].iloc[-100:])
+
+
+def test_extend_appends_connected_and_rebuilds_otherwise():
+    """銜接的新K線只追加；有缺口或覆蓋更早歷史時重建序列"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CandleArchive(tmp)
+        df = create_test_klines(300, step=60)
+
+        assert archive.extend('btctwd', '1m', df.iloc[100:200], 60) == 100
+        assert archive.extend('btctwd', '1m', df.iloc[199:220], 60) == 21
+        assert archive.candles_to_fetch('btctwd', '1m', 50, 60, now=int(df['timestamp'].iloc[229])) == 12
+        assert archive.candles_to_fetch('btctwd', '1m', 500, 60) == 500
+
+        assert archive.extend('btctwd', '1m', df.iloc[250:260], 60) == 10
+        assert np.array_equal(archive.load('btctwd', '1m')['timestamp'], df['timestamp'].to_numpy()[250:260])
+
+        assert archive.extend('btctwd', '1m', df.iloc[240:270], 60) == 30
+        assert np.array_equal(archive.load('btctwd', '1m')['timestamp'], df['timestamp'].to_numpy()[240:270])
+
+
+def test_strategy_backtest_from_archive():
+    """策略回測從檔案庫讀取並補齊最新K線，數據獲取器的結果寫回檔案庫"""
+
+    class FakeStrategyManager:
+        def __init__(self, strategy):
+            self.strategy = strategy
+            self.saved = []
+
+        def get_strategy(self, strategy_id):
+            return self.strategy
+
+        def save_strategy(self, strategy_id):
+            self.saved.append(strategy_id)
+
+    class FakeDataFetcher:
+        def __init__(self, klines):
+            self.klines = klines
+            self.requested = []
+
+        def get_historical_data(self, symbol, interval, limit):
+            self.requested.append(limit)
+            df = self.klines.iloc[-limit:].reset_index(drop=True)
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+            return df
+
+    strategy = SimpleNamespace(strategy_name='archive', strategy_type=SimpleNamespace(value='grid'))
+    manager = FakeStrategyManager(strategy)
+    original_manager = backtest_engine.strategy_config_manager
+    backtest_engine.strategy_config_manager = manager
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            now = int(time.time()) // 3600 * 3600
+            klines = create_test_klines(100, start_ts=now - 99 * 3600, step=3600)
+            engine = backtest_engine.BacktestEngine()
+            engine.candle_archive = CandleArchive(tmp)
+            engine.data_fetcher = FakeDataFetcher(klines)
+            engine.project_root = Path(tmp)
+
+            # 空檔案庫：數據獲取器的結果寫回檔案庫
+            result = engine.run_backtest('archive', 'BTCUSDT', days=1)
+            assert engine.data_fetcher.requested == [24]
+            assert engine.candle_archive.last_timestamp('btcusdt', '1h') == now
+            assert result.start_date == pd.Timestamp(int(klines['timestamp'].iloc[-24]), unit='s')
+            assert result.end_date == pd.Timestamp(now, unit='s')
+            assert manager.saved == ['archive']
+            assert strategy.backtest_results['start_date'] == result.start_date.isoformat()
+
+            # 檔案庫已是最新：只請求覆蓋最後一根的少量K線
+            engine.run_backtest('archive', 'BTCUSDT', days=1)
+            assert engine.data_fetcher.requested[-1] <= 3
+
+            # 檔案庫落後：補齊缺少的最新K線
+            engine.candle_archive.replace('btcusdt', '1h', klines.iloc[:90])
+            result = engine.run_backtest('archive', 'BTCUSDT', days=1)
+            assert 11 <= engine.data_fetcher.requested[-1] <= 13
+            assert result.end_date == pd.Timestamp(now, unit='s')
+            timestamps = engine.candle_archive.load('btcusdt', '1h')['timestamp']
+            assert len(timestamps) == 100 and np.all(np.diff(timestamps) == 3600)
+    finally:
+        backtest_engine.strategy_config_manager = original_manager
+
+
+def test_dynamic_backtest_archive_matches_mock_shape():
+    """動態回測的檔案庫數據與模擬數據同樣以時間戳為索引"""
+    from src.core.dynamic_backtest_engine import create_dynamic_backtest_engine
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # 引擎構造時在相對路徑下創建數據庫，放到臨時目錄中
+        os.chdir(tmp)
+        try:
+            engine = create_dynamic_backtest_engine()
+            engine.candle_archive = CandleArchive(str(Path(tmp) / 'candles'))
+            end_date = datetime(2024, 1, 1, 12, 0)
+            start_date = end_date - timedelta(hours=2)
+            mock = engine._generate_mock_data("BTCTWD", start_date, end_date)
+
+            # 檔案庫價格與模擬數據不同，確認數據來自檔案庫而非回退到模擬數據
+            archived = mock.reset_index()
+            archived['close'] *= 2
+            engine.candle_archive.append('btctwd', '1m', archived)
+            data = engine._get_historical_data("BTCTWD", start_date, end_date)
+            engine.historical_data_manager.storage.close()
+        finally:
+            os.chdir(cwd)
+
+    assert isinstance(data.index, pd.DatetimeIndex)
+    assert list(data.columns) == list(mock.columns)
+    assert data.index.equals(mock.index)
+    assert np.array_equal(data['close'].to_numpy(), mock['close'].to_numpy() * 2)
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_append_and_zero_copy_load,
+        test_growth_beyond_initial_capacity,
+        test_growth_releases_views_before_replace,
+        test_range_load,
+        test_sync_from_storage_is_incremental,
+        test_fetch_klines_archived_requests_only_gap,
+        test_fetch_klines_archived_rebuilds_stale_archive,
+        test_extend_appends_connected_and_rebuilds_otherwise,
+        test_strategy_backtest_from_archive,
+        test_dynamic_backtest_archive_matches_mock_shape,
+    ]
+
+    print("🧪 開始測試列式K線檔案庫...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試多週期K線重採樣 - 聚合結果與交易所K線一致、形成中K線增量更新、單次1分鐘請求供給所有週期、歷史數據庫重採樣延續
+"""
+
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.candle_resampler import CandleResampler, MultiTimeframeKlineFeed, period_to_timeframe
+from src.data.kline_storage import KLINE_COLUMNS, to_unix_seconds
+from src.data.market_stream import RESOLUTION_SECONDS, Candle, MarketEvent
+from src.data.max_transport import MAXTransport, TransportConfig
+from src.data.simulated_market_stream import SimulatedMAXStreamServer
+
+NOW_MINUTE = int(time.time()) // 60 * 60
+
+
+def generate_minutes(count: int, end: int = NOW_MINUTE, seed: int = 7) -> list:
+    """生成以 end 為最後一根（形成中）的1分鐘K線"""
+    rng = np.random.default_rng(seed)
+    closes = 3500000 + np.cumsum(rng.normal(0, 800, count))
+    rows = []
+    for i, close in enumerate(closes):
+        open_ = closes[i - 1] if i else close
+        spread = abs(rng.normal(0, 300, 2))
+        rows.append([end - 60 * (count - 1 - i), round(open_, 2), round(max(open_, close) + spread[0], 2),
+                     round(min(open_, close) - spread[1], 2), round(close, 2), round(rng.uniform(0.1, 3.0), 4)])
+    return rows
+
+
+def aggregate(rows: list, seconds: int) -> list:
+    """參考實現：按開盤時間分桶聚合 OHLCV"""
+    buckets = {}
+    for start, open_, high, low, close, volume in rows:
+        bucket = start - start % seconds
+        if bucket not in buckets:
+            buckets[bucket] = [bucket, open_, high, low, close, volume]
+        else:
+            row = buckets[bucket]
+            row[2], row[3], row[4] = max(row[2], high), min(row[3], low), close
+            row[5] += volume
+    return [buckets[bucket] for bucket in sorted(buckets)]
+
+
+def assert_rows_equal(df, expected: list):
+    actual = np.column_stack([to_unix_seconds(df['timestamp']),
+                              df[['open', 'high', 'low', 'close', 'volume']].to_numpy()])
+    assert actual.shape == (len(expected), 6), f"{actual.shape} != {(len(expected), 6)}"
+    assert np.allclose(actual, np.array(expected, dtype=float), rtol=0, atol=1e-6)
+
+
+def run_with_server(scenario, minutes: int, seeded=('4h',)):
+    """啟動只提供 REST K線的模擬服務器並加載1分鐘及參考週期K線"""
+    async def main():
+        server = SimulatedMAXStreamServer()
+        await server.start()
+        rows = generate_minutes(minutes)
+        server.load_klines('btctwd', '1m', rows)
+        for timeframe in ('5m', '1h') + tuple(seeded):
+            server.load_klines('btctwd', timeframe, aggregate(rows, RESOLUTION_SECONDS[timeframe]))
+        try:
+            return await scenario(server, rows)
+        finally:
+            await server.stop()
+
+    logging.disable(logging.WARNING)
+    try:
+        return asyncio.run(main())
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_rollups_match_exchange_aggregation():
+    """由1分鐘K線生成的各週期與直接聚合一致，基礎K線沒覆蓋開頭的K線不輸出"""
+    rows = generate_minutes(3 * 1440 + 37)
+    resampler = CandleResampler(max_base_candles=10000)
+    resampler.update_rows(rows)
+
+    history_start = rows[0][0]
+    for timeframe in ('1m', '5m', '15m', '30m', '1h', '4h', '1d'):
+        seconds = RESOLUTION_SECONDS[timeframe]
+        expected = [row for row in aggregate(rows, seconds) if row[0] >= history_start]
+        assert_rows_equal(resampler.to_dataframe(timeframe), expected)
+
+    candles = resampler.candles('1h')
+    assert all(candle.closed for candle in candles[:-1]) and not candles[-1].closed
+    assert resampler.candles('1h', include_partial=False)[-1].start == candles[-2].start
+    assert len(resampler.candles('5m', limit=12)) == 12
+    assert resampler.stats['recomputed'] == 0
+    assert period_to_timeframe(240) == '4h' and period_to_timeframe(7) is None
+
+
+def test_partial_candle_updates_are_incremental():
+    """形成中K線的推送/成交更新增量反映到各週期，收窄高低點的修正按桶重算"""
+    start = NOW_MINUTE - NOW_MINUTE % 3600 + 600
+    resampler = CandleResampler(('5m', '1h'))
+    resampler.update(Candle(start, 100, 105, 95, 102, 1.0, closed=True))
+    resampler.update(Candle(start + 60, 102, 103, 101, 102.5, 0.5))
+    resampler.add_trade(108, 0.2, start + 75)
+    resampler.add_trade(99, 0.3, start + 90)
+    bar = resampler.candles('5m')[-1]
+    assert (bar.open, bar.high, bar.low, bar.close, bar.volume) == (100, 108, 95, 99, 2.0)
+    assert not bar.closed and resampler.stats['recomputed'] == 0
+
+    # 交易所修正已收盤K線，最高價下降：重算整個桶
+    resampler.update(Candle(start, 100, 101, 96, 102, 1.5, closed=True))
+    bar = resampler.candles('5m')[-1]
+    assert (bar.high, bar.low, bar.volume) == (108, 96, 2.5) and resampler.stats['recomputed'] == 2
+
+    # 行情流事件：新K線與補數據
+    resampler.on_market_event(MarketEvent('kline', 'btctwd', 'update', Candle(start + 300, 99, 100, 98, 99.5, 1.0), 0))
+    resampler.on_market_event(MarketEvent('kline', 'btctwd', 'backfill',
+                                          [Candle(start + 120, 99, 99, 97, 98, 0.4, closed=True)], 0))
+    bars = resampler.candles('5m')
+    assert [c.start for c in bars] == [start, start + 300] and bars[0].closed and not bars[1].closed
+    assert bars[0].close == 98 and abs(bars[0].volume - 2.9) < 1e-9
+    # 基礎K線從整點後10分鐘才開始，該小時K線缺少開頭，不輸出
+    assert resampler.candles('1h') == []
+    hour = resampler._rollups['1h'][start - 600].candle
+    assert (hour.open, hour.high, hour.low, hour.close) == (100, 108, 96, 99.5)
+
+
+def test_feed_serves_all_timeframes_from_one_request():
+    """一次1分鐘K線請求供給 1m/5m/1h，之後只增量請求新K線；超出範圍的週期只播種一次"""
+    async def scenario(server, rows):
+        transport = MAXTransport(TransportConfig(base_url=server.rest_url, cache_ttl={}, cache_klines=False))
+        feed = MultiTimeframeKlineFeed(server.rest_url, transport, refresh_interval=0)
+
+        frames = await feed.get_timeframes('BTCTWD', {'1m': 100, '5m': 50, '1h': 24})
+        assert len(server.rest_requests) == 1 and server.rest_requests[0]['period'] == '1'
+        assert_rows_equal(frames['1m'], rows[-100:])
+        assert_rows_equal(frames['5m'], aggregate(rows, 300)[-50:])
+        assert_rows_equal(frames['1h'], aggregate(rows, 3600)[-24:])
+
+        # 形成中K線更新並出現新K線：只請求上次之後的K線
+        rows[-1] = [rows[-1][0], rows[-1][1], rows[-1][2] + 5000, rows[-1][3], rows[-1][4] + 100, rows[-1][5] + 1]
+        rows.append([rows[-1][0] + 60, rows[-1][4], rows[-1][4] + 50, rows[-1][4] - 50, rows[-1][4] + 10, 0.5])
+        server.load_klines('btctwd', '1m', rows[-2:])
+        frames = await feed.get_timeframes('btctwd', {'1m': 100, '5m': 50, '1h': 24})
+        assert len(server.rest_requests) == 2 and server.rest_requests[1]['timestamp'] == str(rows[-2][0])
+        assert_rows_equal(frames['5m'], aggregate(rows, 300)[-50:])
+        assert_rows_equal(frames['1h'], aggregate(rows, 3600)[-24:])
+
+        # 4小時x30根超出基礎K線範圍：播種一次，其後由基礎K線延續
+        server.load_klines('btctwd', '4h', aggregate(rows, 14400))
+        for _ in range(2):
+            frame = (await feed.get_timeframes('btctwd', {'4h': 30}))['4h']
+        periods = [request['period'] for request in server.rest_requests[2:]]
+        assert sorted(periods) == ['1', '1', '240'] and feed.stats['seed_requests'] == 1
+        assert_rows_equal(frame, aggregate(rows, 14400)[-30:])
+        await transport.close()
+
+    run_with_server(scenario, minutes=10 * 1440)
+
+
+def test_consumers_share_base_series():
+    """MACD 服務與數據客戶端共用同一份1分鐘K線，不再按週期分別請求"""
+    from src.data.live_macd_service import LiveMACDService
+    from src.data.max_client import MAXDataClient
+
+    async def scenario(server, rows):
+        macd_service = LiveMACDService(base_url=server.rest_url)
+        data_client = MAXDataClient(base_url=server.rest_url)
+
+        macd = await macd_service.get_live_macd('btctwd', '15')
+        klines = await data_client._get_timeframe_klines('btctwd', {'1m': 100, '5m': 50, '1h': 24})
+        assert macd is not None and macd['price'] == rows[-1][4]
+        assert set(klines) == {'1m', '5m', '1h'}
+        assert_rows_equal(klines['1h'], aggregate(rows, 3600)[-24:])
+        assert [request['period'] for request in server.rest_requests] == ['1']
+
+    run_with_server(scenario, minutes=3 * 1440)
+
+
+def test_historical_manager_extends_rollups_from_base():
+    """歷史數據庫首次加載各週期後，只增量請求1分鐘K線並由它重算5m/1h"""
+    from src.data.historical_data_manager import HistoricalDataManager
+    from src.data.max_client import MAXDataClient
+
+    async def scenario(server, rows):
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = HistoricalDataManager(db_path=str(Path(tmp) / "history.db"))
+            manager.max_client = MAXDataClient(base_url=server.rest_url)
+            try:
+                results = await manager.ensure_historical_data('btctwd', ['1m', '5m', '1h'])
+                assert all(results.values()) and len(server.rest_requests) == 3
+
+                rows[-1] = [rows[-1][0], rows[-1][1], rows[-1][2] + 9000, rows[-1][3], rows[-1][4], rows[-1][5] + 2]
+                rows.append([rows[-1][0] + 60, rows[-1][4], rows[-1][4] + 10, rows[-1][4] - 900, rows[-1][4], 1.5])
+                server.load_klines('btctwd', '1m', rows[-2:])
+                assert await manager._update_timeframe_data('btctwd', '1m')
+                assert len(server.rest_requests) == 4 and server.rest_requests[3]['timestamp'] == str(rows[-2][0])
+
+                assert_rows_equal(manager.get_historical_data('btctwd', '1m', 1440), rows[-1440:])
+                assert_rows_equal(manager.get_historical_data('btctwd', '5m', 2016), aggregate(rows, 300)[-2016:])
+                assert_rows_equal(manager.get_historical_data('btctwd', '1h', 24), aggregate(rows, 3600)[-24:])
+                assert manager._check_data_freshness('btctwd', '5m')[0] is False
+                assert manager._check_data_freshness('btctwd', '1m')[0] is False
+            finally:
+                manager.storage.close()
+
+    run_with_server(scenario, minutes=8 * 1440)
+
+
+def test_roll_up_skips_buckets_with_base_gaps():
+    """1分鐘K線中間缺口超過一天時，缺口所在的1h/1d K線保持數據庫原值，不被部分聚合覆寫"""
+    from src.data.historical_data_manager import HistoricalDataManager
+
+    def frame(rows):
+        df = pd.DataFrame(rows, columns=KLINE_COLUMNS)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+
+    rows = generate_minutes(4 * 1440)
+    gapped = rows[:1440 + 30] + rows[1440 + 30 + 26 * 60:]
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = HistoricalDataManager(db_path=str(Path(tmp) / "history.db"))
+        try:
+            manager._save_klines_data('btctwd', '1h', frame(aggregate(rows, 3600)))
+            manager._save_klines_data('btctwd', '1d', frame(aggregate(rows, 86400)))
+            manager._save_klines_data('btctwd', '1m', frame(gapped))
+
+            results = manager._roll_up_base('btctwd', gapped[0][0])
+            assert results['1h'] > 0
+            assert_rows_equal(manager.get_historical_data('btctwd', '1h', 720), aggregate(rows, 3600))
+            assert_rows_equal(manager.get_historical_data('btctwd', '1d', 365), aggregate(rows, 86400))
+        finally:
+            manager.storage.close()
+            logging.disable(logging.NOTSET)
+
+
+def main():
+    """運行所有測試並統計每個交易週期的K線請求數"""
+    tests = [
+        test_rollups_match_exchange_aggregation,
+        test_partial_candle_updates_are_incremental,
+        test_feed_serves_all_timeframes_from_one_request,
+        test_consumers_share_base_series,
+        test_historical_manager_extends_rollups_from_base,
+        test_roll_up_skips_buckets_with_base_gaps,
+    ]
+
+    print("🧪 開始測試多週期K線重採樣...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    async def cycles(server, rows):
+        transport = MAXTransport(TransportConfig(base_url=server.rest_url, cache_ttl={}, cache_klines=False))
+        feed = MultiTimeframeKlineFeed(server.rest_url, transport, refresh_interval=0)
+        limits = {'1m': 100, '5m': 100, '15m': 100, '30m': 48, '1h': 24, '1d': 1}
+        for _ in range(10):
+            await feed.get_timeframes('btctwd', limits)
+        await transport.close()
+        return len(limits) * 10, len(server.rest_requests)
+
+    separate, resampled = run_with_server(cycles, minutes=2 * 1440)
+    print(f"📉 10 個週期 x 6 個時間框架: 分別請求 {separate} 次，重採樣後 {resampled} 次 "
+          f"(減少 {separate / resampled:.1f}x)")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
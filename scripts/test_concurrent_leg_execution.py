@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試套利多腿並發執行 - 資金依賴推導、並發提交縮短暴露時間、部分成交縮放、失敗撤單與對沖
+"""
+
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.strategies.arbitrage_execution_engine import (
+    ArbitrageExecutionEngine, ExecutionConfig, ExecutionStatus, ExecutionStrategy,
+    LegExecutionMode, OrderRequest, OrderType, build_leg_dependencies
+)
+from src.strategies.simulated_exchange import SimulatedExchange
+
+PRICES = {"BTCTWD": 3500000.0, "ETHBTC": 0.0335, "ETHTWD": 121000.0}
+
+# TWD -> BTC -> ETH -> TWD 三角套利
+TRIANGLE = [
+    {'action': 'buy', 'exchange': 'max', 'pair': 'BTCTWD', 'price': 3500000.0, 'volume': 0.02},
+    {'action': 'buy', 'exchange': 'max', 'pair': 'ETHBTC', 'price': 0.0335, 'volume': 0.5964},
+    {'action': 'sell', 'exchange': 'max', 'pair': 'ETHTWD', 'price': 121000.0, 'volume': 0.5952},
+]
+
+FUNDED = {'max': {'TWD': 1000000.0, 'BTC': 1.0, 'ETH': 10.0}}
+
+
+def order(pair: str, action: str, quantity: float, price: float, exchange: str = 'max') -> OrderRequest:
+    return OrderRequest(order_id=f"{exchange}_{pair}_{action}", exchange=exchange, pair=pair, action=action,
+                        order_type=OrderType.MARKET, quantity=quantity, reference_price=price)
+
+
+def create_engine(exchange: SimulatedExchange, mode: LegExecutionMode, balances=None) -> ArbitrageExecutionEngine:
+    engine = ArbitrageExecutionEngine(ExecutionConfig(default_strategy=ExecutionStrategy.AGGRESSIVE,
+                                                      enable_smart_routing=False, leg_execution_mode=mode))
+    engine.set_exchange_client(exchange)
+    if balances:
+        engine.set_balances(balances)
+    return engine
+
+
+def run_execution(engine: ArbitrageExecutionEngine, path=TRIANGLE):
+    """執行套利並等待異步執行結束"""
+    async def scenario():
+        execution_id = await engine.execute_arbitrage("opp_test", path)
+        while execution_id in engine.active_executions:
+            await asyncio.sleep(0.002)
+        return engine.get_execution_status(execution_id)
+
+    logging.disable(logging.ERROR)
+    try:
+        return asyncio.run(scenario())
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_leg_dependencies_from_execution_path():
+    """由付出/產出幣種推導依賴：無餘額時三角套利逐腿依賴，有餘額時全部獨立，跨交易所兩腿獨立"""
+    triangle = [order("BTCTWD", "buy", 0.02, 3500000), order("ETHBTC", "buy", 0.6, 0.0335),
+                order("ETHTWD", "sell", 0.6, 121000)]
+    assert build_leg_dependencies(triangle) == [[], [0], [1]]
+    assert build_leg_dependencies(triangle, FUNDED) == [[], [], []]
+    assert build_leg_dependencies(triangle, {'max': {'TWD': 1000000.0, 'ETH': 10.0}}) == [[], [0], []]
+
+    cross = [order("BTCTWD", "buy", 0.01, 3500000, "binance"), order("BTCTWD", "sell", 0.01, 3505000, "max")]
+    assert build_leg_dependencies(cross) == [[], []]
+    assert build_leg_dependencies([order("BTC/TWD", "sell", 0.01, 1.0), order("UNKNOWN", "buy", 1, 1.0)]) == [[], [0]]
+
+
+def test_concurrent_mode_shortens_exposure():
+    """資金充足時並發模式同時提交三腿，暴露時間遠小於順序模式，並記錄每腿提交到成交延遲"""
+    concurrent_exchange = SimulatedExchange(PRICES, latency=0.05)
+    concurrent = run_execution(create_engine(concurrent_exchange, LegExecutionMode.CONCURRENT, FUNDED))
+    sequential_exchange = SimulatedExchange(PRICES, latency=0.05)
+    sequential = run_execution(create_engine(sequential_exchange, LegExecutionMode.SEQUENTIAL, FUNDED))
+
+    assert concurrent.status == sequential.status == ExecutionStatus.COMPLETED
+    assert concurrent.leg_dependencies == [[], [], []]
+    submitted = [record.submitted_at for record in concurrent_exchange.order_log()]
+    assert max(submitted) - min(submitted) < 0.02
+    assert concurrent.exposure_time < 0.04
+    assert sequential.exposure_time > 0.25
+    for result in concurrent.execution_results:
+        assert 0.045 < result.fill_latency < 0.2
+        assert result.exchange_order_id.startswith("max_sim_")
+
+
+def test_dependent_legs_follow_partial_fills():
+    """無餘額時後續腿在前序腿成交後才提交，數量按前序腿的部分成交比例縮放"""
+    exchange = SimulatedExchange(PRICES, latency=0.01, fill_ratio={"BTCTWD": 0.8})
+    execution = run_execution(create_engine(exchange, LegExecutionMode.CONCURRENT))
+
+    assert execution.status == ExecutionStatus.COMPLETED
+    assert execution.leg_dependencies == [[], [0], [1]]
+    first, second, third = execution.execution_results
+    assert abs(first.executed_quantity - 0.016) < 1e-12
+    assert abs(second.request.quantity - 0.5964 * 0.8) < 1e-12
+    assert abs(third.request.quantity - 0.5952 * 0.8) < 1e-12
+    assert second.submitted_at >= first.filled_at and third.submitted_at >= second.filled_at
+
+
+def test_failed_leg_cancels_and_hedges():
+    """一腿被拒時撤銷掛單中的腿、取消未提交的腿，並以市價反向對沖已成交的腿"""
+    exchange = SimulatedExchange(PRICES, latency={"BTCTWD": 0.01, "ETHBTC": 0.03, "ETHTWD": 0.3},
+                                 reject_pairs={"ETHBTC": "餘額不足"})
+    engine = create_engine(exchange, LegExecutionMode.CONCURRENT, FUNDED)
+    execution = run_execution(engine)
+
+    assert execution.status == ExecutionStatus.FAILED and "餘額不足" in execution.error_message
+    statuses = [result.status for result in execution.execution_results]
+    assert statuses == [ExecutionStatus.COMPLETED, ExecutionStatus.FAILED, ExecutionStatus.CANCELLED]
+    assert exchange.orders[execution.orders[2].order_id].status == "cancelled"
+
+    hedge = exchange.orders[f"rollback_{execution.orders[0].order_id}"]
+    assert hedge.action == "sell" and hedge.pair == "BTCTWD" and hedge.quantity == 0.02
+
+    # 依賴鏈中前序腿失敗時，後續腿不提交
+    chained = SimulatedExchange(PRICES, latency=0.01, reject_pairs={"BTCTWD": "風控拒單"})
+    execution = run_execution(create_engine(chained, LegExecutionMode.CONCURRENT))
+    assert [result.status for result in execution.execution_results] == [
+        ExecutionStatus.FAILED, ExecutionStatus.CANCELLED, ExecutionStatus.CANCELLED]
+    assert len(chained.orders) == 1
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_leg_dependencies_from_execution_path,
+        test_concurrent_mode_shortens_exposure,
+        test_dependent_legs_follow_partial_fills,
+        test_failed_leg_cancels_and_hedges,
+    ]
+
+    print("🧪 開始測試套利多腿並發執行...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試數據緩存優化器 - 字節預算LRU與即時計量、單次序列化與壓縮、持久層批量寫回、按命名空間的命中率與延遲統計
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.optimization.data_cache_optimizer import DataCacheOptimizer
+
+
+class CountingPayload:
+    """記錄被序列化次數的值"""
+    dumps = 0
+
+    def __init__(self, size: int):
+        self.blob = b'x' * size
+
+    def __getstate__(self):
+        CountingPayload.dumps += 1
+        return self.__dict__
+
+
+def create_optimizer(root: str, **overrides) -> DataCacheOptimizer:
+    config = {
+        'max_memory_cache_size': 100,
+        'max_memory_size_mb': 1,
+        'cache_ttl_seconds': 3600,
+        'enable_persistent_cache': True,
+        'enable_compression': True,
+        'compression_min_bytes': 1024,
+        'write_batch_size': 1000,
+        'write_behind_seconds': 3600,
+        'db_path': f"{root}/cache.db",
+        **overrides
+    }
+    config_path = Path(root) / f"cache_{len(list(Path(root).glob('cache_*.json')))}.json"
+    config_path.write_text(json.dumps(config), encoding='utf-8')
+    return DataCacheOptimizer(str(config_path))
+
+
+def persisted_rows(root: str) -> dict:
+    with sqlite3.connect(f"{root}/cache.db") as conn:
+        return {key: (size, compressed, len(data)) for key, data, size, compressed in
+                conn.execute("SELECT key, data, size_bytes, compressed FROM cache_entries")}
+
+
+def run(coroutine):
+    logging.disable(logging.WARNING)
+    try:
+        return asyncio.run(coroutine)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_byte_budget_lru():
+    """總字節數隨寫入/覆蓋/淘汰即時更新，超出預算時淘汰最久未使用的條目"""
+    async def scenario(root):
+        optimizer = create_optimizer(root, max_memory_size_mb=0.01, enable_persistent_cache=False)
+        for index in range(3):
+            await optimizer.set_cached_data(f"key_{index}", bytes(3000))
+        assert optimizer.cache_stats['total_size'] == sum(e.size_bytes for e in optimizer.memory_cache.values())
+
+        await optimizer.get_cached_data("key_0")
+        await optimizer.set_cached_data("key_3", bytes(3000))
+        assert list(optimizer.memory_cache) == ["key_2", "key_0", "key_3"]
+        assert optimizer.cache_stats['evictions'] == 1
+
+        await optimizer.set_cached_data("key_0", bytes(10))
+        assert optimizer.cache_stats['total_size'] == sum(e.size_bytes for e in optimizer.memory_cache.values())
+
+        # 單個值超過整個預算時不放入內存
+        await optimizer.set_cached_data("huge", bytes(20000))
+        assert "huge" not in optimizer.memory_cache and len(optimizer.memory_cache) == 3
+        optimizer.close()
+
+    with tempfile.TemporaryDirectory() as root:
+        run(scenario(root))
+
+
+def test_single_serialization_and_compression():
+    """寫入只序列化一次；可壓縮的值以壓縮形式寫入持久層，重啟後讀回相同數據"""
+    async def scenario(root):
+        optimizer = create_optimizer(root)
+        CountingPayload.dumps = 0
+        await optimizer.set_cached_data("counting", CountingPayload(100))
+        assert CountingPayload.dumps == 1
+
+        rows = [{'price': 3500000.0 + i, 'volume': 1.5} for i in range(2000)]
+        await optimizer.set_cached_data("cache_klines_abc", rows)
+        await optimizer.set_cached_data("small", {'a': 1})
+        assert optimizer.flush_persistent_cache() == 3
+        optimizer.close()
+
+        stored = persisted_rows(root)
+        size, compressed, blob_length = stored["cache_klines_abc"]
+        assert compressed == 1 and blob_length < size
+        assert stored["small"][1] == 0
+
+        reopened = create_optimizer(root)
+        assert await reopened.get_cached_data("cache_klines_abc") == rows
+        assert reopened.get_namespace_stats()['klines']['persistent_hits'] == 1
+        assert await reopened.get_cached_data("cache_klines_abc") == rows
+        assert reopened.get_namespace_stats()['klines']['memory_hits'] == 1
+        reopened.close()
+
+    with tempfile.TemporaryDirectory() as root:
+        run(scenario(root))
+
+
+def test_write_behind_batches():
+    """持久層寫入先進入緩衝區，達到批次大小時以一個事務寫回；未寫回的條目也能讀到"""
+    async def scenario(root):
+        optimizer = create_optimizer(root, write_batch_size=10, max_memory_cache_size=5)
+        for index in range(9):
+            await optimizer.set_cached_data(f"key_{index}", {'value': index})
+        assert persisted_rows(root) == {} and optimizer.get_cache_stats()['pending_writes'] == 9
+
+        # key_0 已被內存淘汰，從寫入緩衝區讀回
+        assert "key_0" not in optimizer.memory_cache
+        assert await optimizer.get_cached_data("key_0") == {'value': 0}
+
+        await optimizer.set_cached_data("key_9", {'value': 9})
+        assert len(persisted_rows(root)) == 10
+        assert optimizer.cache_stats['persistent_flushes'] == 1 and optimizer.cache_stats['persistent_writes'] == 10
+
+        optimizer.clear_cache('persistent')
+        assert persisted_rows(root) == {}
+        optimizer.close()
+
+    with tempfile.TemporaryDirectory() as root:
+        run(scenario(root))
+
+
+def test_buffered_write_skips_db_lock():
+    """寫入緩衝區只取緩衝區鎖，數據庫事務進行中事件循環上的寫入不被阻塞"""
+    with tempfile.TemporaryDirectory() as root:
+        optimizer = create_optimizer(root)
+        finished = threading.Event()
+
+        def writer():
+            run(optimizer.set_cached_data("cache_ticker_1", {'last': 3500000}))
+            finished.set()
+
+        with optimizer._db_lock:
+            thread = threading.Thread(target=writer)
+            thread.start()
+            written_during_transaction = finished.wait(2.0)
+        thread.join()
+
+        assert written_during_transaction
+        assert optimizer.get_cache_stats()['pending_writes'] == 1
+        assert optimizer.flush_persistent_cache() == 1 and optimizer.get_cache_stats()['pending_writes'] == 0
+        assert "cache_ticker_1" in persisted_rows(root)
+        optimizer.close()
+
+
+def test_namespace_evictions_on_expiry_and_clear():
+    """過期清理與清空內存緩存時，淘汰數同時計入所屬命名空間"""
+    async def scenario(root):
+        optimizer = create_optimizer(root, enable_persistent_cache=False)
+        for index in range(2):
+            await optimizer.set_cached_data(f"cache_ticker_{index}", {'last': index})
+        await optimizer.set_cached_data("cache_depth_0", {'bids': []})
+
+        for key in ("cache_ticker_0", "cache_ticker_1"):
+            optimizer.memory_cache[key].timestamp -= timedelta(hours=2)
+        optimizer._cleanup_expired_cache()
+        namespaces = optimizer.get_namespace_stats()
+        assert namespaces['ticker']['evictions'] == 2 and namespaces['depth']['evictions'] == 0
+
+        optimizer.clear_cache('memory')
+        namespaces = optimizer.get_namespace_stats()
+        assert namespaces['ticker']['evictions'] == 2 and namespaces['depth']['evictions'] == 1
+        assert optimizer.get_cache_stats()['evictions'] == 3
+        optimizer.close()
+
+    with tempfile.TemporaryDirectory() as root:
+        run(scenario(root))
+
+
+def test_namespace_stats():
+    """按數據類型統計命中率與讀寫延遲，監控面板摘要的命中率為百分比"""
+    async def scenario(root):
+        optimizer = create_optimizer(root, enable_persistent_cache=False)
+
+        def fetch_ticker():
+            return {'last': 3500000}
+
+        for _ in range(4):
+            await optimizer.cached_data_fetch('ticker', {'market': 'btctwd'}, fetch_ticker)
+        await optimizer.cached_data_fetch('depth', {'market': 'btctwd'}, lambda: {'bids': []})
+
+        namespaces = optimizer.get_namespace_stats()
+        assert namespaces['ticker']['hits'] == 3 and namespaces['ticker']['misses'] == 1
+        assert namespaces['ticker']['hit_rate'] == 0.75 and namespaces['depth']['hit_rate'] == 0.0
+        assert namespaces['ticker']['avg_get_ms'] >= 0 and namespaces['ticker']['avg_set_ms'] >= 0
+        assert optimizer.get_cache_stats()['namespaces'] == namespaces
+
+        performance = optimizer.get_performance_stats()
+        assert performance['hit_rate'] == 60.0
+        optimizer.close()
+
+    with tempfile.TemporaryDirectory() as root:
+        run(scenario(root))
+
+
+def main():
+    """運行所有測試並計時大量寫入/讀取"""
+    tests = [
+        test_byte_budget_lru,
+        test_single_serialization_and_compression,
+        test_write_behind_batches,
+        test_buffered_write_skips_db_lock,
+        test_namespace_evictions_on_expiry_and_clear,
+        test_namespace_stats,
+    ]
+
+    print("🧪 開始測試數據緩存優化器...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    async def benchmark(root):
+        optimizer = create_optimizer(root, max_memory_cache_size=5000, max_memory_size_mb=2,
+                                     write_batch_size=256)
+        value = [{'price': 3500000.0 + i, 'volume': 1.5} for i in range(50)]
+        started = time.perf_counter()
+        for index in range(20000):
+            await optimizer.set_cached_data(f"cache_bench_{index}", value)
+        set_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for index in range(19000, 20000):
+            await optimizer.get_cached_data(f"cache_bench_{index}")
+        get_seconds = time.perf_counter() - started
+        stats = optimizer.get_cache_stats()
+        optimizer.close()
+        return set_seconds, get_seconds, stats
+
+    with tempfile.TemporaryDirectory() as root:
+        set_seconds, get_seconds, stats = run(benchmark(root))
+    print(f"⏱️ 2萬次寫入（2MB預算、持久層批量寫回）: {set_seconds:.2f}s，"
+          f"1千次讀取: {get_seconds * 1000:.1f}ms，淘汰 {stats['evictions']} 項，"
+          f"內存 {stats['memory_usage_mb']:.2f} MB")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
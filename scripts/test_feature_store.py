@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試特徵庫 - 增量補算與完整重算一致、特徵定義變化自動失效、歷史K線不連續時重建、列式讀寫
+"""
+
+import gc
+import logging
+import sys
+import tempfile
+import time
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.ml.feature_store import FeatureStore
+from src.ml.training_data_extractor import LABEL_LOOKAHEAD_ROWS, TrainingDataExtractor
+
+START = 1_700_000_000 // 300 * 300
+
+
+def generate_klines(count: int, offset: int = 0, seconds: int = 300, seed: int = 11) -> pd.DataFrame:
+    """生成從第 offset 根開始的 count 根K線（同一 seed 下相同位置的K線相同）"""
+    rng = np.random.default_rng(seed)
+    total = offset + count
+    closes = 3500000 + np.cumsum(rng.normal(0, 1500, total))
+    opens = np.concatenate([[closes[0]], closes[:-1]])
+    spreads = np.abs(rng.normal(0, 500, (total, 2)))
+    volumes = rng.uniform(0.1, 3.0, total)
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(START + seconds * np.arange(total), unit='s'),
+        'open': opens,
+        'high': np.maximum(opens, closes) + spreads[:, 0],
+        'low': np.minimum(opens, closes) - spreads[:, 1],
+        'close': closes,
+        'volume': volumes
+    })
+    return df.iloc[offset:].reset_index(drop=True)
+
+
+def create_extractor(root: str) -> TrainingDataExtractor:
+    return TrainingDataExtractor(f"{root}/history.db", feature_store_dir=f"{root}/features")
+
+
+def full_recompute(extractor: TrainingDataExtractor, market: str, timeframe: str) -> pd.DataFrame:
+    raw = extractor.historical_manager.storage.read_dataframe(market, timeframe)
+    return extractor._compute_feature_frame(raw)
+
+
+def assert_frames_close(actual: pd.DataFrame, expected: pd.DataFrame):
+    assert list(actual.columns) == list(expected.columns), "列不一致"
+    assert len(actual) == len(expected), f"{len(actual)} != {len(expected)}"
+    assert (actual['timestamp'].values == expected['timestamp'].values).all()
+    for name in expected.columns[1:]:
+        assert np.allclose(actual[name].to_numpy(dtype=float), expected[name].to_numpy(dtype=float),
+                           rtol=1e-9, atol=1e-9, equal_nan=True), f"{name} 不一致"
+
+
+def test_incremental_matches_full_recompute():
+    """新K線到達時只重算尾部，結果與完整重算一致（含EMA預熱與前瞻標籤）"""
+    logging.disable(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            extractor = create_extractor(root)
+            storage = extractor.historical_manager.storage
+            storage.upsert_dataframe('btctwd', '5m', generate_klines(2000))
+            assert extractor.update_feature_store('btctwd', '5m') == 2000
+
+            # 追加299根新K線，同時更新最後一根未收盤K線
+            fresh = generate_klines(300, offset=1999, seed=11)
+            fresh.loc[0, 'close'] *= 1.001
+            storage.upsert_dataframe('btctwd', '5m', fresh)
+            assert extractor.update_feature_store('btctwd', '5m') == 299 + LABEL_LOOKAHEAD_ROWS + 1
+
+            stored = extractor.load_features('btctwd', '5m')
+            assert_frames_close(stored, full_recompute(extractor, 'btctwd', '5m'))
+
+            window = extractor.load_features('btctwd', '5m', limit=500)
+            assert len(window) == 500 and window['timestamp'].iloc[-1] == stored['timestamp'].iloc[-1]
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_definition_change_invalidates():
+    """特徵定義變化後舊特徵自動失效並完整重建"""
+    logging.disable(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            extractor = create_extractor(root)
+            extractor.historical_manager.storage.upsert_dataframe('btctwd', '5m', generate_klines(800))
+            extractor.update_feature_store('btctwd', '5m')
+            old_version = extractor.get_feature_version()
+            assert extractor.update_feature_store('btctwd', '5m') == LABEL_LOOKAHEAD_ROWS + 1
+
+            extractor.feature_config['derived_features'] = extractor.feature_config['derived_features'][:-1]
+            extractor._feature_version = None
+            assert extractor.get_feature_version() != old_version
+            assert extractor.feature_store.load('btctwd', '5m', extractor.get_feature_version()) is None
+            assert extractor.update_feature_store('btctwd', '5m') == 800
+            assert extractor.feature_store.load('btctwd', '5m', old_version) is None
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_history_mismatch_rebuilds():
+    """預熱範圍內的歷史K線與特徵庫不一致時完整重建"""
+    logging.disable(logging.ERROR)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            extractor = create_extractor(root)
+            storage = extractor.historical_manager.storage
+            storage.upsert_dataframe('btctwd', '5m', generate_klines(1000))
+            extractor.update_feature_store('btctwd', '5m')
+
+            # 在預熱範圍內補入一根錯位K線
+            inserted = generate_klines(1, offset=900)
+            inserted['timestamp'] += pd.Timedelta(seconds=60)
+            storage.upsert_dataframe('btctwd', '5m', inserted)
+            assert extractor.update_feature_store('btctwd', '5m') == 1001
+            assert_frames_close(extractor.load_features('btctwd', '5m'), full_recompute(extractor, 'btctwd', '5m'))
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+class MappingCheckStore(FeatureStore):
+    """記錄 load() 返回的記憶體映射視圖在 write() 時是否仍然存活"""
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.views = []
+        self.live_at_write = []
+
+    def load(self, *args, **kwargs):
+        columns = super().load(*args, **kwargs)
+        if columns is not None:
+            self.views += [weakref.ref(values) for values in columns.values() if isinstance(values, np.memmap)]
+        return columns
+
+    def write(self, *args, **kwargs):
+        gc.collect()
+        self.live_at_write.append(sum(ref() is not None for ref in self.views))
+        return super().write(*args, **kwargs)
+
+
+def test_update_releases_mappings_before_write():
+    """增量補算在覆寫列檔案前已釋放所有記憶體映射視圖（Windows 上映射中的檔案無法截斷）"""
+    logging.disable(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            extractor = create_extractor(root)
+            extractor.feature_store = MappingCheckStore(f"{root}/features")
+            storage = extractor.historical_manager.storage
+            storage.upsert_dataframe('btctwd', '5m', generate_klines(800))
+            extractor.update_feature_store('btctwd', '5m')
+            storage.upsert_dataframe('btctwd', '5m', generate_klines(50, offset=800))
+
+            frame = extractor.load_features('btctwd', '5m')
+            assert extractor.update_feature_store('btctwd', '5m') == LABEL_LOOKAHEAD_ROWS + 1
+            assert len(frame) == 850 and extractor.feature_store.views
+            assert extractor.feature_store.live_at_write == [0, 0, 0]
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_store_columns_roundtrip():
+    """特徵列以零拷貝只讀視圖讀取，保留dtype，可按時間範圍讀取並從任意行覆寫截斷"""
+    with tempfile.TemporaryDirectory() as root:
+        store = FeatureStore(root)
+        columns = {
+            'timestamp': np.arange(100, dtype=np.int64) * 60,
+            'close': np.linspace(1.0, 2.0, 100),
+            'hour': np.arange(100, dtype=np.int32) % 24
+        }
+        assert store.write('btctwd', '1m', columns, 'v1') == 100
+
+        loaded = store.load('btctwd', '1m', 'v1')
+        assert loaded['hour'].dtype == np.int32 and not loaded['close'].flags.writeable
+        assert np.array_equal(loaded['close'], columns['close'])
+        assert len(store.load('btctwd', '1m', 'v1', start=600, end=1200)['close']) == 11
+        assert np.array_equal(store.load('btctwd', '1m', limit=5)['timestamp'], columns['timestamp'][-5:])
+        assert store.load('btctwd', '1m', 'v2') is None
+
+        tail = {name: values[90:95] * 2 for name, values in columns.items()}
+        assert store.write('btctwd', '1m', tail, 'v1', first_row=90) == 95
+        frame = store.load_dataframe('btctwd', '1m', 'v1')
+        assert len(frame) == 95 and frame['close'].iloc[90] == columns['close'][90] * 2
+        assert frame['close'].iloc[89] == columns['close'][89]
+
+        for bad_version, bad_columns in (('v2', tail), ('v1', {'timestamp': tail['timestamp']})):
+            try:
+                store.write('btctwd', '1m', bad_columns, bad_version, first_row=90)
+                raise AssertionError("版本或列不一致時續寫應該報錯")
+            except ValueError:
+                pass
+
+
+def main():
+    """運行所有測試並比較30天1分鐘K線的完整重算與增量讀取耗時"""
+    tests = [
+        test_incremental_matches_full_recompute,
+        test_definition_change_invalidates,
+        test_history_mismatch_rebuilds,
+        test_update_releases_mappings_before_write,
+        test_store_columns_roundtrip,
+    ]
+
+    print("🧪 開始測試特徵庫...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    logging.disable(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            extractor = create_extractor(root)
+            storage = extractor.historical_manager.storage
+            rows = 30 * 1440
+            storage.upsert_dataframe('btctwd', '1m', generate_klines(rows, seconds=60))
+
+            started = time.perf_counter()
+            full_recompute(extractor, 'btctwd', '1m')
+            full_seconds = time.perf_counter() - started
+
+            extractor.update_feature_store('btctwd', '1m')
+            storage.upsert_dataframe('btctwd', '1m', generate_klines(5, offset=rows, seconds=60))
+            started = time.perf_counter()
+            extractor.load_features('btctwd', '1m')
+            incremental_seconds = time.perf_counter() - started
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"⏱️ 30天1分鐘K線 ({rows:,} 根): 完整重算 {full_seconds:.3f}s，新增5根後增量讀取 {incremental_seconds:.3f}s")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
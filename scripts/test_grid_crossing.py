@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試網格穿越檢測 - 二分定位與逐層掃描的觸發結果一致、績效增量統計與全量重算一致
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.trading.grid_trading_engine import (GridConfig, GridStatus, GridTradingEngine, OrderStatus,
+                                             OrderType)
+
+
+class LinearScanGridEngine(GridTradingEngine):
+    """參考實現：每次價格更新逐層掃描所有網格並全量重算績效"""
+
+    async def _check_grid_triggers(self, old_price, new_price):
+        triggered_actions = []
+        if self.status != GridStatus.ACTIVE:
+            return triggered_actions
+
+        for level_num, grid_level in self.grid_levels.items():
+            level_price = grid_level.price
+            if (old_price > level_price >= new_price and
+                    not grid_level.buy_filled and grid_level.buy_order_id is None):
+                buy_action = await self._trigger_buy_order(level_num, grid_level)
+                if buy_action:
+                    triggered_actions.append(buy_action)
+            if (old_price < level_price <= new_price and
+                    not grid_level.sell_filled and grid_level.sell_order_id is None and
+                    self.current_position > 0):
+                sell_action = await self._trigger_sell_order(level_num, grid_level)
+                if sell_action:
+                    triggered_actions.append(sell_action)
+
+        triggered_actions.extend(await self._check_stop_conditions(new_price))
+        return triggered_actions
+
+    def _update_performance_stats(self):
+        filled = [o for o in self.order_history if o.status == OrderStatus.FILLED]
+        buys = [o for o in filled if o.order_type == OrderType.BUY]
+        realized_profit = (sum(o.filled_quantity * o.filled_price - o.commission
+                               for o in filled if o.order_type == OrderType.SELL) -
+                           sum(o.filled_quantity * o.filled_price + o.commission for o in buys))
+
+        unrealized_profit = 0.0
+        if self.current_position > 0:
+            quantity = sum(o.filled_quantity for o in buys)
+            avg_buy_price = (sum(o.filled_quantity * o.filled_price + o.commission for o in buys) / quantity
+                             if quantity > 0 else self.config.base_price)
+            unrealized_profit = (self.current_price - avg_buy_price) * self.current_position
+
+        self.performance.realized_profit = realized_profit
+        self.performance.unrealized_profit = unrealized_profit
+        self.performance.total_profit = realized_profit + unrealized_profit
+        self.performance.total_trades = len(filled)
+
+        prices = [price for _, price in self.price_history]
+        drawdown, peak = 0.0, prices[0] if prices else 0.0
+        for price in prices:
+            peak = max(peak, price)
+            drawdown = max(drawdown, (peak - price) / peak)
+        self.performance.max_drawdown = drawdown if len(prices) >= 2 else 0.0
+
+        sharpe = 0.0
+        if len(prices) >= 30:
+            returns = [(prices[i] - prices[i - 1]) / prices[i - 1] for i in range(1, len(prices))]
+            std_return = np.std(returns)
+            sharpe = np.mean(returns) / std_return if std_return > 0 else 0.0
+        self.performance.sharpe_ratio = sharpe
+
+
+def create_config(levels: int = 40, spacing: float = 0.5) -> GridConfig:
+    """以 100 為基準價的網格配置"""
+    return GridConfig(pair="TESTTWD", base_price=100.0, grid_spacing=spacing, grid_levels=levels,
+                      order_amount=10.0, upper_limit=1000.0, lower_limit=1.0, max_position=50.0)
+
+
+def create_engine(engine_class, config: GridConfig, balance: float = 500.0) -> GridTradingEngine:
+    engine = engine_class(config)
+    engine.simulated_order_latency = 0
+    engine.set_balance(balance)
+    assert engine.initialize_grid()
+    return engine
+
+
+def random_walk(ticks: int, seed: int = 11) -> list:
+    """帶跳空的價格路徑，部分價格正好落在網格線上"""
+    rng = random.Random(seed)
+    price, prices = 100.0, []
+    for _ in range(ticks):
+        roll = rng.random()
+        if roll < 0.05:
+            price *= 1 + rng.uniform(-0.08, 0.08)     # 一次穿越多條網格線
+        elif roll < 0.1:
+            price = 100.0 * (1 + rng.randint(-20, 20) * 0.005)  # 正好落在網格線上
+        else:
+            price *= 1 + rng.gauss(0, 0.002)
+        prices.append(max(price, 2.0))
+    return prices
+
+
+async def replay(engine: GridTradingEngine, prices: list) -> list:
+    actions = []
+    for price in prices:
+        result = await engine.update_price(price)
+        actions.extend((action['action'], action.get('level'), action.get('price'))
+                       for action in result['triggered_actions'])
+    return actions
+
+
+def test_bisect_triggers_match_linear_scan():
+    """二分定位觸發的動作、倉位與餘額和逐層掃描完全一致"""
+    prices = random_walk(3000)
+    fast = create_engine(GridTradingEngine, create_config())
+    slow = create_engine(LinearScanGridEngine, create_config())
+
+    fast_actions = asyncio.run(replay(fast, prices))
+    slow_actions = asyncio.run(replay(slow, prices))
+
+    assert any(action == 'buy_triggered' for action, _, _ in fast_actions)
+    assert any(action == 'sell_triggered' for action, _, _ in fast_actions)
+    assert fast_actions == slow_actions
+    assert fast.current_position == slow.current_position
+    assert fast.available_balance == slow.available_balance
+    for level_num, grid_level in fast.grid_levels.items():
+        other = slow.grid_levels[level_num]
+        assert (grid_level.buy_filled, grid_level.sell_filled) == (other.buy_filled, other.sell_filled)
+
+
+def test_incremental_performance_matches_recompute():
+    """增量績效統計與按歷史全量重算一致（含價格窗口截斷之後）"""
+    prices = random_walk(2600, seed=5)
+    fast = create_engine(GridTradingEngine, create_config())
+    slow = create_engine(LinearScanGridEngine, create_config())
+
+    previous = 0
+    for checkpoint in (20, 900, 1001, 1700, 2600):
+        asyncio.run(replay(fast, prices[previous:checkpoint]))
+        asyncio.run(replay(slow, prices[previous:checkpoint]))
+        previous = checkpoint
+
+        assert len(fast.price_history) == len(slow.price_history)
+        for name in ('realized_profit', 'unrealized_profit', 'total_profit', 'max_drawdown', 'sharpe_ratio'):
+            assert np.isclose(getattr(fast.performance, name), getattr(slow.performance, name),
+                              rtol=1e-9, atol=1e-12), (checkpoint, name)
+        assert fast.performance.total_trades == slow.performance.total_trades
+
+
+def test_flags_follow_grid_levels():
+    """緊湊標記與網格層級同步：成交後不再觸發、重建索引後按價格排序"""
+    engine = create_engine(GridTradingEngine, create_config(levels=10, spacing=1.0))
+    assert engine._level_prices == sorted(level.price for level in engine.grid_levels.values())
+    assert engine._buy_armed.dtype == bool and engine._buy_armed.all()
+
+    first = asyncio.run(engine.update_price(98.5))['triggered_actions']
+    assert [action['level'] for action in first] == [-1]
+    assert not engine._buy_armed[engine._level_numbers.index(-1)]
+
+    asyncio.run(engine.update_price(100.0))
+    assert asyncio.run(engine.update_price(98.5))['triggered_actions'] == []
+
+    # 直接修改網格層級後重建索引
+    engine.grid_levels[-1].buy_filled = False
+    engine.grid_levels[-1].buy_order_id = None
+    engine._rebuild_level_index()
+    asyncio.run(engine.update_price(100.0))
+    again = asyncio.run(engine.update_price(98.5))['triggered_actions']
+    assert [action['level'] for action in again] == [-1]
+
+    engine.pause_grid()
+    assert asyncio.run(engine.update_price(90.0))['triggered_actions'] == []
+
+
+def test_sharpe_stable_on_steady_returns():
+    """百萬級價格、收益率幾乎恆定時，增量標準差不受相消誤差影響"""
+    rng = np.random.default_rng(3)
+    config = GridConfig(pair="BTCTWD", base_price=1_000_000.0, grid_spacing=0.5, grid_levels=10,
+                        order_amount=10000.0, upper_limit=5_000_000.0, lower_limit=100_000.0, max_position=1.0)
+    engine = GridTradingEngine(config)
+    price = 1_000_000.0
+    for _ in range(400):
+        price *= 1.001 * (1 + rng.normal(0, 1e-9))
+        engine._record_price(price)
+
+    prices = np.array([price for _, price in engine.price_history])
+    returns = np.diff(prices) / prices[:-1]
+    expected = np.mean(returns) / np.std(returns)
+    assert np.isclose(engine._calculate_sharpe_ratio(), expected, rtol=1e-6), (engine._calculate_sharpe_ratio(), expected)
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_bisect_triggers_match_linear_scan,
+        test_incremental_performance_matches_recompute,
+        test_flags_follow_grid_levels,
+        test_sharpe_stable_on_steady_returns,
+    ]
+
+    print("🧪 開始測試網格穿越檢測...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
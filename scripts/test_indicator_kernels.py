@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試共用技術指標核心 - 驗證向量化結果與原逐行迴圈逐位元一致
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core import indicator_kernels as kernels
+from src.core.final_85_percent_strategy import Final85PercentStrategy
+
+
+def create_test_klines(periods: int = 500, seed: int = 7) -> pd.DataFrame:
+    """創建包含持平區段的測試K線"""
+    rng = np.random.default_rng(seed)
+    close = np.round(3400000 + np.cumsum(rng.normal(0, 2000, periods)), -2)
+    close[50:60] = close[50]
+
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=periods, freq='h'),
+        'high': close + 500,
+        'low': close - 500,
+        'close': close,
+        'volume': rng.integers(1, 1000, periods)
+    })
+
+
+def legacy_obv(df: pd.DataFrame) -> pd.Series:
+    """原逐行OBV實現"""
+    df = df.copy()
+    df['obv'] = 0.0
+    for i in range(1, len(df)):
+        if df.iloc[i]['close'] > df.iloc[i-1]['close']:
+            df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] + df.iloc[i]['volume']
+        elif df.iloc[i]['close'] < df.iloc[i-1]['close']:
+            df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] - df.iloc[i]['volume']
+        else:
+            df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv']
+    return df['obv']
+
+
+def legacy_ema(series: pd.Series, period, alpha_multiplier=1.0, init_method='first') -> pd.Series:
+    """原逐行自定義EMA實現"""
+    alpha = (2.0 / (period + 1)) * alpha_multiplier
+    result = pd.Series(index=series.index, dtype=float)
+
+    if init_method == 'first':
+        result.iloc[0] = series.iloc[0]
+    elif init_method == 'sma':
+        result.iloc[period-1] = series.iloc[:period].mean()
+    elif init_method == 'zero':
+        result.iloc[0] = 0
+
+    start_idx = period if init_method == 'sma' else 1
+    for i in range(start_idx, len(series)):
+        if pd.isna(result.iloc[i-1]):
+            result.iloc[i] = series.iloc[i]
+        else:
+            result.iloc[i] = alpha * series.iloc[i] + (1 - alpha) * result.iloc[i-1]
+    return result
+
+
+def test_obv_matches_legacy_loop():
+    """OBV與原迴圈結果一致"""
+    df = create_test_klines()
+    expected = legacy_obv(df)
+    actual = kernels.obv(df['close'], df['volume'])
+    assert np.array_equal(expected.to_numpy(), actual.to_numpy())
+
+
+def test_ema_init_methods_match_legacy_loop():
+    """三種初始化方法與alpha乘數皆與原迴圈一致"""
+    close = create_test_klines()['close']
+    for init_method in ('first', 'sma', 'zero'):
+        for alpha_multiplier in (1.0, 0.95):
+            expected = legacy_ema(close, 12, alpha_multiplier, init_method)
+            actual = kernels.ema(close, 12, alpha_multiplier, init_method)
+            assert np.array_equal(expected.to_numpy(), actual.to_numpy(), equal_nan=True), init_method
+
+
+def test_rsi_and_bollinger_match_pandas_formula():
+    """RSI與布林帶與原pandas公式一致"""
+    close = create_test_klines()['close']
+
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    expected_rsi = 100 - (100 / (1 + gain / loss))
+    assert np.array_equal(expected_rsi.to_numpy(), kernels.rsi(close).to_numpy(), equal_nan=True)
+
+    middle, upper, lower, position = kernels.bollinger_bands(close)
+    bb_std = close.rolling(window=20).std()
+    assert np.array_equal((close.rolling(window=20).mean() + bb_std * 2).to_numpy(),
+                          upper.to_numpy(), equal_nan=True)
+    assert np.nanmin(position.to_numpy()[19:]) >= -1.0
+
+
+def test_atr_uses_true_range():
+    """ATR首根以高低差計算，其後考慮前收盤"""
+    df = create_test_klines(periods=80)
+    result = kernels.atr(df['high'], df['low'], df['close'], period=1)
+    assert result.iloc[0] == 1000
+    assert (result >= 1000).all()
+
+
+def test_final_85_strategy_indicators():
+    """85%策略指標計算使用核心後可正常產生OBV"""
+    df = create_test_klines()
+    strategy = Final85PercentStrategy()
+    result = strategy.calculate_advanced_indicators(strategy.calculate_macd(df))
+    assert np.array_equal(result['obv'].to_numpy(), legacy_obv(df).to_numpy())
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_obv_matches_legacy_loop,
+        test_ema_init_methods_match_legacy_loop,
+        test_rsi_and_bollinger_match_pandas_formula,
+        test_atr_uses_true_range,
+        test_final_85_strategy_indicators,
+    ]
+
+    print("🧪 開始測試共用技術指標核心...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試K線存儲層 - 批量upsert、WAL模式、舊表遷移與範圍讀取
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.kline_storage import KlineStorage, get_kline_storage
+from src.data.historical_data_manager import HistoricalDataManager
+
+
+def create_test_klines(periods: int = 100, start: str = '2024-01-01') -> pd.DataFrame:
+    """創建測試K線"""
+    close = np.linspace(3400000, 3500000, periods)
+    return pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=periods, freq='5min'),
+        'open': close - 100,
+        'high': close + 500,
+        'low': close - 500,
+        'close': close,
+        'volume': np.arange(periods, dtype=float) + 1
+    })
+
+
+def test_upsert_and_read_latest():
+    """批量寫入後讀取最新N條為時間正序，重複寫入會更新"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = KlineStorage(str(Path(tmp) / 'market.db'))
+        df = create_test_klines()
+
+        assert storage.upsert_dataframe('btctwd', '5m', df) == 100
+
+        latest = storage.read_dataframe('btctwd', '5m', limit=10)
+        assert list(latest['timestamp']) == list(df['timestamp'].iloc[-10:])
+        assert latest['timestamp'].is_monotonic_increasing
+
+        updated = df.iloc[-1:].copy()
+        updated['close'] = 1.0
+        storage.upsert_dataframe('btctwd', '5m', updated)
+        arrays = storage.read_arrays('btctwd', '5m')
+        assert len(arrays['close']) == 100
+        assert arrays['close'][-1] == 1.0
+        storage.close()
+
+
+def test_range_read_and_wal_mode():
+    """範圍讀取含端點且連接使用WAL模式"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = KlineStorage(str(Path(tmp) / 'market.db'))
+        df = create_test_klines()
+        storage.upsert_dataframe('btctwd', '5m', df)
+
+        start = int(df['timestamp'].iloc[10].timestamp())
+        end = int(df['timestamp'].iloc[19].timestamp())
+        arrays = storage.read_arrays('btctwd', '5m', start=start, end=end)
+        assert len(arrays['timestamp']) == 10
+        assert arrays['timestamp'].dtype == np.int64
+
+        journal_mode = storage.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        assert journal_mode.lower() == 'wal'
+        storage.close()
+
+
+def test_legacy_table_migrated_to_without_rowid():
+    """舊版自增ID表遷移後數據保留"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'legacy.db'
+        with sqlite3.connect(db_path) as conn:
+            conn.execute('''
+                CREATE TABLE klines (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    market TEXT NOT NULL, timeframe TEXT NOT NULL, timestamp INTEGER NOT NULL,
+                    open REAL NOT NULL, high REAL NOT NULL, low REAL NOT NULL,
+                    close REAL NOT NULL, volume REAL NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(market, timeframe, timestamp)
+                )
+            ''')
+            conn.execute("INSERT INTO klines (market, timeframe, timestamp, open, high, low, close, volume) "
+                         "VALUES ('btctwd', '1h', 1700000000, 1, 2, 0.5, 1.5, 10)")
+
+        storage = KlineStorage(str(db_path))
+        table_sql = storage.connection.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'klines'"
+        ).fetchone()[0]
+        assert 'WITHOUT ROWID' in table_sql
+        assert storage.read_arrays('btctwd', '1h')['close'].tolist() == [1.5]
+        storage.close()
+
+
+def test_historical_manager_shares_storage():
+    """歷史數據管理器使用共用存儲，讀寫結果一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'market.db')
+        manager = HistoricalDataManager(db_path)
+        assert manager.storage is get_kline_storage(db_path)
+
+        df = create_test_klines(50)
+        assert manager._save_klines_data('btctwd', '5m', df) == 50
+
+        result = manager.get_historical_data('btctwd', '5m', limit=20)
+        assert len(result) == 20
+        assert result['close'].iloc[-1] == df['close'].iloc[-1]
+
+        manager.storage.close()
+
+
+def test_historical_range_treats_naive_datetimes_as_utc():
+    """按範圍讀取時naive時間與寫入一樣視為UTC，不受本地時區影響"""
+    original_tz = os.environ.get('TZ')
+    if hasattr(time, 'tzset'):
+        os.environ['TZ'] = 'Asia/Taipei'
+        time.tzset()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = HistoricalDataManager(str(Path(tmp) / 'market.db'))
+            df = create_test_klines(100)
+            manager._save_klines_data('btctwd', '5m', df)
+
+            start, end = df['timestamp'].iloc[10].to_pydatetime(), df['timestamp'].iloc[19].to_pydatetime()
+            result = manager.get_historical_range('btctwd', '5m', start=start, end=end)
+            assert len(result) == 10
+            assert result['close'].iloc[0] == df['close'].iloc[10]
+            assert result['close'].iloc[-1] == df['close'].iloc[19]
+            manager.storage.close()
+    finally:
+        if hasattr(time, 'tzset'):
+            if original_tz is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = original_tz
+            time.tzset()
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_upsert_and_read_latest,
+        test_range_read_and_wal_mode,
+        test_legacy_table_migrated_to_without_rowid,
+        test_historical_manager_shares_storage,
+        test_historical_range_treats_naive_datetimes_as_utc,
+    ]
+
+    print("🧪 開始測試K線存儲層...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
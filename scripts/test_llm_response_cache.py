@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試LLM回應語義緩存 - 指標量化、TTL與LRU淘汰、持久化以及五AI流水線重用回應
+"""
+
+import asyncio
+import json
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.ai.enhanced_ai_manager import EnhancedAIManager
+from src.ai.llm_response_cache import LLMResponseCache, quantize_market_state
+from src.optimization.performance_optimizer import AIPerformanceOptimizer
+
+MARKET_DATA = {
+    'current_price': 1500000, 'price_change_1m': 0.12, 'price_change_5m': 0.3,
+    'volume_ratio': 1.12, 'rsi': 61.2, 'macd': 1234.5, 'bollinger_position': 0.61
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingOllamaClient:
+    """記錄調用次數的同步客戶端"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, model, messages, options):
+        self.calls += 1
+        return {'message': {'content': f'建議: BUY\n信心度: 70%\n風險評分: 0.4\n#{self.calls}'}}
+
+
+def test_quantization_groups_near_identical_states():
+    """相近的指標讀數量化為同一向量，明顯變化則不同"""
+    nearby = dict(MARKET_DATA, current_price=1500900, rsi=61.9, macd=1236.0, volume_ratio=1.14)
+    assert quantize_market_state(nearby) == quantize_market_state(MARKET_DATA)
+
+    for field, value in (('rsi', 70.0), ('macd', -1234.5), ('current_price', 1530000), ('volume_ratio', 1.6)):
+        changed = dict(MARKET_DATA, **{field: value})
+        assert quantize_market_state(changed) != quantize_market_state(MARKET_DATA), field
+
+    cache = LLMResponseCache()
+    key = cache.make_key('qwen:7b', 'trend_analyst', '1', MARKET_DATA, 'BTCTWD')
+    assert key != cache.make_key('qwen:7b', 'decision_maker', '1', MARKET_DATA, 'BTCTWD')
+    assert key != cache.make_key('qwen:7b', 'trend_analyst', '2', MARKET_DATA, 'BTCTWD')
+    assert key != cache.make_key('mistral:7b', 'trend_analyst', '1', MARKET_DATA, 'BTCTWD')
+    assert key != cache.make_key('qwen:7b', 'trend_analyst', '1', MARKET_DATA, 'ETHTWD')
+
+    # 下游提示詞嵌入上游回應，上游輸出不同時鍵不同
+    downstream = cache.make_key('qwen:7b', 'risk_assessor', '1', MARKET_DATA, 'BTCTWD', ('建議: BUY', '趨勢向上'))
+    assert downstream == cache.make_key('qwen:7b', 'risk_assessor', '1', MARKET_DATA, 'BTCTWD', ('建議: BUY', '趨勢向上'))
+    assert downstream != cache.make_key('qwen:7b', 'risk_assessor', '1', MARKET_DATA, 'BTCTWD', ('建議: SELL', '趨勢向上'))
+    assert downstream != cache.make_key('qwen:7b', 'risk_assessor', '1', MARKET_DATA, 'BTCTWD', ('建議: BUY趨勢向上',))
+
+
+def test_ttl_and_lru_limits():
+    """過期條目不命中，超出條目數或字節數時淘汰最久未使用的條目"""
+    clock = FakeClock()
+    cache = LLMResponseCache(ttl_seconds=60, max_entries=2, max_bytes=30, clock=clock)
+
+    cache.put('a', 'x' * 10)
+    cache.put('b', 'y' * 10)
+    assert cache.get('a') == 'x' * 10
+    cache.put('c', 'z' * 10)
+    assert cache.get('b') is None and cache.get('a') is not None
+
+    cache.put('d', 'w' * 25)
+    assert len(cache) == 1 and cache.get('d') is not None
+
+    clock.now += 61
+    assert cache.get('d') is None
+
+    stats = cache.get_stats()
+    assert stats['evictions'] == 3
+    assert stats['expirations'] == 1
+    assert stats['size_bytes'] == 0
+
+
+def test_persistent_cache_survives_restart():
+    """持久化的回應在重啟後仍可命中，過期條目在載入時清除"""
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'llm_cache.db')
+        cache = LLMResponseCache(path, ttl_seconds=60, clock=clock)
+        cache.put('fresh', '建議: HOLD', model_name='qwen:7b', ai_role='decision_maker', inference_seconds=8.0)
+        clock.now += 30
+        cache.put('newer', '建議: BUY')
+        cache.close()
+
+        clock.now += 40
+        restarted = LLMResponseCache(path, ttl_seconds=60, clock=clock)
+        assert restarted.get('fresh') is None
+        assert restarted.get('newer') == '建議: BUY'
+        restarted.close()
+
+
+def test_hits_do_not_write_per_lookup():
+    """命中只在內存更新訪問時間，隨下一次寫入或關閉時批量持久化"""
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'llm_cache.db')
+        cache = LLMResponseCache(path, ttl_seconds=600, clock=clock)
+        cache.put('a', '建議: HOLD')
+        changes = cache._conn.total_changes
+        for _ in range(50):
+            clock.now += 1
+            assert cache.get('a') == '建議: HOLD'
+        assert cache._conn.total_changes == changes
+
+        cache.close()
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT last_access FROM llm_responses WHERE key = 'a'").fetchone()[0] == clock.now
+
+
+def test_pipeline_reuses_responses_for_same_state():
+    """量化狀態不變的下一週期完全跳過模型推理，狀態變化後重新推理"""
+    cache = LLMResponseCache()
+    manager = EnhancedAIManager(response_cache=cache)
+    manager.ollama_client = CountingOllamaClient()
+
+    first = asyncio.run(manager._analyze_single_pair('BTCTWD', MARKET_DATA))
+    assert manager.ollama_client.calls == len(manager.ai_models)
+
+    second = asyncio.run(manager._analyze_single_pair('BTCTWD', dict(MARKET_DATA, rsi=61.5)))
+    assert manager.ollama_client.calls == len(manager.ai_models)
+    assert [r.response for r in second.ai_responses] == [r.response for r in first.ai_responses]
+
+    asyncio.run(manager._analyze_single_pair('BTCTWD', dict(MARKET_DATA, rsi=75)))
+    assert manager.ollama_client.calls == 2 * len(manager.ai_models)
+
+    stats = manager.get_enhanced_performance_stats()['response_cache']
+    assert stats['hits'] == len(manager.ai_models)
+    assert stats['misses'] == 2 * len(manager.ai_models)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = Path(tmp) / 'performance.json'
+        targets = {'ai_inference_time': 30.0, 'data_processing_time': 5.0,
+                   'total_cycle_time': 35.0, 'memory_usage_mb': 13000}
+        config_path.write_text(json.dumps({'llm_cache_enabled': False, 'optimization_targets': targets}))
+        optimizer = AIPerformanceOptimizer(config_path=str(config_path))
+    assert optimizer.get_performance_report()['ai_performance']['llm_response_cache'] is None
+    optimizer.attach_llm_cache(cache)
+    report = optimizer.get_performance_report()['ai_performance']['llm_response_cache']
+    assert report['hits'] == stats['hits']
+    manager.pipeline_executor.shutdown()
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_quantization_groups_near_identical_states,
+        test_ttl_and_lru_limits,
+        test_persistent_cache_survives_restart,
+        test_hits_do_not_write_per_lookup,
+        test_pipeline_reuses_responses_for_same_state,
+    ]
+
+    print("🧪 開始測試LLM回應語義緩存...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試WebSocket行情流 - 訂單簿/K線狀態維護、推送延遲、訂閱過濾、斷線重連與REST補K線
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.market_stream import Candle, CandleSeries, MarketDataStream, OrderBook
+from src.data.max_transport import MAXTransport, TransportConfig
+from src.data.simulated_market_stream import SimulatedMAXStreamServer
+
+BASE = (int(time.time()) // 60) * 60 - 60 * 30
+
+
+async def wait_until(predicate, timeout: float = 3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待條件超時")
+        await asyncio.sleep(0.005)
+
+
+def run_with_stream(scenario, markets=("btctwd",), **options):
+    """啟動模擬服務器與行情流，執行場景後關閉"""
+    async def main():
+        server = SimulatedMAXStreamServer()
+        await server.start()
+        transport = MAXTransport(TransportConfig(base_url=server.rest_url))
+        stream = MarketDataStream(markets, url=server.ws_url, rest_base_url=server.rest_url,
+                                  transport=transport, reconnect_delay=0.05, **options)
+        stream.start()
+        try:
+            await server.wait_for_clients(1)
+            return await scenario(server, stream)
+        finally:
+            await stream.stop()
+            await server.stop()
+
+    logging.disable(logging.WARNING)
+    try:
+        return asyncio.run(main())
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_order_book_and_candle_series():
+    """訂單簿快照/增量更新，K線序列覆蓋形成中K線、換根收盤、檢測缺口並按時間補入舊K線"""
+    book = OrderBook()
+    book.apply_snapshot([["100", "1"], ["99", "2"]], [["101", "1"], ["102", "3"]])
+    book.apply_update([["100", "0"], ["99.5", "4"]], [["100.5", "1"]])
+    assert book.best_bid == 99.5 and book.best_ask == 100.5 and book.mid_price == 100.0
+    assert book.top(2) == ([(99.5, 4.0), (99.0, 2.0)], [(100.5, 1.0), (101.0, 1.0)])
+
+    series = CandleSeries('1m', maxlen=5)
+    assert series.apply(Candle(BASE, 1, 2, 0.5, 1.5, 10)) is None
+    assert series.apply(Candle(BASE, 1, 3, 0.5, 2.5, 12)) is None
+    assert series.current.high == 3 and not series.closed
+    assert series.apply(Candle(BASE + 60, 2.5, 2.6, 2.4, 2.5, 1)) is None
+    assert [c.start for c in series.closed] == [BASE] and series.closed[0].closed
+    assert series.apply(Candle(BASE + 240, 3, 3, 3, 3, 1)) == (BASE + 60, BASE + 240)
+    assert series.missing_starts() == [BASE + 120, BASE + 180]
+    series.apply(Candle(BASE + 180, 2, 2, 2, 2, 1))
+    series.apply(Candle(BASE + 120, 2, 2, 2, 2, 1))
+    assert [c.start for c in series.candles()] == [BASE + 60 * i for i in (0, 1, 2, 3, 4)]
+    assert series.missing_starts() == [] and series.current.start == BASE + 240
+    for i in range(5, 9):
+        series.apply(Candle(BASE + 60 * i, 1, 1, 1, 1, 1, closed=True))
+    assert len(series.closed) == 5 and series.current is None and series.latest_start == BASE + 480
+
+
+def test_stream_updates_state_sub_second():
+    """推送到達即更新 ticker/成交/訂單簿/K線 並通知訂閱者，端到端延遲在亞秒級"""
+    async def scenario(server, stream):
+        events = []
+        stream.subscribe(events.append)
+        await server.publish_ticker("btctwd", 3400000, 3550000, 3390000, 3500000, 120.5)
+        await server.publish_book("btctwd", [[3499000, 1.0], [3498000, 2.0]], [[3501000, 0.5]], snapshot=True)
+        await server.publish_book("btctwd", [[3499000, 0]], [[3500500, 0.2]])
+        await server.publish_trade("btctwd", 3500200, 0.01)
+        await server.publish_kline("btctwd", "1m", BASE, 3500000, 3501000, 3499000, 3500200, 3.2)
+        await wait_until(lambda: len(events) == 5)
+
+        state = stream.state("BTCTWD")
+        assert [event.channel for event in events] == ['ticker', 'book', 'book', 'trade', 'kline']
+        assert state.ticker['close'] == 3500000 and state.last_price == 3500200
+        assert state.book.best_bid == 3498000 and state.book.best_ask == 3500500
+        assert state.candles['1m'].current.close == 3500200
+        data = state.to_market_data()
+        assert data['current_price'] == 3500200 and data['bid'] == 3498000 and data['volume_24h'] == 120.5
+        assert all(0 <= event.latency < 0.5 for event in events)
+        assert stream.stats['messages'] == 5 and stream.stats['max_latency'] < 0.5
+
+    run_with_stream(scenario)
+
+
+def test_subscriber_filters_and_async_callbacks():
+    """訂閱者可按頻道/交易對過濾，協程回調會被等待，取消訂閱後不再收到更新"""
+    async def scenario(server, stream):
+        all_events, eth_trades = [], []
+
+        async def on_eth_trade(event):
+            await asyncio.sleep(0)
+            eth_trades.append(event.data[0]['price'])
+
+        unsubscribe = stream.subscribe(all_events.append)
+        stream.subscribe(on_eth_trade, channels=['trade'], markets=['ETHTWD'])
+        await server.publish_trade("btctwd", 3500000, 0.1)
+        await server.publish_trade("ethtwd", 121000, 1.0)
+        await server.publish_ticker("ethtwd", 120000, 122000, 119000, 121000, 800)
+        await wait_until(lambda: len(all_events) == 3)
+        assert eth_trades == [121000.0]
+
+        unsubscribe()
+        await server.publish_trade("ethtwd", 121100, 1.0)
+        await wait_until(lambda: len(eth_trades) == 2)
+        assert len(all_events) == 3
+
+    run_with_stream(scenario, markets=("btctwd", "ethtwd"), channels=('ticker', 'trade'))
+
+
+def test_reconnect_backfills_missed_candles():
+    """斷線後自動重連並經 REST 補回斷線期間的K線，推送中跳過的K線也會被偵測並補齊"""
+    async def scenario(server, stream):
+        backfills = []
+        stream.subscribe(lambda event: event.event == 'backfill' and backfills.append(len(event.data)),
+                         channels=['kline'])
+        for i in range(5):
+            await server.publish_kline("btctwd", "1m", BASE + 60 * i, 100 + i, 101 + i, 99 + i, 100.5 + i, 1.0,
+                                       closed=i < 4)
+        series = stream.state("btctwd").candles['1m']
+        await wait_until(lambda: series.latest_start == BASE + 240)
+
+        await server.drop_connections()
+        for i in range(4, 8):
+            await server.publish_kline("btctwd", "1m", BASE + 60 * i, 100 + i, 102 + i, 98 + i, 101 + i, 2.0,
+                                       closed=True, broadcast=False)
+        await wait_until(lambda: stream.stats['reconnects'] == 1 and series.latest_start == BASE + 420)
+        assert server.connection_count == 2
+        assert server.rest_requests[0]['timestamp'] == str(BASE + 240)
+        assert [c.start for c in series.candles()] == [BASE + 60 * i for i in range(8)]
+        assert series.closed[4].high == 106 and series.closed[-1].close == 108
+
+        # 推送中跳過一根K線：偵測缺口並補齊
+        await server.publish_kline("btctwd", "1m", BASE + 480, 108, 109, 107, 108.5, 1.0, closed=True,
+                                   broadcast=False)
+        await server.publish_kline("btctwd", "1m", BASE + 540, 108.5, 110, 108, 109, 1.0)
+        await wait_until(lambda: len(series.candles()) == 10)
+        assert series.missing_starts() == []
+        assert series.latest_start == BASE + 540 and series.candles()[-2].high == 109
+        assert stream.stats['backfilled_candles'] == sum(backfills) >= 5
+
+    run_with_stream(scenario, channels=('kline',))
+
+
+def test_malformed_messages_do_not_kill_stream():
+    """格式異常的推送被記錄並跳過，行情流繼續處理後續消息"""
+    async def scenario(server, stream):
+        events = []
+        stream.subscribe(events.append)
+        client = server.clients[0]
+        await client.send_str("{not json")
+        await client.send_json({'c': 'ticker', 'M': 'btctwd', 'e': 'update', 'tk': {'O': '1'}})
+        await client.send_json({'c': 'trade', 'M': 'btctwd', 'e': 'update', 't': [{'p': 'abc', 'v': '1'}]})
+        await server.publish_ticker("btctwd", 3400000, 3550000, 3390000, 3500000, 120.5)
+        await wait_until(lambda: len(events) == 1)
+        assert stream.stats['message_errors'] == 3 and not stream._task.done()
+        assert stream.state("btctwd").ticker['close'] == 3500000
+
+    run_with_stream(scenario)
+
+
+def test_manager_falls_back_when_stream_task_dies():
+    """行情流任務意外結束時數據管理器記錄其異常並回退到輪詢循環"""
+    import src.data.multi_pair_data_manager as manager_module
+
+    class CrashingStream(MarketDataStream):
+        async def run(self):
+            raise KeyError('tk')
+
+    async def scenario():
+        # 數據循環方法定義在 MultiPairDataManagerMethods 上，只準備 _streaming_data_loop 用到的屬性
+        manager = manager_module.MultiPairDataManagerMethods()
+        manager.stream_configs = {'BTCTWD': None}
+        manager.is_running = True
+        polled = []
+
+        async def polling_loop():
+            polled.append(manager.is_running)
+
+        manager._real_time_data_loop = polling_loop
+        await asyncio.wait_for(manager._streaming_data_loop(), timeout=5)
+        assert manager.market_stream._task.done()
+        return polled
+
+    logging.disable(logging.CRITICAL)
+    original = manager_module.MarketDataStream
+    manager_module.MarketDataStream = CrashingStream
+    try:
+        assert asyncio.run(scenario()) == [True]
+    finally:
+        manager_module.MarketDataStream = original
+        logging.disable(logging.NOTSET)
+
+
+def main():
+    """運行所有測試並比較推送與30秒輪詢的信號延遲"""
+    tests = [
+        test_order_book_and_candle_series,
+        test_stream_updates_state_sub_second,
+        test_subscriber_filters_and_async_callbacks,
+        test_reconnect_backfills_missed_candles,
+        test_malformed_messages_do_not_kill_stream,
+        test_manager_falls_back_when_stream_task_dies,
+    ]
+
+    print("🧪 開始測試WebSocket行情流...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    async def latency_probe(server, stream):
+        latencies = []
+        stream.subscribe(lambda event: latencies.append(event.latency), channels=['trade'])
+        for i in range(200):
+            await server.publish_trade("btctwd", 3500000 + i, 0.01)
+        await wait_until(lambda: len(latencies) == 200)
+        return sorted(latencies)
+
+    latencies = run_with_stream(latency_probe, channels=('trade',))
+    print(f"⏱️ 200 筆成交推送延遲: p50 {latencies[100] * 1000:.2f} ms，p99 {latencies[198] * 1000:.2f} ms "
+          f"（30秒輪詢平均延遲約 15000 ms）")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試MAX請求合併與短時緩存 - 並發相同請求共用在途請求、按端點/K線週期緩存、計數器與多消費者共用
+"""
+
+import asyncio
+import logging
+import socket
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.test_max_transport import LocalMAXServer
+from src.data.max_transport import MAXTransport, ResponseCache, TransportConfig, get_max_transport
+
+
+def create_transport(base_url: str, **overrides) -> MAXTransport:
+    return MAXTransport(TransportConfig(base_url=base_url, backoff_base=0.01, **overrides))
+
+
+def test_concurrent_identical_requests_share_one_call():
+    """同一時刻的相同請求只發出一次，參數不同的請求各自發出，等待方拿到同一份響應"""
+    with LocalMAXServer() as server:
+        server.delay = 0.05
+        transport = create_transport(server.base_url)
+
+        async def cycle():
+            requests = [transport.get('tickers/btctwd') for _ in range(10)]
+            requests += [transport.get('k', {'market': 'btctwd', 'period': 60, 'limit': 24}) for _ in range(5)]
+            requests += [transport.get('k', {'market': 'btctwd', 'period': '60', 'limit': '24'})]
+            requests += [transport.get('k', {'market': 'btctwd', 'period': 5, 'limit': 24})]
+            return await asyncio.gather(*requests)
+
+        responses = asyncio.run(cycle())
+        assert server.hits == {'/api/v2/tickers/btctwd': 1, '/api/v2/k': 2}
+        assert [response.source for response in responses[:10]].count('network') == 1
+        assert all(response.body == responses[0].body for response in responses[:10])
+        assert len(responses[10].json()) == 24
+
+        stats = transport.cache_stats()
+        assert (stats['misses'], stats['coalesced'], stats['hits']) == (3, 14, 0)
+        assert stats['by_endpoint']['tickers'] == {'hits': 0, 'coalesced': 9, 'misses': 1}
+        assert abs(stats['saved_ratio'] - 14 / 17) < 1e-12
+        assert transport.latency_summary()['k']['count'] == 2
+
+
+def test_ttl_cache_and_bypass_rules():
+    """成功響應在 TTL 內直接命中，過期後重新請求；錯誤響應、簽名請求與 use_cache=False 不走緩存"""
+    with LocalMAXServer() as server:
+        transport = create_transport(server.base_url, max_retries=0, cache_ttl={'tickers': 0.15})
+        try:
+            assert transport.get_sync('tickers/btctwd').source == 'network'
+            assert transport.get_sync('tickers/btctwd').source == 'cache'
+            assert transport.get_sync('tickers/btctwd', use_cache=False).source == 'network'
+            transport.request_sync('GET', 'tickers/btctwd', headers={'X-MAX-ACCESSKEY': 'key'})
+            assert server.hits['/api/v2/tickers/btctwd'] == 3
+            time.sleep(0.2)
+            assert transport.get_sync('tickers/btctwd').source == 'network'
+
+            server.failures['/api/v2/tickers/ethtwd'] = [500]
+            assert transport.get_sync('tickers/ethtwd').status == 500
+            assert transport.get_sync('tickers/ethtwd').status == 200
+            assert transport.get_sync('depth').source == 'network'          # 未配置 TTL 的端點不緩存
+            assert transport.get_sync('depth').source == 'network'
+
+            stats = transport.cache_stats()['by_endpoint']['tickers']
+            assert stats == {'hits': 1, 'coalesced': 0, 'misses': 4}
+        finally:
+            transport.close_sync()
+
+
+def test_kline_ttl_follows_candle_close():
+    """K線緩存到當前K線收盤，並受最長緩存秒數限制"""
+    uncapped = ResponseCache(TransportConfig(kline_max_ttl=None))
+    capped = ResponseCache(TransportConfig(kline_max_ttl=60.0))
+    for period in (1, 5, 60, 240):
+        seconds = period * 60
+        now = time.time()
+        until_close = seconds - now % seconds
+        assert abs(uncapped.ttl('k', {'period': period}) - until_close) < 0.05
+        assert abs(capped.ttl('k', {'period': str(period)}) - min(until_close, 60.0)) < 0.05
+    assert capped.ttl('tickers') == 1.0 and not capped.cacheable('members')
+    assert not ResponseCache(TransportConfig(cache_klines=False)).cacheable('k')
+
+
+def test_failed_call_is_shared_by_waiters():
+    """在途請求失敗時所有等待方都收到同一個異常，之後的請求重新發出"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    transport = create_transport(f"http://127.0.0.1:{port}/api/v2", max_retries=0)
+
+    async def scenario():
+        return await asyncio.gather(*[transport.get('tickers/btctwd') for _ in range(5)],
+                                    return_exceptions=True)
+
+    logging.disable(logging.WARNING)
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        logging.disable(logging.NOTSET)
+    assert all(isinstance(result, aiohttp.ClientConnectionError) for result in results)
+    assert transport.cache_stats()['by_endpoint']['tickers'] == {'hits': 0, 'coalesced': 4, 'misses': 1}
+    assert transport.cache.get(transport.cache.key(f"http://127.0.0.1:{port}/api/v2/tickers/btctwd")) is None
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    """發起在途請求的調用方被取消時，共用者仍拿到響應且不重發；全部取消後響應照常寫入緩存"""
+    with LocalMAXServer() as server:
+        server.delay = 0.1
+        transport = create_transport(server.base_url)
+
+        async def scenario():
+            leader = asyncio.ensure_future(transport.get('tickers/btctwd'))
+            await asyncio.sleep(0.02)
+            followers = [asyncio.ensure_future(transport.get('tickers/btctwd')) for _ in range(3)]
+            await asyncio.sleep(0.02)
+            leader.cancel()
+            responses = await asyncio.gather(*followers)
+            assert leader.cancelled()
+            assert all(response.ok and response.source == 'coalesced' for response in responses)
+
+            abandoned = asyncio.ensure_future(transport.get('tickers/ethtwd'))
+            await asyncio.sleep(0.02)
+            abandoned.cancel()
+            await asyncio.sleep(0.15)
+            assert (await transport.get('tickers/ethtwd')).source == 'cache'
+
+        asyncio.run(scenario())
+        assert server.hits == {'/api/v2/tickers/btctwd': 1, '/api/v2/tickers/ethtwd': 1}
+        stats = transport.cache_stats()['by_endpoint']['tickers']
+        assert stats == {'hits': 1, 'coalesced': 3, 'misses': 2}
+
+
+def test_consumers_in_one_cycle_share_calls():
+    """同一交易週期內數據客戶端、多交易對客戶端與 MACD 服務請求相同行情時只打一次API"""
+    from src.data.live_macd_service import LiveMACDService
+    from src.data.max_client import MAXDataClient
+    from src.data.multi_pair_max_client import MultiPairMAXClient, TradingPairConfig
+
+    with LocalMAXServer() as server:
+        server.delay = 0.02
+        # 截至當前的1分鐘K線，足夠多週期K線源由基礎K線重採樣出24根小時K線
+        latest = int(time.time()) // 60 * 60
+        server.klines = [[latest - 60 * i, 100.0, 101.0, 99.0, 100.5, 1.0] for i in range(1499, -1, -1)]
+        transport = get_max_transport()
+        transport.reset_stats()
+        logging.disable(logging.INFO)
+        try:
+            data_client = MAXDataClient(base_url=server.base_url)
+            macd_service = LiveMACDService(base_url=server.base_url)
+            multi_client = MultiPairMAXClient(base_url=server.base_url)
+            multi_client.add_trading_pair(TradingPairConfig("BTCTWD", 0.0001, 1.0, 1.0))
+
+            async def trading_cycle():
+                return await asyncio.gather(
+                    data_client._get_current_ticker('btctwd'),
+                    data_client._get_recent_klines('btctwd', period=60, limit=24),
+                    multi_client._get_ticker('BTCTWD'),
+                    multi_client._get_klines('BTCTWD', period=60, limit=24),
+                    macd_service._fetch_klines('btctwd', '60', 24))
+
+            for _ in range(3):
+                ticker, klines, multi_ticker, multi_klines, macd_klines = asyncio.run(trading_cycle())
+            assert ticker['last_price'] == multi_ticker['last_price'] == 3500000.0
+            assert len(klines) == len(multi_klines) == len(macd_klines) == 24
+
+            # MACD 服務的小時K線由多週期K線源的一次1分鐘K線請求重採樣得到，之後的週期直接讀取重採樣結果
+            assert server.hits == {'/api/v2/tickers/btctwd': 1, '/api/v2/k': 2}
+            stats = transport.cache_stats()
+            assert stats['misses'] == 3 and stats['coalesced'] == 2 and stats['hits'] == 8
+        finally:
+            logging.disable(logging.NOTSET)
+            transport.reset_stats()
+
+
+def main():
+    """運行所有測試並統計多消費者場景下節省的API調用"""
+    tests = [
+        test_concurrent_identical_requests_share_one_call,
+        test_ttl_cache_and_bypass_rules,
+        test_kline_ttl_follows_candle_close,
+        test_failed_call_is_shared_by_waiters,
+        test_cancelled_leader_does_not_cancel_waiters,
+        test_consumers_in_one_cycle_share_calls,
+    ]
+
+    print("🧪 開始測試MAX請求合併與短時緩存...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    with LocalMAXServer() as server:
+        server.delay = 0.01
+        transport = create_transport(server.base_url)
+        consumers, cycles = 6, 20
+
+        async def run_cycles():
+            for _ in range(cycles):
+                await asyncio.gather(*[transport.get('tickers/btctwd') for _ in range(consumers)],
+                                     *[transport.get('k', {'market': 'btctwd', 'period': 60}) for _ in range(consumers)])
+                await asyncio.sleep(0.1)
+
+        asyncio.run(run_cycles())
+        stats = transport.cache_stats()
+    requested = consumers * 2 * cycles
+    print(f"📉 {consumers} 個消費者 x {cycles} 個週期: 請求 {requested} 次，實際API調用 {sum(server.hits.values())} 次 "
+          f"(命中 {stats['hits']}，合併 {stats['coalesced']}，節省 {stats['saved_ratio']:.0%})")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
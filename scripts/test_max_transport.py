@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試MAX共用傳輸層 - 保持連接復用、端點並發限制、重試退避、延遲直方圖，以及各客戶端共用連接池
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.max_transport import MAXTransport, MAXTransportError, TransportConfig, get_max_transport
+
+KLINES = [[1700000000 + 60 * i, 100 + i, 101 + i, 99 + i, 100.5 + i, 1.0] for i in range(30)]
+TICKER = {'last': '3500000', 'vol': '12.5', 'high': '3550000', 'low': '3450000', 'open': '3480000',
+          'buy': '3499000', 'sell': '3501000'}
+
+
+class LocalMAXServer:
+    """在後台線程運行的本地 MAX API 替身，記錄連接與並發情況"""
+
+    def __init__(self):
+        self.peers = set()
+        self.in_flight = {}
+        self.peak = {}
+        self.failures = {}      # 路徑 -> 剩餘要返回的錯誤狀態碼列表
+        self.hits = {}
+        self.delay = 0.0
+        self.klines = KLINES    # K線接口返回的數據（忽略 period，按 limit 取最新）
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+
+    async def _handle(self, request: web.Request):
+        path = request.path
+        self.peers.add(request.transport.get_extra_info('peername'))
+        self.hits[path] = self.hits.get(path, 0) + 1
+        endpoint = path.split('/')[3]
+        self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+        self.peak[endpoint] = max(self.peak.get(endpoint, 0), self.in_flight[endpoint])
+        try:
+            await asyncio.sleep(self.delay)
+            pending = self.failures.get(path)
+            if pending:
+                status = pending.pop(0)
+                headers = {'Retry-After': '0.05'} if status == 429 else {}
+                return web.json_response({'error': 'busy'}, status=status, headers=headers)
+            if endpoint == 'k':
+                return web.json_response(self.klines[-int(request.query.get('limit', 30)):])
+            if endpoint == 'orders':
+                return web.json_response({'id': 1}, status=201)
+            return web.json_response(TICKER)
+        finally:
+            self.in_flight[endpoint] -= 1
+
+    def _serve(self, started: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        app = web.Application()
+        app.router.add_route('*', '/api/v2/{tail:.*}', self._handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        started.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self.runner.cleanup())
+        self.loop.close()
+
+    def __enter__(self):
+        started = threading.Event()
+        self.thread = threading.Thread(target=self._serve, args=(started,), daemon=True)
+        self.thread.start()
+        started.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/v2"
+
+
+def create_transport(server: LocalMAXServer, **overrides) -> MAXTransport:
+    """關閉響應緩存的傳輸層，每次調用都真正發出請求"""
+    settings = dict(base_url=server.base_url, backoff_base=0.01, cache_ttl={}, cache_klines=False)
+    settings.update(overrides)
+    return MAXTransport(TransportConfig(**settings))
+
+
+def test_connections_are_reused():
+    """同步接口的連續請求只建立一條連接，同一事件循環內的並發請求共用連接池"""
+    with LocalMAXServer() as server:
+        transport = create_transport(server)
+        try:
+            for _ in range(20):
+                assert transport.get_json_sync('tickers/btctwd')['last'] == '3500000'
+            assert len(server.peers) == 1
+
+            async def burst():
+                for _ in range(3):
+                    responses = await asyncio.gather(*[transport.get('k', {'limit': 5}) for _ in range(4)])
+                    assert all(response.status == 200 and len(response.json()) == 5 for response in responses)
+
+            asyncio.run(burst())
+            assert len(server.peers) <= 1 + 4
+            assert transport.latency_summary()['k']['count'] == 12
+        finally:
+            transport.close_sync()
+
+
+def test_endpoint_concurrency_limits():
+    """每個端點的同時在途請求不超過配置上限，互不佔用對方的額度"""
+    with LocalMAXServer() as server:
+        server.delay = 0.03
+        transport = create_transport(server, endpoint_concurrency={'k': 2, 'tickers': 5})
+
+        async def scenario():
+            requests = [transport.get('k', {'limit': 3}) for _ in range(8)]
+            requests += [transport.get(f'tickers/pair{i}') for i in range(10)]
+            started = time.perf_counter()
+            responses = await asyncio.gather(*requests)
+            return responses, time.perf_counter() - started
+
+        responses, elapsed = asyncio.run(scenario())
+        assert all(response.ok for response in responses)
+        assert server.peak == {'k': 2, 'tickers': 5}
+        assert elapsed >= 4 * 0.03 * 0.9
+
+
+def test_retry_with_backoff():
+    """GET 遇到 5xx/429 時退避重試（遵守 Retry-After），非冪等請求只重試 429，重試用盡後返回最後狀態"""
+    with LocalMAXServer() as server:
+        transport = create_transport(server)
+        logging.disable(logging.WARNING)
+        try:
+            server.failures['/api/v2/tickers/btctwd'] = [503, 502]
+            response = transport.get_sync('tickers/btctwd')
+            assert response.ok and response.attempts == 3
+
+            server.failures['/api/v2/markets'] = [429]
+            started = time.perf_counter()
+            assert transport.get_sync('markets').ok
+            assert time.perf_counter() - started >= 0.045
+
+            server.failures['/api/v2/orders'] = [503]
+            response = transport.request_sync('POST', 'orders', json_body={'market': 'btctwd'})
+            assert response.status == 503 and response.attempts == 1
+            server.failures['/api/v2/orders'] = [429]
+            assert transport.request_sync('POST', 'orders', json_body={'market': 'btctwd'}).status == 201
+
+            server.failures['/api/v2/depth'] = [500] * 10
+            response = transport.get_sync('depth', {'market': 'btctwd'})
+            assert response.status == 500 and server.hits['/api/v2/depth'] == 4
+            try:
+                response.raise_for_status()
+                raise AssertionError("應拋出 MAXTransportError")
+            except MAXTransportError as e:
+                assert e.status == 500
+
+            summary = transport.latency_summary()
+            assert summary['tickers']['retries'] == 2 and summary['tickers']['errors'] == 0
+            assert summary['depth']['errors'] == 1 and summary['depth']['retries'] == 3
+        finally:
+            logging.disable(logging.NOTSET)
+            transport.close_sync()
+
+
+def test_latency_histogram():
+    """延遲直方圖按端點統計請求數與分位數，分位數隨服務端延遲上升"""
+    with LocalMAXServer() as server:
+        transport = create_transport(server)
+        try:
+            for _ in range(10):
+                transport.get_sync('tickers/btctwd')
+            server.delay = 0.06
+            for _ in range(10):
+                transport.get_sync('k')
+            summary = transport.latency_summary()
+            assert summary['tickers']['count'] == summary['k']['count'] == 10
+            assert summary['k']['p50_ms'] >= 50 and summary['tickers']['p50_ms'] < 50
+            assert summary['k']['p50_ms'] <= summary['k']['p90_ms'] <= summary['k']['p99_ms'] <= summary['k']['max_ms']
+            histogram = transport.histogram('k')
+            assert sum(histogram.counts) == 10
+        finally:
+            transport.close_sync()
+
+
+def test_clients_share_process_transport():
+    """數據客戶端、同步數據獲取器與交易客戶端共用進程級傳輸層，同步接口不再逐次新建連接"""
+    from src.data.data_fetcher import DataFetcher
+    from src.data.max_client import MAXDataClient
+    from src.trading.real_max_client import RealMaxClient
+
+    with LocalMAXServer() as server:
+        logging.disable(logging.INFO)
+        try:
+            transport = get_max_transport()
+            transport.reset_stats()
+
+            fetcher = DataFetcher()
+            fetcher.base_url = server.base_url
+            fetcher.rate_limit_delay = 0.0
+            for _ in range(3):
+                df = fetcher.fetch_data('BTCTWD', '1m', limit=10)
+                assert len(df) == 10 and df['close'].iloc[-1] == KLINES[-1][4]
+
+            real_client = RealMaxClient()
+            real_client.base_url = f"http://127.0.0.1:{server.port}"
+            for _ in range(3):
+                result = real_client.get_ticker('btctwd')
+                assert result['success'] and result['data']['last_price'] == 3500000.0
+            assert len(server.peers) == 1
+
+            client = MAXDataClient(base_url=server.base_url)
+            assert client.transport is transport is fetcher.transport is real_client.transport
+
+            async def fetch():
+                return await asyncio.gather(client._get_current_ticker('btctwd'),
+                                            client._get_recent_klines('btctwd', 1, 20))
+
+            ticker, klines = asyncio.run(fetch())
+            assert ticker['bid'] == 3499000.0 and len(klines) == 20
+
+            # 相同的 K線/ticker 請求由共用緩存應答，只有首次請求真正發出
+            summary = transport.latency_summary()
+            assert summary['k']['count'] == 2 and summary['tickers']['count'] == 1
+            assert transport.cache_stats()['hits'] == 5
+        finally:
+            logging.disable(logging.NOTSET)
+            transport.close_sync()
+
+
+def main():
+    """運行所有測試並比較共用連接池與每次新建會話的請求延遲"""
+    tests = [
+        test_connections_are_reused,
+        test_endpoint_concurrency_limits,
+        test_retry_with_backoff,
+        test_latency_histogram,
+        test_clients_share_process_transport,
+    ]
+
+    print("🧪 開始測試MAX共用傳輸層...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    import aiohttp
+
+    with LocalMAXServer() as server:
+        transport = create_transport(server)
+        start = time.perf_counter()
+        for _ in range(100):
+            transport.get_json_sync('tickers/btctwd')
+        pooled_ms = (time.perf_counter() - start) * 10
+
+        async def fresh_session():
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{server.base_url}/tickers/btctwd") as response:
+                    return await response.json()
+
+        start = time.perf_counter()
+        for _ in range(100):
+            asyncio.run(fresh_session())
+        fresh_ms = (time.perf_counter() - start) * 10
+        transport.close_sync()
+    print(f"⏱️ 100 次同步 ticker 請求: 每次 asyncio.run+新會話 {fresh_ms:.2f} ms/次，共用連接池 {pooled_ms:.2f} ms/次")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試多時間週期信號引擎的列式實現 - 與逐行實現比對各週期信號並測量一年數據的回測耗時
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.multi_timeframe_trading_signals import MultiTimeframeSignalDetectionEngine, TimeframeColumns
+from src.core.signal_benchmark import build_dataset, synthetic_candles
+
+logging.getLogger('src.core.multi_timeframe_trading_signals').setLevel(logging.WARNING)
+
+
+def create_timeframes(bars: int, seed: int = 20240101):
+    """由5分鐘合成K線重採樣出各週期，'30m' 附帶1小時MA策略使用的 ma9/ma25/ma99"""
+    frames = build_dataset('synthetic', synthetic_candles(bars, seed, minutes=5)).frames
+    ma_frame = frames['30m']
+    for window in (9, 25, 99):
+        ma_frame[f'ma{window}'] = ma_frame['close'].rolling(window).mean()
+    return frames['1h'], {label: frames[label] for label in ('30m', '15m', '5m')}
+
+
+def detect_row_by_row(hourly_df: pd.DataFrame, timeframe_dfs: dict) -> dict:
+    """逐行參考實現（列式引擎之前的檢測流程）"""
+    engine = MultiTimeframeSignalDetectionEngine()
+    signals = {'1h': [], '30m': [], '15m': [], '5m': []}
+
+    hourly_signals, position = [], 0
+    for i, row in hourly_df.iterrows():
+        previous_row = hourly_df.iloc[i-1] if i > 0 else None
+        for signal_type, validate, required, cross_text in (
+            ('buy', engine.validator.validate_hourly_buy_signal, 0, '金叉'),
+            ('sell', engine.validator.validate_hourly_sell_signal, 1, '死叉'),
+        ):
+            if validate(row, previous_row):
+                if position == required:
+                    hourly_signals.append({
+                        'datetime': row['datetime'], 'close': row['close'], 'signal_type': signal_type,
+                        'hourly_signal': f"1小時MACD{cross_text}: {row['macd_hist']:.2f}",
+                        'macd_hist': row['macd_hist'], 'macd': row['macd'], 'macd_signal': row['macd_signal']
+                    })
+                    position = 1 - position
+                break
+
+    pair_sequence = 1
+    for signal in sorted(hourly_signals, key=lambda x: x['datetime']):
+        signals['1h'].append({**{key: signal[key] for key in ('datetime', 'close', 'signal_type')},
+                              'trade_sequence': 0, 'timeframe': '1h',
+                              **{key: signal[key] for key in ('hourly_signal', 'macd_hist', 'macd', 'macd_signal')}})
+        if signal['signal_type'] == 'buy':
+            signal['sequence'] = pair_sequence
+            pair_sequence += 1
+        else:
+            signal['sequence'] = pair_sequence - 1
+
+    df = timeframe_dfs['30m'].sort_values('datetime').reset_index(drop=True)
+    ma_position, ma_sequence = 0, 0
+    for i, row in df.iterrows():
+        base = {'datetime': row['datetime'], 'close': row['close']}
+        zeros = {'macd_hist': 0, 'macd': 0, 'macd_signal': 0}
+        if 'ma9' not in row or pd.isna(row['ma9']) or pd.isna(row['ma25']) or pd.isna(row['ma99']):
+            signals['30m'].append({**base, 'signal_type': 'waiting', 'trade_sequence': 0, 'timeframe': '30m',
+                                   'hourly_signal': '⏳ 等待MA數據', **zeros, 'is_waiting': True,
+                                   'ma9': 0, 'ma25': 0, 'ma99': 0})
+            continue
+        ma9, ma25, ma99 = row['ma9'], row['ma25'], row['ma99']
+        prev_ma9, prev_ma25 = ma9, ma25
+        if i > 0 and not pd.isna(df.iloc[i-1]['ma9']):
+            prev_ma9, prev_ma25 = df.iloc[i-1]['ma9'], df.iloc[i-1]['ma25']
+        trigger = False
+        if ma9 < ma99 and ma25 < ma99:
+            if ma9 > ma25 + 100 and prev_ma9 <= prev_ma25:
+                trigger, text, kind = True, f'🟢 1小時MA買進: 黃金交叉({ma9:,.0f}>{ma25:,.0f}) 空頭反彈', 'buy'
+            elif ma9 > ma25:
+                text, kind = f'🔵 1小時MA觀察: 空頭市場MA9({ma9:,.0f})>MA25({ma25:,.0f}) 等待確認', 'observing_buy'
+            else:
+                text, kind = f'⚪ 1小時MA追蹤: 空頭市場 MA9:{ma9:,.0f} MA25:{ma25:,.0f} MA99:{ma99:,.0f}', 'tracking'
+        elif ma9 > ma99 and ma25 > ma99:
+            if ma9 < ma25 - 100 and prev_ma9 >= prev_ma25:
+                trigger, text, kind = True, f'🔴 1小時MA賣出: 死亡交叉({ma9:,.0f}<{ma25:,.0f}) 多頭回調', 'sell'
+            elif ma9 < ma25:
+                text, kind = f'🟠 1小時MA觀察: 多頭市場MA9({ma9:,.0f})<MA25({ma25:,.0f}) 等待確認', 'observing_sell'
+            else:
+                text, kind = f'⚪ 1小時MA追蹤: 多頭市場 MA9:{ma9:,.0f} MA25:{ma25:,.0f} MA99:{ma99:,.0f}', 'tracking'
+        else:
+            text, kind = f'🟣 1小時MA震盪: 震盪市場 MA9:{ma9:,.0f} MA25:{ma25:,.0f} MA99:{ma99:,.0f}', 'sideways'
+        mas = {'ma9': ma9, 'ma25': ma25, 'ma99': ma99}
+        if not trigger:
+            signals['30m'].append({**base, 'signal_type': kind, 'trade_sequence': 0, 'timeframe': '30m',
+                                   'hourly_signal': text, **zeros, 'is_tracking': True, **mas})
+        elif kind == 'buy' and ma_position == 0:
+            ma_sequence, ma_position = ma_sequence + 1, 1
+            signals['30m'].append({**base, 'signal_type': 'buy', 'trade_sequence': ma_sequence, 'timeframe': '30m',
+                                   'hourly_signal': f'🟢 1小時MA買{ma_sequence}: {text}', **zeros,
+                                   'is_confirmed': True, **mas})
+        elif kind == 'sell' and ma_position == 1:
+            ma_position = 0
+            signals['30m'].append({**base, 'signal_type': 'sell', 'trade_sequence': ma_sequence, 'timeframe': '30m',
+                                   'hourly_signal': f'🔴 1小時MA賣{ma_sequence}: {text}', **zeros,
+                                   'is_confirmed': True, **mas})
+        else:
+            status = "已持倉" if ma_position == 1 else "已空倉"
+            label = f'買{ma_sequence + 1}' if kind == 'buy' else f'賣{ma_sequence}'
+            signals['30m'].append({**base, 'signal_type': 'blocked', 'trade_sequence': 0, 'timeframe': '30m',
+                                   'hourly_signal': f'❌ 1小時MA{label}被阻擋 ({status}): {text}', **zeros,
+                                   'is_blocked': True, **mas})
+
+    for timeframe, label in (('15m', '15分'), ('5m', '5分')):
+        df = timeframe_dfs[timeframe].sort_values('datetime').reset_index(drop=True)
+        reference_map = {signal['datetime']: signal for signal in hourly_signals}
+        searching, reference, lowest, highest = None, None, None, None
+        for _, row in df.iterrows():
+            now, price = row['datetime'], row['close']
+            macd = {'macd_hist': row['macd_hist'], 'macd': row['macd'], 'macd_signal': row['macd_signal']}
+            if now in reference_map:
+                searching = {**reference_map[now], 'start_time': now}
+            if searching and now > searching['start_time'] and abs(price - searching['close']) < 0.1:
+                reference = {**searching, 'time': now}
+                kind, sequence, target = reference['signal_type'], reference['sequence'], reference['close']
+                text = '買' if kind == 'buy' else '賣'
+                signals[timeframe].append({
+                    'datetime': now, 'close': target, 'signal_type': f'{kind}_reference', 'trade_sequence': sequence,
+                    'timeframe': timeframe,
+                    'hourly_signal': f'{"🔵" if kind == "buy" else "🔴"} {label}{text}{sequence}基準點',
+                    'macd_hist': 0, 'macd': 0, 'macd_signal': 0, 'is_reference': True, 'reference_sequence': sequence})
+                signals[timeframe].append({
+                    'datetime': now, 'close': target, 'signal_type': f'{kind}_confirmed', 'trade_sequence': sequence,
+                    'timeframe': timeframe, 'hourly_signal': f'✅ 已找到1小時{text}{sequence}觸發點，開始動態追蹤',
+                    **macd, 'is_confirmed': True, 'target_price': target})
+                lowest, highest = (target, None) if kind == 'buy' else (None, target)
+                searching = None
+            if reference and now > reference['time']:
+                sequence = reference['sequence']
+                if reference['signal_type'] == 'buy':
+                    lowest = price if lowest is None or price < lowest else lowest
+                    judge, triggered = lowest, price > lowest
+                else:
+                    highest = price if highest is None or price > highest else highest
+                    judge, triggered = highest, price < highest
+                if not triggered:
+                    signals[timeframe].append({
+                        'datetime': now, 'close': price, 'signal_type': 'tracking', 'trade_sequence': 0,
+                        'timeframe': timeframe,
+                        'hourly_signal': f'⚪ 追蹤中 {price:,.0f} →判斷基準: {judge:,.0f} (1小時基準: {reference["close"]:,.0f})',
+                        **macd, 'is_tracking': True, 'reference_sequence': sequence,
+                        'tracking_lowest': lowest, 'tracking_highest': highest})
+                elif reference['signal_type'] == 'buy':
+                    signals[timeframe].append({
+                        'datetime': now, 'close': price, 'signal_type': 'buy', 'trade_sequence': sequence,
+                        'timeframe': timeframe, 'hourly_signal': f'🟢 {label}買{sequence} (已超過最低點買入)',
+                        **macd, 'is_confirmed': True, 'reference_sequence': sequence, 'tracking_lowest': lowest})
+                    reference = None
+                else:
+                    signals[timeframe].append({
+                        'datetime': now, 'close': price, 'signal_type': 'sell', 'trade_sequence': sequence,
+                        'timeframe': timeframe, 'hourly_signal': f'🔴 {label}賣{sequence} (已低於最高點賣出)',
+                        **macd, 'is_confirmed': True, 'reference_sequence': sequence, 'tracking_highest': highest})
+                    reference = None
+
+    return {timeframe: pd.DataFrame(rows) if rows else pd.DataFrame() for timeframe, rows in signals.items()}
+
+
+def assert_same_signals(expected: dict, actual: dict):
+    assert list(expected) == list(actual)
+    for timeframe in expected:
+        pd.testing.assert_frame_equal(actual[timeframe], expected[timeframe], check_dtype=False,
+                                      obj=f"{timeframe} 信號")
+
+
+def test_matches_row_by_row_engine():
+    """列式引擎輸出與逐行實現逐欄一致（1h交叉、1小時MA狀態、15m/5m搜索與追蹤）"""
+    hourly_df, timeframe_dfs = create_timeframes(8640)
+    expected = detect_row_by_row(hourly_df, timeframe_dfs)
+    actual = MultiTimeframeSignalDetectionEngine().detect_signals(hourly_df, timeframe_dfs)
+    assert_same_signals(expected, actual)
+
+    # 覆蓋到足夠的交易路徑
+    assert len(actual['1h']) >= 10
+    for timeframe in ('15m', '5m'):
+        kinds = set(actual[timeframe]['signal_type'])
+        assert {'buy_reference', 'sell_confirmed', 'tracking', 'buy', 'sell'} <= kinds, kinds
+    assert {'waiting', 'tracking', 'sideways'} <= set(actual['30m']['signal_type'])
+
+
+def test_unsorted_input_and_missing_prices():
+    """打亂行順序、收盤價缺失時，結果仍與逐行實現一致"""
+    hourly_df, timeframe_dfs = create_timeframes(4000, seed=7)
+    shuffled = {label: df.sample(frac=1.0, random_state=3) for label, df in timeframe_dfs.items()}
+    # 部分短週期收盤價缺失：缺失期間既不匹配基準價也不觸發
+    for label in ('15m', '5m'):
+        flat = shuffled[label]
+        flat.loc[flat['datetime'].dt.day.isin([5, 6]), 'close'] = np.nan
+    expected = detect_row_by_row(hourly_df, shuffled)
+    actual = MultiTimeframeSignalDetectionEngine().detect_signals(hourly_df, shuffled)
+    assert_same_signals(expected, actual)
+
+
+def test_reference_found_while_tracking():
+    """買入追蹤尚未觸發時找到下一個賣出基準點：改為追蹤新基準點；沒有MA欄位時全部等待"""
+    start = pd.Timestamp('2024-03-01')
+    hourly_df = pd.DataFrame({
+        'datetime': [start + pd.Timedelta(hours=h) for h in range(4)],
+        'close': [101.0, 100.0, 97.0, 90.0],
+        'macd': [-5.0, -2.0, 5.0, 3.0],
+        'macd_signal': [-3.0, -3.0, 3.0, 4.0],
+        'macd_hist': [-2.0, 1.0, 2.0, -1.0],
+    })
+    # 1小時買進後價格逐根下跌（買入追蹤一直創新低不觸發），跌到賣出基準價90後反彈再回落
+    closes = [101.0] * 13 + [100.0 - 0.25 * i for i in range(41)] + [91.0, 92.0, 91.5, 93.0]
+    minutes = pd.DataFrame({
+        'datetime': [start + pd.Timedelta(minutes=5 * i) for i in range(len(closes))],
+        'close': closes,
+        'macd': np.linspace(-1, 1, len(closes)),
+        'macd_signal': 0.0,
+        'macd_hist': np.linspace(-1, 1, len(closes)),
+    })
+    timeframe_dfs = {'30m': minutes[['datetime', 'close']].iloc[::6].copy(), '15m': minutes.copy(), '5m': minutes}
+
+    expected = detect_row_by_row(hourly_df, timeframe_dfs)
+    actual = MultiTimeframeSignalDetectionEngine().detect_signals(hourly_df, timeframe_dfs)
+    assert_same_signals(expected, actual)
+
+    kinds = actual['5m']['signal_type'].tolist()
+    assert kinds[:2] == ['buy_reference', 'buy_confirmed'] and 'buy' not in kinds
+    assert kinds[-3:] == ['tracking', 'tracking', 'sell']
+    assert actual['5m']['tracking_highest'].iloc[-1] == 92.0
+    assert set(actual['30m']['signal_type']) == {'waiting'}
+
+
+def test_timeframe_columns_locate():
+    """時間精確對齊：存在的時間返回第一行位置，不存在的返回 -1；after 跳過同時間的重複K線"""
+    times = pd.to_datetime(['2024-01-01 00:00', '2024-01-01 00:05', '2024-01-01 00:05', '2024-01-01 00:10'])
+    frame = TimeframeColumns(pd.DataFrame({'datetime': times[::-1], 'close': [4.0, 3.0, 3.0, 1.0]}))
+    positions = frame.locate([pd.Timestamp('2024-01-01 00:05'), pd.Timestamp('2024-01-01 00:07'),
+                              pd.Timestamp('2024-01-01 00:10'), pd.Timestamp('2024-01-01 00:15')])
+    assert positions.tolist() == [1, -1, 3, -1]
+    assert frame.after(1) == 3 and frame.after(3) == 4
+    assert frame.closes == [1.0, 3.0, 3.0, 4.0]
+    assert frame.locate([]).tolist() == []
+
+
+def main():
+    """運行所有測試並測量一年5分鐘數據的多週期回測耗時"""
+    tests = [
+        test_matches_row_by_row_engine,
+        test_unsorted_input_and_missing_prices,
+        test_reference_found_while_tracking,
+        test_timeframe_columns_locate,
+    ]
+
+    print("🧪 開始測試多時間週期列式信號引擎...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    month = create_timeframes(8640)
+    started = time.perf_counter()
+    detect_row_by_row(*month)
+    row_by_row = time.perf_counter() - started
+    started = time.perf_counter()
+    MultiTimeframeSignalDetectionEngine().detect_signals(*month)
+    columnar = time.perf_counter() - started
+    print(f"⏱️ 30天 5m+15m+30m+1h: 逐行 {row_by_row:.2f}s，列式 {columnar:.3f}s")
+
+    year = create_timeframes(365 * 288)
+    started = time.perf_counter()
+    result = MultiTimeframeSignalDetectionEngine().detect_signals(*year)
+    print(f"⏱️ 一年 5m+15m+30m+1h: 列式 {time.perf_counter() - started:.2f}s，"
+          f"{sum(len(df) for df in result.values())} 條信號")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試並行參數掃描引擎 - 進程池結果一致性、提前終止、續跑與共享數據只讀
+"""
+
+import itertools
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.parameter_sweep import ParameterSweepEngine
+from src.core.dynamic_trading_data_structures import DynamicTradeResult, ExecutionReason, SignalType
+import src.core.dynamic_trading_signals as dynamic_trading_signals
+
+
+class WindowLowSignals:
+    """每個買入窗口結束時以窗口內最低價成交（DynamicTradingSignals 尚未實現，測試用信號引擎）"""
+
+    def __init__(self, config):
+        self.window = timedelta(hours=config.window_config.buy_window_hours)
+        self.start_time = None
+        self.trades = 0
+
+    def process_price_update(self, price_data):
+        timestamp, close = price_data['timestamp'], price_data['close']
+        if self.start_time is None:
+            self.start_time, self.start_price = timestamp, close
+            self.low_time, self.low_price = timestamp, close
+            return None
+
+        if close < self.low_price:
+            self.low_time, self.low_price = timestamp, close
+        if timestamp - self.start_time < self.window:
+            return None
+
+        self.trades += 1
+        result = DynamicTradeResult(
+            trade_id=f"buy_{self.trades}",
+            signal_type=SignalType.BUY,
+            original_signal_time=self.start_time,
+            original_signal_price=self.start_price,
+            actual_execution_time=self.low_time,
+            actual_execution_price=self.low_price,
+            execution_reason=ExecutionReason.REVERSAL_DETECTED
+        )
+        self.start_time = None
+        return result
+
+
+if not hasattr(dynamic_trading_signals, 'DynamicTradingSignals'):
+    dynamic_trading_signals.DynamicTradingSignals = WindowLowSignals
+
+
+def create_test_data(periods: int = 5000) -> dict:
+    """創建測試收盤價"""
+    rng = np.random.default_rng(3)
+    return {
+        'timestamp': np.arange(periods, dtype=np.int64) * 60,
+        'close': 3400000 + np.cumsum(rng.normal(0, 2000, periods))
+    }
+
+
+def evaluate_ma_cross(data, params, context):
+    """均線交叉收益（測試用評估函數）"""
+    close = data['close']
+    fast = np.convolve(close, np.ones(params['fast']) / params['fast'], mode='valid')
+    slow = np.convolve(close, np.ones(params['slow']) / params['slow'], mode='valid')
+    fast = fast[-len(slow):]
+    position = (fast > slow).astype(float)[:-1]
+    returns = np.diff(close[-len(slow):])
+    return {'improvement': float(np.sum(position * returns)) * context['scale'],
+            'total_trades': int(np.abs(np.diff(position)).sum())}
+
+
+def evaluate_mutating(data, params, context):
+    """嘗試修改共享數據（應失敗）"""
+    data['close'][0] = 0.0
+    return {'improvement': 0.0}
+
+
+def create_combinations() -> list:
+    return [{'fast': fast, 'slow': slow}
+            for fast, slow in itertools.product([3, 5, 8, 13], [21, 34, 55])]
+
+
+def test_process_pool_matches_in_process():
+    """進程池結果與單進程結果一致"""
+    data = create_test_data()
+    combinations = create_combinations()
+
+    serial = ParameterSweepEngine(evaluate_ma_cross, data, {'scale': 1.0}, max_workers=1).run(combinations)
+    parallel = ParameterSweepEngine(evaluate_ma_cross, data, {'scale': 1.0}, max_workers=2).run(combinations)
+
+    by_index = {record['index']: record['metrics'] for record in parallel['results']}
+    assert parallel['completed_combinations'] == len(combinations)
+    for record in serial['results']:
+        assert by_index[record['index']] == record['metrics']
+    assert parallel['best']['parameters'] == serial['best']['parameters']
+    assert parallel['combinations_per_second'] > 0
+
+
+def test_early_termination_and_resume():
+    """提前終止後以結果文件續跑，只評估剩餘組合"""
+    data = create_test_data()
+    combinations = create_combinations()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results_file = str(Path(tmp) / 'sweep.jsonl')
+
+        first = ParameterSweepEngine(evaluate_ma_cross, data, {'scale': 1.0}, max_workers=1,
+                                     results_file=results_file)
+        partial = first.run(combinations, stop_condition=lambda record: record['index'] >= 4)
+        assert partial['stopped_early']
+        assert partial['completed_combinations'] == 5
+
+        streamed = []
+        second = ParameterSweepEngine(evaluate_ma_cross, data, {'scale': 1.0}, max_workers=2,
+                                      results_file=results_file)
+        summary = second.run(combinations, result_callback=streamed.append)
+        assert summary['resumed_combinations'] == 5
+        assert len(streamed) == len(combinations) - 5
+        assert summary['completed_combinations'] == len(combinations)
+
+        with open(results_file, encoding='utf-8') as f:
+            assert len([json.loads(line) for line in f]) == len(combinations)
+
+
+def test_shared_data_is_read_only():
+    """評估函數無法修改共享市場數據"""
+    data = create_test_data(100)
+    for max_workers in (1, 2):
+        summary = ParameterSweepEngine(evaluate_mutating, data, max_workers=max_workers).run([{'fast': 1}])
+        assert summary['failed_combinations'] == 1
+        assert summary['best'] is None
+
+
+def test_backtest_sweep_matches_single_run():
+    """回測引擎經進程池評估的參數組合與單次回測結果一致"""
+    from src.core import dynamic_backtest_engine
+    from src.core.dynamic_backtest_engine import DynamicBacktestEngine, create_dynamic_backtest_engine
+
+    original_signals = dynamic_backtest_engine.DynamicTradingSignals
+    dynamic_backtest_engine.DynamicTradingSignals = WindowLowSignals
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # 引擎構造時在相對路徑下創建數據庫，放到臨時目錄中
+        os.chdir(tmp)
+        try:
+            engine = create_dynamic_backtest_engine()
+            end_date = datetime(2024, 1, 2)
+            start_date = end_date - timedelta(days=1)
+            frame = engine._generate_mock_data("BTCTWD", start_date, end_date)
+            engine._get_historical_data = lambda symbol, start, end: frame
+
+            optimization = engine.run_parameter_optimization(
+                symbol="BTCTWD",
+                start_date=start_date,
+                end_date=end_date,
+                parameter_ranges={'buy_window_hours': [1.0, 3.0], 'reversal_threshold': [0.5]},
+                max_workers=2
+            )
+            assert 'error' not in optimization, optimization.get('error')
+            assert optimization['optimization_summary']['workers'] == 2
+            assert optimization['optimization_summary']['completed_combinations'] == 2
+
+            for swept in optimization['all_results']:
+                single_engine = DynamicBacktestEngine(engine._create_config_with_params(swept['parameters']))
+                single_engine._get_historical_data = lambda symbol, start, end: frame
+                single = single_engine.run_backtest("BTCTWD", start_date, end_date)
+
+                assert single.total_trades > 0
+                assert (swept['improvement'], swept['total_trades'], swept['win_rate'], swept['sharpe_ratio']) == \
+                    (single.total_improvement, single.total_trades, single.win_rate, single.sharpe_ratio)
+            engine.historical_data_manager.storage.close()
+        finally:
+            os.chdir(cwd)
+            dynamic_backtest_engine.DynamicTradingSignals = original_signals
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_process_pool_matches_in_process,
+        test_early_termination_and_resume,
+        test_shared_data_is_read_only,
+        test_backtest_sweep_matches_single_run,
+    ]
+
+    print("🧪 開始測試並行參數掃描引擎...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
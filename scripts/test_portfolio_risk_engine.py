@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試投資組合風險引擎 - EWMA協方差增量更新、組合指標與逐項計算一致、全局風險管理器接入
+"""
+
+import asyncio
+import logging
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.trading.global_risk_manager import GlobalRiskConfig, GlobalRiskManager
+from src.trading.portfolio_risk_engine import PortfolioRiskEngine
+
+PAIRS = ["BTCTWD", "ETHTWD", "USDTTWD"]
+
+
+def correlated_returns(count: int, seed: int = 1) -> np.ndarray:
+    """BTC/ETH 相關性約0.8、USDT 幾乎不動的1分鐘收益率"""
+    rng = np.random.default_rng(seed)
+    chol = np.linalg.cholesky(np.array([[1.0, 0.8, 0.0], [0.8, 1.0, 0.0], [0.0, 0.0, 1.0]]))
+    shocks = rng.standard_normal((count, 3)) @ chol.T
+    return shocks * np.array([0.001, 0.0013, 0.00003])
+
+
+def test_ewma_incremental_matches_seed_and_recursion():
+    """逐筆增量更新、一次性初始化與逐項 EWMA 遞推得到相同協方差"""
+    returns = correlated_returns(500)
+    priors = {"BTCTWD": 0.04, "ETHTWD": 0.05, "USDTTWD": 0.001}
+
+    incremental, seeded = PortfolioRiskEngine(), PortfolioRiskEngine()
+    for engine in (incremental, seeded):
+        for pair in PAIRS:
+            engine.add_pair(pair, priors[pair], {"BTCTWD": 0.5} if pair == "ETHTWD" else None)
+    for row in returns:
+        incremental.update_returns(dict(zip(PAIRS, row)))
+    seeded.seed_returns({pair: returns[:, i] for i, pair in enumerate(PAIRS)})
+
+    vol = np.array([priors[pair] for pair in PAIRS]) / math.sqrt(1440)
+    expected = np.diag(vol ** 2)
+    expected[0, 1] = expected[1, 0] = 0.5 * vol[0] * vol[1]
+    for row in returns:
+        for i in range(3):
+            for j in range(3):
+                expected[i, j] = 0.94 * expected[i, j] + 0.06 * row[i] * row[j]
+
+    assert np.allclose(incremental.covariance(1 / 1440), expected, rtol=1e-10, atol=0)
+    assert np.allclose(seeded.covariance(1 / 1440), expected, rtol=1e-10, atol=0)
+    assert np.allclose(incremental.return_history(), returns[-500:])
+    assert incremental.observations("ETHTWD") == 500
+
+    # 只更新部分交易對時其他交易對按0收益衰減
+    before = incremental.covariance()
+    incremental.update_returns({"BTCTWD": 0.002})
+    after = incremental.covariance()
+    assert np.allclose(after[1:, 1:], 0.94 * before[1:, 1:], rtol=1e-12, atol=0)
+    assert np.allclose(after[0, 1:], 0.94 * before[0, 1:], rtol=1e-12, atol=0)
+    assert not np.array_equal(before[0, 0], after[0, 0])
+
+
+def test_sparse_updates_keep_covariance_psd():
+    """交替只更新部分交易對時協方差保持半正定，參數法 VaR 不會因負方差歸零"""
+    engine = PortfolioRiskEngine()
+    returns = correlated_returns(250, seed=5)
+    for row in returns[:50]:
+        engine.update_returns({"BTCTWD": row[0], "ETHTWD": row[1]})
+    # 之後波動下降且交替只推送單個交易對：未衰減的交叉協方差會超過縮小的方差
+    for i, row in enumerate(returns[50:] * 0.2):
+        engine.update_returns({"BTCTWD": row[0]} if i % 2 == 0 else {"ETHTWD": row[1]})
+    assert np.linalg.eigvalsh(engine.covariance()).min() >= -1e-18
+
+    engine.set_exposures({"BTCTWD": 100000.0, "ETHTWD": -100000.0})
+    history = engine.return_history() @ engine.exposures
+    assert engine.parametric_var(0.95) > 0 and np.std(history) > 0
+
+    # 一次性初始化時只提供部分交易對同樣保持半正定
+    engine.seed_returns({"USDTTWD": returns[:, 2]})
+    assert np.linalg.eigvalsh(engine.covariance()).min() >= -1e-18
+
+
+def test_portfolio_metrics_match_elementwise():
+    """組合方差、分散化比率、相關性與 VaR/ES 和逐項計算一致"""
+    engine = PortfolioRiskEngine(decay=0.995, history_size=300)
+    returns = correlated_returns(800, seed=4)
+    engine.seed_returns({pair: returns[:, i] for i, pair in enumerate(PAIRS)})
+    exposures = {"BTCTWD": 150000.0, "ETHTWD": 80000.0, "USDTTWD": 50000.0}
+    engine.set_exposures(exposures)
+
+    cov = engine.covariance()
+    x = np.array([exposures[pair] for pair in PAIRS])
+    variance = sum(x[i] * x[j] * cov[i, j] for i in range(3) for j in range(3))
+    assert math.isclose(engine.portfolio_variance(), variance, rel_tol=1e-12)
+
+    w = x / x.sum()
+    vol = np.sqrt(np.diag(cov))
+    corr = cov / np.outer(vol, vol)
+    weighted_vol = sum(w[i] * vol[i] for i in range(3))
+    portfolio_vol = math.sqrt(sum(w[i] * w[j] * vol[i] * vol[j] * corr[i, j] for i in range(3) for j in range(3)))
+    assert math.isclose(engine.diversification_ratio(cap=None), weighted_vol / portfolio_vol, rel_tol=1e-12)
+    pairwise = [corr[i, j] * w[i] * w[j] for i in range(3) for j in range(i + 1, 3)]
+    assert math.isclose(engine.weighted_correlation(), sum(pairwise) / len(pairwise), rel_tol=1e-12)
+    assert engine.correlation()[0, 1] > 0.6 and abs(engine.correlation()[0, 2]) < 0.3
+
+    sigma = math.sqrt(variance)
+    assert math.isclose(engine.parametric_var(0.95), 1.6448536 * sigma, rel_tol=1e-6)
+    assert math.isclose(engine.parametric_es(0.99), sigma * math.exp(-2.3263479 ** 2 / 2) /
+                        math.sqrt(2 * math.pi) / 0.01, rel_tol=1e-6)
+
+    losses = -(returns[-300:] @ x)
+    var_99 = np.quantile(losses, 0.99)
+    assert math.isclose(engine.historical_var(0.99), var_99 * math.sqrt(1440), rel_tol=1e-12)
+    assert math.isclose(engine.historical_es(0.99), losses[losses >= var_99].mean() * math.sqrt(1440),
+                        rel_tol=1e-12)
+    assert engine.historical_es(0.99) >= engine.historical_var(0.99) > engine.historical_var(0.95)
+
+
+def test_ring_buffer_pnl_stays_consistent():
+    """環形緩衝區繞回後的收益率順序正確，增量維護的損益與按敞口重算一致"""
+    engine = PortfolioRiskEngine(history_size=50)
+    engine.set_exposures({"BTCTWD": 10000.0, "ETHTWD": -4000.0})
+    returns = correlated_returns(137, seed=8)[:, :2]
+    for i, row in enumerate(returns):
+        engine.update_returns(dict(zip(PAIRS[:2], row)))
+        if i == 90:
+            engine.set_exposure("ETHTWD", 6000.0)
+
+    assert engine.history_length == 50
+    assert np.allclose(engine.return_history(), returns[-50:])
+    incremental = np.sort(engine.historical_pnl())
+    assert np.allclose(incremental, np.sort(returns[-50:] @ np.array([10000.0, 6000.0])))
+
+    engine.add_pair("LTCTWD", 0.06, {"BTCTWD": 0.5})
+    assert engine.return_history().shape == (50, 3)
+    assert engine.diversification_ratio() > 1.0
+
+
+def test_global_risk_manager_uses_engine():
+    """全局風險管理器由價格推送估計波動率與相關性，並按配置切換歷史模擬VaR"""
+    logging.disable(logging.WARNING)
+    try:
+        config = GlobalRiskConfig(max_total_exposure=1000000, max_single_pair_exposure=500000,
+                                  max_single_strategy_exposure=500000, var_method="historical",
+                                  min_historical_returns=200)
+        manager = GlobalRiskManager(config)
+
+        async def scenario():
+            await manager.register_exposure("grid_btc", "BTCTWD", "grid", 200000)
+            await manager.register_exposure("dca_eth", "ETHTWD", "dca", 100000)
+            prior_var = manager.current_metrics.daily_var_95
+            assert prior_var > 0 and manager._get_pair_volatility("BTCTWD") == 0.04
+
+            prices = np.array([3500000.0, 110000.0, 32.0])
+            for row in correlated_returns(400, seed=2):
+                prices = prices * (1 + row)
+                await manager.update_market_prices(dict(zip(PAIRS, prices)))
+                if manager.risk_engine.history_length == 150:
+                    assert manager.current_metrics.daily_var_95 == manager.risk_engine.parametric_var(0.95)
+            await manager._update_correlation_matrix()
+
+        asyncio.run(scenario())
+    finally:
+        logging.disable(logging.NOTSET)
+
+    metrics = manager.get_global_risk_status()['metrics']
+    assert metrics['daily_var_95'] == metrics['historical_var_95'] > 0
+    assert metrics['expected_shortfall'] >= metrics['daily_var_99']
+    assert 0.02 < manager._get_pair_volatility("BTCTWD") < 0.06
+    assert manager.get_correlation_matrix()["BTCTWD"]["ETHTWD"] > 0.6
+    assert 1.0 <= metrics['diversification_ratio'] <= 2.0
+    assert len(manager.price_history["BTCTWD"]) == 400
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_ewma_incremental_matches_seed_and_recursion,
+        test_sparse_updates_keep_covariance_psd,
+        test_portfolio_metrics_match_elementwise,
+        test_ring_buffer_pnl_stays_consistent,
+        test_global_risk_manager_uses_engine,
+    ]
+
+    print("🧪 開始測試投資組合風險引擎...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試風險分析服務 - 滾動窗口指標與逐次全量計算一致、從歷史數據庫增量刷新、風險模塊接入
+"""
+
+import logging
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.risk_analytics import RiskAnalyticsService, periods_per_year
+from src.data.historical_data_manager import HistoricalDataManager
+
+
+def price_series(count: int, seed: int = 5, start: int = 1700000000, step: int = 300):
+    """帶肥尾跳動的5分鐘收盤價"""
+    rng = np.random.default_rng(seed)
+    returns = rng.standard_t(3, count) * 0.002 + 0.00002
+    closes = 3500000 * np.exp(np.cumsum(returns))
+    timestamps = start + step * np.arange(count, dtype=np.int64)
+    return timestamps, closes
+
+
+def brute_force(closes: np.ndarray, window: int, confidence: float, horizon: int = 1) -> dict:
+    """參考實現：對最近 window 個收益率逐項重算"""
+    returns = np.diff(np.log(closes))[-window:]
+    if horizon > 1:
+        returns = np.array([returns[i:i + horizon].sum() for i in range(len(returns) - horizon + 1)])
+    losses = -returns
+    var = np.quantile(losses, confidence)
+    path = np.log(closes[-window - 1:])
+    drawdown = 1 - np.exp(path - np.maximum.accumulate(path))
+    one_bar = np.diff(np.log(closes))[-window:]
+    return {"var": var, "es": losses[losses >= var].mean(), "max_drawdown": drawdown.max(),
+            "volatility": one_bar.std(), "sharpe": one_bar.mean() / one_bar.std()}
+
+
+def test_rolling_metrics_match_brute_force():
+    """環形窗口繞回後波動率、夏普比率、任意置信度/持有期 VaR 與預期損失、最大回撤與全量計算一致"""
+    service = RiskAnalyticsService(window=700)
+    timestamps, closes = price_series(2500)
+    for i, (timestamp, close) in enumerate(zip(timestamps.tolist(), closes.tolist())):
+        service.update_close("BTCTWD", "5m", timestamp, close)
+        if i in (300, 1401, 2499):
+            seen = closes[:i + 1]
+            window = min(700, i)
+            expected = brute_force(seen, window, 0.95)
+            annual = math.sqrt(periods_per_year("5m"))
+            assert service.observations("BTCTWD", "5m") == window
+            assert math.isclose(service.volatility("BTCTWD", "5m"), expected["volatility"] * annual, rel_tol=1e-9)
+            assert math.isclose(service.sharpe_ratio("BTCTWD", "5m"), expected["sharpe"] * annual, rel_tol=1e-7)
+            assert math.isclose(service.max_drawdown("BTCTWD", "5m"), expected["max_drawdown"], rel_tol=1e-9)
+
+            for confidence in (0.9, 0.95, 0.975, 0.99):
+                for horizon in (1, 5, 24):
+                    expected = brute_force(seen, window, confidence, horizon)
+                    var = service.value_at_risk("BTCTWD", "5m", confidence, horizon)
+                    es = service.expected_shortfall("BTCTWD", "5m", confidence, horizon)
+                    assert math.isclose(var, expected["var"], rel_tol=1e-9, abs_tol=1e-12), (i, confidence, horizon)
+                    assert math.isclose(es, expected["es"], rel_tol=1e-9), (i, confidence, horizon)
+                    assert es >= var
+
+    assert np.allclose(service.returns("BTCTWD", "5m"), np.diff(np.log(closes))[-700:])
+    snapshot = service.snapshot("btc/twd", "5m", horizon=5)
+    assert snapshot.observations == 700 and snapshot.timestamp == int(timestamps[-1])
+    assert snapshot.expected_shortfall_99 >= snapshot.var_99 > snapshot.var_95 > 0
+
+
+def test_lookback_queries_are_cached_per_window_version():
+    """最近 lookback 段的指標與全量計算一致，窗口未變化時重複查詢不再掃描窗口"""
+    service = RiskAnalyticsService(window=1000)
+    timestamps, closes = price_series(1501, seed=5)
+    service.load_closes("BTCTWD", "5m", timestamps[:1001], closes[:1001])
+    window = service.track("BTCTWD", "5m")
+
+    scans = []
+    values = window.values
+    window.values = lambda: scans.append(1) or values()
+
+    def query():
+        return (service.volatility("BTCTWD", "5m", 252, lookback=99),
+                service.sharpe_ratio("BTCTWD", "5m", 252, lookback=99),
+                service.value_at_risk("BTCTWD", "5m", 0.95, lookback=99),
+                service.expected_shortfall("BTCTWD", "5m", 0.99, horizon=5, lookback=99),
+                service.max_drawdown("BTCTWD", "5m", lookback=99))
+
+    for end in (1001, 1200):
+        if end > 1001:
+            service.load_closes("BTCTWD", "5m", timestamps[1001:end], closes[1001:end])
+        first = query()
+        scanned = len(scans)
+        assert query() == first and len(scans) == scanned
+
+        expected = brute_force(closes[:end], 99, 0.95)
+        assert math.isclose(first[0], expected["volatility"] * math.sqrt(252), rel_tol=1e-9)
+        assert math.isclose(first[1], expected["sharpe"] * math.sqrt(252), rel_tol=1e-9)
+        assert math.isclose(first[2], expected["var"], rel_tol=1e-9)
+        assert math.isclose(first[3], brute_force(closes[:end], 99, 0.99, 5)["es"], rel_tol=1e-9)
+        assert math.isclose(first[4], expected["max_drawdown"], rel_tol=1e-9)
+
+    # lookback 不短於窗口時與整個窗口的滑動統計量相同
+    assert service.volatility("BTCTWD", "5m", lookback=5000) == service.volatility("BTCTWD", "5m")
+
+
+def test_unclosed_bar_updates_replace_latest_return():
+    """同一時間戳重複推送時改寫最新收益率，過期K線被忽略，結果與只推送最終收盤價一致"""
+    timestamps, closes = price_series(120, seed=11)
+    live, final = RiskAnalyticsService(window=50), RiskAnalyticsService(window=50)
+    for timestamp, close in zip(timestamps.tolist(), closes.tolist()):
+        live.update_close("ETHTWD", "5m", timestamp, close * 1.01)
+        live.update_close("ETHTWD", "5m", timestamp, close)
+        final.update_close("ETHTWD", "5m", timestamp, close)
+    assert not live.update_close("ETHTWD", "5m", int(timestamps[-5]), 1.0)
+
+    assert np.allclose(live.returns("ETHTWD", "5m"), final.returns("ETHTWD", "5m"), rtol=0, atol=1e-15)
+    assert math.isclose(live.volatility("ETHTWD", "5m"), final.volatility("ETHTWD", "5m"), rel_tol=1e-9)
+    assert live.value_at_risk("ETHTWD", "5m", 0.99) == final.value_at_risk("ETHTWD", "5m", 0.99)
+
+
+def test_incremental_refresh_from_historical_manager():
+    """從歷史數據庫首次載入最新窗口、之後只讀新K線，批量快照覆蓋所有交易對"""
+    logging.disable(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = HistoricalDataManager(str(Path(tmp) / "market_history.db"))
+            timestamps, closes = price_series(3000, seed=2)
+            eth_timestamps, eth_closes = price_series(400, seed=3)
+            manager.storage.upsert_arrays("btctwd", "5m", timestamps[:2000], closes[:2000], closes[:2000],
+                                          closes[:2000], closes[:2000], np.ones(2000))
+            manager.storage.upsert_arrays("ethtwd", "5m", eth_timestamps, eth_closes, eth_closes,
+                                          eth_closes, eth_closes, np.ones(400))
+
+            service = RiskAnalyticsService(manager, window=500)
+            service.track("BTCTWD", "5m")
+            service.track("ETHTWD", "5m")
+            assert service.refresh_all() == {"BTCTWD": 500, "ETHTWD": 399}
+
+            # 最新K線收盤價被改寫，並追加新K線
+            revised = closes.copy()
+            revised[1999] *= 0.98
+            manager.storage.upsert_arrays("btctwd", "5m", timestamps[1999:2600], revised[1999:2600],
+                                          revised[1999:2600], revised[1999:2600], revised[1999:2600],
+                                          np.ones(601))
+            assert service.refresh("BTCTWD", "5m") == 600
+            assert service.refresh("BTCTWD", "5m") == 0
+
+            expected = brute_force(revised[:2600], 500, 0.99)
+            assert np.allclose(service.returns("BTCTWD", "5m"), np.diff(np.log(revised[:2600]))[-500:])
+            assert math.isclose(service.value_at_risk("BTCTWD", "5m", 0.99), expected["var"], rel_tol=1e-9)
+
+            snapshots = service.snapshot_all(horizon=12)["5m"]
+            assert set(snapshots) == {"BTCTWD", "ETHTWD"}
+            assert snapshots["ETHTWD"].observations == 399
+            assert service.value_at_risk_all("5m", 0.95) == {
+                pair: snapshot.var_95 for pair, snapshot in service.snapshot_all()["5m"].items()}
+            manager.storage.close()
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_risk_modules_use_shared_service():
+    """風險評估AI沿用原有符號口徑與回看長度讀取服務指標，全局風險管理器由服務載入收益率歷史"""
+    from src.ai.risk_assessment_ai import RiskAssessmentAI
+    from src.trading.global_risk_manager import GlobalRiskConfig, GlobalRiskManager
+
+    logging.disable(logging.WARNING)
+    try:
+        timestamps, closes = price_series(101, seed=9)
+        service = RiskAnalyticsService(window=100)
+        service.load_closes("BTCTWD", "5m", timestamps, closes)
+        data = pd.DataFrame({"close": closes, "volume": np.ones(101)})
+
+        ai = RiskAssessmentAI()
+        legacy = ai._calculate_risk_metrics("BTCTWD", data)
+        ai.set_risk_analytics(service)
+        shared = ai._calculate_risk_metrics("BTCTWD", data, "5m")
+        assert math.isclose(shared.volatility, legacy.volatility, rel_tol=1e-9)
+        assert math.isclose(shared.var_95, legacy.var_95, rel_tol=1e-9)
+        assert math.isclose(shared.sharpe_ratio, legacy.sharpe_ratio, rel_tol=1e-7)
+        assert shared.max_drawdown < 0 and shared.var_95 < 0
+
+        manager = GlobalRiskManager(GlobalRiskConfig(returns_per_day=288))
+        manager.load_risk_analytics(service, "5m", pairs=["BTCTWD"])
+        assert manager.risk_engine.history_length == 100
+        assert np.allclose(manager.risk_engine.return_history()[:, 0], np.diff(closes) / closes[:-1])
+
+        # 服務窗口比 lookback_periods 長時只使用最近 lookback_periods 根K線
+        long_timestamps, long_closes = price_series(1001, seed=9)
+        long_service = RiskAnalyticsService(window=1000)
+        long_service.load_closes("BTCTWD", "5m", long_timestamps, long_closes)
+        ai.set_risk_analytics(long_service)
+        data = pd.DataFrame({"close": long_closes[-100:], "volume": np.ones(100)})
+        legacy = RiskAssessmentAI()._calculate_risk_metrics("BTCTWD", data)
+        shared = ai._calculate_risk_metrics("BTCTWD", data, "5m", lookback_periods=100)
+        assert math.isclose(shared.volatility, legacy.volatility, rel_tol=1e-9)
+        assert math.isclose(shared.var_95, legacy.var_95, rel_tol=1e-9)
+        assert math.isclose(shared.sharpe_ratio, legacy.sharpe_ratio, rel_tol=1e-7)
+        path = np.log(long_closes[-100:])
+        assert math.isclose(-shared.max_drawdown, (1 - np.exp(path - np.maximum.accumulate(path))).max(),
+                            rel_tol=1e-9)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def main():
+    """運行所有測試並比較滾動窗口查詢與逐次全量計算耗時"""
+    tests = [
+        test_rolling_metrics_match_brute_force,
+        test_lookback_queries_are_cached_per_window_version,
+        test_unclosed_bar_updates_replace_latest_return,
+        test_incremental_refresh_from_historical_manager,
+        test_risk_modules_use_shared_service,
+    ]
+
+    print("🧪 開始測試風險分析服務...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    timestamps, closes = price_series(6000)
+    service = RiskAnalyticsService(window=1000)
+    service.load_closes("BTCTWD", "5m", timestamps[:1001], closes[:1001])
+    start = time.perf_counter()
+    for timestamp, close in zip(timestamps[1001:].tolist(), closes[1001:].tolist()):
+        service.update_close("BTCTWD", "5m", timestamp, close)
+        for confidence in (0.95, 0.99):
+            service.value_at_risk("BTCTWD", "5m", confidence)
+            service.expected_shortfall("BTCTWD", "5m", confidence)
+        service.sharpe_ratio("BTCTWD", "5m")
+    service_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for end in range(1002, 6001):
+        for confidence in (0.95, 0.99):
+            brute_force(closes[:end], 1000, confidence)
+    brute_time = time.perf_counter() - start
+    print(f"⏱️ 4999 根K線 x 4 個 VaR/ES 查詢: 全量重算 {brute_time:.2f} s，"
+          f"滾動窗口 {service_time:.2f} s ({brute_time / service_time:.0f}x)")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
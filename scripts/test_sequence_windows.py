@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試序列窗口數據集 - 步幅視圖與逐個切片構建的序列一致、零複製、小批次流式讀取與內存佔用
+"""
+
+import logging
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.ml.price_predictor import LSTMPricePredictor
+from src.ml.sequence_windows import SequenceWindowDataset, strided_windows
+
+
+def create_features(rows: int, features: int = 4, seed: int = 5) -> np.ndarray:
+    return np.random.default_rng(seed).random((rows, features))
+
+
+def build_sequences_by_copy(data: np.ndarray, seq_len: int):
+    """逐個切片複製的參考實現（窗口視圖之前的 _create_sequences）"""
+    X, y = [], []
+    for i in range(seq_len, len(data)):
+        X.append(data[i-seq_len:i])
+        y.append(data[i, 0])
+    return np.array(X), np.array(y)
+
+
+def test_strided_windows_match_copies():
+    """窗口視圖與逐個切片複製的序列逐值相同，且與原矩陣共用內存、只讀"""
+    data = create_features(500)
+    expected_X, expected_y = build_sequences_by_copy(data, 60)
+    dataset = SequenceWindowDataset.from_array(data, 60)
+
+    assert dataset.windows.shape == expected_X.shape == (440, 60, 4)
+    assert np.array_equal(dataset.windows, expected_X) and np.array_equal(dataset.targets, expected_y)
+    assert np.shares_memory(dataset.windows, data) and np.shares_memory(dataset.targets, data)
+    assert not dataset.windows.flags.writeable
+
+    assert strided_windows(data, 60).shape == (441, 60, 4)
+    assert strided_windows(data[:10], 60).shape == (0, 60, 4)
+
+
+def test_multi_horizon_targets():
+    """多個預測時間點的目標按最長時間點截斷樣本數，第 h 列為窗口之後第 h 個收盤價"""
+    data = create_features(100)
+    dataset = SequenceWindowDataset.from_array(data, 10, horizons=(1, 5), target_column=0)
+    assert dataset.num_samples == 86 and dataset.targets.shape == (86, 2)
+    for i in (0, 42, 85):
+        assert dataset.targets[i, 0] == data[i + 10, 0] and dataset.targets[i, 1] == data[i + 14, 0]
+    try:
+        SequenceWindowDataset.from_array(data, 10, horizons=(0,))
+        raise AssertionError("預測週期為0應該報錯")
+    except ValueError:
+        pass
+
+
+def test_batches_stream_without_copy():
+    """順序批次是零複製切片；打亂時每個epoch恰好覆蓋所有樣本一次並重新打亂；切分保持時間順序"""
+    data = create_features(300)
+    dataset = SequenceWindowDataset.from_array(data, 20, batch_size=64)
+    assert len(dataset) == dataset.num_batches == 5
+    X0, y0 = dataset[0]
+    assert X0.shape == (64, 20, 4) and np.shares_memory(X0, data)
+    assert dataset.batch(4)[0].shape == (280 - 256, 20, 4)
+    try:
+        dataset.batch(5)
+        raise AssertionError("超出範圍的批次應該報錯")
+    except IndexError:
+        pass
+
+    train, test = dataset.split(0.75)
+    assert train.num_samples == 210 and test.num_samples == 70
+    assert np.array_equal(test.windows[0], data[210:230]) and np.shares_memory(test.windows, data)
+
+    shuffled = train.subset(0, shuffle=True, seed=1)
+    first_epoch = np.concatenate([y for _, y in shuffled.batches()])
+    assert np.array_equal(np.sort(first_epoch), np.sort(train.targets))
+    assert not np.array_equal(first_epoch, train.targets)
+    shuffled.on_epoch_end()
+    second_epoch = np.concatenate([y for _, y in shuffled.batches()])
+    assert not np.array_equal(first_epoch, second_epoch)
+
+
+def test_predictor_sequences_use_views():
+    """LSTMPricePredictor 構建的序列與舊實現相同，並遵循配置的預測時間點"""
+    logging.disable(logging.ERROR)
+    try:
+        with tempfile.TemporaryDirectory() as model_dir:
+            predictor = LSTMPricePredictor(model_dir)
+            data = create_features(400)
+            X, y = predictor._create_sequences(data)
+            expected_X, expected_y = build_sequences_by_copy(data, predictor.config['sequence_length'])
+            assert np.array_equal(X, expected_X) and np.array_equal(y, expected_y)
+            assert np.shares_memory(X, data)
+
+            predictor.config['prediction_horizons'] = [1, 3, 6]
+            X, y = predictor._create_sequences(data)
+            assert X.shape == (335, 60, 4) and y.shape == (335, 3) and y[0, 2] == data[65, 0]
+
+            # 未構建模型時批量預測直接返回空結果
+            assert predictor.predict_batch({'btctwd': data[-60:]}) == {}
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def peak_memory_mb(build, *args) -> float:
+    tracemalloc.start()
+    result = build(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1024 / 1024
+
+
+def main():
+    """運行所有測試並比較兩種序列構建方式的內存峰值"""
+    tests = [
+        test_strided_windows_match_copies,
+        test_multi_horizon_targets,
+        test_batches_stream_without_copy,
+        test_predictor_sequences_use_views,
+    ]
+
+    print("🧪 開始測試序列窗口數據集...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    data = create_features(50000)
+    copied = peak_memory_mb(build_sequences_by_copy, data, 60)
+    viewed = peak_memory_mb(lambda d, n: SequenceWindowDataset.from_array(d, n), data, 60)
+    print(f"💾 5萬根K線 × 4特徵、序列長度60: 逐個複製峰值 {copied:.1f} MB，窗口視圖峰值 {viewed:.2f} MB")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
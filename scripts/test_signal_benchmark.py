@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試信號引擎基準框架 - 數據集確定性、所有引擎可運行、真實K線數據集與退化檢測
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.signal_benchmark import (ENGINE_SPECS, BenchmarkHistory, BenchmarkResult,
+                                       SignalEngineBenchmark, count_signals, recorded_dataset,
+                                       synthetic_candles, synthetic_dataset)
+from src.data.candle_archive import CandleArchive
+
+
+def test_synthetic_dataset_is_deterministic():
+    """合成數據集可重現，各週期由基礎K線重採樣並附帶MACD"""
+    first = synthetic_dataset(3000)
+    second = synthetic_dataset(3000)
+    assert first.fingerprint == second.fingerprint
+    assert synthetic_dataset(3000, seed=1).fingerprint != first.fingerprint
+
+    assert len(first.base) == 3000
+    assert len(first.frames['5m']) == 600 and len(first.frames['1h']) == 50
+    hourly = first.frames['1h']
+    assert hourly['high'].iloc[0] == first.base['high'].iloc[:60].max()
+    assert np.isclose(hourly['volume'].iloc[0], first.base['volume'].iloc[:60].sum())
+    for frame in first.frames.values():
+        assert {'datetime', 'macd', 'macd_signal', 'macd_hist'} <= set(frame.columns)
+        assert (frame['high'] >= frame[['open', 'close']].max(axis=1)).all()
+
+
+def test_every_registered_engine_runs():
+    """註冊表中的每個引擎都能在1k根K線上運行並產生吞吐量數據"""
+    benchmark = SignalEngineBenchmark(measure_memory=False)
+    results = benchmark.run(synthetic_dataset, [1000])
+
+    assert [result.engine for result in results] == [spec.name for spec in ENGINE_SPECS]
+    failed = {result.engine: result.error for result in results if result.status != 'ok'}
+    assert not failed, failed
+    assert all(result.bars_per_second > 0 and result.realtime_1m_ok is not None for result in results)
+    assert sum(result.signals for result in results) > 0
+
+
+def test_recorded_dataset_and_memory_measurement():
+    """從K線歸檔讀取真實K線數據集，並測量峰值內存"""
+    candles = synthetic_candles(2500)
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CandleArchive(tmp)
+        archive.append('btctwd', '1m', candles)
+
+        assert recorded_dataset(5000, archive=archive) is None
+        dataset = recorded_dataset(2000, archive=archive)
+
+    assert dataset.name == 'recorded:btctwd:1m'
+    assert np.array_equal(dataset.base['close'].to_numpy(), candles['close'].to_numpy()[-2000:])
+
+    benchmark = SignalEngineBenchmark(['smart_balanced_volume_macd'])
+    result = benchmark.measure(benchmark.specs[0], dataset)
+    assert result.status == 'ok'
+    assert result.peak_memory_mb > 0
+
+
+def test_regression_detection_and_skip_projection():
+    """吞吐量低於同機器歷史中位數超過閾值或基線成功的引擎本次未成功時報告退化；預計過慢的規模被跳過"""
+    def record(bars_per_second, fingerprint='abc'):
+        return BenchmarkResult('demo', 'synthetic', 1000, fingerprint, 'ok', wall_time=1000 / bars_per_second,
+                               bars_per_second=bars_per_second)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = BenchmarkHistory(str(Path(tmp) / 'history.json'))
+        for bars_per_second in (1000, 1100, 900):
+            history.append([record(bars_per_second)], machine='host-a')
+        history.append([record(100)], machine='host-b')
+
+        assert history.baseline(record(1), machine='host-a') == 1000
+        assert history.find_regressions([record(800)], threshold=0.25, machine='host-a') == []
+        regressions = history.find_regressions([record(700)], threshold=0.25, machine='host-a')
+        assert len(regressions) == 1 and round(regressions[0]['change'], 2) == -0.3
+        assert history.find_regressions([record(700, 'other-data')], machine='host-a') == []
+        assert history.find_regressions([record(700)], machine='host-c') == []
+
+        # 基線中成功的引擎本次失敗或被跳過，同樣判定為退化
+        for status in ('error', 'skipped'):
+            broken = BenchmarkResult('demo', 'synthetic', 1000, 'abc', status, error='boom')
+            regressions = history.find_regressions([broken], threshold=0.25, machine='host-a')
+            assert len(regressions) == 1 and regressions[0]['status'] == status
+            assert regressions[0]['bars_per_second'] == 0.0 and regressions[0]['change'] == -1.0
+        never_ok = BenchmarkResult('other', 'synthetic', 1000, 'abc', 'error', error='boom')
+        assert history.find_regressions([never_ok], machine='host-a') == []
+
+    benchmark = SignalEngineBenchmark(['final_85_percent'], measure_memory=False, max_seconds=1e-6)
+    results = benchmark.run(synthetic_dataset, [1000, 2000])
+    assert [result.status for result in results] == ['ok', 'skipped']
+
+    frame = pd.DataFrame({'signal_type': ['buy', 'hold', 'tracking', 'sell']})
+    assert count_signals(({'1h': frame, '5m': frame}, {})) == 4
+
+
+def main():
+    """運行所有測試"""
+    tests = [
+        test_synthetic_dataset_is_deterministic,
+        test_every_registered_engine_runs,
+        test_recorded_dataset_and_memory_measurement,
+        test_regression_detection_and_skip_projection,
+    ]
+
+    print("🧪 開始測試信號引擎基準框架...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
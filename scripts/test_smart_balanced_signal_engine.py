@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試智能平衡策略的列式信號引擎 - 與逐行實現比對信號清單並測量耗時
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.smart_balanced_volume_macd_signals import SmartBalancedVolumeEnhancedMACDSignals
+
+logging.getLogger('src.core.smart_balanced_volume_macd_signals').setLevel(logging.WARNING)
+
+
+def create_test_klines(periods: int, seed: int = 11) -> pd.DataFrame:
+    """創建帶趨勢切換的1小時測試K線"""
+    rng = np.random.default_rng(seed)
+    drift = np.sin(np.arange(periods) / 150) * 3000
+    close = 3400000 + np.cumsum(rng.normal(0, 8000, periods) + drift)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=periods, freq='h'),
+        'open': close,
+        'high': close * 1.002,
+        'low': close * 0.998,
+        'close': close,
+        'volume': rng.gamma(2.0, 50.0, periods)
+    })
+
+
+def detect_row_by_row(strategy: SmartBalancedVolumeEnhancedMACDSignals, df: pd.DataFrame) -> list:
+    """逐行參考實現（列式引擎之前的檢測流程）"""
+    df = strategy.volume_analyzer.calculate_smart_indicators(strategy.calculate_macd(df))
+    position, sequence, signals = 0, 0, []
+
+    for i in range(1, len(df)):
+        current_row, previous_row = df.iloc[i], df.iloc[i-1]
+        market_context = strategy.analyze_market_context(df, i)
+
+        for signal_type, crossed, required_position in (
+            ('buy', strategy._check_macd_buy_signal(current_row, previous_row), 0),
+            ('sell', strategy._check_macd_sell_signal(current_row, previous_row), 1),
+        ):
+            if not crossed or position != required_position:
+                continue
+            passed, info, score = strategy.volume_analyzer.smart_signal_validation(
+                current_row, signal_type, market_context
+            )
+            if passed:
+                if signal_type == 'buy':
+                    sequence += 1
+                position = 1 - position
+            signals.append({
+                'datetime': current_row['timestamp'],
+                'close': current_row['close'],
+                'signal_type': signal_type if passed else f'{signal_type}_rejected',
+                'trade_sequence': sequence if passed else 0,
+                'macd': current_row['macd'],
+                'macd_signal': current_row['macd_signal'],
+                'macd_hist': current_row['macd_hist'],
+                'volume_confirmed': passed,
+                'validation_info': info,
+                'signal_strength': score,
+                'market_context': market_context
+            })
+    return signals
+
+
+def test_columnar_engine_matches_row_by_row():
+    """列式引擎輸出與逐行實現完全一致"""
+    df = create_test_klines(3000)
+    strategy = SmartBalancedVolumeEnhancedMACDSignals()
+
+    expected = detect_row_by_row(strategy, df)
+    actual = strategy.detect_smart_balanced_signals(df).to_dict('records')
+
+    assert len(expected) > 0
+    assert len(actual) == len(expected)
+    for exp, act in zip(expected, actual):
+        assert exp.keys() == act.keys()
+        for key in exp:
+            if key == 'market_context':
+                assert exp[key].keys() == act[key].keys()
+                for ctx_key, value in exp[key].items():
+                    assert value == act[key][ctx_key] or (pd.isna(value) and pd.isna(act[key][ctx_key]))
+            else:
+                assert exp[key] == act[key], key
+
+
+def test_market_context_arrays_match_analyze_market_context():
+    """預計算市場環境與 analyze_market_context 逐根一致"""
+    df = create_test_klines(400)
+    strategy = SmartBalancedVolumeEnhancedMACDSignals()
+    df = strategy.volume_analyzer.calculate_smart_indicators(strategy.calculate_macd(df))
+    context = strategy.precompute_market_context(df)
+
+    for i in range(1, len(df)):
+        expected = strategy.analyze_market_context(df, i)
+        actual = strategy._market_context_at(context, i)
+        assert expected['trend'] == actual['trend']
+        assert expected['volatility'] == actual['volatility']
+        if 'avg_volatility' in expected:
+            assert expected['avg_volatility'] == actual['avg_volatility']
+
+
+def test_empty_input():
+    """空數據返回空DataFrame"""
+    strategy = SmartBalancedVolumeEnhancedMACDSignals()
+    assert strategy.detect_smart_balanced_signals(pd.DataFrame()).empty
+
+
+def main():
+    """運行測試並測量10k根K線的檢測耗時"""
+    print("🧪 開始測試智能平衡列式信號引擎...")
+    for test in (test_columnar_engine_matches_row_by_row,
+                 test_market_context_arrays_match_analyze_market_context,
+                 test_empty_input):
+        test()
+        print(f"   ✅ {test.__doc__}")
+
+    df = create_test_klines(10000)
+    strategy = SmartBalancedVolumeEnhancedMACDSignals()
+    strategy.detect_smart_balanced_signals(df)
+
+    start = time.perf_counter()
+    signals = strategy.detect_smart_balanced_signals(df)
+    elapsed = time.perf_counter() - start
+    print(f"\n⏱️ 10,000根K線檢測耗時: {elapsed * 1000:.1f} ms ({len(signals)} 個信號)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試增量指標狀態 - 與批量計算交叉核對、K線跳動、存檔續算與服務接入
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.streaming_indicators import IndicatorCheckpointStore, StreamingIndicatorSet
+from src.core.improved_max_macd_calculator import ImprovedMaxMACDCalculator
+from src.data.live_macd_service import LiveMACDService
+from src.data.max_client import MAXDataClient
+
+
+def create_test_klines(periods: int = 1000, step: int = 3600, seed: int = 5) -> pd.DataFrame:
+    """創建以Unix秒為時間戳、結束於當前時間的測試K線"""
+    rng = np.random.default_rng(seed)
+    close = 3400000 + np.cumsum(rng.normal(0, 3000, periods))
+    end = int(time.time()) // step * step
+    return pd.DataFrame({
+        'timestamp': end - (periods - 1 - np.arange(periods)) * step,
+        'open': close,
+        'high': close + 500,
+        'low': close - 500,
+        'close': close,
+        'volume': rng.gamma(2.0, 5.0, periods)
+    })
+
+
+def feed_with_ticks(indicators: StreamingIndicatorSet, df: pd.DataFrame) -> list:
+    """每根K線先送入兩個盤中價格再送入收盤價，返回每根K線最終的指標值"""
+    outputs = []
+    for timestamp, close in zip(df['timestamp'], df['close']):
+        indicators.update(timestamp, close * 1.01)
+        indicators.update(timestamp, close * 0.99)
+        outputs.append(indicators.update(timestamp, close))
+    return outputs
+
+
+def test_macd_and_ema_match_pandas_exactly():
+    """含盤中跳動時 MACD/EMA 與 pandas ewm 逐位一致"""
+    close = create_test_klines()['close']
+    for adjust in (False, True):
+        indicators = StreamingIndicatorSet(adjust=adjust, ema_spans=(10,))
+        result = pd.DataFrame(feed_with_ticks(indicators, create_test_klines()))
+
+        macd = close.ewm(span=12, adjust=adjust).mean() - close.ewm(span=26, adjust=adjust).mean()
+        signal = macd.ewm(span=9, adjust=adjust).mean()
+        assert np.array_equal(result['macd'].to_numpy(), macd.to_numpy())
+        assert np.array_equal(result['macd_signal'].to_numpy(), signal.to_numpy())
+        assert np.array_equal(result['ema_10'].to_numpy(), close.ewm(span=10, adjust=adjust).mean().to_numpy())
+
+
+def test_rolling_indicators_match_batch():
+    """MA/RSI/布林帶與 pandas rolling 結果一致（浮點容差內）"""
+    df = create_test_klines()
+    close = df['close']
+    indicators = StreamingIndicatorSet(ma_windows=(20,), rsi_period=14, bollinger_window=20)
+    result = pd.DataFrame(feed_with_ticks(indicators, df))
+
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+    rsi = 100 - (100 / (1 + gain / loss))
+    upper = close.rolling(20).mean() + close.rolling(20).std() * 2
+
+    np.testing.assert_allclose(result['ma_20'], close.rolling(20).mean(), rtol=1e-12)
+    np.testing.assert_allclose(result['rsi'], rsi, rtol=1e-9)
+    np.testing.assert_allclose(result['bollinger_upper'], upper, rtol=1e-12)
+
+
+def test_improved_calculator_stream_matches_batch():
+    """ImprovedMaxMACDCalculator 增量更新與 calculate_macd 逐根一致（含默認 'sma' 初始化）"""
+    prices = create_test_klines(120)['close'].tolist()
+    calculator = ImprovedMaxMACDCalculator()
+
+    for init_method in ('sma', 'first'):
+        calculator.reset_stream(init_method=init_method)
+        for end in range(1, len(prices) + 1):
+            calculator.update_macd(prices[end - 1] * 1.01, closed=False)
+            provisional = calculator.update_macd(prices[end - 1], closed=False)
+            committed = calculator.update_macd(prices[end - 1])
+            assert provisional == committed
+
+            macd_line, signal_line, histogram = calculator.calculate_macd(prices[:end], init_method=init_method)
+            if macd_line:
+                assert committed == (macd_line[-1], signal_line[-1], histogram[-1]), (init_method, end)
+
+
+def test_improved_calculator_stream_state_round_trip():
+    """增量 MACD 狀態導出恢復後續算結果不變"""
+    prices = create_test_klines(120)['close'].tolist()
+    calculator = ImprovedMaxMACDCalculator()
+    for price in prices[:60]:
+        calculator.update_macd(price)
+
+    restored = ImprovedMaxMACDCalculator()
+    restored.restore_stream_state(json.loads(json.dumps(calculator.get_stream_state())))
+    for price in prices[60:]:
+        assert restored.update_macd(price) == calculator.update_macd(price)
+
+
+def test_improved_calculator_polling_series():
+    """輪詢同一窗口時只提交新收盤K線，結果與從首次輪詢起的 calculate_macd 一致"""
+    df = create_test_klines(400)
+    timestamps, prices = df['timestamp'].tolist(), df['close'].tolist()
+    calculator = ImprovedMaxMACDCalculator()
+
+    def expected(start, end):
+        macd_line, signal_line, histogram = calculator.calculate_macd(prices[start:end])
+        return macd_line[-1], signal_line[-1], histogram[-1]
+
+    macd_line, signal_line, histogram = calculator.stream_macd_series(timestamps[50:150], prices[50:150])
+    batch = calculator.calculate_macd(prices[50:150])
+    assert [value for value in macd_line if not np.isnan(value)] == batch[0]
+    assert [value for value in histogram if not np.isnan(value)] == batch[2]
+
+    for end in range(151, 200):
+        pushed = calculator.stream['slow'].count
+        macd_line, signal_line, histogram = calculator.stream_macd_series(timestamps[end - 100:end], prices[end - 100:end])
+        assert calculator.stream['slow'].count == pushed + 1
+        assert (macd_line[-1], signal_line[-1], histogram[-1]) == expected(50, end)
+        assert (macd_line[-2], signal_line[-2], histogram[-2]) == expected(50, end - 1)
+
+    # 與上次提交的K線接不上時重建狀態
+    macd_line, signal_line, histogram = calculator.stream_macd_series(timestamps[300:400], prices[300:400])
+    assert (macd_line[-1], signal_line[-1], histogram[-1]) == expected(300, 400)
+
+
+def test_checkpoint_resume_matches_uninterrupted():
+    """存檔後恢復續算與不中斷的結果一致"""
+    df = create_test_klines()
+    config = dict(adjust=True, ema_spans=(10, 20), ma_windows=(10, 20), rsi_period=14, bollinger_window=20)
+
+    uninterrupted = StreamingIndicatorSet(**config)
+    expected = feed_with_ticks(uninterrupted, df)[-1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'checkpoints.json')
+        first = StreamingIndicatorSet(**config)
+        feed_with_ticks(first, df.iloc[:600])
+        store = IndicatorCheckpointStore(path)
+        store.put('btctwd_5m', first)
+        store.save()
+
+        resumed = IndicatorCheckpointStore(path).get('btctwd_5m')
+        assert resumed.bars == 600
+        actual = feed_with_ticks(resumed, df.iloc[599:])[-1]
+
+    assert actual == expected
+
+
+class FakeKlineService(LiveMACDService):
+    """以固定K線代替API的服務"""
+
+    def __init__(self, klines: pd.DataFrame, **kwargs):
+        super().__init__(**kwargs)
+        self.klines = klines
+        self.requested = []
+
+    async def _fetch_klines(self, market, period, limit):
+        self.requested.append(limit)
+        return self.klines.iloc[-limit:].reset_index(drop=True)
+
+
+def test_live_service_fetches_only_new_klines():
+    """實時服務預熱後只獲取新K線，結果與批量計算一致，重啟從存檔續算"""
+    klines = create_test_klines(300)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'checkpoints.json')
+        service = FakeKlineService(klines.iloc[:-1], checkpoint_path=path)
+        asyncio.run(service.get_live_macd('btctwd', '60'))
+
+        service.klines = klines
+        result = asyncio.run(service.get_live_macd('btctwd', '60'))
+        assert service.requested[0] == 100
+        assert service.requested[1] <= 3
+
+        batch = service._calculate_macd(klines.iloc[-101:].reset_index(drop=True), 12, 26, 9)
+        assert result['macd']['histogram'] == round(batch['macd_hist'].iloc[-1], 1)
+        assert result['macd']['macd_line'] == round(batch['macd'].iloc[-1], 1)
+
+        restarted = FakeKlineService(klines, checkpoint_path=path)
+        again = asyncio.run(restarted.get_live_macd('btctwd', '60'))
+        assert restarted.requested[0] <= 3
+        assert again['macd'] == result['macd']
+
+
+def test_max_client_indicators_match_batch():
+    """MAX客戶端增量指標與批量公式一致，後續調用只處理新K線"""
+    df = create_test_klines(80, step=300)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+    client = MAXDataClient()
+
+    indicators = client._calculate_indicators_for_timeframe(df.iloc[:50])
+    close = df['close'].iloc[:50]
+    assert indicators['ema_20'] == float(close.ewm(span=20).mean().iloc[-1])
+    macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    assert indicators['macd_signal'] == float(macd.ewm(span=9).mean().iloc[-1])
+
+    indicators = client._calculate_indicators_for_timeframe(df.iloc[30:80])
+    close = df['close']
+    assert client.indicator_states[('btctwd', '5m')].bars == 80
+    assert indicators['ema_10'] == float(close.ewm(span=10).mean().iloc[-1])
+    assert abs(indicators['sma_20'] - close.rolling(20).mean().iloc[-1]) < 1e-6
+
+
+def test_max_client_indicator_state_per_market():
+    """不同交易對的K線各自維護指標狀態，互不污染也不互相重置"""
+    df = create_test_klines(80, step=300)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+    other = df.copy()
+    other['close'] = other['close'] / 100
+    client = MAXDataClient()
+
+    client._calculate_indicators_for_timeframe(df.iloc[:50], 'btctwd')
+    eth = client._calculate_indicators_for_timeframe(other.iloc[:50], 'ethtwd')
+    btc = client._calculate_indicators_for_timeframe(df.iloc[30:80], 'btctwd')
+
+    assert client.indicator_states[('btctwd', '5m')].bars == 80
+    assert client.indicator_states[('ethtwd', '5m')].bars == 50
+    assert eth['ema_20'] == float(other['close'].iloc[:50].ewm(span=20).mean().iloc[-1])
+    assert btc['ema_10'] == float(df['close'].ewm(span=10).mean().iloc[-1])
+
+
+def main():
+    """運行所有測試並測量單次跳動更新耗時"""
+    tests = [
+        test_macd_and_ema_match_pandas_exactly,
+        test_rolling_indicators_match_batch,
+        test_improved_calculator_stream_matches_batch,
+        test_improved_calculator_stream_state_round_trip,
+        test_improved_calculator_polling_series,
+        test_checkpoint_resume_matches_uninterrupted,
+        test_live_service_fetches_only_new_klines,
+        test_max_client_indicators_match_batch,
+        test_max_client_indicator_state_per_market,
+    ]
+
+    print("🧪 開始測試增量指標狀態...")
+    for test in tests:
+        test()
+        print(f"   ✅ {test.__doc__}")
+
+    for periods in (1000, 100000):
+        indicators = StreamingIndicatorSet(ma_windows=(9, 25, 99), rsi_period=14, bollinger_window=20)
+        df = create_test_klines(periods)
+        for timestamp, close in zip(df['timestamp'].tolist(), df['close'].tolist()):
+            indicators.update(timestamp, close)
+
+        start = time.perf_counter()
+        for i in range(10000):
+            indicators.update(df['timestamp'].iloc[-1], 3400000 + i)
+        elapsed = (time.perf_counter() - start) / 10000
+        print(f"⏱️ 歷史 {periods:>7,} 根K線時單次跳動更新: {elapsed * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
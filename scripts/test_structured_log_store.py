@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試分段結構化日誌存儲 - 索引查詢與全量掃描一致、按段清理導出、崩潰後恢復
+"""
+
+import csv
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.logging.log_store import INDEX_DTYPE, SegmentedLogStore
+from src.logging.structured_logger import LogCategory, LogLevel, StructuredLogger
+
+LEVELS = [level.value for level in LogLevel]
+CATEGORIES = [cat.value for cat in LogCategory]
+
+
+def create_records(count: int, start: datetime, step_seconds: float = 60.0, seed: int = 7) -> list:
+    """創建跨多天的測試日誌"""
+    rng = random.Random(seed)
+    return [{
+        'timestamp': (start + timedelta(seconds=i * step_seconds)).isoformat(),
+        'level': rng.choice(LEVELS),
+        'category': rng.choice(CATEGORIES),
+        'message': f"事件 {i} {'訂單成交' if i % 7 == 0 else '心跳'}",
+        'extra_data': {'i': i}
+    } for i in range(count)]
+
+
+def brute_force(records, start=None, end=None, level=None, category=None, search_text=None):
+    """逐條掃描的參考實現（按時間倒序）"""
+    matched = []
+    for record in records:
+        timestamp = datetime.fromisoformat(record['timestamp'])
+        if start and timestamp < start or end and timestamp > end:
+            continue
+        if level and record['level'] != level or category and record['category'] != category:
+            continue
+        if search_text and search_text.lower() not in record['message'].lower():
+            continue
+        matched.append(record)
+    return sorted(matched, key=lambda r: r['timestamp'], reverse=True)
+
+
+def test_indexed_query_matches_full_scan():
+    """索引查詢結果與逐條掃描一致，並按天和大小切分段"""
+    start = datetime(2025, 8, 1, 20, 0, 0)
+    records = create_records(5000, start)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SegmentedLogStore(Path(tmp), LEVELS, CATEGORIES, segment_max_bytes=64 * 1024)
+        for i in range(0, len(records), 1250):
+            store.append_batch(records[i:i + 1250])
+
+        segments = store.segments()
+        assert len({segment.day for segment in segments}) == 5
+        assert len(segments) > 5
+        assert sum(segment.count for segment in segments) == len(records)
+
+        cases = [
+            {},
+            {'level': 'ERROR'},
+            {'category': 'trading', 'level': 'INFO'},
+            {'start_time': start + timedelta(days=1, hours=3), 'end_time': start + timedelta(days=2)},
+            {'start_time': start + timedelta(days=3), 'category': 'network', 'search_text': '訂單'},
+        ]
+        for filters in cases:
+            expected = brute_force(records, filters.get('start_time'), filters.get('end_time'),
+                                   filters.get('level'), filters.get('category'), filters.get('search_text'))
+            assert store.query(limit=100000, **filters) == expected, filters
+            assert store.query(limit=25, **filters) == expected[:25], filters
+
+
+def test_logger_writes_queries_exports_and_cleans_segments():
+    """日誌器批量寫入後可查詢、導出，並按段清理過期日誌"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = StructuredLogger(logs_dir=Path(tmp))
+
+        old_records = create_records(50, datetime.now() - timedelta(days=40))
+        logger.log_store.append_batch(old_records)
+
+        for i in range(200):
+            logger.log(LogLevel.ERROR if i % 10 == 0 else LogLevel.INFO,
+                       LogCategory.TRADING if i % 2 else LogCategory.SYSTEM, f"交易事件 {i}", {'i': i})
+        logger.flush()
+
+        errors = logger.query_logs(level=LogLevel.ERROR, start_time=datetime.now() - timedelta(hours=1))
+        assert len(errors) == 20
+        assert errors[0]['message'] == '交易事件 190'
+        assert all(log['category'] == 'system' for log in errors)
+        assert logger.get_log_statistics()['total_logs'] == 200
+
+        window = (datetime.now() - timedelta(hours=1), datetime.now() + timedelta(minutes=1))
+        exported = logger.export_logs(*window)
+        with open(exported, encoding='utf-8') as f:
+            logs = json.load(f)
+        assert [log['message'] for log in logs[:200]] == [f"交易事件 {i}" for i in range(200)]
+
+        exported_csv = logger.export_logs(*window, export_format='csv')
+        with open(exported_csv, newline='', encoding='utf-8') as f:
+            assert len(list(csv.DictReader(f))) >= 200
+
+        assert logger.export_logs(datetime(2000, 1, 1), datetime(2000, 1, 2)) is None
+
+        logger.cleanup_old_logs(days=30)
+        logger.flush()
+        assert logger.query_logs(end_time=datetime.now() - timedelta(days=30)) == []
+        assert len(logger.query_logs(limit=1000)) >= 200
+        logger.stop_log_worker()
+
+
+def test_recovers_from_partial_write():
+    """寫了一半的索引記錄和沒有索引的數據行在重新打開時被截斷"""
+    records = create_records(100, datetime(2025, 8, 1, 0, 0, 0))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SegmentedLogStore(Path(tmp), LEVELS, CATEGORIES)
+        store.append_batch(records[:60])
+        segment = store.segments()[-1]
+        with open(Path(tmp) / segment.name, 'ab') as f:
+            f.write(b'{"timestamp": "2025-08-01T01:00:00", "mess')
+        with open(Path(tmp) / segment.name.replace('.jsonl', '.idx'), 'ab') as f:
+            f.write(b'\x00' * (INDEX_DTYPE.itemsize // 2))
+
+        reopened = SegmentedLogStore(Path(tmp), LEVELS, CATEGORIES)
+        reopened.append_batch(records[60:])
+        assert reopened.query(limit=1000) == brute_force(records)
+
+
+def test_flush_does_not_block_without_worker():
+    """工作線程停止後或啟動前 flush 直接寫入隊列，不會阻塞"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = StructuredLogger(logs_dir=Path(tmp))
+        logger.stop_log_worker()
+
+        for i in range(5):
+            logger.info(LogCategory.SYSTEM, f"停止後日誌 {i}")
+        begin = time.perf_counter()
+        logger.flush()
+        assert time.perf_counter() - begin < 1.0
+        assert logger.log_queue.unfinished_tasks == 0
+        assert [log['message'] for log in logger.query_logs()] == [f"停止後日誌 {i}" for i in range(4, -1, -1)]
+
+        logger.start_log_worker()
+        logger.info(LogCategory.SYSTEM, "重新啟動後日誌")
+        logger.flush()
+        assert logger.query_logs(limit=1)[0]['message'] == "重新啟動後日誌"
+        logger.stop_log_worker()
+
+
+def test_imports_legacy_jsonl_once():
+    """舊版 aimax_structured.jsonl 中的JSON日誌只導入一次並可查詢"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = create_records(3, datetime(2025, 8, 6, 21, 0))
+        legacy_file = Path(tmp) / "aimax_structured.jsonl"
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            for record in legacy:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.write(f"[{record['category']}] {record['message']}\n")
+
+        logger = StructuredLogger(logs_dir=Path(tmp))
+        logger.stop_log_worker()
+        assert logger.query_logs(end_time=datetime(2025, 8, 7)) == legacy[::-1]
+
+        logger = StructuredLogger(logs_dir=Path(tmp))
+        logger.stop_log_worker()
+        assert len(logger.query_logs(end_time=datetime(2025, 8, 7))) == 3
+
+        # 導入後舊文件繼續增長的部分在下次啟動時補導入
+        extra = create_records(1, datetime(2025, 8, 6, 22, 0), seed=11)
+        with open(legacy_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(extra[0], ensure_ascii=False) + '\n')
+        logger = StructuredLogger(logs_dir=Path(tmp))
+        logger.stop_log_worker()
+        assert logger.query_logs(end_time=datetime(2025, 8, 7)) == (legacy + extra)[::-1]
+        assert legacy_file.exists()
+
+
+def main():
+    """運行所有測試並比較索引查詢與全量掃描耗時"""
+    tests = [
+        test_indexed_query_matches_full_scan,
+        test_logger_writes_queries_exports_and_cleans_segments,
+        test_recovers_from_partial_write,
+        test_flush_does_not_block_without_worker,
+        test_imports_legacy_jsonl_once,
+    ]
+
+    print("🧪 開始測試分段結構化日誌存儲...")
+    for test in tests:
+        test()
+        print(f"   ✅ {test.__doc__}")
+
+    start = datetime(2025, 5, 1)
+    records = create_records(300000, start, step_seconds=30)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SegmentedLogStore(Path(tmp), LEVELS, CATEGORIES)
+        for i in range(0, len(records), 5000):
+            store.append_batch(records[i:i + 5000])
+
+        window = {'start_time': start + timedelta(days=60), 'end_time': start + timedelta(days=61),
+                  'level': 'ERROR', 'category': 'trading'}
+        begin = time.perf_counter()
+        indexed = store.query(limit=100, **window)
+        indexed_time = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        scanned = []
+        for segment in store.segments():
+            with open(Path(tmp) / segment.name, encoding='utf-8') as f:
+                scanned.extend(json.loads(line) for line in f)
+        scanned = brute_force(scanned, window['start_time'], window['end_time'],
+                              window['level'], window['category'])[:100]
+        scan_time = time.perf_counter() - begin
+
+    assert indexed == scanned
+    print(f"⏱️ {len(records):,} 條日誌（{len(store.segments())} 段）: "
+          f"索引查詢 {indexed_time * 1000:.1f} ms，全量掃描 {scan_time * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
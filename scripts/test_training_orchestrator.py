@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試模型訓練編排器 - 時間序列折疊不洩漏、標準化器只在訓練段擬合、並行與串行結果一致、折疊緩存與吞吐量統計
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加項目路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.ml.training_orchestrator import (
+    FoldScaler, ModelTrainingOrchestrator, TimeSeriesFold, purged_kfold, walk_forward_folds
+)
+
+
+class NearestCentroid:
+    """最近質心分類器（測試用，需為模組級類以便在子進程中pickle）"""
+
+    def fit(self, X, y):
+        self.classes_ = np.unique(y)
+        self.centroids_ = np.stack([X[y == label].mean(axis=0) for label in self.classes_])
+        return self
+
+    def predict(self, X):
+        distances = ((X[:, None, :] - self.centroids_[None, :, :]) ** 2).sum(axis=2)
+        return self.classes_[distances.argmin(axis=1)]
+
+
+class MajorityClass:
+    """多數類分類器（測試用）"""
+
+    def fit(self, X, y):
+        labels, counts = np.unique(y, return_counts=True)
+        self.label_ = labels[counts.argmax()]
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.label_)
+
+
+class Broken:
+    """擬合時拋出異常的模型（測試錯誤收集）"""
+
+    def fit(self, X, y):
+        raise RuntimeError("模型擬合失敗")
+
+    def predict(self, X):
+        return np.zeros(len(X))
+
+
+def create_dataset(rows: int, features: int = 12, seed: int = 3):
+    """三分類數據集：標籤由前兩個特徵的線性組合決定"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features))
+    score = X[:, 0] + 0.5 * X[:, 1] + rng.normal(scale=0.5, size=rows)
+    y = np.digitize(score, [-0.5, 0.5]) - 1
+    return X, y
+
+
+def test_walk_forward_folds_do_not_leak():
+    """前進式折疊：測試段依次相接，訓練段只在測試段之前並剔除 purge 個樣本"""
+    folds = walk_forward_folds(600, n_splits=5, purge=10)
+    assert [fold.test_range for fold in folds] == [(100, 200), (200, 300), (300, 400), (400, 500), (500, 600)]
+    for fold in folds:
+        assert fold.train_ranges == ((0, fold.test_range[0] - 10),)
+        assert fold.train_indices().max() < fold.test_range[0] - 10 + 1
+
+    rolling = walk_forward_folds(600, n_splits=5, purge=10, max_train_size=50)
+    assert all(fold.train_size == 50 for fold in rolling)
+
+    try:
+        walk_forward_folds(10, n_splits=5, test_size=2)
+        raise AssertionError("樣本不足應該報錯")
+    except ValueError:
+        pass
+
+
+def test_purged_kfold_purge_and_embargo():
+    """清洗K折：測試段前剔除 purge、測試段後禁用 embargo，訓練段與測試段不重疊"""
+    folds = purged_kfold(100, n_splits=4, purge=3, embargo=2)
+    assert folds[0].train_ranges == ((27, 100),)
+    assert folds[1].train_ranges == ((0, 22), (52, 100))
+    assert folds[3].train_ranges == ((0, 72),)
+    for fold in folds:
+        train = fold.train_indices()
+        assert not np.any((train >= fold.test_range[0]) & (train < fold.test_range[1]))
+
+
+def test_scaler_fitted_on_train_only():
+    """每折的標準化器只用訓練段擬合，與手動計算一致"""
+    X, y = create_dataset(400)
+    X[300:] += 100  # 測試段分佈漂移，若洩漏會改變均值
+    holdout = TimeSeriesFold(0, ((0, 290),), (300, 400))
+    orchestrator = ModelTrainingOrchestrator({'centroid': NearestCentroid()}, max_workers=1)
+    result = orchestrator.run(X, y, walk_forward_folds(290, 3), holdout)['centroid']
+
+    scaler = result['holdout']['scaler']
+    expected = FoldScaler().fit(X[:290])
+    assert np.allclose(scaler.mean_, expected.mean_) and np.allclose(scaler.scale_, expected.scale_)
+    assert np.array_equal(result['holdout']['y_test'], y[300:])
+
+
+def test_parallel_matches_serial():
+    """進程池與當前進程內執行的分數與預測完全一致"""
+    X, y = create_dataset(3000)
+    folds = walk_forward_folds(2400, n_splits=4, purge=10)
+    holdout = TimeSeriesFold(4, ((0, 2390),), (2400, 3000))
+    estimators = {'centroid': NearestCentroid(), 'majority': MajorityClass()}
+
+    serial = ModelTrainingOrchestrator(estimators, max_workers=1).run(X, y, folds, holdout)
+    parallel = ModelTrainingOrchestrator(estimators, max_workers=2).run(X, y, folds, holdout)
+    for name in estimators:
+        assert serial[name]['cv_scores'] == parallel[name]['cv_scores']
+        assert serial[name]['holdout']['test_score'] == parallel[name]['holdout']['test_score']
+        assert np.array_equal(serial[name]['holdout']['y_pred'], parallel[name]['holdout']['y_pred'])
+    assert serial['centroid']['cv_mean'] > serial['majority']['cv_mean']
+
+
+def test_fold_cache_and_throughput():
+    """同一折疊的標準化矩陣在模型間共用，吞吐量按模型統計，失敗模型的錯誤被收集"""
+    logging.disable(logging.ERROR)
+    try:
+        X, y = create_dataset(1000)
+        folds = walk_forward_folds(1000, n_splits=3)
+        orchestrator = ModelTrainingOrchestrator(
+            {'centroid': NearestCentroid(), 'majority': MajorityClass(), 'broken': Broken()}, max_workers=1
+        )
+        results = orchestrator.run(X, y, folds)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    assert orchestrator.stats['tasks'] == 9 and orchestrator.stats['failed'] == 3
+    assert orchestrator.stats['cache_hits'] == 6
+    assert len(results['centroid']['cv_scores']) == 3 and results['centroid']['holdout'] is None
+    throughput = results['centroid']['throughput']
+    assert throughput['fit_samples_per_second'] > 0 and throughput['predict_samples_per_second'] > 0
+    assert results['broken']['cv_scores'] == [] and len(results['broken']['errors']) == 3
+    assert "模型擬合失敗" in results['broken']['errors'][0]
+
+
+def main():
+    """運行所有測試並計時30天1分鐘K線規模的並行訓練"""
+    tests = [
+        test_walk_forward_folds_do_not_leak,
+        test_purged_kfold_purge_and_embargo,
+        test_scaler_fitted_on_train_only,
+        test_parallel_matches_serial,
+        test_fold_cache_and_throughput,
+    ]
+
+    print("🧪 開始測試模型訓練編排器...")
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"   ✅ {test.__doc__}")
+        except AssertionError as e:
+            print(f"   ❌ {test.__doc__}: {e}")
+
+    X, y = create_dataset(30 * 24 * 60, features=40)
+    n_train = int(len(X) * 0.8)
+    folds = walk_forward_folds(n_train - 10, n_splits=5, purge=10)
+    holdout = TimeSeriesFold(5, ((0, n_train - 10),), (n_train, len(X)))
+    estimators = {'centroid': NearestCentroid(), 'majority': MajorityClass()}
+    for workers in (1, 4):
+        started = time.perf_counter()
+        ModelTrainingOrchestrator(estimators, max_workers=workers).run(X, y, folds, holdout)
+        print(f"⏱️ 30天1分鐘K線 ({len(X):,} 樣本 × 40 特徵), 2 個模型 × 5 折 + 保留段, "
+              f"{workers} 個進程: {time.perf_counter() - started:.2f}s")
+
+    print(f"\n📊 測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI流水線DAG執行器 - 按依賴關係並行執行AI階段
+互不依賴的階段同時運行，阻塞的模型調用放到有界線程池並按模型限制並發，
+並記錄每個階段與每個模型的延遲
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineStage:
+    """流水線階段：func 接收 {依賴階段名: 結果} 並返回協程"""
+    name: str
+    func: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+
+
+class AIPipelineExecutor:
+    """AI流水線DAG執行器"""
+
+    def __init__(self, max_workers: int = 8,
+                 model_concurrency: Optional[Dict[str, int]] = None,
+                 default_model_concurrency: int = 2):
+        """
+        初始化執行器
+
+        Args:
+            max_workers: 執行阻塞模型調用的線程數上限
+            model_concurrency: 每個模型同時執行的調用數上限
+            default_model_concurrency: 未配置模型的並發上限
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-model')
+        self.model_concurrency = dict(model_concurrency or {})
+        self.default_model_concurrency = default_model_concurrency
+
+        # asyncio.Semaphore 綁定事件循環，按循環分別建立
+        self._semaphores: Dict[Tuple[int, str], asyncio.Semaphore] = {}
+        self._stats_lock = threading.Lock()
+        self.stage_stats: Dict[str, Dict[str, float]] = {}
+        self.model_stats: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def topological_order(stages: List[PipelineStage]) -> List[PipelineStage]:
+        """按依賴排序階段，檢查未知依賴與循環依賴"""
+        by_name = {stage.name: stage for stage in stages}
+        if len(by_name) != len(stages):
+            raise ValueError("流水線階段名稱重複")
+
+        order, visiting, visited = [], set(), set()
+
+        def visit(stage: PipelineStage):
+            if stage.name in visited:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"流水線存在循環依賴: {stage.name}")
+            visiting.add(stage.name)
+            for dependency in stage.depends_on:
+                if dependency not in by_name:
+                    raise ValueError(f"階段 {stage.name} 依賴未知階段 {dependency}")
+                visit(by_name[dependency])
+            visiting.discard(stage.name)
+            visited.add(stage.name)
+            order.append(stage)
+
+        for stage in stages:
+            visit(stage)
+        return order
+
+    async def run_graph(self, stages: List[PipelineStage]) -> Dict[str, Any]:
+        """
+        執行整個DAG
+
+        Returns:
+            {階段名: 結果}
+        """
+        tasks: Dict[str, asyncio.Future] = {}
+
+        async def run_stage(stage: PipelineStage):
+            dependencies = {name: await tasks[name] for name in stage.depends_on}
+            start = time.perf_counter()
+            try:
+                return await stage.func(dependencies)
+            finally:
+                self._record(self.stage_stats, stage.name, latency=time.perf_counter() - start)
+
+        for stage in self.topological_order(stages):
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(tasks.keys(), results))
+
+    def _semaphore(self, model_name: str) -> asyncio.Semaphore:
+        key = (id(asyncio.get_running_loop()), model_name)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            limit = self.model_concurrency.get(model_name, self.default_model_concurrency)
+            semaphore = asyncio.Semaphore(limit)
+            self._semaphores[key] = semaphore
+        return semaphore
+
+    async def run_blocking(self, model_name: str, func: Callable, *args, **kwargs) -> Any:
+        """在線程池中執行阻塞的模型調用（受模型並發上限約束）"""
+        queued = time.perf_counter()
+        async with self._semaphore(model_name):
+            started = time.perf_counter()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, partial(func, *args, **kwargs)
+                )
+            finally:
+                self._record(self.model_stats, model_name,
+                             latency=time.perf_counter() - started, wait=started - queued)
+
+    def _record(self, table: Dict[str, Dict[str, float]], name: str, latency: float, wait: float = 0.0):
+        with self._stats_lock:
+            stats = table.setdefault(name, {'count': 0, 'total_time': 0.0, 'max_time': 0.0,
+                                            'last_time': 0.0, 'total_wait': 0.0})
+            stats['count'] += 1
+            stats['total_time'] += latency
+            stats['max_time'] = max(stats['max_time'], latency)
+            stats['last_time'] = latency
+            stats['total_wait'] += wait
+
+    @staticmethod
+    def _summarize(table: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                'count': stats['count'],
+                'average_time': stats['total_time'] / stats['count'],
+                'max_time': stats['max_time'],
+                'last_time': stats['last_time'],
+                'average_wait': stats['total_wait'] / stats['count']
+            }
+            for name, stats in table.items() if stats['count']
+        }
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """每個階段與每個模型的延遲統計（秒）"""
+        with self._stats_lock:
+            return {'stages': self._summarize(self.stage_stats),
+                    'models': self._summarize(self.model_stats)}
+
+    def shutdown(self, wait: bool = True):
+        """關閉線程池"""
+        self.executor.shutdown(wait=wait)
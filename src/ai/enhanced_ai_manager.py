@@ -8,20 +8,28 @@
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Sequence
+from dataclasses import dataclass, asdict
 from pathlib import Path
 
 import ollama
 
 try:
     from .multi_pair_prompt_optimizer import create_multi_pair_prompt_optimizer, MultiPairContext
+    from .ai_pipeline_executor import AIPipelineExecutor, PipelineStage
+    from .llm_response_cache import LLMResponseCache, get_llm_response_cache
 except ImportError:
     from multi_pair_prompt_optimizer import create_multi_pair_prompt_optimizer, MultiPairContext
+    from ai_pipeline_executor import AIPipelineExecutor, PipelineStage
+    from llm_response_cache import LLMResponseCache, get_llm_response_cache
 
 logger = logging.getLogger(__name__)
 
+# 提示詞模板版本：修改任何 _get_*_system_prompt / _build_*_prompt 後需遞增，使舊的緩存回應失效
+PROMPT_TEMPLATE_VERSION = "1"
+
 @dataclass
 class EnhancedAIResponse:
     """增強AI回應數據結構"""
@@ -53,7 +61,8 @@ class MultiPairDecision:
 class EnhancedAIManager:
     """增強AI協作管理器 - 五AI系統"""
     
-    def __init__(self, config_path: str = "config/ai_models.json"):
+    def __init__(self, config_path: str = "config/ai_models.json",
+                 response_cache: Optional[LLMResponseCache] = None):
         self.config_path = Path(config_path)
         self.ollama_client = ollama.Client()
         
@@ -96,6 +105,15 @@ class EnhancedAIManager:
             }
         }
         
+        # 流水線執行器：阻塞的模型調用在有界線程池中執行，每個模型最多同時處理2個請求
+        self.pipeline_executor = AIPipelineExecutor(
+            max_workers=8,
+            model_concurrency={config["model_name"]: 2 for config in self.ai_models.values()}
+        )
+        
+        # LLM回應緩存：量化市場狀態相同時重用上次的模型回應
+        self.response_cache = response_cache if response_cache is not None else get_llm_response_cache()
+        
         # 多交易對設置
         self.supported_pairs = ['BTCTWD', 'ETHTWD', 'LTCTWD', 'BCHTWD']
         self.pair_specific_configs = {}
@@ -133,18 +151,15 @@ class EnhancedAIManager:
         
         decisions = {}
         
-        # 並行分析所有交易對
-        tasks = []
-        for pair, market_data in multi_pair_data.items():
-            if pair in self.supported_pairs:
-                task = self._analyze_single_pair_with_context(pair, market_data, multi_pair_context)
-                tasks.append(task)
+        # 並行分析所有交易對，每個交易對走同一條五AI依賴圖流水線
+        pairs = [pair for pair in multi_pair_data if pair in self.supported_pairs]
+        tasks = [self._analyze_single_pair(pair, multi_pair_data[pair], multi_pair_context)
+                 for pair in pairs]
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # 處理結果
-        for i, result in enumerate(results):
-            pair = list(multi_pair_data.keys())[i]
+        for pair, result in zip(pairs, results):
             if isinstance(result, Exception):
                 logger.error(f"❌ {pair} 分析失敗: {result}")
                 decisions[pair] = self._create_fallback_decision(pair, str(result))
@@ -154,34 +169,46 @@ class EnhancedAIManager:
         logger.info(f"✅ 多交易對分析完成: {len(decisions)} 個決策")
         return decisions
     
-    async def _analyze_single_pair(self, pair: str, market_data: Dict[str, Any]) -> MultiPairDecision:
-        """分析單個交易對"""
+    async def _analyze_single_pair(self, pair: str, market_data: Dict[str, Any],
+                                   multi_pair_context: Optional[MultiPairContext] = None) -> MultiPairDecision:
+        """分析單個交易對（提供多交易對上下文時各階段改用優化的多交易對提示詞）"""
         start_time = datetime.now()
         
         try:
             logger.info(f"📊 開始分析 {pair}")
             
-            # 階段1: 市場掃描員 (LLaMA 2:7B)
-            scanner_response = await self._run_market_scanner(pair, market_data)
-            
-            # 階段2: 深度分析師 (Falcon 7B) 
-            analyst_response = await self._run_deep_analyst(pair, market_data, scanner_response)
-            
-            # 階段3: 趋势分析師 (Qwen 7B)
-            trend_response = await self._run_trend_analyst(pair, market_data, scanner_response)
-            
-            # 階段4: 風險評估AI (Mistral 7B) ⭐ 新增
-            risk_response = await self._run_risk_assessor(pair, market_data, 
-                                                        scanner_response, analyst_response, trend_response)
-            
-            # 階段5: 最終決策者 (Qwen 7B)
-            decision_response = await self._run_decision_maker(pair, market_data,
-                                                             scanner_response, analyst_response, 
-                                                             trend_response, risk_response)
+            # 掃描員 → (深度分析師 ∥ 趨勢分析師) → 風險評估AI → 最終決策者
+            stages = [
+                # 階段1: 市場掃描員 (LLaMA 2:7B)
+                PipelineStage("market_scanner",
+                              lambda r: self._run_market_scanner(pair, market_data, multi_pair_context)),
+                # 階段2: 深度分析師 (Falcon 7B)，只依賴掃描員
+                PipelineStage("deep_analyst",
+                              lambda r: self._run_deep_analyst(pair, market_data, r["market_scanner"],
+                                                               multi_pair_context),
+                              ("market_scanner",)),
+                # 階段3: 趨勢分析師 (Qwen 7B)，只依賴掃描員，與深度分析師並行
+                PipelineStage("trend_analyst",
+                              lambda r: self._run_trend_analyst(pair, market_data, r["market_scanner"],
+                                                                multi_pair_context),
+                              ("market_scanner",)),
+                # 階段4: 風險評估AI (Mistral 7B)
+                PipelineStage("risk_assessor",
+                              lambda r: self._run_risk_assessor(pair, market_data, r["market_scanner"],
+                                                                r["deep_analyst"], r["trend_analyst"],
+                                                                multi_pair_context),
+                              ("market_scanner", "deep_analyst", "trend_analyst")),
+                # 階段5: 最終決策者 (Qwen 7B)
+                PipelineStage("decision_maker",
+                              lambda r: self._run_decision_maker(pair, market_data, r["market_scanner"],
+                                                                 r["deep_analyst"], r["trend_analyst"],
+                                                                 r["risk_assessor"], multi_pair_context),
+                              ("market_scanner", "deep_analyst", "trend_analyst", "risk_assessor")),
+            ]
+            results = await self.pipeline_executor.run_graph(stages)
             
             # 綜合所有AI的回應
-            ai_responses = [scanner_response, analyst_response, trend_response, 
-                          risk_response, decision_response]
+            ai_responses = [results[ai_role] for ai_role in self.ai_models]
             
             # 生成最終協作決策
             collaborative_decision = self._synthesize_multi_pair_decision(pair, ai_responses)
@@ -199,21 +226,90 @@ class EnhancedAIManager:
             logger.error(f"❌ {pair} 分析失敗: {e}")
             return self._create_fallback_decision(pair, str(e))
     
-    async def _run_market_scanner(self, pair: str, market_data: Dict[str, Any]) -> EnhancedAIResponse:
+    def _create_multi_pair_context(self, multi_pair_data: Dict[str, Dict[str, Any]]) -> MultiPairContext:
+        """創建多交易對上下文 ⭐ 新增方法"""
+        try:
+            # 分析全局市場條件
+            avg_volatility = sum(data.get('volatility', 0.02) for data in multi_pair_data.values()) / len(multi_pair_data)
+            
+            # 判斷市場條件
+            if avg_volatility > 0.05:
+                market_conditions = 'bear'
+            elif avg_volatility < 0.02:
+                market_conditions = 'bull'
+            else:
+                market_conditions = 'sideways'
+            
+            # 計算簡化的相關性矩陣
+            correlation_matrix = {}
+            pairs = list(multi_pair_data.keys())
+            
+            for pair1 in pairs:
+                correlation_matrix[pair1] = {}
+                for pair2 in pairs:
+                    if pair1 == pair2:
+                        correlation_matrix[pair1][pair2] = 1.0
+                    else:
+                        # 基於價格變化計算簡化相關性
+                        change1 = multi_pair_data[pair1].get('price_change_5m', 0)
+                        change2 = multi_pair_data[pair2].get('price_change_5m', 0)
+                        
+                        if change1 * change2 > 0:
+                            correlation = min(0.8, abs(change1 + change2) / 10)
+                        else:
+                            correlation = max(-0.5, -(abs(change1 - change2) / 10))
+                        
+                        correlation_matrix[pair1][pair2] = correlation
+            
+            return MultiPairContext(
+                total_pairs=len(multi_pair_data),
+                active_pairs=list(multi_pair_data.keys()),
+                market_conditions=market_conditions,
+                correlation_matrix=correlation_matrix,
+                global_risk_level=min(1.0, avg_volatility * 10),
+                available_capital=100000.0  # 預設10萬TWD
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ 創建多交易對上下文失敗: {e}")
+            return MultiPairContext(
+                total_pairs=len(multi_pair_data),
+                active_pairs=list(multi_pair_data.keys()),
+                market_conditions='sideways',
+                correlation_matrix={},
+                global_risk_level=0.5,
+                available_capital=100000.0
+            )
+    
+    def _context_cache_tags(self, multi_pair_context: Optional[MultiPairContext]) -> tuple:
+        """多交易對上下文會嵌入提示詞，以其內容作為額外的緩存鍵成分"""
+        if multi_pair_context is None:
+            return ()
+        return (json.dumps(asdict(multi_pair_context), sort_keys=True, ensure_ascii=False),)
+    
+    async def _run_market_scanner(self, pair: str, market_data: Dict[str, Any],
+                                  multi_pair_context: Optional[MultiPairContext] = None) -> EnhancedAIResponse:
         """運行市場掃描員 (LLaMA 2:7B)"""
         start_time = datetime.now()
         
         try:
             model_config = self.ai_models["market_scanner"]
             
-            prompt = self._build_scanner_prompt(pair, market_data)
+            if multi_pair_context is None:
+                prompt = self._build_scanner_prompt(pair, market_data)
+            else:
+                prompt = self.prompt_optimizer.get_optimized_scanner_prompt(pair, market_data, multi_pair_context)
             
             response = await self._call_ai_model(
                 model_name=model_config["model_name"],
                 system_prompt=self._get_scanner_system_prompt(),
                 user_prompt=prompt,
                 max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
+                temperature=model_config["temperature"],
+                ai_role="market_scanner",
+                pair=pair,
+                market_data=market_data,
+                upstream_responses=self._context_cache_tags(multi_pair_context)
             )
             
             processing_time = (datetime.now() - start_time).total_seconds()
@@ -234,21 +330,31 @@ class EnhancedAIManager:
             return self._create_error_response("market_scanner", pair, str(e))
     
     async def _run_deep_analyst(self, pair: str, market_data: Dict[str, Any], 
-                              scanner_response: EnhancedAIResponse) -> EnhancedAIResponse:
+                              scanner_response: EnhancedAIResponse,
+                              multi_pair_context: Optional[MultiPairContext] = None) -> EnhancedAIResponse:
         """運行深度分析師 (Falcon 7B)"""
         start_time = datetime.now()
         
         try:
             model_config = self.ai_models["deep_analyst"]
             
-            prompt = self._build_analyst_prompt(pair, market_data, scanner_response)
+            if multi_pair_context is None:
+                prompt = self._build_analyst_prompt(pair, market_data, scanner_response)
+            else:
+                prompt = self.prompt_optimizer.get_optimized_analyst_prompt(
+                    pair, market_data, scanner_response.response, multi_pair_context
+                )
             
             response = await self._call_ai_model(
                 model_name=model_config["model_name"],
                 system_prompt=self._get_analyst_system_prompt(),
                 user_prompt=prompt,
                 max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
+                temperature=model_config["temperature"],
+                ai_role="deep_analyst",
+                pair=pair,
+                market_data=market_data,
+                upstream_responses=(scanner_response.response,) + self._context_cache_tags(multi_pair_context)
             )
             
             processing_time = (datetime.now() - start_time).total_seconds()
@@ -269,21 +375,31 @@ class EnhancedAIManager:
             return self._create_error_response("deep_analyst", pair, str(e))
     
     async def _run_trend_analyst(self, pair: str, market_data: Dict[str, Any],
-                               scanner_response: EnhancedAIResponse) -> EnhancedAIResponse:
+                               scanner_response: EnhancedAIResponse,
+                               multi_pair_context: Optional[MultiPairContext] = None) -> EnhancedAIResponse:
         """運行趨勢分析師 (Qwen 7B)"""
         start_time = datetime.now()
         
         try:
             model_config = self.ai_models["trend_analyst"]
             
-            prompt = self._build_trend_prompt(pair, market_data, scanner_response)
+            if multi_pair_context is None:
+                prompt = self._build_trend_prompt(pair, market_data, scanner_response)
+            else:
+                prompt = self.prompt_optimizer.get_optimized_trend_prompt(
+                    pair, market_data, scanner_response.response, multi_pair_context
+                )
             
             response = await self._call_ai_model(
                 model_name=model_config["model_name"],
                 system_prompt=self._get_trend_system_prompt(),
                 user_prompt=prompt,
                 max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
+                temperature=model_config["temperature"],
+                ai_role="trend_analyst",
+                pair=pair,
+                market_data=market_data,
+                upstream_responses=(scanner_response.response,) + self._context_cache_tags(multi_pair_context)
             )
             
             processing_time = (datetime.now() - start_time).total_seconds()
@@ -306,22 +422,34 @@ class EnhancedAIManager:
     async def _run_risk_assessor(self, pair: str, market_data: Dict[str, Any],
                                scanner_response: EnhancedAIResponse,
                                analyst_response: EnhancedAIResponse,
-                               trend_response: EnhancedAIResponse) -> EnhancedAIResponse:
+                               trend_response: EnhancedAIResponse,
+                               multi_pair_context: Optional[MultiPairContext] = None) -> EnhancedAIResponse:
         """運行風險評估AI (Mistral 7B) ⭐ 新增核心功能"""
         start_time = datetime.now()
         
         try:
             model_config = self.ai_models["risk_assessor"]
             
-            prompt = self._build_risk_assessment_prompt(pair, market_data, 
-                                                      scanner_response, analyst_response, trend_response)
+            if multi_pair_context is None:
+                prompt = self._build_risk_assessment_prompt(pair, market_data, 
+                                                          scanner_response, analyst_response, trend_response)
+            else:
+                prompt = self.prompt_optimizer.get_optimized_risk_prompt(
+                    pair, market_data, scanner_response.response, analyst_response.response,
+                    trend_response.response, multi_pair_context
+                )
             
             response = await self._call_ai_model(
                 model_name=model_config["model_name"],
                 system_prompt=self._get_risk_assessor_system_prompt(),
                 user_prompt=prompt,
                 max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
+                temperature=model_config["temperature"],
+                ai_role="risk_assessor",
+                pair=pair,
+                market_data=market_data,
+                upstream_responses=(scanner_response.response, analyst_response.response,
+                                    trend_response.response) + self._context_cache_tags(multi_pair_context)
             )
             
             processing_time = (datetime.now() - start_time).total_seconds()
@@ -347,23 +475,36 @@ class EnhancedAIManager:
                                 scanner_response: EnhancedAIResponse,
                                 analyst_response: EnhancedAIResponse,
                                 trend_response: EnhancedAIResponse,
-                                risk_response: EnhancedAIResponse) -> EnhancedAIResponse:
+                                risk_response: EnhancedAIResponse,
+                                multi_pair_context: Optional[MultiPairContext] = None) -> EnhancedAIResponse:
         """運行最終決策者 (Qwen 7B)"""
         start_time = datetime.now()
         
         try:
             model_config = self.ai_models["decision_maker"]
             
-            prompt = self._build_final_decision_prompt(pair, market_data,
-                                                     scanner_response, analyst_response,
-                                                     trend_response, risk_response)
+            if multi_pair_context is None:
+                prompt = self._build_final_decision_prompt(pair, market_data,
+                                                         scanner_response, analyst_response,
+                                                         trend_response, risk_response)
+            else:
+                prompt = self.prompt_optimizer.get_optimized_decision_prompt(
+                    pair, market_data, scanner_response.response, analyst_response.response,
+                    trend_response.response, risk_response.response, multi_pair_context
+                )
             
             response = await self._call_ai_model(
                 model_name=model_config["model_name"],
                 system_prompt=self._get_decision_maker_system_prompt(),
                 user_prompt=prompt,
                 max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
+                temperature=model_config["temperature"],
+                ai_role="decision_maker",
+                pair=pair,
+                market_data=market_data,
+                upstream_responses=(scanner_response.response, analyst_response.response,
+                                    trend_response.response, risk_response.response)
+                                   + self._context_cache_tags(multi_pair_context)
             )
             
             processing_time = (datetime.now() - start_time).total_seconds()
@@ -384,10 +525,25 @@ class EnhancedAIManager:
             return self._create_error_response("decision_maker", pair, str(e)) 
    
     async def _call_ai_model(self, model_name: str, system_prompt: str, 
-                           user_prompt: str, max_tokens: int, temperature: float) -> str:
-        """調用AI模型"""
+                           user_prompt: str, max_tokens: int, temperature: float,
+                           ai_role: Optional[str] = None, pair: str = "",
+                           market_data: Optional[Dict[str, Any]] = None,
+                           upstream_responses: Sequence[str] = ()) -> str:
+        """調用AI模型（提供角色與市場數據時先查詢回應緩存；提示詞嵌入的上游回應納入緩存鍵）"""
+        cache_key = None
+        if self.response_cache is not None and ai_role and market_data is not None:
+            cache_key = self.response_cache.make_key(model_name, ai_role, PROMPT_TEMPLATE_VERSION,
+                                                     market_data, pair, upstream_responses)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"♻️ {pair} {ai_role} 命中回應緩存，跳過模型推理")
+                return cached
+        
         try:
-            response = self.ollama_client.chat(
+            start = time.perf_counter()
+            response = await self.pipeline_executor.run_blocking(
+                model_name,
+                self.ollama_client.chat,
                 model=model_name,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -399,8 +555,12 @@ class EnhancedAIManager:
                     "top_p": 0.9
                 }
             )
+            content = response['message']['content']
             
-            return response['message']['content']
+            if cache_key is not None:
+                self.response_cache.put(cache_key, content, model_name=model_name, ai_role=ai_role,
+                                        inference_seconds=time.perf_counter() - start)
+            return content
             
         except Exception as e:
             logger.error(f"❌ AI模型調用失敗 ({model_name}): {e}")
@@ -1045,6 +1205,8 @@ class EnhancedAIManager:
             },
             "ai_availability": self.performance_stats["ai_availability"],
             "pair_performance": self.performance_stats["pair_stats"],
+            "pipeline_latency": self.pipeline_executor.get_latency_stats(),
+            "response_cache": self.response_cache.get_stats() if self.response_cache is not None else None,
             "ai_models": {
                 ai_role: {
                     "model_name": config["model_name"],
@@ -1178,310 +1340,6 @@ if __name__ == "__main__":
         else:
             return "極低"
     
-    def _create_multi_pair_context(self, multi_pair_data: Dict[str, Dict[str, Any]]) -> MultiPairContext:
-        """創建多交易對上下文 ⭐ 新增方法"""
-        try:
-            # 分析全局市場條件
-            avg_volatility = sum(data.get('volatility', 0.02) for data in multi_pair_data.values()) / len(multi_pair_data)
-            
-            # 判斷市場條件
-            if avg_volatility > 0.05:
-                market_conditions = 'bear'
-            elif avg_volatility < 0.02:
-                market_conditions = 'bull'
-            else:
-                market_conditions = 'sideways'
-            
-            # 計算簡化的相關性矩陣
-            correlation_matrix = {}
-            pairs = list(multi_pair_data.keys())
-            
-            for pair1 in pairs:
-                correlation_matrix[pair1] = {}
-                for pair2 in pairs:
-                    if pair1 == pair2:
-                        correlation_matrix[pair1][pair2] = 1.0
-                    else:
-                        # 基於價格變化計算簡化相關性
-                        change1 = multi_pair_data[pair1].get('price_change_5m', 0)
-                        change2 = multi_pair_data[pair2].get('price_change_5m', 0)
-                        
-                        if change1 * change2 > 0:
-                            correlation = min(0.8, abs(change1 + change2) / 10)
-                        else:
-                            correlation = max(-0.5, -(abs(change1 - change2) / 10))
-                        
-                        correlation_matrix[pair1][pair2] = correlation
-            
-            return MultiPairContext(
-                total_pairs=len(multi_pair_data),
-                active_pairs=list(multi_pair_data.keys()),
-                market_conditions=market_conditions,
-                correlation_matrix=correlation_matrix,
-                global_risk_level=min(1.0, avg_volatility * 10),
-                available_capital=100000.0  # 預設10萬TWD
-            )
-            
-        except Exception as e:
-            logger.error(f"❌ 創建多交易對上下文失敗: {e}")
-            return MultiPairContext(
-                total_pairs=len(multi_pair_data),
-                active_pairs=list(multi_pair_data.keys()),
-                market_conditions='sideways',
-                correlation_matrix={},
-                global_risk_level=0.5,
-                available_capital=100000.0
-            )
-    
-    async def _analyze_single_pair_with_context(self, pair: str, market_data: Dict[str, Any], 
-                                              multi_pair_context: MultiPairContext) -> MultiPairDecision:
-        """使用多交易對上下文分析單個交易對 ⭐ 新增方法"""
-        start_time = datetime.now()
-        
-        try:
-            logger.info(f"📊 開始分析 {pair}")
-            
-            # 階段1: 市場掃描員 (使用優化提示詞)
-            scanner_response = await self._run_market_scanner_with_context(pair, market_data, multi_pair_context)
-            
-            # 階段2: 深度分析師 (使用優化提示詞)
-            analyst_response = await self._run_deep_analyst_with_context(pair, market_data, scanner_response, multi_pair_context)
-            
-            # 階段3: 趨勢分析師 (使用優化提示詞)
-            trend_response = await self._run_trend_analyst_with_context(pair, market_data, scanner_response, multi_pair_context)
-            
-            # 階段4: 風險評估AI (使用優化提示詞)
-            risk_response = await self._run_risk_assessor_with_context(pair, market_data, 
-                                                                    scanner_response, analyst_response, 
-                                                                    trend_response, multi_pair_context)
-            
-            # 階段5: 最終決策者 (使用優化提示詞)
-            decision_response = await self._run_decision_maker_with_context(pair, market_data,
-                                                                          scanner_response, analyst_response, 
-                                                                          trend_response, risk_response, 
-                                                                          multi_pair_context)
-            
-            # 綜合所有AI的回應
-            ai_responses = [scanner_response, analyst_response, trend_response, 
-                          risk_response, decision_response]
-            
-            # 生成最終協作決策
-            collaborative_decision = self._synthesize_multi_pair_decision(pair, ai_responses)
-            
-            # 更新性能統計
-            processing_time = (datetime.now() - start_time).total_seconds()
-            self._update_performance_stats(pair, collaborative_decision, processing_time)
-            
-            logger.info(f"✅ {pair} 分析完成: {collaborative_decision.final_decision} "
-                       f"(信心度: {collaborative_decision.confidence:.2f})")
-            
-            return collaborative_decision
-            
-        except Exception as e:
-            logger.error(f"❌ {pair} 分析失敗: {e}")
-            return self._create_fallback_decision(pair, str(e))
-    
-    async def _run_market_scanner_with_context(self, pair: str, market_data: Dict[str, Any], 
-                                             multi_pair_context: MultiPairContext) -> EnhancedAIResponse:
-        """運行市場掃描員 - 多交易對優化版本"""
-        start_time = datetime.now()
-        
-        try:
-            model_config = self.ai_models["market_scanner"]
-            
-            # 使用優化的多交易對提示詞
-            prompt = self.prompt_optimizer.get_optimized_scanner_prompt(pair, market_data, multi_pair_context)
-            
-            response = await self._call_ai_model(
-                model_name=model_config["model_name"],
-                system_prompt=self._get_scanner_system_prompt(),
-                user_prompt=prompt,
-                max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
-            )
-            
-            processing_time = (datetime.now() - start_time).total_seconds()
-            
-            return EnhancedAIResponse(
-                ai_role="market_scanner",
-                model_name=model_config["model_name"],
-                response=response,
-                confidence=self._extract_confidence(response),
-                processing_time=processing_time,
-                timestamp=datetime.now(),
-                success=True,
-                pair=pair
-            )
-            
-        except Exception as e:
-            logger.error(f"❌ {pair} 市場掃描員執行失敗: {e}")
-            return self._create_error_response("market_scanner", pair, str(e))
-    
-    async def _run_deep_analyst_with_context(self, pair: str, market_data: Dict[str, Any], 
-                                           scanner_response: EnhancedAIResponse,
-                                           multi_pair_context: MultiPairContext) -> EnhancedAIResponse:
-        """運行深度分析師 - 多交易對優化版本"""
-        start_time = datetime.now()
-        
-        try:
-            model_config = self.ai_models["deep_analyst"]
-            
-            # 使用優化的多交易對提示詞
-            prompt = self.prompt_optimizer.get_optimized_analyst_prompt(
-                pair, market_data, scanner_response.response, multi_pair_context
-            )
-            
-            response = await self._call_ai_model(
-                model_name=model_config["model_name"],
-                system_prompt=self._get_analyst_system_prompt(),
-                user_prompt=prompt,
-                max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
-            )
-            
-            processing_time = (datetime.now() - start_time).total_seconds()
-            
-            return EnhancedAIResponse(
-                ai_role="deep_analyst",
-                model_name=model_config["model_name"],
-                response=response,
-                confidence=self._extract_confidence(response),
-                processing_time=processing_time,
-                timestamp=datetime.now(),
-                success=True,
-                pair=pair
-            )
-            
-        except Exception as e:
-            logger.error(f"❌ {pair} 深度分析師執行失敗: {e}")
-            return self._create_error_response("deep_analyst", pair, str(e))
-    
-    async def _run_trend_analyst_with_context(self, pair: str, market_data: Dict[str, Any],
-                                            scanner_response: EnhancedAIResponse,
-                                            multi_pair_context: MultiPairContext) -> EnhancedAIResponse:
-        """運行趨勢分析師 - 多交易對優化版本"""
-        start_time = datetime.now()
-        
-        try:
-            model_config = self.ai_models["trend_analyst"]
-            
-            # 使用優化的多交易對提示詞
-            prompt = self.prompt_optimizer.get_optimized_trend_prompt(
-                pair, market_data, scanner_response.response, multi_pair_context
-            )
-            
-            response = await self._call_ai_model(
-                model_name=model_config["model_name"],
-                system_prompt=self._get_trend_system_prompt(),
-                user_prompt=prompt,
-                max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
-            )
-            
-            processing_time = (datetime.now() - start_time).total_seconds()
-            
-            return EnhancedAIResponse(
-                ai_role="trend_analyst",
-                model_name=model_config["model_name"],
-                response=response,
-                confidence=self._extract_confidence(response),
-                processing_time=processing_time,
-                timestamp=datetime.now(),
-                success=True,
-                pair=pair
-            )
-            
-        except Exception as e:
-            logger.error(f"❌ {pair} 趨勢分析師執行失敗: {e}")
-            return self._create_error_response("trend_analyst", pair, str(e))
-    
-    async def _run_risk_assessor_with_context(self, pair: str, market_data: Dict[str, Any],
-                                            scanner_response: EnhancedAIResponse,
-                                            analyst_response: EnhancedAIResponse,
-                                            trend_response: EnhancedAIResponse,
-                                            multi_pair_context: MultiPairContext) -> EnhancedAIResponse:
-        """運行風險評估AI - 多交易對優化版本"""
-        start_time = datetime.now()
-        
-        try:
-            model_config = self.ai_models["risk_assessor"]
-            
-            # 使用優化的多交易對提示詞
-            prompt = self.prompt_optimizer.get_optimized_risk_prompt(
-                pair, market_data, scanner_response.response, analyst_response.response,
-                trend_response.response, multi_pair_context
-            )
-            
-            response = await self._call_ai_model(
-                model_name=model_config["model_name"],
-                system_prompt=self._get_risk_assessor_system_prompt(),
-                user_prompt=prompt,
-                max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
-            )
-            
-            processing_time = (datetime.now() - start_time).total_seconds()
-            risk_score = self._extract_risk_score(response)
-            
-            return EnhancedAIResponse(
-                ai_role="risk_assessor",
-                model_name=model_config["model_name"],
-                response=response,
-                confidence=self._extract_confidence(response),
-                processing_time=processing_time,
-                timestamp=datetime.now(),
-                success=True,
-                pair=pair,
-                risk_score=risk_score
-            )
-            
-        except Exception as e:
-            logger.error(f"❌ {pair} 風險評估AI執行失敗: {e}")
-            return self._create_error_response("risk_assessor", pair, str(e))
-    
-    async def _run_decision_maker_with_context(self, pair: str, market_data: Dict[str, Any],
-                                             scanner_response: EnhancedAIResponse,
-                                             analyst_response: EnhancedAIResponse,
-                                             trend_response: EnhancedAIResponse,
-                                             risk_response: EnhancedAIResponse,
-                                             multi_pair_context: MultiPairContext) -> EnhancedAIResponse:
-        """運行最終決策者 - 多交易對優化版本"""
-        start_time = datetime.now()
-        
-        try:
-            model_config = self.ai_models["decision_maker"]
-            
-            # 使用優化的多交易對提示詞
-            prompt = self.prompt_optimizer.get_optimized_decision_prompt(
-                pair, market_data, scanner_response.response, analyst_response.response,
-                trend_response.response, risk_response.response, multi_pair_context
-            )
-            
-            response = await self._call_ai_model(
-                model_name=model_config["model_name"],
-                system_prompt=self._get_decision_maker_system_prompt(),
-                user_prompt=prompt,
-                max_tokens=model_config["max_tokens"],
-                temperature=model_config["temperature"]
-            )
-            
-            processing_time = (datetime.now() - start_time).total_seconds()
-            
-            return EnhancedAIResponse(
-                ai_role="decision_maker",
-                model_name=model_config["model_name"],
-                response=response,
-                confidence=self._extract_confidence(response),
-                processing_time=processing_time,
-                timestamp=datetime.now(),
-                success=True,
-                pair=pair
-            )
-            
-        except Exception as e:
-            logger.error(f"❌ {pair} 最終決策者執行失敗: {e}")
-            return self._create_error_response("decision_maker", pair, str(e))
-    
     def _update_performance_stats(self, pair: str, decision: MultiPairDecision, processing_time: float):
         """更新性能統計"""
         try:
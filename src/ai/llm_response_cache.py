@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM回應語義緩存 - 按量化後的市場狀態重用AI分析結果
+緩存鍵由 (模型, AI角色, 提示詞模板版本, 交易對, 量化指標向量) 組成，
+相鄰週期RSI/MACD/成交量幾乎不變時直接返回上次的回應而跳過7B模型推理。
+支持TTL過期、LRU淘汰、條目數與字節數上限，並以SQLite持久化以便重啟後繼續命中。
+"""
+
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 量化規則: 字段 -> (方式, 參數)
+#   step: 按固定步長分桶       log: 按相對變化分桶（價格）
+#   sig:  保留有效數字（MACD等量綱不固定的指標）   label: 原樣保留的分類字段
+DEFAULT_QUANTIZATION: Dict[str, Tuple[str, Any]] = {
+    'current_price': ('log', 0.002),
+    'price_change_1m': ('step', 0.1),
+    'price_change_5m': ('step', 0.2),
+    'price_change_15m': ('step', 0.3),
+    'volume_ratio': ('step', 0.1),
+    'rsi': ('step', 2.0),
+    'macd': ('sig', 2),
+    'macd_signal': ('sig', 2),
+    'macd_histogram': ('sig', 2),
+    'bollinger_position': ('step', 0.05),
+    'volatility': ('sig', 2),
+    'price_trend': ('label', None),
+    'volume_trend': ('label', None),
+    'volatility_level': ('label', None),
+}
+
+
+def _quantize_value(value: Any, method: str, param: Any) -> Any:
+    """按規則量化單個值，缺失或無效值返回None"""
+    if value is None:
+        return None
+    if method == 'label':
+        return str(value)
+
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(value):
+        return None
+
+    if method == 'step':
+        return int(round(value / param))
+    if method == 'log':
+        if value <= 0:
+            return None
+        return int(round(math.log(value) / math.log1p(param)))
+    if method == 'sig':
+        if value == 0:
+            return (0, 0)
+        exponent = math.floor(math.log10(abs(value)))
+        return (int(round(value / 10 ** (exponent - param + 1))), exponent)
+    raise ValueError(f"未知的量化方式: {method}")
+
+
+def quantize_market_state(market_data: Dict[str, Any],
+                          quantization: Optional[Dict[str, Tuple[str, Any]]] = None) -> Tuple:
+    """
+    將市場數據量化為指標向量
+
+    Returns:
+        ((字段, 分桶), ...) 按字段名排序的元組，可直接作為緩存鍵的一部分
+    """
+    rules = quantization or DEFAULT_QUANTIZATION
+    return tuple(
+        (field, _quantize_value(market_data.get(field), method, param))
+        for field, (method, param) in sorted(rules.items())
+    )
+
+
+@dataclass
+class CacheEntry:
+    """緩存條目"""
+    response: str
+    model_name: str
+    ai_role: str
+    created_at: float
+    last_access: float
+    size_bytes: int
+    inference_seconds: float = 0.0
+
+
+class LLMResponseCache:
+    """LLM回應緩存（內存LRU + 可選SQLite持久化）"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: float = 300.0,
+                 max_entries: int = 1000, max_bytes: int = 8 * 1024 * 1024,
+                 quantization: Optional[Dict[str, Tuple[str, Any]]] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        初始化緩存
+
+        Args:
+            db_path: SQLite文件路徑，None 表示只使用內存
+            ttl_seconds: 條目有效期（秒）
+            max_entries: 最大條目數
+            max_bytes: 所有回應的最大總字節數
+            quantization: 自定義量化規則，默認 DEFAULT_QUANTIZATION
+            clock: 時間函數（測試時可替換）
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.quantization = quantization or DEFAULT_QUANTIZATION
+        self.clock = clock
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        # 命中時只在內存更新訪問時間，隨下一次寫入或關閉時批量持久化
+        self._dirty_access: Dict[str, float] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'expirations': 0,
+                      'evictions': 0, 'saved_inference_seconds': 0.0}
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._init_persistent_cache()
+
+    # ---------------------------------------------------------------- 持久化
+
+    def _init_persistent_cache(self):
+        """打開SQLite並載入未過期的條目"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model_name TEXT,
+                ai_role TEXT,
+                response TEXT,
+                created_at REAL,
+                last_access REAL,
+                size_bytes INTEGER,
+                inference_seconds REAL
+            )
+        ''')
+        self._conn.execute("DELETE FROM llm_responses WHERE created_at <= ?",
+                           (self.clock() - self.ttl_seconds,))
+        self._conn.commit()
+
+        rows = self._conn.execute(
+            "SELECT key, model_name, ai_role, response, created_at, last_access, size_bytes, "
+            "inference_seconds FROM llm_responses ORDER BY last_access"
+        ).fetchall()
+        for key, model_name, ai_role, response, created_at, last_access, size_bytes, inference in rows:
+            self._entries[key] = CacheEntry(response, model_name, ai_role, created_at,
+                                            last_access, size_bytes, inference)
+            self._total_bytes += size_bytes
+        self._enforce_limits()
+
+        logger.info(f"✅ LLM回應緩存已載入: {len(self._entries)} 條 ({self.db_path})")
+
+    def _delete_persisted(self, keys):
+        for key in keys:
+            self._dirty_access.pop(key, None)
+        if self._conn is not None and keys:
+            self._conn.executemany("DELETE FROM llm_responses WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+
+    def _write_access_times(self):
+        """把命中後更新的訪問時間寫入當前事務（調用方負責提交）"""
+        if self._conn is not None and self._dirty_access:
+            self._conn.executemany("UPDATE llm_responses SET last_access = ? WHERE key = ?",
+                                   [(last_access, key) for key, last_access in self._dirty_access.items()])
+        self._dirty_access.clear()
+
+    # ---------------------------------------------------------------- 鍵
+
+    def make_key(self, model_name: str, ai_role: str, template_version: str,
+                 market_data: Dict[str, Any], pair: str = '', upstream: Sequence[str] = ()) -> str:
+        """
+        由模型、角色、模板版本、量化市場狀態與上游回應生成緩存鍵
+
+        Args:
+            upstream: 嵌入提示詞的上游AI回應；其摘要納入鍵，上游輸出不同時不會重放下游回應
+        """
+        upstream_digest = hashlib.sha256(
+            '\x1e'.join(response or '' for response in upstream).encode('utf-8')
+        ).hexdigest() if upstream else ''
+        payload = [model_name, ai_role, template_version, pair,
+                   quantize_market_state(market_data, self.quantization), upstream_digest]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    # ---------------------------------------------------------------- 讀寫
+
+    def get(self, key: str) -> Optional[str]:
+        """查詢緩存，過期條目視為未命中並刪除"""
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self.clock()
+            if entry is not None and now - entry.created_at >= self.ttl_seconds:
+                self._remove(key)
+                self._delete_persisted([key])
+                self.stats['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            entry.last_access = now
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['saved_inference_seconds'] += entry.inference_seconds
+            if self._conn is not None:
+                self._dirty_access[key] = now
+            return entry.response
+
+    def put(self, key: str, response: str, model_name: str = '', ai_role: str = '',
+            inference_seconds: float = 0.0):
+        """寫入緩存，超出條目數或字節數上限時淘汰最久未使用的條目"""
+        size_bytes = len(response.encode('utf-8'))
+        if size_bytes > self.max_bytes:
+            return
+
+        with self._lock:
+            now = self.clock()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(response, model_name, ai_role, now, now,
+                                            size_bytes, inference_seconds)
+            self._total_bytes += size_bytes
+            self.stats['stores'] += 1
+
+            if self._conn is not None:
+                self._dirty_access.pop(key, None)
+                self._write_access_times()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, model_name, ai_role, response, now, now, size_bytes, inference_seconds)
+                )
+                self._conn.commit()
+            self._enforce_limits()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size_bytes
+
+    def _enforce_limits(self):
+        evicted = []
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
+            evicted.append(key)
+        if evicted:
+            self.stats['evictions'] += len(evicted)
+            self._delete_persisted(evicted)
+
+    def purge_expired(self) -> int:
+        """清除所有過期條目，返回清除數量"""
+        with self._lock:
+            cutoff = self.clock() - self.ttl_seconds
+            expired = [key for key, entry in self._entries.items() if entry.created_at <= cutoff]
+            for key in expired:
+                self._remove(key)
+            self.stats['expirations'] += len(expired)
+            self._delete_persisted(expired)
+            return len(expired)
+
+    def clear(self):
+        """清空緩存（提示詞模板改動時使用）"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self._dirty_access.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_responses")
+                self._conn.commit()
+
+    # ---------------------------------------------------------------- 統計
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率與容量統計"""
+        with self._lock:
+            requests = self.stats['hits'] + self.stats['misses']
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'persistent': self._conn is not None,
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'hit_rate': self.stats['hits'] / max(1, requests),
+                'stores': self.stats['stores'],
+                'expirations': self.stats['expirations'],
+                'evictions': self.stats['evictions'],
+                'saved_inference_seconds': self.stats['saved_inference_seconds'],
+            }
+
+    def close(self):
+        """寫入未持久化的訪問時間並關閉SQLite連接"""
+        with self._lock:
+            if self._conn is not None:
+                self._write_access_times()
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+
+_cache_pool: Dict[str, LLMResponseCache] = {}
+_cache_pool_lock = threading.Lock()
+
+
+def get_llm_response_cache(db_path: str = "data/cache/llm_response_cache.db",
+                           **kwargs) -> LLMResponseCache:
+    """獲取進程共用的LLM回應緩存實例（同一路徑只打開一次，參數只在首次創建時生效）"""
+    key = str(Path(db_path).resolve())
+    with _cache_pool_lock:
+        cache = _cache_pool.get(key)
+        if cache is None:
+            cache = LLMResponseCache(db_path, **kwargs)
+            _cache_pool[key] = cache
+        return cache
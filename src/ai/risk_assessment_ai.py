@@ -116,6 +116,7 @@ class RiskAssessmentAI:
     def __init__(self, model_name: str = "qwen2.5:7b"):
         self.model_name = model_name
         self.data_manager = None
+        self.risk_analytics = None
         self.config_manager = get_dynamic_config_manager()
         
         # 風險評估參數
@@ -144,6 +145,11 @@ class RiskAssessmentAI:
         self.data_manager = data_manager
         logger.info("📊 風險評估AI已連接數據管理器")
     
+    def set_risk_analytics(self, risk_analytics):
+        """設置共享的風險分析服務（有滾動收益率窗口時替代逐次重算）"""
+        self.risk_analytics = risk_analytics
+        logger.info("📊 風險評估AI已連接風險分析服務")
+    
     async def assess_risk(self, pair: str, timeframe: str = '5m', 
                          lookback_periods: int = 100) -> RiskAssessmentResult:
         """評估交易對風險"""
@@ -156,7 +162,7 @@ class RiskAssessmentAI:
                 raise ValueError(f"無法獲取 {pair} 的市場數據")
             
             # 計算風險指標
-            risk_metrics = self._calculate_risk_metrics(pair, market_data)
+            risk_metrics = self._calculate_risk_metrics(pair, market_data, timeframe, lookback_periods)
             
             # 分析各類風險因子
             risk_factors = self._analyze_risk_factors(pair, market_data, risk_metrics)
@@ -232,25 +238,32 @@ class RiskAssessmentAI:
             logger.error(f"❌ 獲取 {pair} 市場數據失敗: {e}")
             return pd.DataFrame()
     
-    def _calculate_risk_metrics(self, pair: str, data: pd.DataFrame) -> RiskMetrics:
+    def _calculate_risk_metrics(self, pair: str, data: pd.DataFrame,
+                                timeframe: Optional[str] = None,
+                                lookback_periods: Optional[int] = None) -> RiskMetrics:
         """計算風險指標"""
         try:
             prices = data['close'].values
-            returns = np.diff(np.log(prices))
-            
-            # 基本風險指標
-            volatility = np.std(returns) * np.sqrt(252)  # 年化波動率
-            var_95 = np.percentile(returns, 5)  # 95% VaR
-            
-            # 計算最大回撤
-            cumulative = np.cumprod(1 + returns)
-            running_max = np.maximum.accumulate(cumulative)
-            drawdown = (cumulative - running_max) / running_max
-            max_drawdown = np.min(drawdown)
             
-            # 夏普比率
-            mean_return = np.mean(returns)
-            sharpe_ratio = mean_return / np.std(returns) * np.sqrt(252) if np.std(returns) > 0 else 0
+            analytics = self._analytics_risk_metrics(pair, timeframe, lookback_periods)
+            if analytics is not None:
+                volatility, var_95, max_drawdown, sharpe_ratio = analytics
+            else:
+                returns = np.diff(np.log(prices))
+                
+                # 基本風險指標
+                volatility = np.std(returns) * np.sqrt(252)  # 年化波動率
+                var_95 = np.percentile(returns, 5)  # 95% VaR
+                
+                # 計算最大回撤
+                cumulative = np.cumprod(1 + returns)
+                running_max = np.maximum.accumulate(cumulative)
+                drawdown = (cumulative - running_max) / running_max
+                max_drawdown = np.min(drawdown)
+                
+                # 夏普比率
+                mean_return = np.mean(returns)
+                sharpe_ratio = mean_return / np.std(returns) * np.sqrt(252) if np.std(returns) > 0 else 0
             
             # 技術指標
             rsi = self._calculate_rsi(prices)
@@ -293,6 +306,35 @@ class RiskAssessmentAI:
             logger.error(f"❌ 計算 {pair} 風險指標失敗: {e}")
             raise
     
+    def _analytics_risk_metrics(self, pair: str, timeframe: Optional[str],
+                                lookback_periods: Optional[int] = None) -> Optional[Tuple[float, float, float, float]]:
+        """
+        從風險分析服務讀取 (波動率, VaR95, 最大回撤, 夏普比率)
+        
+        沿用原有口徑：按252期年化，VaR為5%分位收益率（負數），最大回撤為負數；
+        lookback_periods 根K線對應最近 lookback_periods-1 個收益率，服務窗口更長時只取這一段；
+        服務未設置或窗口數據不足時返回 None
+        """
+        if self.risk_analytics is None or timeframe is None:
+            return None
+        try:
+            self.risk_analytics.refresh(pair, timeframe)
+            observations = self.risk_analytics.observations(pair, timeframe)
+            count = observations if lookback_periods is None else min(observations, lookback_periods - 1)
+            if count < 2:
+                return None
+            
+            # 最近 count 個收益率的統計量由服務按窗口版本緩存，重複查詢不再重算
+            return (
+                self.risk_analytics.volatility(pair, timeframe, periods_per_year=252, lookback=count),
+                -self.risk_analytics.value_at_risk(pair, timeframe, 0.95, lookback=count),
+                -self.risk_analytics.max_drawdown(pair, timeframe, lookback=count),
+                self.risk_analytics.sharpe_ratio(pair, timeframe, periods_per_year=252, lookback=count)
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 風險分析服務查詢 {pair} 失敗，改用即時計算: {e}")
+            return None
+    
     def _calculate_rsi(self, prices: np.ndarray, period: int = 14) -> float:
         """計算RSI指標"""
         try:
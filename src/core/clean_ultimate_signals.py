@@ -11,6 +11,8 @@ from datetime import datetime
 from typing import Dict, List
 import logging
 
+from . import indicator_kernels as kernels
+
 logger = logging.getLogger(__name__)
 
 class UltimateOptimizedVolumeEnhancedMACDSignals:
@@ -23,14 +25,10 @@ class UltimateOptimizedVolumeEnhancedMACDSignals:
         """計算MACD指標"""
         df = df.copy()
         
-        # 計算EMA
-        ema_fast = df['close'].ewm(span=fast).mean()
-        ema_slow = df['close'].ewm(span=slow).mean()
-        
-        # 計算MACD線
-        df['macd'] = ema_fast - ema_slow
-        df['macd_signal'] = df['macd'].ewm(span=signal).mean()
-        df['macd_hist'] = df['macd'] - df['macd_signal']
+        # 計算MACD線、信號線與柱狀圖
+        df['macd'], df['macd_signal'], df['macd_hist'] = kernels.macd(
+            df['close'], fast=fast, slow=slow, signal=signal
+        )
         
         return df
     
@@ -39,22 +37,14 @@ class UltimateOptimizedVolumeEnhancedMACDSignals:
         df = df.copy()
         
         # 基本成交量指標
-        df['volume_ma20'] = df['volume'].rolling(window=20).mean()
-        df['volume_ratio'] = df['volume'] / df['volume_ma20']
+        df['volume_ma20'], df['volume_ratio'] = kernels.volume_ratio(df['volume'], window=20)
         
         # RSI指標
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        df['rsi'] = kernels.rsi(df['close'], period=14)
         
         # 布林帶
-        df['bb_middle'] = df['close'].rolling(window=20).mean()
-        bb_std = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-        df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
+        df['bb_middle'], df['bb_upper'], df['bb_lower'], df['bb_position'] = \
+            kernels.bollinger_bands(df['close'], window=20, num_std=2)
         
         # 移動平均線
         df['ma20'] = df['close'].rolling(window=20).mean()
@@ -18,6 +18,9 @@ from .dynamic_trading_data_structures import (
 )
 from ..data.tracking_data_manager import TrackingDataManager
 from ..data.historical_data_manager import HistoricalDataManager
+from ..data.candle_archive import get_candle_archive
+from ..data.kline_storage import datetime_to_unix_seconds
+from .parameter_sweep import ParameterSweepEngine
 
 logger = logging.getLogger(__name__)
 
@@ -73,11 +76,13 @@ class DynamicBacktestEngine:
         self.dynamic_signals = DynamicTradingSignals(config)
         self.data_manager = TrackingDataManager(config.performance_config)
         self.historical_data_manager = HistoricalDataManager()
+        self.candle_archive = get_candle_archive()
         
         # 回測狀態
         self.is_running = False
         self.current_backtest_id = None
         self.progress_callback = None
+        self.parameter_sweep: Optional[ParameterSweepEngine] = None
         
         logger.info("動態回測引擎初始化完成")
     
@@ -148,8 +153,13 @@ class DynamicBacktestEngine:
     def _get_historical_data(self, symbol: str, start_date: datetime, end_date: datetime) -> pd.DataFrame:
         """獲取歷史數據"""
         try:
-            # 嘗試從歷史數據管理器獲取
-            data = self.historical_data_manager.get_data(symbol, start_date, end_date)
+            # 先將數據庫中的新K線增量同步到本地檔案庫，再以記憶體映射讀取所需範圍
+            market = symbol.lower()
+            self.candle_archive.sync_from_storage(self.historical_data_manager.storage, market, '1m')
+            # 與模擬數據相同以時間戳為索引，策略回測按時間索引讀取K線
+            data = self.candle_archive.load_dataframe(
+                market, '1m', start=datetime_to_unix_seconds(start_date), end=datetime_to_unix_seconds(end_date)
+            ).set_index('timestamp')
             
             if data is None or data.empty:
                 # 生成模擬數據
@@ -437,6 +447,8 @@ class DynamicBacktestEngine:
     def stop_backtest(self):
         """停止回測"""
         self.is_running = False
+        if self.parameter_sweep:
+            self.parameter_sweep.stop()
         logger.info("回測已停止")
     
     def get_backtest_status(self) -> Dict[str, Any]:
@@ -456,77 +468,82 @@ class DynamicBacktestEngine:
                                  symbol: str,
                                  start_date: datetime,
                                  end_date: datetime,
-                                 parameter_ranges: Dict[str, List[float]]) -> Dict[str, Any]:
-        """參數優化回測"""
+                                 parameter_ranges: Dict[str, List[float]],
+                                 initial_capital: float = 1000000.0,
+                                 max_workers: Optional[int] = None,
+                                 results_file: Optional[str] = None,
+                                 stop_condition: Optional[callable] = None,
+                                 result_callback: Optional[callable] = None) -> Dict[str, Any]:
+        """
+        參數優化回測（數據只載入一次，參數組合並行評估）
+        
+        Args:
+            max_workers: 進程數，預設為CPU核心數
+            results_file: JSONL結果文件，中斷後以同一文件重新調用即可續跑
+            stop_condition: 收到每個結果後調用，返回True時提前終止
+            result_callback: 每個組合完成時的回調
+        """
         
         logger.info(f"開始參數優化: {len(parameter_ranges)} 個參數")
         
-        best_result = None
-        best_params = None
-        best_improvement = float('-inf')
-        
-        optimization_results = []
-        
         try:
             # 生成參數組合
             param_combinations = self._generate_parameter_combinations(parameter_ranges)
             
-            for i, params in enumerate(param_combinations):
-                if not self.is_running:
-                    break
-                
-                # 更新配置
-                test_config = self._create_config_with_params(params)
-                original_config = self.config
-                self.config = test_config
-                self.dynamic_signals = DynamicTradingSignals(test_config)
-                
-                try:
-                    # 執行回測
-                    result = self.run_backtest(symbol, start_date, end_date)
-                    
-                    # 評估結果
-                    improvement = result.total_improvement
-                    
-                    optimization_results.append({
-                        'parameters': params,
-                        'improvement': improvement,
-                        'win_rate': result.win_rate,
-                        'total_trades': result.total_trades,
-                        'sharpe_ratio': result.sharpe_ratio
-                    })
-                    
-                    # 更新最佳結果
-                    if improvement > best_improvement:
-                        best_improvement = improvement
-                        best_result = result
-                        best_params = params
-                    
-                    logger.info(f"參數組合 {i+1}/{len(param_combinations)}: 改善 {improvement:,.0f}")
-                    
-                except Exception as e:
-                    logger.error(f"參數組合 {i+1} 回測失敗: {e}")
-                
-                finally:
-                    # 恢復原始配置
-                    self.config = original_config
-                    self.dynamic_signals = DynamicTradingSignals(original_config)
+            historical_data = self._get_historical_data(symbol, start_date, end_date)
+            if historical_data.empty:
+                raise ValueError(f"無法獲取 {symbol} 的歷史數據")
+            
+            # 時間戳索引作為 timestamp 列一併共享，子進程重建與 run_backtest 相同的時間索引
+            shared_data = {'timestamp': historical_data.index.to_numpy()}
+            shared_data.update({column: historical_data[column].to_numpy() for column in historical_data.columns})
+            
+            self.parameter_sweep = ParameterSweepEngine(
+                evaluate=evaluate_parameter_combination,
+                data=shared_data,
+                context={
+                    'config': self.config,
+                    'start_date': start_date,
+                    'end_date': end_date,
+                    'initial_capital': initial_capital
+                },
+                max_workers=max_workers,
+                results_file=results_file,
+                score_key='improvement'
+            )
+            
+            self.is_running = True
+            sweep = self.parameter_sweep.run(param_combinations, stop_condition, result_callback)
+            best = sweep['best']
             
             return {
-                'best_parameters': best_params,
-                'best_result': best_result.get_summary() if best_result else None,
-                'best_improvement': best_improvement,
-                'all_results': optimization_results,
+                'best_parameters': best['parameters'] if best else None,
+                'best_result': best['metrics']['summary'] if best else None,
+                'best_improvement': best['metrics']['improvement'] if best else float('-inf'),
+                'all_results': [
+                    {'parameters': record['parameters'],
+                     **{key: record['metrics'][key] for key in
+                        ('improvement', 'win_rate', 'total_trades', 'sharpe_ratio')}}
+                    for record in sweep['results']
+                ],
                 'optimization_summary': {
-                    'total_combinations': len(param_combinations),
-                    'completed_combinations': len(optimization_results),
-                    'best_improvement': best_improvement
+                    'total_combinations': sweep['total_combinations'],
+                    'completed_combinations': sweep['completed_combinations'],
+                    'resumed_combinations': sweep['resumed_combinations'],
+                    'failed_combinations': sweep['failed_combinations'],
+                    'stopped_early': sweep['stopped_early'],
+                    'combinations_per_second': sweep['combinations_per_second'],
+                    'workers': sweep['workers'],
+                    'best_improvement': best['metrics']['improvement'] if best else float('-inf')
                 }
             }
             
         except Exception as e:
             logger.error(f"參數優化失敗: {e}")
             return {'error': str(e)}
+        finally:
+            self.is_running = False
+            self.parameter_sweep = None
     
     def _generate_parameter_combinations(self, parameter_ranges: Dict[str, List[float]]) -> List[Dict[str, float]]:
         """生成參數組合"""
@@ -566,6 +583,40 @@ class DynamicBacktestEngine:
         return new_config
 
 
+# 參數掃描子進程內共用的回測引擎（每個進程只創建一次）
+_sweep_engine: Optional[DynamicBacktestEngine] = None
+
+
+def evaluate_parameter_combination(data: Dict[str, np.ndarray],
+                                   params: Dict[str, float],
+                                   context: Dict[str, Any]) -> Dict[str, Any]:
+    """在共享的只讀歷史數據上評估單個參數組合（參數掃描的評估函數）"""
+    global _sweep_engine
+    base_config = context['config']
+    if _sweep_engine is None:
+        _sweep_engine = DynamicBacktestEngine(base_config)
+    
+    engine = _sweep_engine
+    engine.config = base_config
+    engine.config = engine._create_config_with_params(params)
+    engine.is_running = True
+    
+    frame = pd.DataFrame(data, copy=False).set_index('timestamp')
+    dynamic_results = engine._run_dynamic_strategy_backtest(frame, context['initial_capital'])
+    result = engine._calculate_performance_metrics(
+        BacktestResult(start_date=context['start_date'], end_date=context['end_date']),
+        dynamic_results, [], frame
+    )
+    
+    return {
+        'improvement': result.total_improvement,
+        'win_rate': result.win_rate,
+        'total_trades': result.total_trades,
+        'sharpe_ratio': result.sharpe_ratio,
+        'summary': result.get_summary()
+    }
+
+
 # 工具函數
 def create_dynamic_backtest_engine(config: Optional[DynamicTradingConfig] = None) -> DynamicBacktestEngine:
     """創建動態回測引擎"""
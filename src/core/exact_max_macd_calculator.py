@@ -7,6 +7,8 @@
 import pandas as pd
 import numpy as np
 
+from . import indicator_kernels as kernels
+
 class ExactMaxMACDCalculator:
     """完全精確的MAX MACD計算器"""
     
@@ -21,31 +23,7 @@ class ExactMaxMACDCalculator:
             alpha_multiplier: alpha乘數 (默認1.0)
             init_method: 初始化方法 ('first', 'sma', 'zero')
         """
-        alpha = (2.0 / (period + 1)) * alpha_multiplier
-        result = pd.Series(index=series.index, dtype=float)
-        
-        if init_method == 'first':
-            result.iloc[0] = series.iloc[0]
-        elif init_method == 'sma':
-            if len(series) >= period:
-                result.iloc[period-1] = series.iloc[:period].mean()
-                # 填充前面的NaN
-                for i in range(period-1):
-                    result.iloc[i] = np.nan
-            else:
-                result.iloc[0] = series.iloc[0]
-        elif init_method == 'zero':
-            result.iloc[0] = 0
-        
-        start_idx = period if init_method == 'sma' and len(series) >= period else 1
-        
-        for i in range(start_idx, len(series)):
-            if pd.isna(result.iloc[i-1]):
-                result.iloc[i] = series.iloc[i]
-            else:
-                result.iloc[i] = alpha * series.iloc[i] + (1 - alpha) * result.iloc[i-1]
-        
-        return result
+        return kernels.ema(series, period, alpha_multiplier, init_method)
     
     @staticmethod
     def calculate_exact_macd(df):
@@ -11,6 +11,8 @@ from datetime import datetime
 from typing import Dict, List, Tuple
 import logging
 
+from . import indicator_kernels as kernels
+
 logger = logging.getLogger(__name__)
 
 class Final85PercentStrategy:
@@ -26,14 +28,10 @@ class Final85PercentStrategy:
         """計算MACD指標"""
         df = df.copy()
         
-        # 計算EMA
-        ema_fast = df['close'].ewm(span=12).mean()
-        ema_slow = df['close'].ewm(span=26).mean()
-        
-        # 計算MACD線
-        df['macd'] = ema_fast - ema_slow
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-        df['macd_hist'] = df['macd'] - df['macd_signal']
+        # 計算MACD線、信號線與柱狀圖
+        df['macd'], df['macd_signal'], df['macd_hist'] = kernels.macd(
+            df['close'], fast=12, slow=26, signal=9
+        )
         
         return df
     
@@ -42,36 +40,20 @@ class Final85PercentStrategy:
         df = df.copy()
         
         # 基本成交量指標
-        df['volume_ma20'] = df['volume'].rolling(window=20).mean()
-        df['volume_ratio'] = df['volume'] / df['volume_ma20']
+        df['volume_ma20'], df['volume_ratio'] = kernels.volume_ratio(df['volume'], window=20)
         
         # 成交量趨勢強度
-        df['volume_ma5'] = df['volume'].rolling(window=5).mean()
-        df['volume_trend'] = df['volume_ma5'].pct_change(periods=3)
+        df['volume_ma5'], df['volume_trend'] = kernels.volume_trend(df['volume'], window=5, periods=3)
         
         # RSI指標 - 優化參數
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        df['rsi'] = kernels.rsi(df['close'], period=14)
         
         # 布林帶
-        df['bb_middle'] = df['close'].rolling(window=20).mean()
-        bb_std = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-        df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
+        df['bb_middle'], df['bb_upper'], df['bb_lower'], df['bb_position'] = \
+            kernels.bollinger_bands(df['close'], window=20, num_std=2)
         
         # OBV能量潮
-        df['obv'] = 0.0
-        for i in range(1, len(df)):
-            if df.iloc[i]['close'] > df.iloc[i-1]['close']:
-                df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] + df.iloc[i]['volume']
-            elif df.iloc[i]['close'] < df.iloc[i-1]['close']:
-                df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] - df.iloc[i]['volume']
-            else:
-                df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv']
+        df['obv'] = kernels.obv(df['close'], df['volume'])
         
         df['obv_trend'] = df['obv'].pct_change(periods=5)
         
@@ -12,11 +12,17 @@ from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 import json
 import logging
+from collections import deque
+
+from .streaming_indicators import StreamingEMA
 
 # 設置日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 輪詢增量計算時保留的已收盤K線 MACD 結果數
+MAX_STREAM_ROWS = 5000
+
 @dataclass
 class MACDData:
     """MACD 數據結構"""
@@ -67,6 +73,9 @@ class ImprovedMaxMACDCalculator:
         # 載入真實的 MAX 參考數據
         self.reference_data = self._load_reference_data()
         
+        # 實時更新用的增量EMA狀態
+        self.reset_stream()
+        
         logger.info(f"MAX MACD Calculator 初始化完成，載入 {len(self.reference_data)} 個參考數據點")
     
     def _load_reference_data(self) -> Dict[str, MACDData]:
@@ -143,6 +152,100 @@ class ImprovedMaxMACDCalculator:
         
         return macd_line[signal_start:], signal_line, histogram
     
+    def reset_stream(self, alpha_multiplier: float = 1.0, init_method: str = 'sma'):
+        """重置增量 MACD 狀態"""
+        self.stream = {
+            'fast': StreamingEMA(self.fast_period, init_method=init_method, alpha_multiplier=alpha_multiplier),
+            'slow': StreamingEMA(self.slow_period, init_method=init_method, alpha_multiplier=alpha_multiplier),
+            'signal': StreamingEMA(self.signal_period, init_method=init_method, alpha_multiplier=alpha_multiplier)
+        }
+        # calculate_macd 按列表位置配對快慢線；'sma' 初始化時快線列表比慢線早
+        # slow_period - fast_period 根開始，慢線與這麼多根之前的快線值相減
+        self.fast_lag = self.slow_period - self.fast_period if init_method == 'sma' else 0
+        self.fast_history = deque(maxlen=self.fast_lag)
+        self.stream_settings = (alpha_multiplier, init_method)
+        self.stream_rows: Dict = {}
+        self.stream_last_timestamp = None
+    
+    def update_macd(self, price: float, closed: bool = True) -> Optional[Tuple[float, float, float]]:
+        """
+        增量更新 MACD（每次 O(1)），結果與相同參數的 calculate_macd 最後一個值一致
+        
+        Args:
+            price: 最新收盤價
+            closed: K線已收盤則提交狀態；False 表示當前K線跳動，只計算不提交
+            
+        Returns:
+            (macd_line, signal_line, histogram)，數據不足時返回 None
+        """
+        step = 'push' if closed else 'peek'
+        fast = getattr(self.stream['fast'], step)(price)
+        slow = getattr(self.stream['slow'], step)(price)
+        
+        paired_fast = fast
+        if fast is not None and self.fast_lag:
+            history = self.fast_history
+            paired_fast = history[0] if len(history) == self.fast_lag else None
+            if closed:
+                history.append(fast)
+        if paired_fast is None or slow is None:
+            return None
+        
+        macd_value = round(paired_fast - slow, 1)
+        signal_value = getattr(self.stream['signal'], step)(macd_value)
+        if signal_value is None:
+            return None
+        
+        signal_value = round(signal_value, 1)
+        return macd_value, signal_value, round(macd_value - signal_value, 1)
+    
+    def stream_macd_series(self, timestamps: List, prices: List[float]) -> Tuple[List[float], List[float], List[float]]:
+        """
+        輪詢時以增量狀態計算一段K線的 MACD
+        
+        最後一根視為未收盤K線，只計算不提交。首次調用或與上次提交的K線接不上時以這段K線
+        重建狀態（結果與 calculate_macd 一致），之後每次只提交上次之後新收盤的K線。
+        
+        Returns:
+            與輸入等長的 (macd_line, signal_line, histogram)，數據不足處為 NaN
+        """
+        timestamps, prices = list(timestamps), list(prices)
+        if not prices:
+            return [], [], []
+        
+        last = self.stream_last_timestamp
+        closed = timestamps[:-1]
+        if last is not None and last in closed:
+            start = closed.index(last) + 1
+        else:
+            self.reset_stream(*self.stream_settings)
+            start = 0
+        
+        for timestamp, price in zip(closed[start:], prices[start:-1]):
+            self.stream_rows[timestamp] = self.update_macd(price)
+            self.stream_last_timestamp = timestamp
+        current = self.update_macd(prices[-1], closed=False)
+        
+        while len(self.stream_rows) > MAX_STREAM_ROWS:
+            del self.stream_rows[next(iter(self.stream_rows))]
+        
+        missing = (np.nan, np.nan, np.nan)
+        rows = [self.stream_rows.get(timestamp) or missing for timestamp in closed] + [current or missing]
+        macd_line, signal_line, histogram = (list(values) for values in zip(*rows))
+        return macd_line, signal_line, histogram
+    
+    def get_stream_state(self) -> Dict:
+        """導出增量狀態（用於重啟後續算）"""
+        state = {name: ema.state() for name, ema in self.stream.items()}
+        state['fast_history'] = list(self.fast_history)
+        return state
+    
+    def restore_stream_state(self, state: Dict):
+        """恢復增量狀態"""
+        for name, ema in self.stream.items():
+            ema.restore(state[name])
+        self.fast_history = deque(state['fast_history'], maxlen=self.fast_lag)
+    
     def validate_against_reference(self, prices: List[float], timestamps: List[str],
                                  alpha_multiplier: float = 1.0, init_method: str = 'sma') -> Dict:
         """使用參考數據驗證計算結果"""
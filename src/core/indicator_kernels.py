@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共用技術指標核心 - 以NumPy陣列實現的向量化指標計算
+取代各信號引擎中逐行 df.iloc[i] 讀寫的迴圈，輸出與原實現逐位元一致
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float_array(series: pd.Series) -> np.ndarray:
+    """取得序列的float64陣列（不複製已是float64的數據）"""
+    return np.asarray(series, dtype=np.float64)
+
+
+def macd(close: pd.Series, fast: int = 12, slow: int = 26,
+         signal: int = 9) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """
+    標準MACD (pandas ewm, adjust=True)
+
+    Returns:
+        (macd, macd_signal, macd_hist)
+    """
+    ema_fast = close.ewm(span=fast).mean()
+    ema_slow = close.ewm(span=slow).mean()
+
+    macd_line = ema_fast - ema_slow
+    macd_signal = macd_line.ewm(span=signal).mean()
+    macd_hist = macd_line - macd_signal
+
+    return macd_line, macd_signal, macd_hist
+
+
+def ema(series: pd.Series, period: float, alpha_multiplier: float = 1.0,
+        init_method: str = 'first') -> pd.Series:
+    """
+    自定義遞迴EMA - 與 ExactMaxMACDCalculator.calculate_custom_ema 結果一致
+
+    遞迴本身無法向量化，因此在原生float列表上執行，避免pandas逐元素索引開銷。
+
+    Args:
+        series: 價格序列
+        period: EMA週期
+        alpha_multiplier: alpha乘數
+        init_method: 初始化方法 ('first', 'sma', 'zero')
+    """
+    alpha = (2.0 / (period + 1)) * alpha_multiplier
+    values = _as_float_array(series).tolist()
+    n = len(values)
+    result = [math.nan] * n
+
+    if n == 0:
+        return pd.Series(result, index=series.index, dtype=float)
+
+    start_idx = 1
+    if init_method == 'first':
+        result[0] = values[0]
+    elif init_method == 'sma':
+        window = int(period)
+        if n >= window:
+            result[window - 1] = float(series.iloc[:window].mean())
+            start_idx = window
+        else:
+            result[0] = values[0]
+    elif init_method == 'zero':
+        result[0] = 0.0
+
+    prev = result[start_idx - 1]
+    for i in range(start_idx, n):
+        if math.isnan(prev):
+            prev = values[i]
+        else:
+            prev = alpha * values[i] + (1 - alpha) * prev
+        result[i] = prev
+
+    return pd.Series(result, index=series.index, dtype=float)
+
+
+def obv(close: pd.Series, volume: pd.Series) -> pd.Series:
+    """
+    OBV能量潮 - 收盤上漲累加成交量，下跌累減，持平不變
+    """
+    close_values = _as_float_array(close)
+    volume_values = _as_float_array(volume)
+
+    signed_volume = np.zeros(len(close_values), dtype=np.float64)
+    if len(close_values) > 1:
+        diff = close_values[1:] - close_values[:-1]
+        signed_volume[1:] = np.where(
+            diff > 0, volume_values[1:],
+            np.where(diff < 0, -volume_values[1:], 0.0)
+        )
+
+    return pd.Series(np.cumsum(signed_volume), index=close.index)
+
+
+def rsi(close: pd.Series, period: int = 14) -> pd.Series:
+    """RSI指標（簡單移動平均版本）"""
+    delta = _as_float_array(close.diff())
+    gain = pd.Series(np.where(delta > 0, delta, 0.0), index=close.index)
+    loss = pd.Series(np.where(delta < 0, -delta, 0.0), index=close.index)
+
+    rs = gain.rolling(window=period).mean() / loss.rolling(window=period).mean()
+    return 100 - (100 / (1 + rs))
+
+
+def bollinger_bands(close: pd.Series, window: int = 20,
+                    num_std: float = 2) -> Tuple[pd.Series, pd.Series, pd.Series, pd.Series]:
+    """
+    布林帶
+
+    Returns:
+        (bb_middle, bb_upper, bb_lower, bb_position)
+    """
+    rolling = close.rolling(window=window)
+    middle = rolling.mean()
+    std = rolling.std()
+
+    upper = middle + (std * num_std)
+    lower = middle - (std * num_std)
+    position = (close - lower) / (upper - lower)
+
+    return middle, upper, lower, position
+
+
+def atr(high: pd.Series, low: pd.Series, close: pd.Series, period: int = 14) -> pd.Series:
+    """ATR平均真實波幅（真實波幅的簡單移動平均）"""
+    high_values = _as_float_array(high)
+    low_values = _as_float_array(low)
+    prev_close = _as_float_array(close.shift(1))
+
+    true_range = np.fmax(
+        high_values - low_values,
+        np.fmax(np.abs(high_values - prev_close), np.abs(low_values - prev_close))
+    )
+
+    return pd.Series(true_range, index=close.index).rolling(window=period).mean()
+
+
+def volume_ratio(volume: pd.Series, window: int = 20) -> Tuple[pd.Series, pd.Series]:
+    """
+    相對成交量
+
+    Returns:
+        (volume_ma, volume_ratio)
+    """
+    volume_ma = volume.rolling(window=window).mean()
+    return volume_ma, volume / volume_ma
+
+
+def volume_trend(volume: pd.Series, window: int = 5, periods: int = 3) -> Tuple[pd.Series, pd.Series]:
+    """
+    成交量趨勢強度（短期成交量均線的變化率）
+
+    Returns:
+        (volume_ma, volume_trend)
+    """
+    volume_ma = volume.rolling(window=window).mean()
+    return volume_ma, volume_ma.pct_change(periods=periods)
@@ -379,6 +379,60 @@ class MultiTimeframeSignalValidator:
             logger.error(f"1小時賣出信號驗證失敗: {e}")
             return False
 
+# 1小時MA策略參數與狀態編碼
+MA_CROSS_THRESHOLD = 100  # 穿越閾值（元）
+MA_STATE_WAITING = 0
+MA_STATE_BUY = 1
+MA_STATE_OBSERVING_BUY = 2
+MA_STATE_BEAR_TRACKING = 3
+MA_STATE_SELL = 4
+MA_STATE_OBSERVING_SELL = 5
+MA_STATE_BULL_TRACKING = 6
+MA_STATE_SIDEWAYS = 7
+
+
+def _datetime_ns(values) -> np.ndarray:
+    """時間欄位轉為 int64 納秒（帶時區的統一轉為UTC）"""
+    values = pd.to_datetime(pd.Series(values))
+    if values.dt.tz is not None:
+        values = values.dt.tz_convert('UTC').dt.tz_localize(None)
+    return values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+class TimeframeColumns:
+    """單一時間週期按時間排序後的欄位數組，只排序/轉換一次，時間窗口以二分查找定位"""
+    
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.sort_values('datetime').reset_index(drop=True)
+        self.datetimes = self.df['datetime'].tolist()
+        self.closes = self.df['close'].tolist()
+        self.close = self.df['close'].to_numpy(dtype=float)
+        self.times = _datetime_ns(self.df['datetime'])
+        self._columns: Dict[str, np.ndarray] = {}
+    
+    def __len__(self) -> int:
+        return len(self.df)
+    
+    def column(self, name: str) -> np.ndarray:
+        """數值欄位（首次訪問時轉換並緩存）"""
+        if name not in self._columns:
+            self._columns[name] = self.df[name].to_numpy(dtype=float)
+        return self._columns[name]
+    
+    def locate(self, datetimes: List) -> np.ndarray:
+        """各時間點精確對應的第一行位置，沒有該時間的K線返回 -1"""
+        if not len(datetimes) or not len(self.times):
+            return np.full(len(datetimes), -1, dtype=np.int64)
+        targets = _datetime_ns(datetimes)
+        positions = np.searchsorted(self.times, targets, side='left')
+        matched = self.times[np.minimum(positions, len(self.times) - 1)] == targets
+        return np.where((positions < len(self.times)) & matched, positions, -1)
+    
+    def after(self, position: int) -> int:
+        """時間晚於第 position 行的第一行位置"""
+        return int(np.searchsorted(self.times, self.times[position], side='right'))
+
+
 class MultiTimeframeSignalDetectionEngine:
     """多時間週期策略信號檢測引擎"""
     
@@ -392,7 +446,12 @@ class MultiTimeframeSignalDetectionEngine:
         logger.info(f"初始化多時間框架信號檢測引擎，狀態已重置: waiting_for_confirmation={self.tracker.waiting_for_confirmation}")
         
     def detect_signals(self, hourly_df: pd.DataFrame, timeframe_dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
-        """檢測多時間週期策略信號"""
+        """
+        檢測多時間週期策略信號
+
+        各時間週期只排序並轉為數組一次：1小時金叉/死叉以向量化條件找出，持倉狀態只在交叉K線上推進；
+        15分/5分以二分查找定位每個1小時信號的搜索窗口，在連續的數組切片上完成價格搜索與追蹤
+        """
         logger.info(f"🎯 開始檢測多時間週期信號，1小時數據: {len(hourly_df)} 筆")
         signals = {
             '1h': [],
@@ -401,47 +460,11 @@ class MultiTimeframeSignalDetectionEngine:
             '5m': []
         }
         
-        # 處理1小時數據 - 需要順序處理每個信號
-        hourly_signals_to_process = []
-        
         # 重置tracker狀態，確保從乾淨狀態開始
         self.tracker.reset_all_states()
         
         # 首先收集所有有效的1小時信號（不被忽略的）
-        for i, row in hourly_df.iterrows():
-            previous_row = hourly_df.iloc[i-1] if i > 0 else None
-            
-            # 檢查1小時MACD買進信號
-            if self.validator.validate_hourly_buy_signal(row, previous_row):
-                # 檢查是否可以買進（不在持倉狀態）
-                if self.tracker.can_buy():
-                    hourly_signals_to_process.append({
-                        'datetime': row['datetime'],
-                        'close': row['close'],
-                        'signal_type': 'buy',
-                        'hourly_signal': f"1小時MACD金叉: {row['macd_hist']:.2f}",
-                        'macd_hist': row['macd_hist'],
-                        'macd': row['macd'],
-                        'macd_signal': row['macd_signal']
-                    })
-                    # 模擬執行買進，更新持倉狀態
-                    self.tracker.current_position = 1
-                
-            elif self.validator.validate_hourly_sell_signal(row, previous_row):
-                # 檢查是否可以賣出（在持倉狀態）
-                if self.tracker.can_sell():
-                    hourly_signals_to_process.append({
-                        'datetime': row['datetime'],
-                        'close': row['close'],
-                        'signal_type': 'sell',
-                        'hourly_signal': f"1小時MACD死叉: {row['macd_hist']:.2f}",
-                        'macd_hist': row['macd_hist'],
-                        'macd': row['macd'],
-                        'macd_signal': row['macd_signal']
-                    })
-                    # 模擬執行賣出，更新持倉狀態
-                    self.tracker.current_position = 0
-        
+        hourly_signals_to_process = self._collect_hourly_signals(hourly_df)
         logger.info(f"收集到 {len(hourly_signals_to_process)} 個1小時信號")
         
         # 按時間順序排序1小時信號
@@ -464,26 +487,18 @@ class MultiTimeframeSignalDetectionEngine:
                 'macd_signal': hourly_signal['macd_signal']
             })
             
-            # 不在這裡添加基準點信號，等到統一追蹤邏輯中找到真正觸發點時再添加
-            # 只記錄序號信息供後續使用
-            signal_type_text = '買' if hourly_signal['signal_type'] == 'buy' else '賣'
-            
             # 買進信號：使用當前pair_sequence，然後遞增
-            # 賣出信號：使用當前pair_sequence，不遞增（與前面的買進配對）
+            # 賣出信號：使用前一個序號（與前面的買進配對）
             if hourly_signal['signal_type'] == 'buy':
                 current_sequence = pair_sequence
                 pair_sequence += 1  # 買進後遞增，準備下一對
             else:
-                current_sequence = pair_sequence - 1  # 賣出使用前一個序號（與買進配對）
+                current_sequence = pair_sequence - 1
             
-            # 將序號信息添加到hourly_signal中，供統一追蹤邏輯使用
+            # 將序號信息添加到hourly_signal中，供短週期追蹤邏輯使用
             hourly_signal['sequence'] = current_sequence
-            
-            logger.info(f"準備搜索1小時{signal_type_text}{current_sequence}基準點觸發時機")
-            
-            # 暫時不在這裡處理30分鐘追蹤，改為統一處理
         
-        # 統一處理30分鐘追蹤邏輯
+        # 統一處理1小時MA策略
         try:
             logger.info(f"🚀 準備調用統一追蹤邏輯，timeframe_dfs keys: {list(timeframe_dfs.keys())}")
             self._process_30m_unified_tracking(timeframe_dfs, signals, hourly_signals_to_process)
@@ -493,11 +508,11 @@ class MultiTimeframeSignalDetectionEngine:
             import traceback
             traceback.print_exc()
         
-        # 處理15分鐘時間框架 - 使用30分鐘追蹤結果作為基準
+        # 處理15分鐘時間框架 - 搜索1小時觸發價格後動態追蹤
         if '15m' in timeframe_dfs and not timeframe_dfs['15m'].empty:
             self._process_15m_with_30m_tracking(timeframe_dfs['15m'], signals, hourly_signals_to_process)
         
-        # 處理5分鐘時間框架 - 完全獨立，複製30分鐘邏輯
+        # 處理5分鐘時間框架 - 與15分鐘相同的邏輯，完全獨立
         if '5m' in timeframe_dfs and not timeframe_dfs['5m'].empty:
             self._process_5m_independent_tracking(timeframe_dfs['5m'], signals, hourly_signals_to_process)
         
@@ -508,29 +523,69 @@ class MultiTimeframeSignalDetectionEngine:
         
         return result
     
-    # 舊的追蹤方法已移除，使用統一追蹤邏輯
+    def _collect_hourly_signals(self, hourly_df: pd.DataFrame) -> List[Dict]:
+        """
+        找出1小時MACD金叉/死叉（與 MultiTimeframeSignalValidator 的條件相同）
+        
+        交叉條件整列計算，持倉狀態只在交叉K線上推進：空倉時只接受金叉，持倉時只接受死叉
+        """
+        if hourly_df is None or hourly_df.empty:
+            return []
+        
+        hist = hourly_df['macd_hist'].to_numpy(dtype=float)
+        macd = hourly_df['macd'].to_numpy(dtype=float)
+        signal = hourly_df['macd_signal'].to_numpy(dtype=float)
+        prev_hist, prev_macd, prev_signal = (np.concatenate([[np.nan], values[:-1]]) for values in (hist, macd, signal))
+        
+        buy = (prev_hist < 0) & (prev_macd <= prev_signal) & (macd > signal) & (macd < 0) & (signal < 0)
+        sell = ~buy & (prev_hist > 0) & (prev_macd >= prev_signal) & (signal > macd) & (macd > 0) & (signal > 0)
+        
+        datetimes = hourly_df['datetime'].tolist()
+        closes = hourly_df['close'].tolist()
+        collected = []
+        for i in np.flatnonzero(buy | sell):
+            if buy[i] != self.tracker.can_buy():
+                continue
+            signal_type = 'buy' if buy[i] else 'sell'
+            cross_text = '金叉' if buy[i] else '死叉'
+            collected.append({
+                'datetime': datetimes[i],
+                'close': closes[i],
+                'signal_type': signal_type,
+                'hourly_signal': f"1小時MACD{cross_text}: {hist[i]:.2f}",
+                'macd_hist': hist[i],
+                'macd': macd[i],
+                'macd_signal': signal[i]
+            })
+            # 模擬執行買進/賣出，更新持倉狀態
+            self.tracker.current_position = 1 if buy[i] else 0
+        
+        return collected
     
     def _process_30m_unified_tracking(self, timeframe_dfs: Dict[str, pd.DataFrame], signals: Dict[str, List], hourly_signals: List):
-        """1小時MA動態判斷策略處理"""
+        """1小時MA動態判斷策略處理（MA狀態整列計算，持倉狀態只在觸發K線上推進）"""
         if '30m' not in timeframe_dfs or timeframe_dfs['30m'] is None or timeframe_dfs['30m'].empty:
             logger.warning("1小時MA數據為空，跳過MA策略處理")
             return
         
-        df_1h_ma = timeframe_dfs['30m']  # 實際是1小時MA數據
-        df_sorted = df_1h_ma.sort_values('datetime').reset_index(drop=True)
+        frame = TimeframeColumns(timeframe_dfs['30m'])  # 實際是1小時MA數據
+        logger.info(f"🔥 開始1小時MA動態判斷處理，共 {len(frame)} 筆1小時數據")
+        
+        if 'ma9' in frame.df.columns:
+            states, ma9, ma25, ma99 = self._classify_1h_ma_states(frame)
+        else:
+            states = np.full(len(frame), MA_STATE_WAITING)
+            ma9 = ma25 = ma99 = states
         
         # 為1小時MA策略創建獨立的持倉狀態
         ma_position = 0  # 0=空倉, 1=持倉
         ma_trade_sequence = 0
         
-        logger.info(f"🔥 開始1小時MA動態判斷處理，共 {len(df_sorted)} 筆1小時數據")
-        
-        for i, row in df_sorted.iterrows():
-            current_time = row['datetime']
-            current_price = row['close']
+        for i, state in enumerate(states.tolist()):
+            current_time = frame.datetimes[i]
+            current_price = frame.closes[i]
             
-            # 檢查是否有MA數據
-            if 'ma9' not in row or pd.isna(row['ma9']) or pd.isna(row['ma25']) or pd.isna(row['ma99']):
+            if state == MA_STATE_WAITING:
                 # 沒有MA數據，添加等待信號
                 signals['30m'].append({
                     'datetime': current_time,
@@ -549,17 +604,12 @@ class MultiTimeframeSignalDetectionEngine:
                 })
                 continue
             
-            ma9 = row['ma9']
-            ma25 = row['ma25']
-            ma99 = row['ma99']
-            
-            # 1小時MA動態判斷邏輯
-            trigger_result, tracking_signal, signal_type = self._process_1h_ma_strategy(
-                current_time, current_price, ma9, ma25, ma99, i, df_sorted
-            )
+            row_ma9, row_ma25, row_ma99 = ma9[i], ma25[i], ma99[i]
+            signal_type, tracking_signal = self._describe_1h_ma_state(state, row_ma9, row_ma25, row_ma99)
+            ma_values = {'ma9': row_ma9, 'ma25': row_ma25, 'ma99': row_ma99}
             
             # 處理交易信號 - 使用獨立的持倉狀態
-            if trigger_result:
+            if state in (MA_STATE_BUY, MA_STATE_SELL):
                 if signal_type == 'buy' and ma_position == 0:
                     # 執行買進
                     ma_trade_sequence += 1
@@ -575,32 +625,27 @@ class MultiTimeframeSignalDetectionEngine:
                         'macd': 0,
                         'macd_signal': 0,
                         'is_confirmed': True,
-                        'ma9': ma9,
-                        'ma25': ma25,
-                        'ma99': ma99
+                        **ma_values
                     })
                     logger.info(f"1小時MA買入交易完成: 買{ma_trade_sequence} - {tracking_signal}")
                     
                 elif signal_type == 'sell' and ma_position == 1:
-                    # 執行賣出 - 使用相同的序號（與買進配對）
+                    # 執行賣出 - 使用相同的序號（與買進配對），等下次買進時再遞增
                     ma_position = 0  # 設置為空倉
                     signals['30m'].append({
                         'datetime': current_time,
                         'close': current_price,
                         'signal_type': 'sell',
-                        'trade_sequence': ma_trade_sequence,  # 使用當前序號（與買進配對）
+                        'trade_sequence': ma_trade_sequence,
                         'timeframe': '30m',
                         'hourly_signal': f'🔴 1小時MA賣{ma_trade_sequence}: {tracking_signal}',
                         'macd_hist': 0,
                         'macd': 0,
                         'macd_signal': 0,
                         'is_confirmed': True,
-                        'ma9': ma9,
-                        'ma25': ma25,
-                        'ma99': ma99
+                        **ma_values
                     })
                     logger.info(f"1小時MA賣出交易完成: 賣{ma_trade_sequence} - {tracking_signal}")
-                    # 賣出後準備下一個交易對，但不在這裡遞增，等下次買進時再遞增
                 else:
                     # 無法交易（已有持倉或空倉）
                     position_status = "已持倉" if ma_position == 1 else "已空倉"
@@ -617,9 +662,7 @@ class MultiTimeframeSignalDetectionEngine:
                         'macd': 0,
                         'macd_signal': 0,
                         'is_blocked': True,
-                        'ma9': ma9,
-                        'ma25': ma25,
-                        'ma99': ma99
+                        **ma_values
                     })
             else:
                 # 添加追蹤信號
@@ -634,457 +677,189 @@ class MultiTimeframeSignalDetectionEngine:
                     'macd': 0,
                     'macd_signal': 0,
                     'is_tracking': True,
-                    'ma9': ma9,
-                    'ma25': ma25,
-                    'ma99': ma99
+                    **ma_values
                 })
     
-    def _process_1h_ma_strategy(self, current_time, current_price, ma9, ma25, ma99, current_index, df_sorted):
-        """1小時MA動態判斷核心邏輯"""
-        
-        # 策略參數 - 大幅降低閾值以增加觸發機會
-        CROSS_THRESHOLD = 100        # 穿越閾值（元）- 大幅降低閾值
-        CONFIRM_PERIODS = 1          # 確認週期數 - 降低確認要求
-        MA99_TREND_THRESHOLD = 0.001 # MA99趨勢閾值（0.1%）- 大幅降低閾值
-        
-        # 計算MA99趨勢（需要至少5期數據）
-        ma99_trend = 0
-        if current_index >= 5:
-            ma99_5_ago = df_sorted.iloc[current_index - 5]['ma99']
-            if not pd.isna(ma99_5_ago) and ma99_5_ago > 0:
-                ma99_trend = (ma99 - ma99_5_ago) / ma99_5_ago
-        
-        # 獲取前一期數據（用於確認穿越）
-        prev_ma9 = ma9
-        prev_ma25 = ma25
-        if current_index > 0:
-            prev_row = df_sorted.iloc[current_index - 1]
-            if 'ma9' in prev_row and not pd.isna(prev_row['ma9']):
-                prev_ma9 = prev_row['ma9']
-                prev_ma25 = prev_row['ma25']
-        
-        # 判斷當前市場狀態
-        if ma9 < ma99 and ma25 < ma99:
-            # 空頭市場（MA9和MA25都在MA99下方）
-            market_state = "空頭市場"
-            
-            if ma9 > ma25 + CROSS_THRESHOLD and prev_ma9 <= prev_ma25:
-                # 黃金交叉 - 簡化條件，不要求MA99趨勢
-                return True, f'🟢 1小時MA買進: 黃金交叉({ma9:,.0f}>{ma25:,.0f}) 空頭反彈', 'buy'
-            elif ma9 > ma25:
-                return False, f'🔵 1小時MA觀察: 空頭市場MA9({ma9:,.0f})>MA25({ma25:,.0f}) 等待確認', 'observing_buy'
-            else:
-                return False, f'⚪ 1小時MA追蹤: {market_state} MA9:{ma9:,.0f} MA25:{ma25:,.0f} MA99:{ma99:,.0f}', 'tracking'
-                
-        elif ma9 > ma99 and ma25 > ma99:
-            # 多頭市場（MA9和MA25都在MA99上方）
-            market_state = "多頭市場"
-            
-            if ma9 < ma25 - CROSS_THRESHOLD and prev_ma9 >= prev_ma25:
-                # 死亡交叉 - 簡化條件，不要求MA99趨勢
-                return True, f'🔴 1小時MA賣出: 死亡交叉({ma9:,.0f}<{ma25:,.0f}) 多頭回調', 'sell'
-            elif ma9 < ma25:
-                return False, f'🟠 1小時MA觀察: 多頭市場MA9({ma9:,.0f})<MA25({ma25:,.0f}) 等待確認', 'observing_sell'
-            else:
-                return False, f'⚪ 1小時MA追蹤: {market_state} MA9:{ma9:,.0f} MA25:{ma25:,.0f} MA99:{ma99:,.0f}', 'tracking'
-        else:
-            # 震盪市場（MA9和MA25跨越MA99）
-            return False, f'🟣 1小時MA震盪: 震盪市場 MA9:{ma9:,.0f} MA25:{ma25:,.0f} MA99:{ma99:,.0f}', 'sideways'
+    @staticmethod
+    def _classify_1h_ma_states(frame: 'TimeframeColumns') -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        整列判斷每根K線的1小時MA狀態
         
+        空頭市場（MA9、MA25都在MA99下方）中MA9上穿MA25超過閾值為買進，
+        多頭市場（都在MA99上方）中MA9下穿MA25超過閾值為賣出，前一期沒有MA時以當期代替
+        """
+        ma9, ma25, ma99 = frame.column('ma9'), frame.column('ma25'), frame.column('ma99')
+        
+        previous_valid = np.concatenate([[False], ~np.isnan(ma9[:-1])])
+        prev_ma9 = np.where(previous_valid, np.concatenate([[np.nan], ma9[:-1]]), ma9)
+        prev_ma25 = np.where(previous_valid, np.concatenate([[np.nan], ma25[:-1]]), ma25)
+        
+        bear = (ma9 < ma99) & (ma25 < ma99)
+        bull = ~bear & (ma9 > ma99) & (ma25 > ma99)
+        buy = bear & (ma9 > ma25 + MA_CROSS_THRESHOLD) & (prev_ma9 <= prev_ma25)
+        sell = bull & (ma9 < ma25 - MA_CROSS_THRESHOLD) & (prev_ma9 >= prev_ma25)
+        
+        states = np.select(
+            [np.isnan(ma9) | np.isnan(ma25) | np.isnan(ma99),
+             buy, bear & (ma9 > ma25), bear,
+             sell, bull & (ma9 < ma25), bull],
+            [MA_STATE_WAITING,
+             MA_STATE_BUY, MA_STATE_OBSERVING_BUY, MA_STATE_BEAR_TRACKING,
+             MA_STATE_SELL, MA_STATE_OBSERVING_SELL, MA_STATE_BULL_TRACKING],
+            default=MA_STATE_SIDEWAYS
+        )
+        return states, ma9, ma25, ma99
+    
+    @staticmethod
+    def _describe_1h_ma_state(state: int, ma9: float, ma25: float, ma99: float) -> Tuple[str, str]:
+        """1小時MA狀態對應的信號類型與說明文字"""
+        if state == MA_STATE_BUY:
+            return 'buy', f'🟢 1小時MA買進: 黃金交叉({ma9:,.0f}>{ma25:,.0f}) 空頭反彈'
+        if state == MA_STATE_OBSERVING_BUY:
+            return 'observing_buy', f'🔵 1小時MA觀察: 空頭市場MA9({ma9:,.0f})>MA25({ma25:,.0f}) 等待確認'
+        if state == MA_STATE_SELL:
+            return 'sell', f'🔴 1小時MA賣出: 死亡交叉({ma9:,.0f}<{ma25:,.0f}) 多頭回調'
+        if state == MA_STATE_OBSERVING_SELL:
+            return 'observing_sell', f'🟠 1小時MA觀察: 多頭市場MA9({ma9:,.0f})<MA25({ma25:,.0f}) 等待確認'
+        if state in (MA_STATE_BEAR_TRACKING, MA_STATE_BULL_TRACKING):
+            market_state = "空頭市場" if state == MA_STATE_BEAR_TRACKING else "多頭市場"
+            return 'tracking', f'⚪ 1小時MA追蹤: {market_state} MA9:{ma9:,.0f} MA25:{ma25:,.0f} MA99:{ma99:,.0f}'
+        return 'sideways', f'🟣 1小時MA震盪: 震盪市場 MA9:{ma9:,.0f} MA25:{ma25:,.0f} MA99:{ma99:,.0f}'
+    
     def _process_15m_with_30m_tracking(self, df: pd.DataFrame, signals: Dict[str, List], hourly_signals: List):
-        """處理15分鐘，使用搜索確認機制（複製30分鐘的搜索邏輯）"""
-        if df is None or df.empty:
-            print("15M: 數據為空，跳過處理")
-            return
-        
-        df_sorted = df.sort_values('datetime').reset_index(drop=True)
-        hourly_signals_sorted = sorted(hourly_signals, key=lambda x: x['datetime'])
-        
-        # 初始化信號列表
-        if '15m' not in signals:
-            signals['15m'] = []
-        
-        # 當前活躍的搜索狀態和追蹤狀態（複製30分鐘的搜索邏輯）
-        searching_reference = None  # 正在搜索的1小時基準點
-        current_reference = None    # 已找到並開始追蹤的基準點
-        tracking_lowest = None      # 追蹤最低點（買入用）
-        tracking_highest = None     # 追蹤最高點（賣出用）
-        
-        print(f"15M: 開始處理15分鐘，共 {len(df_sorted)} 筆數據")
-        
-        # 預先建立1小時基準點映射
-        hourly_reference_map = {}
-        for hourly_signal in hourly_signals_sorted:
-            hourly_reference_map[hourly_signal['datetime']] = hourly_signal
-            print(f"15M HOURLY MAP: {hourly_signal['datetime']} -> {hourly_signal['close']:,.0f} ({hourly_signal['signal_type']})")
-        
-        for i, row in df_sorted.iterrows():
-            current_time = row['datetime']
-            current_price = row['close']
-            
-            # 檢查是否有新的1小時基準點需要搜索
-            if current_time in hourly_reference_map:
-                hourly_signal = hourly_reference_map[current_time]
-                
-                # 從hourly_signal中獲取序號
-                sequence_num = hourly_signal.get('sequence')
-                
-                # 開始搜索1小時真正觸發價格
-                searching_reference = {
-                    'target_price': hourly_signal['close'],  # 要搜索的目標價格
-                    'type': hourly_signal['signal_type'],
-                    'sequence': sequence_num,
-                    'start_time': current_time,
-                    'hourly_time': current_time
-                }
-                
-                print(f"🔍 15M: 開始搜索1小時真正觸發價格 {hourly_signal['close']:,.0f} ({hourly_signal['signal_type']}{sequence_num})")
-                
-                # 不在這裡添加信號，等找到真正觸發點時再添加
-            
-            # 如果正在搜索，檢查是否找到目標價格
-            if searching_reference and current_time > searching_reference['start_time']:
-                target_price = searching_reference['target_price']
-                
-                # 檢查是否找到精確匹配的價格（允許小誤差）
-                if abs(current_price - target_price) < 0.1:
-                    # 找到了！設置為活躍的追蹤基準點
-                    current_reference = {
-                        'price': target_price,  # 使用1小時的目標價格
-                        'type': searching_reference['type'],
-                        'sequence': searching_reference['sequence'],
-                        'time': current_time,  # 實際找到的時間
-                        'hourly_time': searching_reference['hourly_time']  # 1小時觸發時間
-                    }
-                    
-                    print(f"✅ 15M: 已找到1小時觸發點！時間: {current_time}, 價格: {target_price:,.0f}")
-                    
-                    # 先添加基準點信號（在找到觸發點的時間顯示）
-                    signal_type_text = '買' if current_reference['type'] == 'buy' else '賣'
-                    base_signal = f'🔵 15分{signal_type_text}{current_reference["sequence"]}基準點' if current_reference['type'] == 'buy' else f'🔴 15分{signal_type_text}{current_reference["sequence"]}基準點'
-                    signal_type = 'buy_reference' if current_reference['type'] == 'buy' else 'sell_reference'
-                    
-                    signals['15m'].append({
-                        'datetime': current_time,  # 在實際找到觸發點的時間顯示基準點
-                        'close': target_price,
-                        'signal_type': signal_type,
-                        'trade_sequence': current_reference['sequence'],
-                        'timeframe': '15m',
-                        'hourly_signal': base_signal,
-                        'macd_hist': 0,
-                        'macd': 0,
-                        'macd_signal': 0,
-                        'is_reference': True,
-                        'reference_sequence': current_reference['sequence']
-                    })
-                    
-                    # 然後添加確認找到的信號
-                    found_signal = f'✅ 已找到1小時{signal_type_text}{current_reference["sequence"]}觸發點，開始動態追蹤'
-                    
-                    signals['15m'].append({
-                        'datetime': current_time,
-                        'close': target_price,  # 使用目標價格而不是當前價格
-                        'signal_type': f'{current_reference["type"]}_confirmed',
-                        'trade_sequence': current_reference['sequence'],
-                        'timeframe': '15m',
-                        'hourly_signal': found_signal,
-                        'macd_hist': row['macd_hist'],
-                        'macd': row['macd'],
-                        'macd_signal': row['macd_signal'],
-                        'is_confirmed': True,
-                        'target_price': target_price
-                    })
-                    
-                    # 初始化追蹤價格
-                    if current_reference['type'] == 'buy':
-                        tracking_lowest = target_price
-                        tracking_highest = None
-                        print(f"   初始化15分買入追蹤最低點: {tracking_lowest:,.0f}")
-                    else:
-                        tracking_highest = target_price
-                        tracking_lowest = None
-                        print(f"   初始化15分賣出追蹤最高點: {tracking_highest:,.0f}")
-                    
-                    # 清除搜索狀態
-                    searching_reference = None
-            
-            # 如果有活躍的基準點，進行追蹤（完全複製30分鐘邏輯）
-            if current_reference and current_time > current_reference['time']:
-                tracking_signal = '⚪ 追蹤中'
-                
-                if current_reference['type'] == 'buy':
-                    # 買入：持續更新最低點
-                    if tracking_lowest is None or current_price < tracking_lowest:
-                        tracking_lowest = current_price
-                    
-                    # 動態判斷基準：使用追蹤到的最低點
-                    dynamic_trigger_price = tracking_lowest
-                    tracking_signal = f'⚪ 追蹤中 {current_price:,.0f} →判斷基準: {dynamic_trigger_price:,.0f} (1小時基準: {current_reference["price"]:,.0f})'
-                    
-                    # 觸發條件：當前價格 > 追蹤到的最低點
-                    trigger_result = current_price > dynamic_trigger_price
-                    
-                else:
-                    # 賣出：持續更新最高點
-                    if tracking_highest is None or current_price > tracking_highest:
-                        tracking_highest = current_price
-                    
-                    # 動態判斷基準：使用追蹤到的最高點
-                    dynamic_trigger_price = tracking_highest
-                    tracking_signal = f'⚪ 追蹤中 {current_price:,.0f} →判斷基準: {dynamic_trigger_price:,.0f} (1小時基準: {current_reference["price"]:,.0f})'
-                    
-                    # 觸發條件：當前價格 < 追蹤到的最高點
-                    trigger_result = current_price < dynamic_trigger_price
-                
-                if trigger_result:
-                    # 觸發交易
-                    if current_reference['type'] == 'buy':
-                        signals['15m'].append({
-                            'datetime': current_time,
-                            'close': current_price,
-                            'signal_type': 'buy',
-                            'trade_sequence': current_reference['sequence'],
-                            'timeframe': '15m',
-                            'hourly_signal': f'🟢 15分買{current_reference["sequence"]} (已超過最低點買入)',
-                            'macd_hist': row['macd_hist'],
-                            'macd': row['macd'],
-                            'macd_signal': row['macd_signal'],
-                            'is_confirmed': True,
-                            'reference_sequence': current_reference['sequence'],
-                            'tracking_lowest': tracking_lowest  # 記錄追蹤到的最低點
-                        })
-                        print(f"15M買入交易完成: 15分買{current_reference['sequence']}, 最低點: {tracking_lowest:,.0f}")
-                        current_reference = None  # 清除活躍基準點
-                        
-                    else:
-                        signals['15m'].append({
-                            'datetime': current_time,
-                            'close': current_price,
-                            'signal_type': 'sell',
-                            'trade_sequence': current_reference['sequence'],
-                            'timeframe': '15m',
-                            'hourly_signal': f'🔴 15分賣{current_reference["sequence"]} (已低於最高點賣出)',
-                            'macd_hist': row['macd_hist'],
-                            'macd': row['macd'],
-                            'macd_signal': row['macd_signal'],
-                            'is_confirmed': True,
-                            'reference_sequence': current_reference['sequence'],
-                            'tracking_highest': tracking_highest  # 記錄追蹤到的最高點
-                        })
-                        print(f"15M賣出交易完成: 15分賣{current_reference['sequence']}, 最高點: {tracking_highest:,.0f}")
-                        current_reference = None  # 清除活躍基準點
-                else:
-                    # 沒有觸發，添加追蹤信號
-                    signals['15m'].append({
-                        'datetime': current_time,
-                        'close': current_price,
-                        'signal_type': 'tracking',
-                        'trade_sequence': 0,
-                        'timeframe': '15m',
-                        'hourly_signal': tracking_signal,
-                        'macd_hist': row['macd_hist'],
-                        'macd': row['macd'],
-                        'macd_signal': row['macd_signal'],
-                        'is_tracking': True,
-                        'reference_sequence': current_reference['sequence'],
-                        'tracking_lowest': tracking_lowest,
-                        'tracking_highest': tracking_highest
-                    })
+        """處理15分鐘，使用搜索確認機制"""
+        self._process_confirmation_tracking(df, signals, hourly_signals, '15m', '15分')
     
     def _process_5m_independent_tracking(self, df: pd.DataFrame, signals: Dict[str, List], hourly_signals: List):
-        """處理5分鐘，完全複製30分鐘的搜索邏輯，完全獨立"""
-        if df is None or df.empty:
-            print("5M: 數據為空，跳過處理")
-            return
-        
-        df_sorted = df.sort_values('datetime').reset_index(drop=True)
-        hourly_signals_sorted = sorted(hourly_signals, key=lambda x: x['datetime'])
-        
-        # 初始化信號列表
-        if '5m' not in signals:
-            signals['5m'] = []
-        
-        # 當前活躍的搜索狀態和追蹤狀態（完全複製30分鐘的邏輯）
-        searching_reference = None  # 正在搜索的1小時基準點
-        current_reference = None    # 已找到並開始追蹤的基準點
-        tracking_lowest = None      # 追蹤最低點（買入用）
-        tracking_highest = None     # 追蹤最高點（賣出用）
+        """處理5分鐘，與15分鐘相同的搜索確認機制，完全獨立"""
+        self._process_confirmation_tracking(df, signals, hourly_signals, '5m', '5分')
+    
+    def _process_confirmation_tracking(self, df: pd.DataFrame, signals: Dict[str, List], hourly_signals: List,
+                                       timeframe: str, label: str):
+        """
+        在短時間週期上搜索1小時信號的真正觸發價格，找到後動態追蹤最低/最高點
         
-        print(f"5M: 開始處理5分鐘，共 {len(df_sorted)} 筆數據")
+        1. 搜索：從1小時信號時間之後到下一個1小時信號開始之前，第一根收盤價與1小時收盤價相差小於0.1的K線
+        2. 追蹤：之後每根K線更新最低點（買）/最高點（賣），價格回升超過最低點即買進、回落低於最高點即賣出；
+           追蹤到下一個基準點被找到為止
         
-        # 預先建立1小時基準點映射
-        hourly_reference_map = {}
-        for hourly_signal in hourly_signals_sorted:
-            hourly_reference_map[hourly_signal['datetime']] = hourly_signal
+        兩個窗口都以二分查找定位，搜索與追蹤在窗口的數組切片上向量化完成
+        """
+        if df is None or df.empty:
+            logger.info(f"{timeframe}: 數據為空，跳過處理")
+            return
         
-        for i, row in df_sorted.iterrows():
-            current_time = row['datetime']
-            current_price = row['close']
+        frame = TimeframeColumns(df)
+        entries = signals.setdefault(timeframe, [])
+        logger.debug(f"{timeframe}: 開始處理，共 {len(frame)} 筆數據")
+        
+        # 1小時基準點按時間精確對齊到本週期的K線位置
+        reference_map = {signal['datetime']: signal for signal in sorted(hourly_signals, key=lambda x: x['datetime'])}
+        starts = frame.locate(list(reference_map))
+        searches = sorted((int(start), signal) for start, signal in zip(starts, reference_map.values()) if start >= 0)
+        
+        # 每個搜索窗口內第一根匹配目標價格的K線
+        found = []
+        for k, (start, hourly_signal) in enumerate(searches):
+            begin = frame.after(start)
+            end = searches[k + 1][0] if k + 1 < len(searches) else len(frame)
+            hits = np.flatnonzero(np.abs(frame.close[begin:end] - hourly_signal['close']) < 0.1)
+            if hits.size:
+                found.append((begin + int(hits[0]), hourly_signal))
+        
+        if not found:
+            return
+        macd_hist, macd, macd_signal = frame.column('macd_hist'), frame.column('macd'), frame.column('macd_signal')
+        
+        for m, (position, hourly_signal) in enumerate(found):
+            target_price = hourly_signal['close']
+            reference_type = hourly_signal['signal_type']
+            sequence = hourly_signal.get('sequence')
+            is_buy = reference_type == 'buy'
+            signal_type_text = '買' if is_buy else '賣'
+            logger.debug(f"✅ {timeframe}: 已找到1小時觸發點！時間: {frame.datetimes[position]}, 價格: {target_price:,.0f}")
+            
+            # 基準點信號與確認找到的信號（在實際找到觸發點的時間顯示，價格使用1小時目標價格）
+            entries.append({
+                'datetime': frame.datetimes[position],
+                'close': target_price,
+                'signal_type': f'{reference_type}_reference',
+                'trade_sequence': sequence,
+                'timeframe': timeframe,
+                'hourly_signal': f'{"🔵" if is_buy else "🔴"} {label}{signal_type_text}{sequence}基準點',
+                'macd_hist': 0,
+                'macd': 0,
+                'macd_signal': 0,
+                'is_reference': True,
+                'reference_sequence': sequence
+            })
+            entries.append({
+                'datetime': frame.datetimes[position],
+                'close': target_price,
+                'signal_type': f'{reference_type}_confirmed',
+                'trade_sequence': sequence,
+                'timeframe': timeframe,
+                'hourly_signal': f'✅ 已找到1小時{signal_type_text}{sequence}觸發點，開始動態追蹤',
+                'macd_hist': macd_hist[position],
+                'macd': macd[position],
+                'macd_signal': macd_signal[position],
+                'is_confirmed': True,
+                'target_price': target_price
+            })
             
-            # 檢查是否有新的1小時基準點需要搜索
-            if current_time in hourly_reference_map:
-                hourly_signal = hourly_reference_map[current_time]
-                sequence_num = hourly_signal.get('sequence')
-                
-                # 開始搜索1小時真正觸發價格
-                searching_reference = {
-                    'target_price': hourly_signal['close'],  # 要搜索的目標價格
-                    'type': hourly_signal['signal_type'],
-                    'sequence': sequence_num,
-                    'start_time': current_time,
-                    'hourly_time': current_time
-                }
-                
-                print(f"🔍 5M: 開始搜索1小時真正觸發價格 {hourly_signal['close']:,.0f} ({hourly_signal['signal_type']}{sequence_num})")
+            # 追蹤窗口：找到觸發點之後，到下一個基準點被找到為止
+            begin = frame.after(position)
+            end = found[m + 1][0] if m + 1 < len(found) else len(frame)
+            prices = frame.close[begin:end]
+            accumulate = np.fmin.accumulate if is_buy else np.fmax.accumulate
+            extremes = accumulate(np.concatenate([[target_price], prices]))
+            triggered = prices > extremes[:-1] if is_buy else prices < extremes[:-1]
+            triggers = np.flatnonzero(triggered)
+            stop = int(triggers[0]) if triggers.size else len(prices)
+            
+            for offset in range(stop):
+                i = begin + offset
+                extreme = extremes[offset + 1]
+                entries.append({
+                    'datetime': frame.datetimes[i],
+                    'close': frame.closes[i],
+                    'signal_type': 'tracking',
+                    'trade_sequence': 0,
+                    'timeframe': timeframe,
+                    'hourly_signal': f'⚪ 追蹤中 {frame.closes[i]:,.0f} →判斷基準: {extreme:,.0f} (1小時基準: {target_price:,.0f})',
+                    'macd_hist': macd_hist[i],
+                    'macd': macd[i],
+                    'macd_signal': macd_signal[i],
+                    'is_tracking': True,
+                    'reference_sequence': sequence,
+                    'tracking_lowest': extreme if is_buy else None,
+                    'tracking_highest': None if is_buy else extreme
+                })
             
-            # 如果正在搜索，檢查是否找到目標價格
-            if searching_reference and current_time > searching_reference['start_time']:
-                target_price = searching_reference['target_price']
-                
-                # 檢查是否找到精確匹配的價格（允許小誤差）
-                if abs(current_price - target_price) < 0.1:
-                    # 找到了！設置為活躍的追蹤基準點
-                    current_reference = {
-                        'price': target_price,  # 使用1小時的目標價格
-                        'type': searching_reference['type'],
-                        'sequence': searching_reference['sequence'],
-                        'time': current_time,  # 實際找到的時間
-                        'hourly_time': searching_reference['hourly_time']  # 1小時觸發時間
-                    }
-                    
-                    print(f"✅ 5M: 已找到1小時觸發點！時間: {current_time}, 價格: {target_price:,.0f}")
-                    
-                    # 先添加基準點信號（在找到觸發點的時間顯示）
-                    signal_type_text = '買' if current_reference['type'] == 'buy' else '賣'
-                    base_signal = f'🔵 5分{signal_type_text}{current_reference["sequence"]}基準點' if current_reference['type'] == 'buy' else f'🔴 5分{signal_type_text}{current_reference["sequence"]}基準點'
-                    signal_type = 'buy_reference' if current_reference['type'] == 'buy' else 'sell_reference'
-                    
-                    signals['5m'].append({
-                        'datetime': current_time,  # 在實際找到觸發點的時間顯示基準點
-                        'close': target_price,
-                        'signal_type': signal_type,
-                        'trade_sequence': current_reference['sequence'],
-                        'timeframe': '5m',
-                        'hourly_signal': base_signal,
-                        'macd_hist': 0,
-                        'macd': 0,
-                        'macd_signal': 0,
-                        'is_reference': True,
-                        'reference_sequence': current_reference['sequence']
-                    })
-                    
-                    # 然後添加確認找到的信號
-                    found_signal = f'✅ 已找到1小時{signal_type_text}{current_reference["sequence"]}觸發點，開始動態追蹤'
-                    
-                    signals['5m'].append({
-                        'datetime': current_time,
-                        'close': target_price,  # 使用目標價格而不是當前價格
-                        'signal_type': f'{current_reference["type"]}_confirmed',
-                        'trade_sequence': current_reference['sequence'],
-                        'timeframe': '5m',
-                        'hourly_signal': found_signal,
-                        'macd_hist': row['macd_hist'],
-                        'macd': row['macd'],
-                        'macd_signal': row['macd_signal'],
-                        'is_confirmed': True,
-                        'target_price': target_price
-                    })
-                    
-                    # 初始化追蹤價格
-                    if current_reference['type'] == 'buy':
-                        tracking_lowest = target_price
-                        tracking_highest = None
-                        print(f"   初始化5分買入追蹤最低點: {tracking_lowest:,.0f}")
-                    else:
-                        tracking_highest = target_price
-                        tracking_lowest = None
-                        print(f"   初始化5分賣出追蹤最高點: {tracking_highest:,.0f}")
-                    
-                    # 清除搜索狀態
-                    searching_reference = None
+            if not triggers.size:
+                continue
             
-            # 如果有活躍的基準點，進行追蹤（完全複製30分鐘邏輯）
-            if current_reference and current_time > current_reference['time']:
-                tracking_signal = '⚪ 追蹤中'
-                
-                if current_reference['type'] == 'buy':
-                    # 買入：持續更新最低點
-                    if tracking_lowest is None or current_price < tracking_lowest:
-                        tracking_lowest = current_price
-                    
-                    # 動態判斷基準：使用追蹤到的最低點
-                    dynamic_trigger_price = tracking_lowest
-                    tracking_signal = f'⚪ 追蹤中 {current_price:,.0f} →判斷基準: {dynamic_trigger_price:,.0f} (1小時基準: {current_reference["price"]:,.0f})'
-                    
-                    # 觸發條件：當前價格 > 追蹤到的最低點
-                    trigger_result = current_price > dynamic_trigger_price
-                    
-                else:
-                    # 賣出：持續更新最高點
-                    if tracking_highest is None or current_price > tracking_highest:
-                        tracking_highest = current_price
-                    
-                    # 動態判斷基準：使用追蹤到的最高點
-                    dynamic_trigger_price = tracking_highest
-                    tracking_signal = f'⚪ 追蹤中 {current_price:,.0f} →判斷基準: {dynamic_trigger_price:,.0f} (1小時基準: {current_reference["price"]:,.0f})'
-                    
-                    # 觸發條件：當前價格 < 追蹤到的最高點
-                    trigger_result = current_price < dynamic_trigger_price
-                
-                if trigger_result:
-                    # 觸發交易
-                    if current_reference['type'] == 'buy':
-                        signals['5m'].append({
-                            'datetime': current_time,
-                            'close': current_price,
-                            'signal_type': 'buy',
-                            'trade_sequence': current_reference['sequence'],
-                            'timeframe': '5m',
-                            'hourly_signal': f'🟢 5分買{current_reference["sequence"]} (已超過最低點買入)',
-                            'macd_hist': row['macd_hist'],
-                            'macd': row['macd'],
-                            'macd_signal': row['macd_signal'],
-                            'is_confirmed': True,
-                            'reference_sequence': current_reference['sequence'],
-                            'tracking_lowest': tracking_lowest  # 記錄追蹤到的最低點
-                        })
-                        print(f"5M買入交易完成: 5分買{current_reference['sequence']}, 最低點: {tracking_lowest:,.0f}")
-                        current_reference = None  # 清除活躍基準點
-                        
-                    else:
-                        signals['5m'].append({
-                            'datetime': current_time,
-                            'close': current_price,
-                            'signal_type': 'sell',
-                            'trade_sequence': current_reference['sequence'],
-                            'timeframe': '5m',
-                            'hourly_signal': f'🔴 5分賣{current_reference["sequence"]} (已低於最高點賣出)',
-                            'macd_hist': row['macd_hist'],
-                            'macd': row['macd'],
-                            'macd_signal': row['macd_signal'],
-                            'is_confirmed': True,
-                            'reference_sequence': current_reference['sequence'],
-                            'tracking_highest': tracking_highest  # 記錄追蹤到的最高點
-                        })
-                        print(f"5M賣出交易完成: 5分賣{current_reference['sequence']}, 最高點: {tracking_highest:,.0f}")
-                        current_reference = None  # 清除活躍基準點
-                else:
-                    # 沒有觸發，添加追蹤信號
-                    signals['5m'].append({
-                        'datetime': current_time,
-                        'close': current_price,
-                        'signal_type': 'tracking',
-                        'trade_sequence': 0,
-                        'timeframe': '5m',
-                        'hourly_signal': tracking_signal,
-                        'macd_hist': row['macd_hist'],
-                        'macd': row['macd'],
-                        'macd_signal': row['macd_signal'],
-                        'is_tracking': True,
-                        'reference_sequence': current_reference['sequence'],
-                        'tracking_lowest': tracking_lowest,
-                        'tracking_highest': tracking_highest
-                    })
+            # 觸發交易
+            i = begin + stop
+            extreme = extremes[stop + 1]
+            trade = {
+                'datetime': frame.datetimes[i],
+                'close': frame.closes[i],
+                'signal_type': reference_type,
+                'trade_sequence': sequence,
+                'timeframe': timeframe,
+                'hourly_signal': (f'🟢 {label}買{sequence} (已超過最低點買入)' if is_buy
+                                  else f'🔴 {label}賣{sequence} (已低於最高點賣出)'),
+                'macd_hist': macd_hist[i],
+                'macd': macd[i],
+                'macd_signal': macd_signal[i],
+                'is_confirmed': True,
+                'reference_sequence': sequence
+            }
+            trade['tracking_lowest' if is_buy else 'tracking_highest'] = extreme
+            entries.append(trade)
+            logger.debug(f"{timeframe}{'買入' if is_buy else '賣出'}交易完成: {label}{signal_type_text}{sequence}, "
+                         f"{'最低點' if is_buy else '最高點'}: {extreme:,.0f}")
 
     
     def get_statistics(self) -> Dict:
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+並行參數掃描引擎 - 數據只載入一次，參數組合分發到進程池
+市場數據放在共享記憶體中供子進程只讀訪問，結果邊完成邊回傳並追加寫入結果文件，
+中斷後可從結果文件續跑
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# evaluate(data, params, context) -> 指標字典
+EvaluateFunction = Callable[[Dict[str, np.ndarray], Dict[str, Any], Any], Dict[str, Any]]
+
+
+def parameter_key(params: Dict[str, Any]) -> str:
+    """參數組合的穩定鍵（用於續跑去重）"""
+    return json.dumps(params, sort_keys=True, default=float)
+
+
+class SharedMarketData:
+    """將多個列陣列放入同一塊共享記憶體"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        layout = []
+        offset = 0
+        arrays = {name: np.ascontiguousarray(values) for name, values in columns.items()}
+        for name, values in arrays.items():
+            layout.append((name, values.dtype.str, offset, len(values)))
+            offset += values.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (name, dtype, start, length), values in zip(layout, arrays.values()):
+            np.ndarray(length, dtype=dtype, buffer=self.shm.buf, offset=start)[:] = values
+
+        self.descriptor = (self.shm.name, layout)
+
+    @staticmethod
+    def attach(descriptor) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+        """在子進程中附加共享記憶體，返回只讀視圖"""
+        name, layout = descriptor
+        shm = shared_memory.SharedMemory(name=name)
+        views = {}
+        for column, dtype, start, length in layout:
+            view = np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start)
+            view.flags.writeable = False
+            views[column] = view
+        return shm, views
+
+    def close(self):
+        """釋放共享記憶體"""
+        self.shm.close()
+        self.shm.unlink()
+
+
+# 子進程狀態（由進程池 initializer 設定）
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(descriptor, evaluate: EvaluateFunction, context: Any):
+    shm, data = SharedMarketData.attach(descriptor)
+    _worker_state.update(shm=shm, data=data, evaluate=evaluate, context=context)
+
+
+def _run_in_worker(index: int, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Optional[str]]:
+    try:
+        metrics = _worker_state['evaluate'](_worker_state['data'], params, _worker_state['context'])
+        return index, metrics, None
+    except Exception as e:
+        return index, {}, str(e)
+
+
+class ParameterSweepEngine:
+    """並行參數掃描引擎"""
+
+    def __init__(self,
+                 evaluate: EvaluateFunction,
+                 data: Dict[str, np.ndarray],
+                 context: Any = None,
+                 max_workers: Optional[int] = None,
+                 results_file: Optional[str] = None,
+                 score_key: str = 'improvement'):
+        """
+        初始化參數掃描引擎
+
+        Args:
+            evaluate: 模組級評估函數（需可pickle），接收只讀數據、參數與上下文，返回指標字典
+            data: 列名到NumPy陣列的市場數據，只載入一次並共享給所有子進程
+            context: 傳給評估函數的額外上下文（每個子進程只傳遞一次）
+            max_workers: 進程數，預設為CPU核心數；1 表示在當前進程內執行
+            results_file: JSONL結果文件，每完成一個組合追加一行，存在時自動續跑
+            score_key: 用於挑選最佳結果的指標名
+        """
+        self.evaluate = evaluate
+        self.data = data
+        self.context = context
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.results_file = Path(results_file) if results_file else None
+        self.score_key = score_key
+
+        self._stop_event = threading.Event()
+        self.stats = {
+            'completed': 0,
+            'failed': 0,
+            'elapsed_seconds': 0.0,
+            'combinations_per_second': 0.0
+        }
+
+    def stop(self):
+        """請求提前終止（已提交的組合完成後停止）"""
+        self._stop_event.set()
+
+    @property
+    def is_stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def load_completed(self) -> Dict[str, Dict[str, Any]]:
+        """讀取結果文件中已完成的組合"""
+        completed = {}
+        if self.results_file is None or not self.results_file.exists():
+            return completed
+
+        with open(self.results_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中斷時可能留下寫到一半的最後一行
+                    logger.warning(f"⚠️ 跳過損壞的結果記錄: {self.results_file}")
+                    continue
+                if record.get('error') is None:
+                    completed[parameter_key(record['parameters'])] = record
+        return completed
+
+    def iter_results(self, combinations: Iterable[Dict[str, Any]],
+                     skip_keys: Optional[set] = None) -> Iterator[Dict[str, Any]]:
+        """
+        按完成順序逐個產出結果記錄
+
+        Returns:
+            {'index', 'parameters', 'metrics', 'error'} 字典的迭代器
+        """
+        skip_keys = skip_keys or set()
+        pending = [(i, params) for i, params in enumerate(combinations)
+                   if parameter_key(params) not in skip_keys]
+
+        self._stop_event.clear()
+        self.stats.update(completed=0, failed=0)
+        start_time = time.perf_counter()
+
+        output = open(self.results_file, 'a', encoding='utf-8') if self.results_file else None
+        try:
+            for index, params, metrics, error in self._execute(pending):
+                record = {'index': index, 'parameters': params, 'metrics': metrics, 'error': error}
+                if error is None:
+                    self.stats['completed'] += 1
+                else:
+                    self.stats['failed'] += 1
+                    logger.error(f"參數組合 {index + 1} 評估失敗: {error}")
+
+                if output:
+                    output.write(json.dumps(record, ensure_ascii=False, default=float) + '\n')
+                    output.flush()
+
+                elapsed = time.perf_counter() - start_time
+                self.stats['elapsed_seconds'] = elapsed
+                self.stats['combinations_per_second'] = (
+                    (self.stats['completed'] + self.stats['failed']) / elapsed if elapsed > 0 else 0.0
+                )
+                yield record
+        finally:
+            if output:
+                output.close()
+
+    def _execute(self, pending: List[Tuple[int, Dict[str, Any]]]):
+        """執行待評估組合，產出 (index, params, metrics, error)"""
+        if not pending:
+            return
+
+        if self.max_workers <= 1:
+            data = {}
+            for name, values in self.data.items():
+                data[name] = np.asarray(values).view()
+                data[name].flags.writeable = False
+
+            for index, params in pending:
+                if self.is_stopped:
+                    return
+                try:
+                    yield index, params, self.evaluate(data, params, self.context), None
+                except Exception as e:
+                    yield index, params, {}, str(e)
+            return
+
+        shared = SharedMarketData(self.data)
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(shared.descriptor, self.evaluate, self.context)) as pool:
+                queue = iter(pending)
+                in_flight = {}
+
+                def submit_next() -> bool:
+                    item = next(queue, None)
+                    if item is None:
+                        return False
+                    in_flight[pool.submit(_run_in_worker, *item)] = item[1]
+                    return True
+
+                # 只保持少量在途任務，提前終止時無需取消大量排隊任務
+                for _ in range(self.max_workers * 2):
+                    if not submit_next():
+                        break
+
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        params = in_flight.pop(future)
+                        index, metrics, error = future.result()
+                        yield index, params, metrics, error
+                        if not self.is_stopped:
+                            submit_next()
+        finally:
+            shared.close()
+
+    def run(self,
+            combinations: List[Dict[str, Any]],
+            stop_condition: Optional[Callable[[Dict[str, Any]], bool]] = None,
+            result_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        執行完整掃描
+
+        Args:
+            combinations: 參數組合列表
+            stop_condition: 收到每個結果後調用，返回True時提前終止
+            result_callback: 每個結果完成時回調（流式回傳）
+
+        Returns:
+            掃描摘要，包含最佳結果、全部結果與吞吐量
+        """
+        resumed = self.load_completed()
+        wanted = {parameter_key(params) for params in combinations}
+        resumed = {key: record for key, record in resumed.items() if key in wanted}
+        if resumed:
+            logger.info(f"🔁 從結果文件續跑: 已完成 {len(resumed)}/{len(combinations)} 個組合")
+
+        results = list(resumed.values())
+        total = len(combinations)
+        logger.info(f"🚀 開始參數掃描: {total} 個組合, {self.max_workers} 個進程")
+
+        for record in self.iter_results(combinations, skip_keys=set(resumed)):
+            if record['error'] is None:
+                results.append(record)
+            if result_callback:
+                result_callback(record)
+
+            done = len(results) + self.stats['failed']
+            if done % 50 == 0 or done == total:
+                logger.info(f"參數掃描進度: {done}/{total} "
+                            f"({self.stats['combinations_per_second']:.1f} 組合/秒)")
+
+            if stop_condition and record['error'] is None and stop_condition(record):
+                logger.info("⏹️ 達到提前終止條件，停止參數掃描")
+                self.stop()
+
+        best = max(results, key=lambda r: r['metrics'].get(self.score_key, float('-inf')), default=None)
+
+        return {
+            'best': best,
+            'results': results,
+            'total_combinations': total,
+            'completed_combinations': len(results),
+            'resumed_combinations': len(resumed),
+            'failed_combinations': self.stats['failed'],
+            'stopped_early': self.is_stopped,
+            'elapsed_seconds': self.stats['elapsed_seconds'],
+            'combinations_per_second': self.stats['combinations_per_second'],
+            'workers': self.max_workers
+        }
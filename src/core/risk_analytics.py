@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+風險分析服務 - 按交易對/時間框架維護滾動對數收益率窗口
+收益率存放在環形緩衝區，由 HistoricalDataManager 增量讀取新K線或由外部推送收盤價；
+均值/方差以滑動 Welford 遞推 O(1) 更新，波動率與夏普比率直接讀取。
+排序後的收益率、前綴和與回撤按窗口版本懶計算並緩存，
+同一版本內任意置信度的 VaR/預期損失查詢只需二分定位，不再重複計算收益率。
+"""
+
+import logging
+import math
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 時間框架對應的秒數（加密貨幣全年無休，年化按365天計算）
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '4h': 14400,
+    '1d': 86400,
+}
+
+SECONDS_PER_YEAR = 365 * 86400
+
+
+def periods_per_year(timeframe: str) -> float:
+    """時間框架每年的K線數"""
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(f"不支持的時間框架: {timeframe}")
+    return SECONDS_PER_YEAR / TIMEFRAME_SECONDS[timeframe]
+
+
+def market_name(pair: str) -> str:
+    """交易對名稱轉為K線存儲使用的市場代碼，如 BTC/TWD -> btctwd"""
+    return pair.replace('/', '').replace('-', '').lower()
+
+
+def _interpolated_quantile(sorted_values: np.ndarray, q: float) -> float:
+    """已排序數組的線性插值分位數（與 np.quantile 默認方法一致）"""
+    position = (len(sorted_values) - 1) * q
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return float(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction)
+
+
+@dataclass
+class RiskSnapshot:
+    """單個交易對/時間框架的風險快照（VaR/預期損失/回撤為正的損失比例）"""
+    pair: str
+    timeframe: str
+    timestamp: Optional[int]     # 最新K線時間戳（Unix秒）
+    observations: int            # 窗口內收益率數量
+    horizon: int                 # VaR/預期損失的持有期（K線數）
+    volatility: float            # 年化波動率
+    sharpe_ratio: float          # 年化夏普比率
+    var_95: float
+    var_99: float
+    expected_shortfall_95: float
+    expected_shortfall_99: float
+    max_drawdown: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+class ReturnWindow:
+    """單條收益率序列的環形緩衝區與滑動統計量"""
+
+    def __init__(self, capacity: int):
+        if capacity < 2:
+            raise ValueError("收益率窗口長度至少為2")
+        self.capacity = capacity
+        self._values = np.zeros(capacity)
+        self._cursor = 0
+        self._filled = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._pushes_since_resync = 0
+
+        self.last_timestamp: Optional[int] = None
+        self.last_close: Optional[float] = None
+        self._previous_close: Optional[float] = None   # 最新K線之前的收盤價，用於改寫未收盤K線
+
+        self.version = 0
+        self._cache: Dict[Any, Any] = {}
+        self._cache_version = -1
+
+    def __len__(self) -> int:
+        return self._filled
+
+    # ---------------------------------------------------------------- 寫入
+
+    def update(self, timestamp: int, close: float) -> bool:
+        """
+        加入一根K線收盤價
+
+        時間戳與最新K線相同時改寫最新收益率（未收盤K線跳動），更早的時間戳被忽略
+
+        Returns:
+            窗口是否發生變化
+        """
+        timestamp = int(timestamp)
+        if close <= 0 or not math.isfinite(close):
+            return False
+
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return False
+
+        if timestamp == self.last_timestamp:
+            if close == self.last_close:
+                return False
+            if self._previous_close is not None and self._filled:
+                self._replace_last(math.log(close / self._previous_close))
+            self.last_close = close
+            self.version += 1
+            return True
+
+        if self.last_close is not None:
+            self._push(math.log(close / self.last_close))
+        self._previous_close = self.last_close
+        self.last_timestamp = timestamp
+        self.last_close = close
+        self.version += 1
+        return True
+
+    def extend(self, timestamps: Sequence[int], closes: Sequence[float]) -> int:
+        """批量加入按時間正序的K線，返回新增的收益率數量"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        closes = np.asarray(closes, dtype=float)
+
+        # 不晚於最新K線的部分逐筆處理（只有同一時間戳會改寫），其餘部分一次寫入
+        if self.last_timestamp is not None:
+            start = int(np.searchsorted(timestamps, self.last_timestamp, side='right'))
+            for timestamp, close in zip(timestamps[:start].tolist(), closes[:start].tolist()):
+                self.update(timestamp, close)
+            timestamps, closes = timestamps[start:], closes[start:]
+
+        valid = np.isfinite(closes) & (closes > 0)
+        timestamps, closes = timestamps[valid], closes[valid]
+        if len(closes) and self.last_close is None:
+            self.update(int(timestamps[0]), float(closes[0]))
+            timestamps, closes = timestamps[1:], closes[1:]
+        if len(closes) == 0:
+            return 0
+
+        chain = np.concatenate(([self.last_close], closes))
+        returns = np.diff(np.log(chain))
+        if len(returns) < max(64, self.capacity // 4):
+            for value in returns.tolist():
+                self._push(value)
+        else:
+            self._write_bulk(returns)
+
+        self._previous_close = float(chain[-2])
+        self.last_timestamp = int(timestamps[-1])
+        self.last_close = float(closes[-1])
+        self.version += 1
+        return len(returns)
+
+    def _push(self, value: float):
+        """滑動 Welford：窗口未滿時加入，已滿時以新值替換最舊的值"""
+        if self._filled < self.capacity:
+            self._values[self._cursor] = value
+            self._filled += 1
+            delta = value - self._mean
+            self._mean += delta / self._filled
+            self._m2 += delta * (value - self._mean)
+        else:
+            old = self._values[self._cursor]
+            self._values[self._cursor] = value
+            self._slide(old, value)
+        self._cursor = (self._cursor + 1) % self.capacity
+
+        # 每推進一整個窗口全量重算一次，消除浮點累積誤差（攤銷 O(1)）
+        self._pushes_since_resync += 1
+        if self._pushes_since_resync >= self.capacity:
+            self._resync()
+
+    def _slide(self, old: float, new: float):
+        old_mean = self._mean
+        self._mean += (new - old) / self._filled
+        self._m2 += (new - old) * (new - self._mean + old - old_mean)
+
+    def _replace_last(self, value: float):
+        position = (self._cursor - 1) % self.capacity
+        old = self._values[position]
+        self._values[position] = value
+        self._slide(old, value)
+
+    def _write_bulk(self, returns: np.ndarray):
+        returns = returns[-self.capacity:]
+        positions = (self._cursor + np.arange(len(returns))) % self.capacity
+        self._values[positions] = returns
+        self._cursor = int((self._cursor + len(returns)) % self.capacity)
+        self._filled = min(self.capacity, self._filled + len(returns))
+        self._resync()
+
+    def _resync(self):
+        values = self.values()
+        self._mean = float(values.mean()) if len(values) else 0.0
+        self._m2 = float(((values - self._mean) ** 2).sum()) if len(values) else 0.0
+        self._pushes_since_resync = 0
+
+    # ---------------------------------------------------------------- 讀取
+
+    def values(self) -> np.ndarray:
+        """按時間順序返回窗口內的對數收益率"""
+        if self._filled < self.capacity:
+            return self._values[:self._filled].copy()
+        return np.roll(self._values, -self._cursor)
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def std(self) -> float:
+        """總體標準差（ddof=0）"""
+        if self._filled == 0:
+            return 0.0
+        return math.sqrt(max(self._m2 / self._filled, 0.0))
+
+    def cached(self, key: Any, builder: Callable[[], Any]) -> Any:
+        """按窗口版本緩存派生數據，窗口變化後整體失效"""
+        if self._cache_version != self.version:
+            self._cache.clear()
+            self._cache_version = self.version
+        if key not in self._cache:
+            self._cache[key] = builder()
+        return self._cache[key]
+
+    def _lookback(self, lookback: Optional[int]) -> Optional[int]:
+        """lookback 不短於窗口時視為整個窗口（共用滑動統計量與緩存）"""
+        return None if lookback is None or lookback >= self._filled else lookback
+
+    def moments(self, lookback: Optional[int] = None) -> Tuple[float, float]:
+        """窗口內（或最近 lookback 個收益率）的均值與總體標準差"""
+        lookback = self._lookback(lookback)
+        if lookback is None:
+            return self._mean, self.std
+
+        def build():
+            values = self.values()[-lookback:]
+            return float(values.mean()), float(values.std())
+        return self.cached(('moments', lookback), build)
+
+    def sorted_returns(self, horizon: int = 1, lookback: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """持有期 horizon 根K線的重疊收益率（升序）及其前綴和，lookback 限定最近的收益率數量"""
+        lookback = self._lookback(lookback)
+
+        def build():
+            values = self.values()
+            if lookback is not None:
+                values = values[-lookback:]
+            if horizon > 1:
+                path = np.concatenate(([0.0], np.cumsum(values)))
+                values = path[horizon:] - path[:-horizon]
+            ordered = np.sort(values)
+            return ordered, np.cumsum(ordered)
+        return self.cached(('sorted', horizon, lookback), build)
+
+    def max_drawdown(self, lookback: Optional[int] = None) -> float:
+        """窗口內（或最近 lookback 根K線）價格路徑的最大回撤比例"""
+        lookback = self._lookback(lookback)
+
+        def build():
+            values = self.values()
+            if lookback is not None:
+                values = values[-lookback:]
+            if len(values) == 0:
+                return 0.0
+            path = np.concatenate(([0.0], np.cumsum(values)))
+            deepest = float(np.max(np.maximum.accumulate(path) - path))
+            return -math.expm1(-deepest)
+        return self.cached(('drawdown', lookback), build)
+
+
+class RiskAnalyticsService:
+    """共享的滾動風險分析服務"""
+
+    def __init__(self, historical_manager=None, window: int = 1000,
+                 annualization: Optional[Dict[str, float]] = None):
+        """
+        初始化風險分析服務
+
+        Args:
+            historical_manager: HistoricalDataManager（或任何帶 storage.read_arrays 的對象），
+                                為 None 時只接受 update_close 推送的收盤價
+            window: 每個交易對/時間框架保留的收益率數量
+            annualization: 覆蓋時間框架的年化期數，如 {'1d': 252}
+        """
+        self.historical_manager = historical_manager
+        self.window = window
+        self.annualization = dict(annualization or {})
+
+        self._windows: Dict[Tuple[str, str], ReturnWindow] = {}
+        self._pairs: Dict[Tuple[str, str], str] = {}   # 狀態鍵 -> 註冊時的交易對名稱
+        self._lock = threading.RLock()
+
+        logger.info(f"📊 風險分析服務初始化完成，窗口長度: {window}")
+
+    # ---------------------------------------------------------------- 數據餵入
+
+    def track(self, pair: str, timeframe: str) -> ReturnWindow:
+        """註冊交易對/時間框架並返回其收益率窗口"""
+        key = (market_name(pair), timeframe)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = ReturnWindow(self.window)
+                self._windows[key] = window
+                self._pairs[key] = pair
+            return window
+
+    def tracked(self, timeframe: Optional[str] = None) -> List[Tuple[str, str]]:
+        """已註冊的 (交易對, 時間框架)"""
+        with self._lock:
+            return [(self._pairs[key], key[1]) for key in self._windows
+                    if timeframe is None or key[1] == timeframe]
+
+    def update_close(self, pair: str, timeframe: str, timestamp: int, close: float) -> bool:
+        """推送一根K線收盤價（同一時間戳重複推送時改寫最新收益率）"""
+        window = self.track(pair, timeframe)
+        with self._lock:
+            return window.update(timestamp, close)
+
+    def load_closes(self, pair: str, timeframe: str, timestamps: Sequence[int],
+                    closes: Sequence[float]) -> int:
+        """批量載入按時間正序的收盤價，返回新增的收益率數量"""
+        window = self.track(pair, timeframe)
+        with self._lock:
+            return window.extend(timestamps, closes)
+
+    def refresh(self, pair: str, timeframe: str) -> int:
+        """
+        從歷史數據庫讀取新K線
+
+        首次只讀最新 window+1 根，之後從最新K線時間戳（含）開始讀，
+        因此未收盤K線的收盤價變化也會被同步
+
+        Returns:
+            新增的收益率數量
+        """
+        window = self.track(pair, timeframe)
+        if self.historical_manager is None:
+            return 0
+
+        try:
+            storage = self.historical_manager.storage
+            with self._lock:
+                if window.last_timestamp is None:
+                    arrays = storage.read_arrays(market_name(pair), timeframe, limit=self.window + 1)
+                else:
+                    arrays = storage.read_arrays(market_name(pair), timeframe, start=window.last_timestamp)
+                if len(arrays['timestamp']) == 0:
+                    return 0
+                return window.extend(arrays['timestamp'], arrays['close'])
+
+        except Exception as e:
+            logger.error(f"❌ 刷新 {pair} {timeframe} 收益率窗口失敗: {e}")
+            return 0
+
+    def refresh_all(self, timeframe: Optional[str] = None) -> Dict[str, int]:
+        """刷新所有已註冊的窗口，返回 {交易對: 新增收益率數量}"""
+        return {pair: self.refresh(pair, tf) for pair, tf in self.tracked(timeframe)}
+
+    # ---------------------------------------------------------------- 查詢
+
+    def _window(self, pair: str, timeframe: str) -> Optional[ReturnWindow]:
+        return self._windows.get((market_name(pair), timeframe))
+
+    def _periods_per_year(self, timeframe: str, override: Optional[float]) -> float:
+        if override is not None:
+            return override
+        if timeframe in self.annualization:
+            return self.annualization[timeframe]
+        return periods_per_year(timeframe)
+
+    def observations(self, pair: str, timeframe: str) -> int:
+        window = self._window(pair, timeframe)
+        return len(window) if window is not None else 0
+
+    def returns(self, pair: str, timeframe: str) -> np.ndarray:
+        """按時間順序的對數收益率"""
+        window = self._window(pair, timeframe)
+        return window.values() if window is not None else np.zeros(0)
+
+    def volatility(self, pair: str, timeframe: str, periods_per_year: Optional[float] = None,
+                   lookback: Optional[int] = None) -> float:
+        """年化波動率（lookback 限定最近的收益率數量）"""
+        window = self._window(pair, timeframe)
+        if window is None or len(window) == 0:
+            return 0.0
+        _, std = window.moments(lookback)
+        return std * math.sqrt(self._periods_per_year(timeframe, periods_per_year))
+
+    def sharpe_ratio(self, pair: str, timeframe: str, periods_per_year: Optional[float] = None,
+                     risk_free_rate: float = 0.0, lookback: Optional[int] = None) -> float:
+        """年化夏普比率（risk_free_rate 為年化無風險利率，lookback 限定最近的收益率數量）"""
+        window = self._window(pair, timeframe)
+        if window is None or len(window) == 0:
+            return 0.0
+        mean, std = window.moments(lookback)
+        if std == 0:
+            return 0.0
+        periods = self._periods_per_year(timeframe, periods_per_year)
+        excess = mean - risk_free_rate / periods
+        return excess / std * math.sqrt(periods)
+
+    def value_at_risk(self, pair: str, timeframe: str, confidence: float = 0.95,
+                      horizon: int = 1, lookback: Optional[int] = None) -> float:
+        """
+        歷史模擬 VaR：持有期 horizon 根K線的重疊對數收益率在 1-confidence 分位數處的損失
+
+        Args:
+            lookback: 只使用最近 lookback 個收益率，None 表示整個窗口
+
+        Returns:
+            正數表示損失；數據不足時為0
+        """
+        window = self._window(pair, timeframe)
+        if window is None or min(len(window), lookback or len(window)) < horizon:
+            return 0.0
+        ordered, _ = window.sorted_returns(horizon, lookback)
+        return -_interpolated_quantile(ordered, 1 - confidence)
+
+    def expected_shortfall(self, pair: str, timeframe: str, confidence: float = 0.95,
+                           horizon: int = 1, lookback: Optional[int] = None) -> float:
+        """歷史模擬預期損失：不高於 VaR 分位數的收益率的平均損失"""
+        window = self._window(pair, timeframe)
+        if window is None or min(len(window), lookback or len(window)) < horizon:
+            return 0.0
+        ordered, prefix = window.sorted_returns(horizon, lookback)
+        threshold = _interpolated_quantile(ordered, 1 - confidence)
+        count = max(int(np.searchsorted(ordered, threshold, side='right')), 1)
+        return -float(prefix[count - 1]) / count
+
+    def max_drawdown(self, pair: str, timeframe: str, lookback: Optional[int] = None) -> float:
+        """窗口內（或最近 lookback 根K線）的最大回撤，正數表示回撤比例"""
+        window = self._window(pair, timeframe)
+        if window is None:
+            return 0.0
+        return window.max_drawdown(lookback)
+
+    def snapshot(self, pair: str, timeframe: str, horizon: int = 1,
+                 periods_per_year: Optional[float] = None) -> RiskSnapshot:
+        """單個交易對/時間框架的完整風險快照"""
+        window = self._window(pair, timeframe)
+        return RiskSnapshot(
+            pair=pair,
+            timeframe=timeframe,
+            timestamp=window.last_timestamp if window is not None else None,
+            observations=self.observations(pair, timeframe),
+            horizon=horizon,
+            volatility=self.volatility(pair, timeframe, periods_per_year),
+            sharpe_ratio=self.sharpe_ratio(pair, timeframe, periods_per_year),
+            var_95=self.value_at_risk(pair, timeframe, 0.95, horizon),
+            var_99=self.value_at_risk(pair, timeframe, 0.99, horizon),
+            expected_shortfall_95=self.expected_shortfall(pair, timeframe, 0.95, horizon),
+            expected_shortfall_99=self.expected_shortfall(pair, timeframe, 0.99, horizon),
+            max_drawdown=self.max_drawdown(pair, timeframe)
+        )
+
+    def snapshot_all(self, timeframe: Optional[str] = None, horizon: int = 1,
+                     refresh: bool = False) -> Dict[str, Dict[str, RiskSnapshot]]:
+        """
+        批量查詢所有已註冊交易對的風險快照
+
+        Returns:
+            {時間框架: {交易對: RiskSnapshot}}
+        """
+        if refresh:
+            self.refresh_all(timeframe)
+        results: Dict[str, Dict[str, RiskSnapshot]] = {}
+        with self._lock:
+            for pair, tf in self.tracked(timeframe):
+                results.setdefault(tf, {})[pair] = self.snapshot(pair, tf, horizon)
+        return results
+
+    def value_at_risk_all(self, timeframe: str, confidence: float = 0.95,
+                          horizon: int = 1) -> Dict[str, float]:
+        """所有已註冊交易對在同一置信度/持有期下的 VaR"""
+        with self._lock:
+            return {pair: self.value_at_risk(pair, timeframe, confidence, horizon)
+                    for pair, _ in self.tracked(timeframe)}
+
+    def expected_shortfall_all(self, timeframe: str, confidence: float = 0.95,
+                               horizon: int = 1) -> Dict[str, float]:
+        """所有已註冊交易對在同一置信度/持有期下的預期損失"""
+        with self._lock:
+            return {pair: self.expected_shortfall(pair, timeframe, confidence, horizon)
+                    for pair, _ in self.tracked(timeframe)}
+
+
+def create_risk_analytics_service(historical_manager=None, window: int = 1000,
+                                  pairs: Iterable[str] = (), timeframes: Iterable[str] = ()) -> RiskAnalyticsService:
+    """創建風險分析服務並註冊交易對/時間框架（有歷史數據管理器時立即載入）"""
+    service = RiskAnalyticsService(historical_manager, window)
+    timeframes = list(timeframes)
+    for pair in pairs:
+        for timeframe in timeframes:
+            service.track(pair, timeframe)
+    service.refresh_all()
+    return service
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+信號引擎基準測試框架 - 在固定數據集上測量各策略信號引擎的吞吐量
+每個引擎在相同時間跨度的確定性合成K線或歸檔的真實K線上運行，
+記錄耗時、峰值內存與每秒處理K線數/信號數，寫入JSON歷史並與
+同一機器上的歷史中位數比較，吞吐量下降超過閾值時判定為退化。
+"""
+
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import indicator_kernels as kernels
+
+logger = logging.getLogger(__name__)
+
+# 各週期相對基礎K線的重採樣規則
+RESAMPLE_RULES = {'5m': '5min', '15m': '15min', '30m': '30min', '1h': '60min'}
+
+
+@dataclass
+class BenchmarkDataset:
+    """基準數據集：base 為基礎週期K線，frames 為各週期（均已附帶MACD欄位）"""
+    name: str
+    bars: int
+    fingerprint: str
+    frames: Dict[str, pd.DataFrame]
+
+    @property
+    def base(self) -> pd.DataFrame:
+        return self.frames['base']
+
+
+@dataclass
+class EngineSpec:
+    """信號引擎描述：run(模塊, 數據集) 返回引擎原始輸出"""
+    name: str
+    module: str
+    run: Callable[[Any, BenchmarkDataset], Any]
+
+
+@dataclass
+class BenchmarkResult:
+    """單個引擎在單個數據集上的測量結果"""
+    engine: str
+    dataset: str
+    bars: int
+    fingerprint: str
+    status: str
+    wall_time: float = 0.0
+    peak_memory_mb: float = 0.0
+    signals: int = 0
+    bars_per_second: float = 0.0
+    signals_per_second: float = 0.0
+    realtime_window_seconds: float = 0.0
+    realtime_1m_ok: Optional[bool] = None
+    error: Optional[str] = None
+
+
+# ---------------------------------------------------------------- 數據集
+
+def _with_macd(df: pd.DataFrame) -> pd.DataFrame:
+    """附加引擎需要的 datetime 與 MACD 欄位"""
+    df = df.reset_index(drop=True)
+    df['datetime'] = df['timestamp']
+    df['macd'], df['macd_signal'], df['macd_hist'] = kernels.macd(df['close'])
+    return df
+
+
+def _resample(base: pd.DataFrame, rule: str) -> pd.DataFrame:
+    frame = base.set_index('timestamp').resample(rule).agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    ).dropna()
+    return frame.reset_index()
+
+
+def _fingerprint(base: pd.DataFrame) -> str:
+    digest = hashlib.sha256()
+    for column in ('open', 'high', 'low', 'close', 'volume'):
+        digest.update(np.ascontiguousarray(base[column].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def build_dataset(name: str, base: pd.DataFrame) -> BenchmarkDataset:
+    """由基礎週期K線建立數據集（重採樣出5m/15m/30m/1h週期）"""
+    base = base[['timestamp', 'open', 'high', 'low', 'close', 'volume']].copy()
+    frames = {'base': _with_macd(base.copy())}
+    for label, rule in RESAMPLE_RULES.items():
+        frames[label] = _with_macd(_resample(base, rule))
+    return BenchmarkDataset(name, len(base), _fingerprint(base), frames)
+
+
+def synthetic_candles(bars: int, seed: int = 20240101, minutes: int = 1,
+                      start: str = '2024-01-01') -> pd.DataFrame:
+    """
+    確定性合成K線：帶趨勢與波動率切換的幾何隨機遊走
+
+    同一 (bars, seed) 在任何機器上產生逐位相同的數據
+    """
+    rng = np.random.default_rng(seed)
+    regime = np.repeat(rng.choice([0.5, 1.0, 2.0], size=bars // 500 + 1), 500)[:bars]
+    drift = np.repeat(rng.normal(0, 0.0002, size=bars // 2000 + 1), 2000)[:bars]
+    returns = drift + rng.normal(0, 0.0012, bars) * regime
+    close = np.round(3400000 * np.exp(np.cumsum(returns)), 0)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0008, bars)) * close
+    return pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=bars, freq=f'{minutes}min'),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': np.round(rng.gamma(2.0, 5.0, bars) * regime, 4)
+    })
+
+
+def synthetic_dataset(bars: int, seed: int = 20240101) -> BenchmarkDataset:
+    """合成1分鐘K線數據集"""
+    return build_dataset('synthetic', synthetic_candles(bars, seed))
+
+
+def recorded_dataset(bars: int, market: str = 'btctwd', timeframe: str = '1m',
+                     archive=None) -> Optional[BenchmarkDataset]:
+    """
+    從K線歸檔讀取最近 bars 根真實K線，不足時返回None
+
+    Args:
+        archive: CandleArchive 實例，默認使用進程共用的歸檔
+    """
+    if archive is None:
+        from ..data.candle_archive import get_candle_archive
+        archive = get_candle_archive()
+
+    columns = archive.load(market, timeframe)
+    if len(columns['timestamp']) < bars:
+        return None
+    base = pd.DataFrame({name: np.array(values[-bars:]) for name, values in columns.items()})
+    base['timestamp'] = pd.to_datetime(base['timestamp'], unit='s')
+    return build_dataset(f'recorded:{market}:{timeframe}', base)
+
+
+# ---------------------------------------------------------------- 引擎註冊表
+
+def _hourly_and_dynamic(dataset: BenchmarkDataset):
+    return dataset.frames['1h'].copy(), dataset.frames['5m'].copy()
+
+
+ENGINE_SPECS: List[EngineSpec] = [
+    EngineSpec('final_85_percent', 'final_85_percent_strategy',
+               lambda m, d: m.Final85PercentStrategy().detect_signals(d.base.copy())),
+    EngineSpec('optimized_85_percent', 'optimized_85_percent_strategy',
+               lambda m, d: m.Optimized85PercentStrategy().detect_optimized_signals(d.base.copy())),
+    EngineSpec('next_gen_85_percent', 'next_gen_85_percent_strategy',
+               lambda m, d: m.NextGen85PercentStrategy().detect_next_gen_signals(d.base.copy())),
+    EngineSpec('smart_balanced_volume_macd', 'smart_balanced_volume_macd_signals',
+               lambda m, d: m.SmartBalancedVolumeEnhancedMACDSignals().detect_smart_balanced_signals(d.base.copy())),
+    EngineSpec('ultimate_optimized_volume_macd', 'ultimate_optimized_volume_macd_signals',
+               lambda m, d: m.UltimateOptimizedVolumeEnhancedMACDSignals().detect_ultimate_optimized_signals(
+                   d.base.copy())),
+    EngineSpec('clean_ultimate', 'clean_ultimate_signals',
+               lambda m, d: m.UltimateOptimizedVolumeEnhancedMACDSignals().detect_signals(d.base.copy())),
+    EngineSpec('ultra_advanced_volume_macd', 'ultra_advanced_volume_macd_signals',
+               lambda m, d: m.UltraAdvancedVolumeEnhancedMACDSignals().detect_ultra_advanced_signals(d.base.copy())),
+    EngineSpec('advanced_volume_macd', 'advanced_volume_macd_signals',
+               lambda m, d: m.AdvancedVolumeEnhancedMACDSignals().detect_advanced_signals(d.base.copy())),
+    EngineSpec('volume_enhanced_macd', 'volume_enhanced_macd_signals',
+               lambda m, d: m.VolumeEnhancedMACDSignals().detect_enhanced_signals(d.base.copy())),
+    EngineSpec('improved_trading', 'improved_trading_signals',
+               lambda m, d: m.SignalDetectionEngine().detect_signals(d.base.copy())),
+    EngineSpec('improved_trading_v1', 'improved_trading_signals_v1',
+               lambda m, d: m.SignalDetectionEngine().detect_signals(d.base.copy())),
+    EngineSpec('trailing_stop', 'trailing_stop_trading_signals',
+               lambda m, d: m.TrailingStopTradingSignals().detect_signals(d.base.copy())),
+    EngineSpec('dynamic_trading', 'dynamic_trading_signals',
+               lambda m, d: m.DynamicSignalDetectionEngine().detect_signals(d.base.copy())),
+    EngineSpec('hybrid_trading', 'hybrid_trading_signals',
+               lambda m, d: m.HybridSignalDetectionEngine().detect_signals(*_hourly_and_dynamic(d))),
+    EngineSpec('improved_hybrid_trading', 'improved_hybrid_trading_signals',
+               lambda m, d: m.ImprovedHybridSignalDetectionEngine().detect_signals(*_hourly_and_dynamic(d))),
+    EngineSpec('multi_timeframe_trading', 'multi_timeframe_trading_signals',
+               lambda m, d: m.MultiTimeframeSignalDetectionEngine().detect_signals(
+                   d.frames['1h'].copy(), {label: d.frames[label].copy() for label in ('30m', '15m', '5m')})),
+]
+
+
+def count_signals(output: Any) -> int:
+    """統計引擎輸出中的買賣信號數（兼容信號表、逐K線表、列表與多週期字典）"""
+    if isinstance(output, tuple):
+        return count_signals(output[0]) if output else 0
+    if isinstance(output, dict):
+        return sum(count_signals(value) for value in output.values())
+    if isinstance(output, pd.DataFrame):
+        if 'signal_type' in output.columns:
+            return int(output['signal_type'].isin(['buy', 'sell']).sum())
+        return len(output)
+    if isinstance(output, list):
+        return len(output)
+    return 0
+
+
+@contextlib.contextmanager
+def _quiet():
+    """屏蔽引擎的 print 與 WARNING 及以下日誌，避免輸出本身影響計時（異常仍由 measure 捕獲）"""
+    logging.disable(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+# ---------------------------------------------------------------- 執行
+
+class SignalEngineBenchmark:
+    """信號引擎基準測試執行器"""
+
+    def __init__(self, engines: Optional[Iterable[str]] = None, repeat: int = 1,
+                 measure_memory: bool = True, max_seconds: float = 120.0,
+                 realtime_window_bars: int = 1440, realtime_budget_seconds: float = 6.0):
+        """
+        初始化執行器
+
+        Args:
+            engines: 只運行指定名稱的引擎，None 表示全部
+            repeat: 計時重複次數（取最佳值）
+            measure_memory: 是否額外運行一次以 tracemalloc 測量峰值內存
+            max_seconds: 按當前規模外推，下一規模預計超過此秒數時跳過
+            realtime_window_bars: 每根新的1分鐘K線需要重算的窗口長度
+            realtime_budget_seconds: 重算該窗口允許的最長時間
+        """
+        selected = set(engines) if engines else None
+        self.specs = [spec for spec in ENGINE_SPECS if selected is None or spec.name in selected]
+        if selected is not None:
+            unknown = selected - {spec.name for spec in self.specs}
+            if unknown:
+                raise ValueError(f"未知的信號引擎: {sorted(unknown)}")
+        self.repeat = max(1, repeat)
+        self.measure_memory = measure_memory
+        self.max_seconds = max_seconds
+        self.realtime_window_bars = realtime_window_bars
+        self.realtime_budget_seconds = realtime_budget_seconds
+
+    def measure(self, spec: EngineSpec, dataset: BenchmarkDataset) -> BenchmarkResult:
+        """在單個數據集上測量單個引擎"""
+        result = BenchmarkResult(spec.name, dataset.name, dataset.bars, dataset.fingerprint, 'ok')
+        try:
+            module = importlib.import_module(f'src.core.{spec.module}')
+            best, output = float('inf'), None
+            for _ in range(self.repeat):
+                with _quiet():
+                    start = time.perf_counter()
+                    output = spec.run(module, dataset)
+                    best = min(best, time.perf_counter() - start)
+
+            if self.measure_memory:
+                with _quiet():
+                    tracemalloc.start()
+                    try:
+                        spec.run(module, dataset)
+                        _, peak = tracemalloc.get_traced_memory()
+                    finally:
+                        tracemalloc.stop()
+                result.peak_memory_mb = peak / 1024 / 1024
+
+            result.wall_time = best
+            result.signals = count_signals(output)
+            result.bars_per_second = dataset.bars / best if best > 0 else float('inf')
+            result.signals_per_second = result.signals / best if best > 0 else 0.0
+            result.realtime_window_seconds = self.realtime_window_bars / result.bars_per_second
+            result.realtime_1m_ok = result.realtime_window_seconds <= self.realtime_budget_seconds
+        except Exception as e:
+            result.status = 'error'
+            result.error = f"{type(e).__name__}: {e}"
+            logger.warning(f"⚠️ {spec.name} 在 {dataset.name}/{dataset.bars} 上運行失敗: {result.error}")
+        return result
+
+    def run(self, dataset_factory: Callable[[int], Optional[BenchmarkDataset]],
+            sizes: Iterable[int], progress: Optional[Callable[[BenchmarkResult], None]] = None
+            ) -> List[BenchmarkResult]:
+        """
+        按規模從小到大運行所有引擎
+
+        Args:
+            dataset_factory: 規模 -> 數據集（返回None表示該規模不可用）
+            sizes: K線數量列表
+            progress: 每得到一個結果時的回調
+        """
+        sizes = sorted(set(sizes))
+        datasets = {}
+        for bars in sizes:
+            dataset = dataset_factory(bars)
+            if dataset is not None:
+                datasets[bars] = dataset
+
+        results = []
+        for spec in self.specs:
+            previous: Optional[BenchmarkResult] = None
+            for bars, dataset in datasets.items():
+                projected = (previous.wall_time * bars / previous.bars
+                             if previous is not None and previous.status == 'ok' else 0.0)
+                if previous is not None and previous.status != 'ok':
+                    result = BenchmarkResult(spec.name, dataset.name, bars, dataset.fingerprint, 'skipped',
+                                             error='較小規模運行失敗')
+                elif projected > self.max_seconds:
+                    result = BenchmarkResult(spec.name, dataset.name, bars, dataset.fingerprint, 'skipped',
+                                             error=f'預計耗時 {projected:.0f}s 超過上限 {self.max_seconds:.0f}s',
+                                             realtime_1m_ok=previous.realtime_1m_ok)
+                else:
+                    result = self.measure(spec, dataset)
+                    previous = result
+                results.append(result)
+                if progress:
+                    progress(result)
+        return results
+
+
+# ---------------------------------------------------------------- 歷史與退化檢測
+
+def machine_id() -> str:
+    """機器標識：只與同一機器上的歷史比較"""
+    return f"{platform.node()}|{platform.machine()}|{platform.processor()}|{os.cpu_count()}"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5, check=True).stdout.strip() or None
+    except Exception:
+        return None
+
+
+class BenchmarkHistory:
+    """基準結果的JSON歷史"""
+
+    def __init__(self, path: str = 'reports/benchmarks/signal_engines_history.json', window: int = 5):
+        """
+        Args:
+            path: 歷史文件路徑
+            window: 基線取最近多少次運行的中位數
+        """
+        self.path = Path(path)
+        self.window = window
+
+    def load(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('runs', [])
+
+    def baseline(self, result: BenchmarkResult, runs: Optional[List[Dict[str, Any]]] = None,
+                 machine: Optional[str] = None) -> Optional[float]:
+        """同一機器、同一數據指紋下最近 window 次成功運行的吞吐量中位數"""
+        machine = machine or machine_id()
+        history = []
+        for run in runs if runs is not None else self.load():
+            if run.get('machine') != machine:
+                continue
+            for record in run.get('results', []):
+                if (record['engine'] == result.engine and record['fingerprint'] == result.fingerprint
+                        and record['status'] == 'ok'):
+                    history.append(record['bars_per_second'])
+        history = history[-self.window:]
+        return statistics.median(history) if history else None
+
+    def find_regressions(self, results: List[BenchmarkResult], threshold: float = 0.25,
+                         machine: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        吞吐量低於基線 (1 - threshold) 倍的結果
+
+        基線中成功運行、本次卻失敗或被跳過的引擎同樣視為退化（吞吐量記為0）
+        """
+        runs = self.load()
+        regressions = []
+        for result in results:
+            baseline = self.baseline(result, runs, machine)
+            if not baseline:
+                continue
+            bars_per_second = result.bars_per_second if result.status == 'ok' else 0.0
+            if bars_per_second < baseline * (1 - threshold):
+                regressions.append({
+                    'engine': result.engine,
+                    'dataset': result.dataset,
+                    'bars': result.bars,
+                    'status': result.status,
+                    'error': result.error,
+                    'baseline_bars_per_second': baseline,
+                    'bars_per_second': bars_per_second,
+                    'change': bars_per_second / baseline - 1
+                })
+        return regressions
+
+    def append(self, results: List[BenchmarkResult], machine: Optional[str] = None,
+               note: Optional[str] = None) -> Dict[str, Any]:
+        """追加一次運行記錄（原子替換文件）"""
+        runs = self.load()
+        run = {
+            'timestamp': datetime.now().isoformat(),
+            'machine': machine or machine_id(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'note': note,
+            'results': [asdict(result) for result in results]
+        }
+        runs.append(run)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'runs': runs}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        return run
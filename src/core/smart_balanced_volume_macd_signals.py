@@ -10,9 +10,25 @@ import numpy as np
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Tuple
 import logging
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import indicator_kernels as kernels
 
 logger = logging.getLogger(__name__)
 
+# 市場環境分析參數（對應 analyze_market_context 的切片規則）
+CONTEXT_MIN_INDEX = 50
+CONTEXT_WINDOW = 21
+CONTEXT_SLOPE_LAG = 9
+
+# 信號驗證所需欄位
+VALIDATION_COLUMNS = [
+    'market_strength', 'volatility_ratio', 'volume_ratio', 'volume_trend', 'rsi',
+    'bb_position', 'bb_width', 'trend_strength', 'ma50', 'ma200',
+    'macd_strength', 'macd_acceleration'
+]
+SIGNAL_COLUMNS = ['close', 'macd', 'macd_signal', 'macd_hist']
+
 class SmartBalancedVolumeAnalyzer:
     """智能平衡成交量分析器"""
     
@@ -22,26 +38,17 @@ class SmartBalancedVolumeAnalyzer:
         df = df.copy()
         
         # 基本成交量指標
-        df['volume_ma20'] = df['volume'].rolling(window=20).mean()
-        df['volume_ratio'] = df['volume'] / df['volume_ma20']
+        df['volume_ma20'], df['volume_ratio'] = kernels.volume_ratio(df['volume'], window=20)
         
         # 成交量趨勢強度
-        df['volume_ma5'] = df['volume'].rolling(window=5).mean()
-        df['volume_trend'] = df['volume_ma5'].pct_change(periods=3)
+        df['volume_ma5'], df['volume_trend'] = kernels.volume_trend(df['volume'], window=5, periods=3)
         
         # RSI指標
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        df['rsi'] = kernels.rsi(df['close'], period=14)
         
         # 布林帶
-        df['bb_middle'] = df['close'].rolling(window=20).mean()
-        bb_std = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-        df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
+        df['bb_middle'], df['bb_upper'], df['bb_lower'], df['bb_position'] = \
+            kernels.bollinger_bands(df['close'], window=20, num_std=2)
         df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_middle']
         
         # 市場趨勢指標
@@ -271,14 +278,10 @@ class SmartBalancedVolumeEnhancedMACDSignals:
         """計算MACD指標"""
         df = df.copy()
         
-        # 計算EMA
-        ema_fast = df['close'].ewm(span=12).mean()
-        ema_slow = df['close'].ewm(span=26).mean()
-        
-        # 計算MACD線
-        df['macd'] = ema_fast - ema_slow
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-        df['macd_hist'] = df['macd'] - df['macd_signal']
+        # 計算MACD線、信號線與柱狀圖
+        df['macd'], df['macd_signal'], df['macd_hist'] = kernels.macd(
+            df['close'], fast=12, slow=26, signal=9
+        )
         
         return df
     
@@ -320,8 +323,102 @@ class SmartBalancedVolumeEnhancedMACDSignals:
             logger.error(f"市場環境分析失敗: {e}")
             return {'trend': 'unknown', 'volatility': 'normal', 'strength': 0}
     
+    def precompute_market_context(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        一次性預計算每根K線的市場環境特徵（與 analyze_market_context 結果一致）
+
+        Returns:
+            包含 ma50_slope、avg_volatility 和 valid 陣列的字典
+        """
+        n = len(df)
+        ma50 = df['ma50'].to_numpy(dtype=np.float64)
+        volatility = df['volatility'].to_numpy(dtype=np.float64)
+
+        ma50_slope = np.full(n, np.nan)
+        avg_volatility = np.full(n, np.nan)
+        valid = np.arange(n) >= CONTEXT_MIN_INDEX
+
+        if n > CONTEXT_MIN_INDEX:
+            # 斜率：窗口末值相對倒數第10個值 (iloc[-1] vs iloc[-10])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ma50_slope[CONTEXT_SLOPE_LAG:] = (ma50[CONTEXT_SLOPE_LAG:] - ma50[:-CONTEXT_SLOPE_LAG]) / ma50[:-CONTEXT_SLOPE_LAG]
+
+            # 平均波動率：與 pandas Series.mean 相同，跳過NaN後逐窗口求和
+            nan_mask = np.isnan(volatility)
+            windows = sliding_window_view(np.where(nan_mask, 0.0, volatility), CONTEXT_WINDOW)
+            counts = sliding_window_view(~nan_mask, CONTEXT_WINDOW).sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                avg_volatility[CONTEXT_WINDOW - 1:] = np.where(counts > 0, windows.sum(axis=1) / counts, np.nan)
+
+        return {'ma50_slope': ma50_slope, 'avg_volatility': avg_volatility, 'valid': valid}
+
+    @staticmethod
+    def _market_context_at(context: Dict[str, np.ndarray], index: int) -> Dict:
+        """從預計算陣列取出單根K線的市場環境"""
+        if not context['valid'][index]:
+            return {'trend': 'unknown', 'volatility': 'normal', 'strength': 0}
+
+        ma50_slope = context['ma50_slope'][index]
+        avg_volatility = context['avg_volatility'][index]
+
+        if ma50_slope > 0.02:
+            trend = 'bullish'
+        elif ma50_slope < -0.02:
+            trend = 'bearish'
+        else:
+            trend = 'sideways'
+
+        if avg_volatility > 0.03:
+            volatility = 'high'
+        elif avg_volatility < 0.015:
+            volatility = 'low'
+        else:
+            volatility = 'normal'
+
+        return {
+            'trend': trend,
+            'volatility': volatility,
+            'strength': abs(ma50_slope),
+            'avg_volatility': avg_volatility
+        }
+
+    @staticmethod
+    def find_macd_crossovers(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        向量化檢測MACD買賣交叉（條件與 _check_macd_buy_signal/_check_macd_sell_signal 相同）
+
+        Returns:
+            (買進候選布林陣列, 賣出候選布林陣列)，第0根恆為False
+        """
+        macd = df['macd'].to_numpy(dtype=np.float64)
+        macd_signal = df['macd_signal'].to_numpy(dtype=np.float64)
+        macd_hist = df['macd_hist'].to_numpy(dtype=np.float64)
+
+        buy = np.zeros(len(df), dtype=bool)
+        sell = np.zeros(len(df), dtype=bool)
+        if len(df) < 2:
+            return buy, sell
+
+        prev_macd, prev_signal, prev_hist = macd[:-1], macd_signal[:-1], macd_hist[:-1]
+        cur_macd, cur_signal = macd[1:], macd_signal[1:]
+
+        buy[1:] = (
+            (prev_hist < 0) & (prev_macd <= prev_signal) &
+            (cur_macd > cur_signal) & (cur_macd < 0) & (cur_signal < 0)
+        )
+        sell[1:] = (
+            (prev_hist > 0) & (prev_macd >= prev_signal) &
+            (cur_signal > cur_macd) & (cur_macd > 0) & (cur_signal > 0)
+        )
+        return buy, sell
+
     def detect_smart_balanced_signals(self, df: pd.DataFrame) -> pd.DataFrame:
-        """檢測智能平衡成交量增強MACD信號"""
+        """
+        檢測智能平衡成交量增強MACD信號
+
+        先以向量化方式預計算指標、MACD交叉與市場環境，
+        再只在交叉K線上執行持倉狀態機，避免逐行 df.iloc 與每根重建20根切片。
+        """
         if df is None or df.empty:
             return pd.DataFrame()
         
@@ -334,111 +431,65 @@ class SmartBalancedVolumeEnhancedMACDSignals:
         df = self.calculate_macd(df)
         df = self.volume_analyzer.calculate_smart_indicators(df)
         
+        columns = {name: df[name].to_numpy() for name in VALIDATION_COLUMNS + SIGNAL_COLUMNS}
+        timestamps = df['timestamp'].array
+        context = self.precompute_market_context(df)
+        buy_candidates, sell_candidates = self.find_macd_crossovers(df)
+        
         signals = []
         
-        for i in range(1, len(df)):
-            current_row = df.iloc[i]
-            previous_row = df.iloc[i-1]
+        for i in np.flatnonzero(buy_candidates | sell_candidates):
+            i = int(i)
             
-            # 分析市場環境
-            market_context = self.analyze_market_context(df, i)
+            if buy_candidates[i] and self.current_position == 0:
+                signal_type = 'buy'
+            elif sell_candidates[i] and self.current_position == 1:
+                signal_type = 'sell'
+            else:
+                continue
             
-            # 檢查MACD買進信號
-            macd_buy_signal = self._check_macd_buy_signal(current_row, previous_row)
-            if macd_buy_signal and self.current_position == 0:
-                # 智能平衡驗證
-                passed, info, score = self.volume_analyzer.smart_signal_validation(
-                    current_row, 'buy', market_context
-                )
-                
-                if passed:
+            market_context = self._market_context_at(context, i)
+            row = {name: columns[name][i] for name in VALIDATION_COLUMNS}
+            
+            # 智能平衡驗證
+            passed, info, score = self.volume_analyzer.smart_signal_validation(
+                row, signal_type, market_context
+            )
+            
+            if passed:
+                if signal_type == 'buy':
                     # 執行買進
                     self.trade_sequence += 1
                     self.current_position = 1
-                    
-                    signal = {
-                        'datetime': current_row['timestamp'],
-                        'close': current_row['close'],
-                        'signal_type': 'buy',
-                        'trade_sequence': self.trade_sequence,
-                        'macd': current_row['macd'],
-                        'macd_signal': current_row['macd_signal'],
-                        'macd_hist': current_row['macd_hist'],
-                        'volume_confirmed': True,
-                        'validation_info': info,
-                        'signal_strength': score,
-                        'market_context': market_context
-                    }
-                    signals.append(signal)
-                    self.trade_history.append(signal)
-                    
-                    logger.info(f"✅ 智能確認買進 #{self.trade_sequence}: {current_row['close']:,.0f} - {info}")
                 else:
-                    # 信號被拒絕
-                    signal = {
-                        'datetime': current_row['timestamp'],
-                        'close': current_row['close'],
-                        'signal_type': 'buy_rejected',
-                        'trade_sequence': 0,
-                        'macd': current_row['macd'],
-                        'macd_signal': current_row['macd_signal'],
-                        'macd_hist': current_row['macd_hist'],
-                        'volume_confirmed': False,
-                        'validation_info': info,
-                        'signal_strength': score,
-                        'market_context': market_context
-                    }
-                    signals.append(signal)
-                    
-                    logger.info(f"❌ 買進信號被拒絕: {current_row['close']:,.0f} - {info}")
-            
-            # 檢查MACD賣出信號
-            macd_sell_signal = self._check_macd_sell_signal(current_row, previous_row)
-            if macd_sell_signal and self.current_position == 1:
-                # 智能平衡驗證
-                passed, info, score = self.volume_analyzer.smart_signal_validation(
-                    current_row, 'sell', market_context
-                )
-                
-                if passed:
                     # 執行賣出
                     self.current_position = 0
-                    
-                    signal = {
-                        'datetime': current_row['timestamp'],
-                        'close': current_row['close'],
-                        'signal_type': 'sell',
-                        'trade_sequence': self.trade_sequence,
-                        'macd': current_row['macd'],
-                        'macd_signal': current_row['macd_signal'],
-                        'macd_hist': current_row['macd_hist'],
-                        'volume_confirmed': True,
-                        'validation_info': info,
-                        'signal_strength': score,
-                        'market_context': market_context
-                    }
-                    signals.append(signal)
-                    self.trade_history.append(signal)
-                    
-                    logger.info(f"✅ 智能確認賣出 #{self.trade_sequence}: {current_row['close']:,.0f} - {info}")
-                else:
-                    # 信號被拒絕
-                    signal = {
-                        'datetime': current_row['timestamp'],
-                        'close': current_row['close'],
-                        'signal_type': 'sell_rejected',
-                        'trade_sequence': 0,
-                        'macd': current_row['macd'],
-                        'macd_signal': current_row['macd_signal'],
-                        'macd_hist': current_row['macd_hist'],
-                        'volume_confirmed': False,
-                        'validation_info': info,
-                        'signal_strength': score,
-                        'market_context': market_context
-                    }
-                    signals.append(signal)
-                    
-                    logger.info(f"❌ 賣出信號被拒絕: {current_row['close']:,.0f} - {info}")
+                trade_sequence = self.trade_sequence
+            else:
+                # 信號被拒絕
+                trade_sequence = 0
+            
+            signal = {
+                'datetime': timestamps[i],
+                'close': columns['close'][i],
+                'signal_type': signal_type if passed else f'{signal_type}_rejected',
+                'trade_sequence': trade_sequence,
+                'macd': columns['macd'][i],
+                'macd_signal': columns['macd_signal'][i],
+                'macd_hist': columns['macd_hist'][i],
+                'volume_confirmed': passed,
+                'validation_info': info,
+                'signal_strength': score,
+                'market_context': market_context
+            }
+            signals.append(signal)
+            
+            action = '買進' if signal_type == 'buy' else '賣出'
+            if passed:
+                self.trade_history.append(signal)
+                logger.info(f"✅ 智能確認{action} #{self.trade_sequence}: {signal['close']:,.0f} - {info}")
+            else:
+                logger.info(f"❌ {action}信號被拒絕: {signal['close']:,.0f} - {info}")
         
         return pd.DataFrame(signals)
     
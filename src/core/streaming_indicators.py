@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量指標狀態 - 按交易對/時間框架保存 EMA/MACD/RSI/MA/布林帶 狀態
+每根K線收盤或當前K線跳動時 O(1) 更新，延遲與歷史長度無關；狀態可存檔，重啟後無需重算
+
+K線語義與批量計算一致：最後一根（未收盤）K線參與計算但不提交，
+同一時間戳的更新只替換當前K線收盤價，出現更新的時間戳時才提交上一根。
+"""
+
+import json
+import math
+import os
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingEMA:
+    """
+    單條EMA的增量狀態
+
+    init_method 為 None 時逐位重現 pandas ewm(span, adjust) 的遞推；
+    為 'sma' 或 'first' 時重現 ImprovedMaxMACDCalculator.calculate_ema 的遞推。
+    """
+
+    def __init__(self, span: int, adjust: bool = False, init_method: Optional[str] = None,
+                 alpha_multiplier: float = 1.0):
+        if init_method not in (None, 'sma', 'first'):
+            raise ValueError(f"不支持的初始化方法: {init_method}")
+
+        self.span = span
+        self.adjust = adjust
+        self.init_method = init_method
+        self.alpha_multiplier = alpha_multiplier
+
+        if init_method is None:
+            com = (span - 1) / 2.0
+            alpha = 1. / (1. + com)
+            self._old_wt_factor = 1. - alpha
+            self._new_wt = 1. if adjust else alpha
+        else:
+            self._alpha = (2.0 / (span + 1)) * alpha_multiplier
+
+        self.count = 0
+        self.value: Optional[float] = None
+        self._old_wt = 1.
+        self._seed_sum = 0.0
+
+    def _advance(self, x: float):
+        """返回加入 x 後的 (value, old_wt, seed_sum)，不修改狀態"""
+        if self.init_method is None:
+            if self.count == 0:
+                return x, 1., 0.0
+            old_wt = self._old_wt * self._old_wt_factor
+            weighted = self.value
+            if weighted != x:
+                weighted = old_wt * weighted + self._new_wt * x
+                weighted /= (old_wt + self._new_wt)
+            return weighted, (old_wt + self._new_wt) if self.adjust else 1., 0.0
+
+        if self.init_method == 'sma' and self.count < self.span:
+            seed_sum = self._seed_sum + x
+            if self.count + 1 < self.span:
+                return None, 1., seed_sum
+            return seed_sum / self.span, 1., seed_sum
+
+        if self.count == 0:
+            return x, 1., 0.0
+        return self._alpha * x + (1 - self._alpha) * self.value, 1., self._seed_sum
+
+    def peek(self, x: float) -> Optional[float]:
+        """加入 x 後的EMA值（不提交）"""
+        return self._advance(x)[0]
+
+    def push(self, x: float) -> Optional[float]:
+        """提交 x 並返回新的EMA值"""
+        self.value, self._old_wt, self._seed_sum = self._advance(x)
+        self.count += 1
+        return self.value
+
+    def state(self) -> Dict[str, Any]:
+        return {'count': self.count, 'value': self.value,
+                'old_wt': self._old_wt, 'seed_sum': self._seed_sum}
+
+    def restore(self, state: Dict[str, Any]):
+        self.count = state['count']
+        self.value = state['value']
+        self._old_wt = state['old_wt']
+        self._seed_sum = state['seed_sum']
+
+
+class RollingWindow:
+    """固定窗口的增量均值/標準差（與 pandas rolling 的 min_periods=window 一致）"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window - 1)
+        self.total = 0.0
+
+    def peek_mean(self, x: float) -> Optional[float]:
+        """加入 x 後的窗口均值（不提交）"""
+        if len(self.values) < self.window - 1:
+            return None
+        return (self.total + x) / self.window
+
+    def peek_std(self, x: float) -> Optional[float]:
+        """加入 x 後的窗口樣本標準差（不提交）"""
+        mean = self.peek_mean(x)
+        if mean is None or self.window < 2:
+            return None
+        squares = math.fsum((v - mean) ** 2 for v in self.values) + (x - mean) ** 2
+        return math.sqrt(squares / (self.window - 1))
+
+    def push(self, x: float):
+        self.values.append(x)
+        # 每根K線只提交一次，窗口內精確重算和值，避免長時間運行的累積誤差
+        self.total = math.fsum(self.values)
+
+    def state(self) -> Dict[str, Any]:
+        return {'values': list(self.values)}
+
+    def restore(self, state: Dict[str, Any]):
+        self.values = deque(state['values'], maxlen=self.window - 1)
+        self.total = math.fsum(self.values)
+
+
+class StreamingIndicatorSet:
+    """單個交易對/時間框架的增量指標集合"""
+
+    def __init__(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9,
+                 adjust: bool = False, ema_spans: Iterable[int] = (), ma_windows: Iterable[int] = (),
+                 rsi_period: Optional[int] = None, bollinger_window: Optional[int] = None,
+                 bollinger_std: float = 2.0):
+        """
+        初始化指標集合
+
+        Args:
+            fast_period/slow_period/signal_period: MACD參數
+            adjust: EMA是否使用 pandas adjust=True 權重
+            ema_spans: 額外輸出的EMA週期（ema_{span}）
+            ma_windows: 簡單移動平均窗口（ma_{window}）
+            rsi_period: RSI週期（簡單移動平均版本），None 表示不計算
+            bollinger_window: 布林帶窗口，None 表示不計算
+        """
+        self.config = {
+            'fast_period': fast_period, 'slow_period': slow_period, 'signal_period': signal_period,
+            'adjust': adjust, 'ema_spans': list(ema_spans), 'ma_windows': list(ma_windows),
+            'rsi_period': rsi_period, 'bollinger_window': bollinger_window,
+            'bollinger_std': bollinger_std
+        }
+        self.reset()
+
+    def reset(self):
+        """清空所有狀態"""
+        config = self.config
+        self.fast_ema = StreamingEMA(config['fast_period'], config['adjust'])
+        self.slow_ema = StreamingEMA(config['slow_period'], config['adjust'])
+        self.signal_ema = StreamingEMA(config['signal_period'], config['adjust'])
+        self.emas = {span: StreamingEMA(span, config['adjust']) for span in config['ema_spans']}
+        self.mas = {window: RollingWindow(window) for window in config['ma_windows']}
+
+        self.rsi_gain = RollingWindow(config['rsi_period']) if config['rsi_period'] else None
+        self.rsi_loss = RollingWindow(config['rsi_period']) if config['rsi_period'] else None
+        self.bollinger = RollingWindow(config['bollinger_window']) if config['bollinger_window'] else None
+
+        self.committed_count = 0
+        self.last_committed_close: Optional[float] = None
+        self.current_timestamp: Optional[int] = None
+        self.current_close: Optional[float] = None
+        self.previous: Optional[Dict[str, float]] = None
+        self.latest: Optional[Dict[str, float]] = None
+
+    @property
+    def bars(self) -> int:
+        """已處理的K線數（含當前未收盤K線）"""
+        return self.committed_count + (self.current_timestamp is not None)
+
+    def update(self, timestamp: int, close: float) -> Optional[Dict[str, float]]:
+        """
+        輸入一根K線的最新收盤價
+
+        Args:
+            timestamp: K線開盤時間（Unix秒）
+            close: 當前收盤價
+
+        Returns:
+            含當前K線的最新指標值；早於當前K線的輸入被忽略
+        """
+        timestamp = int(timestamp)
+        if self.current_timestamp is None or timestamp > self.current_timestamp:
+            if self.current_timestamp is not None:
+                self._commit(self.current_close)
+            self.current_timestamp = timestamp
+        elif timestamp < self.current_timestamp:
+            return self.latest
+
+        self.current_close = float(close)
+        self.latest = self._evaluate(self.current_close)
+        return self.latest
+
+    def _delta(self, close: float) -> float:
+        # 第一根K線的差分為NaN，批量計算中視為0
+        return 0.0 if self.last_committed_close is None else close - self.last_committed_close
+
+    def _evaluate(self, close: float) -> Dict[str, float]:
+        """以已提交狀態加上當前收盤價計算全部指標"""
+        macd = self.fast_ema.peek(close) - self.slow_ema.peek(close)
+        signal = self.signal_ema.peek(macd)
+        values = {'close': close, 'macd': macd, 'macd_signal': signal, 'macd_hist': macd - signal}
+
+        for span, ema in self.emas.items():
+            values[f'ema_{span}'] = ema.peek(close)
+        for window, rolling in self.mas.items():
+            values[f'ma_{window}'] = _nan_if_none(rolling.peek_mean(close))
+
+        if self.rsi_gain is not None:
+            delta = self._delta(close)
+            gain = self.rsi_gain.peek_mean(delta if delta > 0 else 0.0)
+            loss = self.rsi_loss.peek_mean(-delta if delta < 0 else 0.0)
+            values['rsi'] = _rsi(gain, loss)
+
+        if self.bollinger is not None:
+            middle = _nan_if_none(self.bollinger.peek_mean(close))
+            std = _nan_if_none(self.bollinger.peek_std(close))
+            band = std * self.config['bollinger_std']
+            values.update(bollinger_middle=middle, bollinger_upper=middle + band,
+                          bollinger_lower=middle - band)
+
+        return values
+
+    def _commit(self, close: float):
+        """提交一根已收盤K線"""
+        macd = self.fast_ema.push(close) - self.slow_ema.push(close)
+        self.signal_ema.push(macd)
+        for ema in self.emas.values():
+            ema.push(close)
+        for rolling in self.mas.values():
+            rolling.push(close)
+
+        if self.rsi_gain is not None:
+            delta = self._delta(close)
+            self.rsi_gain.push(delta if delta > 0 else 0.0)
+            self.rsi_loss.push(-delta if delta < 0 else 0.0)
+        if self.bollinger is not None:
+            self.bollinger.push(close)
+
+        self.previous = self.latest
+        self.last_committed_close = close
+        self.committed_count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """導出可JSON序列化的存檔"""
+        return {
+            'config': self.config,
+            'committed_count': self.committed_count,
+            'last_committed_close': self.last_committed_close,
+            'current_timestamp': self.current_timestamp,
+            'current_close': self.current_close,
+            'previous': self.previous,
+            'latest': self.latest,
+            'fast_ema': self.fast_ema.state(),
+            'slow_ema': self.slow_ema.state(),
+            'signal_ema': self.signal_ema.state(),
+            'emas': {str(span): ema.state() for span, ema in self.emas.items()},
+            'mas': {str(window): rolling.state() for window, rolling in self.mas.items()},
+            'rsi_gain': self.rsi_gain.state() if self.rsi_gain else None,
+            'rsi_loss': self.rsi_loss.state() if self.rsi_loss else None,
+            'bollinger': self.bollinger.state() if self.bollinger else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'StreamingIndicatorSet':
+        """從存檔恢復"""
+        indicators = cls(**data['config'])
+        indicators.committed_count = data['committed_count']
+        indicators.last_committed_close = data['last_committed_close']
+        indicators.current_timestamp = data['current_timestamp']
+        indicators.current_close = data['current_close']
+        indicators.previous = data['previous']
+        indicators.latest = data['latest']
+
+        indicators.fast_ema.restore(data['fast_ema'])
+        indicators.slow_ema.restore(data['slow_ema'])
+        indicators.signal_ema.restore(data['signal_ema'])
+        for span, ema in indicators.emas.items():
+            ema.restore(data['emas'][str(span)])
+        for window, rolling in indicators.mas.items():
+            rolling.restore(data['mas'][str(window)])
+        for name in ('rsi_gain', 'rsi_loss', 'bollinger'):
+            if getattr(indicators, name) is not None:
+                getattr(indicators, name).restore(data[name])
+        return indicators
+
+
+class IndicatorCheckpointStore:
+    """指標狀態存檔（JSON文件，原子替換寫入）"""
+
+    def __init__(self, path: str = "data/indicator_checkpoints.json"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._states: Dict[str, Dict[str, Any]] = {}
+
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._states = json.load(f)
+                logger.info(f"📂 載入 {len(self._states)} 個指標存檔: {self.path}")
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"⚠️ 指標存檔無法讀取，將重新計算: {e}")
+
+    def get(self, key: str) -> Optional[StreamingIndicatorSet]:
+        """恢復指定鍵的指標狀態"""
+        state = self._states.get(key)
+        return StreamingIndicatorSet.from_dict(state) if state else None
+
+    def put(self, key: str, indicators: StreamingIndicatorSet):
+        self._states[key] = indicators.to_dict()
+
+    def save(self):
+        """寫入存檔文件"""
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._states, f)
+        os.replace(tmp_path, self.path)
+
+
+def _nan_if_none(value: Optional[float]) -> float:
+    return float('nan') if value is None else value
+
+
+def _rsi(gain: Optional[float], loss: Optional[float]) -> float:
+    """與 100 - 100 / (1 + gain/loss) 的浮點語義一致（含除零情況）"""
+    if gain is None or loss is None:
+        return float('nan')
+    if loss == 0:
+        return float('nan') if gain == 0 else 100.0
+    return 100 - (100 / (1 + gain / loss))
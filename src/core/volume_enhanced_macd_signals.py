@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Tuple
 import logging
 
+from . import indicator_kernels as kernels
+
 logger = logging.getLogger(__name__)
 
 class VolumeAnalyzer:
@@ -30,29 +32,18 @@ class VolumeAnalyzer:
         """
         df = df.copy()
         
-        # 成交量移動平均
-        df['volume_ma'] = df['volume'].rolling(window=volume_ma_period).mean()
-        
-        # 相對成交量（當前成交量 / 平均成交量）
-        df['volume_ratio'] = df['volume'] / df['volume_ma']
+        # 成交量移動平均與相對成交量（當前成交量 / 平均成交量）
+        df['volume_ma'], df['volume_ratio'] = kernels.volume_ratio(df['volume'], window=volume_ma_period)
         
         # 成交量趨勢（5期成交量移動平均的斜率）
-        df['volume_ma5'] = df['volume'].rolling(window=5).mean()
-        df['volume_trend'] = df['volume_ma5'].pct_change(periods=3)
+        df['volume_ma5'], df['volume_trend'] = kernels.volume_trend(df['volume'], window=5, periods=3)
         
         # 價量背離指標
         df['price_change'] = df['close'].pct_change()
         df['volume_change'] = df['volume'].pct_change()
         
         # OBV (On Balance Volume) 能量潮指標
-        df['obv'] = 0.0
-        for i in range(1, len(df)):
-            if df.iloc[i]['close'] > df.iloc[i-1]['close']:
-                df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] + df.iloc[i]['volume']
-            elif df.iloc[i]['close'] < df.iloc[i-1]['close']:
-                df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv'] - df.iloc[i]['volume']
-            else:
-                df.iloc[i, df.columns.get_loc('obv')] = df.iloc[i-1]['obv']
+        df['obv'] = kernels.obv(df['close'], df['volume'])
         
         # OBV移動平均
         df['obv_ma'] = df['obv'].rolling(window=10).mean()
@@ -159,18 +150,10 @@ class VolumeEnhancedMACDSignals:
         """計算MACD指標"""
         df = df.copy()
         
-        # 計算EMA
-        ema_fast = df['close'].ewm(span=self.fast_period).mean()
-        ema_slow = df['close'].ewm(span=self.slow_period).mean()
-        
-        # 計算MACD線
-        df['macd'] = ema_fast - ema_slow
-        
-        # 計算信號線
-        df['macd_signal'] = df['macd'].ewm(span=self.signal_period).mean()
-        
-        # 計算MACD柱
-        df['macd_hist'] = df['macd'] - df['macd_signal']
+        # 計算MACD線、信號線與柱狀圖
+        df['macd'], df['macd_signal'], df['macd_hist'] = kernels.macd(
+            df['close'], fast=self.fast_period, slow=self.slow_period, signal=self.signal_period
+        )
         
         return df
     
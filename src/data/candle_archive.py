@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地列式K線檔案庫 - 每個交易對/時間框架一個可記憶體映射的檔案
+回測直接讀取零拷貝NumPy視圖，增量更新只追加新K線，不再重複下載歷史數據
+
+檔案格式:
+    64字節檔頭 (magic, 版本, 列數, 記錄數, 容量)
+    之後依序為 timestamp/open/high/low/close/volume 六個列區塊，每塊 容量 x 8 字節
+    追加時先寫入列數據，最後才更新檔頭記錄數，讀取端只看到已提交的記錄
+"""
+
+import os
+import struct
+import threading
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .kline_storage import KLINE_COLUMNS, to_unix_seconds
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MAGIC = b'AIMXCNDL'
+ARCHIVE_VERSION = 1
+HEADER_FORMAT = '<8sIIQQ'       # magic, version, ncols, count, capacity
+HEADER_SIZE = 64
+COUNT_OFFSET = 16
+INITIAL_CAPACITY = 4096
+COLUMN_DTYPES = {name: np.dtype('<i8') if name == 'timestamp' else np.dtype('<f8')
+                 for name in KLINE_COLUMNS}
+
+# MAX K線週期（分鐘）與時間框架名稱對照
+PERIOD_TIMEFRAMES = {1: '1m', 5: '5m', 15: '15m', 30: '30m', 60: '1h', 240: '4h', 1440: '1d'}
+
+
+class CandleArchive:
+    """列式K線檔案庫"""
+
+    def __init__(self, root: str = "data/candles"):
+        """
+        初始化K線檔案庫
+
+        Args:
+            root: 檔案庫目錄
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+
+    def path_for(self, market: str, timeframe: str) -> Path:
+        """交易對/時間框架對應的檔案路徑"""
+        return self.root / f"{market.lower()}_{timeframe}.candles"
+
+    @staticmethod
+    def _read_header(path: Path) -> Dict[str, int]:
+        """讀取並校驗檔頭"""
+        with open(path, 'rb') as f:
+            magic, version, ncols, count, capacity = struct.unpack(
+                HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT))
+            )
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION or ncols != len(KLINE_COLUMNS):
+            raise ValueError(f"無效的K線檔案: {path}")
+        return {'count': count, 'capacity': capacity}
+
+    @staticmethod
+    def _column_offset(column_index: int, capacity: int) -> int:
+        return HEADER_SIZE + column_index * capacity * 8
+
+    def _create_file(self, path: Path, capacity: int, columns: Dict[str, np.ndarray], count: int):
+        """以指定容量寫出完整檔案（原子替換）"""
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(struct.pack(HEADER_FORMAT, ARCHIVE_MAGIC, ARCHIVE_VERSION,
+                                len(KLINE_COLUMNS), count, capacity).ljust(HEADER_SIZE, b'\0'))
+            for name in KLINE_COLUMNS:
+                block = np.zeros(capacity, dtype=COLUMN_DTYPES[name])
+                block[:count] = columns[name][:count]
+                f.write(block.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self, market: str, timeframe: str, start: Optional[int] = None,
+             end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        以零拷貝只讀視圖載入K線
+
+        Args:
+            start/end: Unix秒時間戳範圍（含端點），None 表示不限
+
+        Returns:
+            欄位名到只讀NumPy視圖的字典；檔案不存在時返回空陣列
+        """
+        path = self.path_for(market, timeframe)
+        if not path.exists():
+            return {name: np.empty(0, dtype=COLUMN_DTYPES[name]) for name in KLINE_COLUMNS}
+
+        header = self._read_header(path)
+        count, capacity = header['count'], header['capacity']
+        if count == 0:
+            return {name: np.empty(0, dtype=COLUMN_DTYPES[name]) for name in KLINE_COLUMNS}
+
+        mapped = np.memmap(path, dtype=np.uint8, mode='r')
+        columns = {
+            name: np.frombuffer(mapped, dtype=COLUMN_DTYPES[name], count=count,
+                                offset=self._column_offset(i, capacity))
+            for i, name in enumerate(KLINE_COLUMNS)
+        }
+
+        lo = 0 if start is None else int(np.searchsorted(columns['timestamp'], start, side='left'))
+        hi = count if end is None else int(np.searchsorted(columns['timestamp'], end, side='right'))
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    def load_dataframe(self, market: str, timeframe: str, start: Optional[int] = None,
+                       end: Optional[int] = None) -> pd.DataFrame:
+        """載入K線為DataFrame（timestamp 轉為datetime）"""
+        columns = self.load(market, timeframe, start, end)
+        df = pd.DataFrame({name: columns[name] for name in KLINE_COLUMNS[1:]})
+        df.insert(0, 'timestamp', pd.to_datetime(columns['timestamp'], unit='s'))
+        return df
+
+    def last_timestamp(self, market: str, timeframe: str) -> Optional[int]:
+        """最後一根K線的Unix秒時間戳"""
+        timestamps = self.load(market, timeframe)['timestamp']
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    @staticmethod
+    def _prepare_columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """轉為按時間排序的列陣列，同一時間戳保留最後一筆"""
+        incoming = df.dropna(subset=KLINE_COLUMNS)
+        columns = {'timestamp': to_unix_seconds(incoming['timestamp'])}
+        for name in KLINE_COLUMNS[1:]:
+            columns[name] = incoming[name].to_numpy(dtype=np.float64)
+
+        order = np.argsort(columns['timestamp'], kind='stable')
+        columns = {name: values[order] for name, values in columns.items()}
+
+        timestamps = columns['timestamp']
+        keep = np.append(timestamps[1:] != timestamps[:-1], True)
+        return {name: values[keep] for name, values in columns.items()}
+
+    def append(self, market: str, timeframe: str, df: pd.DataFrame) -> int:
+        """
+        增量追加K線
+
+        早於最後一根的記錄會被忽略；與最後一根時間相同的記錄覆蓋該根（未收盤K線）。
+
+        Args:
+            df: 包含 timestamp/open/high/low/close/volume 欄位的DataFrame
+
+        Returns:
+            新增或覆蓋的記錄數
+        """
+        if df is None or df.empty:
+            return 0
+
+        new_columns = self._prepare_columns(df)
+        path = self.path_for(market, timeframe)
+        with self._write_lock:
+            # 只取記錄數與最後時間戳後立即釋放映射視圖：擴容時要原子替換檔案，
+            # Windows 上仍被映射的檔案無法替換
+            existing = self.load(market, timeframe)
+            count = len(existing['timestamp'])
+            last = int(existing['timestamp'][-1]) if count else None
+            del existing
+
+            first_row = count
+            if count:
+                keep = new_columns['timestamp'] >= last
+                new_columns = {name: values[keep] for name, values in new_columns.items()}
+                if len(new_columns['timestamp']) and new_columns['timestamp'][0] == last:
+                    first_row = count - 1
+
+            added = len(new_columns['timestamp'])
+            if added == 0:
+                return 0
+
+            new_count = first_row + added
+            capacity = self._read_header(path)['capacity'] if path.exists() else 0
+
+            if new_count > capacity:
+                new_capacity = max(INITIAL_CAPACITY, capacity)
+                while new_capacity < new_count:
+                    new_capacity *= 2
+                existing = self.load(market, timeframe)
+                merged = {
+                    name: np.concatenate([existing[name][:first_row], new_columns[name]])
+                    for name in KLINE_COLUMNS
+                }
+                del existing
+                self._create_file(path, new_capacity, merged, new_count)
+            else:
+                with open(path, 'r+b') as f:
+                    for i, name in enumerate(KLINE_COLUMNS):
+                        f.seek(self._column_offset(i, capacity) + first_row * 8)
+                        f.write(new_columns[name].astype(COLUMN_DTYPES[name]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                    # 最後提交記錄數
+                    f.seek(COUNT_OFFSET)
+                    f.write(struct.pack('<Q', new_count))
+                    f.flush()
+
+        logger.debug(f"📦 {market} {timeframe} 追加 {added} 根K線，共 {new_count} 根")
+        return added
+
+    def replace(self, market: str, timeframe: str, df: pd.DataFrame) -> int:
+        """以給定K線重建整個序列（原子替換檔案），返回記錄數"""
+        if df is None or df.empty:
+            return 0
+
+        columns = self._prepare_columns(df)
+        count = len(columns['timestamp'])
+        capacity = INITIAL_CAPACITY
+        while capacity < count:
+            capacity *= 2
+
+        with self._write_lock:
+            self._create_file(self.path_for(market, timeframe), capacity, columns, count)
+
+        logger.debug(f"📦 {market} {timeframe} 重建序列，共 {count} 根K線")
+        return count
+
+    def candles_to_fetch(self, market: str, timeframe: str, limit: int, period_seconds: int,
+                         now: Optional[float] = None) -> int:
+        """
+        補齊最新 limit 根K線需要向數據源請求的數量
+
+        檔案庫不足 limit 根或落後超過 limit 根時返回 limit，否則為缺口K線數加1根（覆蓋未收盤K線）
+        """
+        timestamps = self.load(market, timeframe)['timestamp']
+        if len(timestamps) < limit:
+            return limit
+        missing = int(((now if now is not None else time.time()) - int(timestamps[-1])) // period_seconds) + 2
+        return max(1, min(limit, missing))
+
+    def extend(self, market: str, timeframe: str, fresh: pd.DataFrame, period_seconds: int) -> int:
+        """
+        以數據源返回的最新K線更新序列
+
+        新數據與已有序列銜接時只追加；與最後一根之間有缺口，或覆蓋了比已有序列更早的歷史時，
+        以新數據重建序列，避免檔案庫中出現不連續的K線
+
+        Returns:
+            新增、覆蓋或重建的記錄數
+        """
+        if fresh is None or fresh.empty:
+            return 0
+
+        first_fresh = int(to_unix_seconds(fresh['timestamp']).min())
+        existing = self.load(market, timeframe)['timestamp']
+        connected = len(existing) > 0 and int(existing[0]) <= first_fresh <= int(existing[-1]) + period_seconds
+        # 釋放映射視圖後再寫入（重建時要原子替換檔案）
+        del existing
+
+        if connected:
+            return self.append(market, timeframe, fresh)
+        return self.replace(market, timeframe, fresh)
+
+    def sync_from_storage(self, storage, market: str, timeframe: str) -> int:
+        """從SQLite K線存儲增量同步（只讀取最後一根之後的記錄）"""
+        last = self.last_timestamp(market, timeframe)
+        arrays = storage.read_arrays(market, timeframe, start=last)
+        if len(arrays['timestamp']) == 0:
+            return 0
+        return self.append(market, timeframe, pd.DataFrame(arrays))
+
+
+async def fetch_klines_archived(service, market: str, period: str, limit: int,
+                                archive: Optional[CandleArchive] = None) -> Optional[pd.DataFrame]:
+    """
+    經由本地檔案庫獲取K線：只向API請求檔案庫缺少的最新部分，
+    檔案庫落後超過 limit 根時以最新 limit 根重建，不留缺口
+
+    Args:
+        service: 提供 _fetch_klines(market, period, limit) 的服務（如 LiveMACDService）
+        market: 交易對
+        period: K線週期（分鐘字符串）
+        limit: 需要的K線數量
+
+    Returns:
+        與 _fetch_klines 相同格式的DataFrame（timestamp 為Unix秒，含 datetime 欄位）
+    """
+    archive = archive or get_candle_archive()
+    minutes = int(period)
+    timeframe = PERIOD_TIMEFRAMES.get(minutes, f"{minutes}m")
+
+    fetch_limit = archive.candles_to_fetch(market, timeframe, limit, minutes * 60)
+    fresh = await service._fetch_klines(market, period, fetch_limit)
+    archive.extend(market, timeframe, fresh, minutes * 60)
+
+    columns = archive.load(market, timeframe)
+    if len(columns['timestamp']) == 0:
+        return None
+
+    df = pd.DataFrame({name: columns[name][-limit:] for name in KLINE_COLUMNS})
+    df.insert(1, 'datetime', [pd.Timestamp.fromtimestamp(ts).to_pydatetime() for ts in df['timestamp']])
+    return df
+
+
+_archives: Dict[str, CandleArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def get_candle_archive(root: str = "data/candles") -> CandleArchive:
+    """獲取進程共用的K線檔案庫實例"""
+    key = str(Path(root).resolve())
+    with _archives_lock:
+        archive = _archives.get(key)
+        if archive is None:
+            archive = CandleArchive(root)
+            _archives[key] = archive
+        return archive
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多週期K線重採樣 - 由單一1分鐘K線（或成交）流增量生成 5m/15m/30m/1h/4h/1d K線
+各週期由同一份基礎K線聚合而來，彼此一致；每個交易週期只需請求一次1分鐘K線，
+基礎K線覆蓋不到的較長歷史只在首次從API播種一次，之後同樣由基礎K線延續。
+"""
+
+import bisect
+import logging
+import threading
+import time
+from dataclasses import replace
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from .kline_storage import KLINE_COLUMNS, to_unix_seconds
+from .market_stream import RESOLUTION_SECONDS, Candle, MarketEvent
+from .max_transport import MAX_API_BASE_URL, MAXTransport, get_max_transport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEFRAMES = ('5m', '15m', '30m', '1h', '4h', '1d')
+
+
+def period_to_timeframe(period_minutes: int) -> Optional[str]:
+    """MAX API 的 period（分鐘）轉為週期名稱，不支持的週期返回 None"""
+    for timeframe, seconds in RESOLUTION_SECONDS.items():
+        if seconds == int(period_minutes) * 60:
+            return timeframe
+    return None
+
+
+class _Rollup:
+    """單根聚合K線及其覆蓋的基礎K線範圍"""
+    __slots__ = ('candle', 'first', 'last', 'count', 'seeded')
+
+    def __init__(self, candle: Candle, first: int, last: int, count: int, seeded: bool = False):
+        self.candle = candle
+        self.first = first
+        self.last = last
+        self.count = count
+        self.seeded = seeded
+
+
+class CandleResampler:
+    """由基礎K線增量維護各個較高週期的K線"""
+
+    def __init__(self, timeframes: Sequence[str] = DEFAULT_TIMEFRAMES, base: str = '1m',
+                 max_base_candles: int = 1500, max_rollup_candles: int = 1000):
+        """
+        初始化重採樣器
+
+        Args:
+            timeframes: 需要生成的週期（必須是基礎週期的整數倍）
+            base: 基礎週期
+            max_base_candles: 保留的基礎K線根數
+            max_rollup_candles: 每個週期保留的聚合K線根數
+        """
+        self.base = base
+        self.base_seconds = RESOLUTION_SECONDS[base]
+        self.timeframes = tuple(tf for tf in timeframes if tf != base)
+        for timeframe in self.timeframes:
+            if RESOLUTION_SECONDS[timeframe] % self.base_seconds:
+                raise ValueError(f"週期 {timeframe} 不是 {base} 的整數倍")
+        self.max_base_candles = max_base_candles
+        self.max_rollup_candles = max_rollup_candles
+
+        self._base: Dict[int, Candle] = {}
+        self._base_starts: List[int] = []
+        self._rollups: Dict[str, Dict[int, _Rollup]] = {tf: {} for tf in self.timeframes}
+        self._rollup_starts: Dict[str, List[int]] = {tf: [] for tf in self.timeframes}
+
+        # 見過的最早基礎K線：早於它開盤的聚合K線缺少前段數據
+        self.history_start: Optional[int] = None
+
+        self.stats = {'base_updates': 0, 'incremental': 0, 'recomputed': 0, 'seeded': 0}
+
+    # ---------------------------------------------------------------- 寫入
+
+    @property
+    def latest_start(self) -> Optional[int]:
+        return self._base_starts[-1] if self._base_starts else None
+
+    @property
+    def earliest_start(self) -> Optional[int]:
+        return self._base_starts[0] if self._base_starts else None
+
+    @property
+    def base_count(self) -> int:
+        return len(self._base_starts)
+
+    def update(self, candle: Candle) -> List[Tuple[str, Candle]]:
+        """
+        寫入一根基礎K線（新K線或形成中K線的更新），增量更新受影響的聚合K線
+
+        Returns:
+            (週期, 聚合K線) 列表
+        """
+        start = int(candle.start) - int(candle.start) % self.base_seconds
+        candle = Candle(start, float(candle.open), float(candle.high), float(candle.low),
+                        float(candle.close), float(candle.volume), bool(candle.closed))
+
+        old = self._base.get(start)
+        if old is None:
+            bisect.insort(self._base_starts, start)
+        self._base[start] = candle
+        if self.history_start is None or start < self.history_start:
+            self.history_start = start
+        self.stats['base_updates'] += 1
+
+        changed = []
+        for timeframe in self.timeframes:
+            rollup = self._apply_rollup(timeframe, candle, old)
+            if rollup is not None:
+                changed.append((timeframe, rollup.candle))
+
+        if len(self._base_starts) > self.max_base_candles:
+            for expired in self._base_starts[:len(self._base_starts) - self.max_base_candles]:
+                del self._base[expired]
+            del self._base_starts[:len(self._base_starts) - self.max_base_candles]
+        return changed
+
+    def update_rows(self, rows: Iterable[Sequence[Any]], now: Optional[float] = None) -> int:
+        """寫入 MAX API 格式的K線行 [timestamp, open, high, low, close, volume]"""
+        now = time.time() if now is None else now
+        count = 0
+        for row in sorted(rows, key=lambda item: int(item[0])):
+            start = int(row[0])
+            self.update(Candle(start, *(float(value) for value in row[1:6]),
+                               closed=start + self.base_seconds <= now))
+            count += 1
+        return count
+
+    def update_dataframe(self, df: pd.DataFrame, now: Optional[float] = None) -> int:
+        """寫入包含 timestamp/open/high/low/close/volume 欄位的DataFrame"""
+        if df is None or df.empty:
+            return 0
+        timestamps = to_unix_seconds(df['timestamp'])
+        values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=float)
+        return self.update_rows(([ts, *row] for ts, row in zip(timestamps.tolist(), values.tolist())), now)
+
+    def add_trade(self, price: float, volume: float, timestamp: float) -> List[Tuple[str, Candle]]:
+        """由單筆成交更新所在的基礎K線"""
+        start = int(timestamp) - int(timestamp) % self.base_seconds
+        current = self._base.get(start)
+        if current is None:
+            candle = Candle(start, price, price, price, price, volume)
+        else:
+            candle = Candle(start, current.open, max(current.high, price), min(current.low, price), price,
+                            current.volume + volume)
+        return self.update(candle)
+
+    def on_market_event(self, event: MarketEvent):
+        """MarketDataStream 訂閱回調：消費基礎週期的 kline 推送/補數據，或 trade 推送"""
+        if event.channel == 'kline':
+            candles = event.data if isinstance(event.data, list) else [event.data]
+            for candle in candles:
+                self.update(candle)
+        elif event.channel == 'trade':
+            for trade in event.data:
+                self.add_trade(trade['price'], trade['volume'], trade['timestamp'])
+
+    def seed(self, timeframe: str, rows: Iterable[Sequence[Any]], now: Optional[float] = None) -> int:
+        """
+        以API返回的較高週期K線播種基礎K線覆蓋不到的歷史
+
+        只接受開盤時間早於基礎K線歷史的K線，其餘週期由基礎K線負責，避免重複計量
+        """
+        now = time.time() if now is None else now
+        seconds = RESOLUTION_SECONDS[timeframe]
+        rollups, starts = self._rollups[timeframe], self._rollup_starts[timeframe]
+        count = 0
+        for row in rows:
+            start = int(row[0])
+            if self.history_start is not None and start >= self.history_start:
+                continue
+            candle = Candle(start, *(float(value) for value in row[1:6]), closed=start + seconds <= now)
+            if start not in rollups:
+                bisect.insort(starts, start)
+            rollups[start] = _Rollup(candle, start, start + seconds - self.base_seconds, 0, seeded=True)
+            count += 1
+        self._trim_rollups(timeframe)
+        self.stats['seeded'] += count
+        return count
+
+    def _apply_rollup(self, timeframe: str, candle: Candle, old: Optional[Candle]) -> Optional[_Rollup]:
+        seconds = RESOLUTION_SECONDS[timeframe]
+        bucket = candle.start - candle.start % seconds
+        rollups = self._rollups[timeframe]
+        rollup = rollups.get(bucket)
+
+        if rollup is None:
+            rollup = _Rollup(Candle(bucket, candle.open, candle.high, candle.low, candle.close, candle.volume),
+                             candle.start, candle.start, 1)
+            rollups[bucket] = rollup
+            bisect.insort(self._rollup_starts[timeframe], bucket)
+            self._trim_rollups(timeframe)
+            self.stats['incremental'] += 1
+            return rollup
+        if rollup.seeded:
+            return None
+
+        aggregate = rollup.candle
+        if old is None:
+            if candle.start < rollup.first:
+                aggregate.open = candle.open
+                rollup.first = candle.start
+            if candle.start > rollup.last:
+                aggregate.close = candle.close
+                rollup.last = candle.start
+            aggregate.high = max(aggregate.high, candle.high)
+            aggregate.low = min(aggregate.low, candle.low)
+            aggregate.volume += candle.volume
+            rollup.count += 1
+            self.stats['incremental'] += 1
+        elif candle.high >= old.high and candle.low <= old.low:
+            # 形成中K線的更新：高低點只會擴張，成交量按差值累加
+            aggregate.high = max(aggregate.high, candle.high)
+            aggregate.low = min(aggregate.low, candle.low)
+            aggregate.volume += candle.volume - old.volume
+            if candle.start == rollup.first:
+                aggregate.open = candle.open
+            if candle.start == rollup.last:
+                aggregate.close = candle.close
+            self.stats['incremental'] += 1
+        else:
+            # 修正使高低點收窄，只能按桶重新聚合
+            self._recompute(timeframe, rollup)
+            self.stats['recomputed'] += 1
+        return rollup
+
+    def _recompute(self, timeframe: str, rollup: _Rollup):
+        bucket = rollup.candle.start
+        left = bisect.bisect_left(self._base_starts, bucket)
+        right = bisect.bisect_left(self._base_starts, bucket + RESOLUTION_SECONDS[timeframe])
+        members = [self._base[start] for start in self._base_starts[left:right]]
+        rollup.candle = Candle(bucket, members[0].open, max(c.high for c in members),
+                               min(c.low for c in members), members[-1].close, sum(c.volume for c in members))
+        rollup.first, rollup.last, rollup.count = members[0].start, members[-1].start, len(members)
+
+    def _trim_rollups(self, timeframe: str):
+        starts = self._rollup_starts[timeframe]
+        if len(starts) > self.max_rollup_candles:
+            for expired in starts[:len(starts) - self.max_rollup_candles]:
+                del self._rollups[timeframe][expired]
+            del starts[:len(starts) - self.max_rollup_candles]
+
+    # ---------------------------------------------------------------- 讀取
+
+    def candles(self, timeframe: str, limit: Optional[int] = None,
+                include_partial: bool = True, complete_only: bool = False) -> List[Candle]:
+        """
+        獲取某週期的K線（時間正序）
+
+        Args:
+            timeframe: 週期（基礎週期或已配置的較高週期）
+            limit: 只取最新的 limit 根
+            include_partial: 是否包含尚未收盤的最新K線
+            complete_only: 只返回基礎K線連續覆蓋的聚合K線（桶內有缺口的K線跳過）
+        """
+        latest = self.latest_start
+        if timeframe == self.base:
+            result = [replace(self._base[start], closed=self._base[start].closed or start < latest)
+                      for start in self._base_starts]
+        else:
+            seconds = RESOLUTION_SECONDS[timeframe]
+            result = []
+            for start in self._rollup_starts[timeframe]:
+                rollup = self._rollups[timeframe][start]
+                if rollup.seeded:
+                    result.append(replace(rollup.candle))
+                    continue
+                if start < self.history_start:
+                    # 基礎K線沒有覆蓋到這根K線的開頭，開盤價與成交量不完整
+                    continue
+                if complete_only and rollup.count < (min(start + seconds, latest + self.base_seconds)
+                                                     - start) // self.base_seconds:
+                    # 桶內缺少基礎K線，聚合值只是部分數據
+                    continue
+                final = self._base.get(start + seconds - self.base_seconds)
+                closed = (latest is not None and latest >= start + seconds) or (final is not None and final.closed)
+                result.append(replace(rollup.candle, closed=closed))
+
+        if not include_partial and result and not result[-1].closed:
+            result.pop()
+        if limit is not None:
+            result = result[-limit:] if limit > 0 else []
+        return result
+
+    def to_dataframe(self, timeframe: str, limit: Optional[int] = None,
+                     include_partial: bool = True, complete_only: bool = False) -> pd.DataFrame:
+        """與 MAX K線接口相同欄位的DataFrame（timestamp 轉為datetime）"""
+        rows = [candle.to_list() for candle in self.candles(timeframe, limit, include_partial, complete_only)]
+        df = pd.DataFrame(rows, columns=KLINE_COLUMNS)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+
+
+class MultiTimeframeKlineFeed:
+    """以單一1分鐘K線請求維護各交易對的多週期K線"""
+
+    def __init__(self, base_url: str = MAX_API_BASE_URL, transport: Optional[MAXTransport] = None,
+                 timeframes: Sequence[str] = DEFAULT_TIMEFRAMES, max_base_candles: int = 1500,
+                 refresh_interval: float = 1.0, api_limit: int = 10000):
+        """
+        Args:
+            base_url: MAX API 地址
+            transport: 共用傳輸層（默認進程共用實例）
+            timeframes: 由基礎K線生成的週期
+            max_base_candles: 保留的1分鐘K線根數，需要更長歷史的週期改為一次性播種
+            refresh_interval: 兩次刷新基礎K線的最小間隔（秒）
+            api_limit: K線接口單次最多返回的根數
+        """
+        self.base_url = base_url.rstrip('/')
+        self.transport = transport or get_max_transport()
+        self.timeframes = tuple(timeframes)
+        self.max_base_candles = max_base_candles
+        self.refresh_interval = refresh_interval
+        self.api_limit = api_limit
+
+        self.resamplers: Dict[str, CandleResampler] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._seeded: Dict[Tuple[str, str], int] = {}
+        self.stats = {'base_requests': 0, 'seed_requests': 0, 'served': 0}
+
+    def resampler(self, market: str) -> CandleResampler:
+        market = market.lower()
+        if market not in self.resamplers:
+            self.resamplers[market] = CandleResampler(self.timeframes, max_base_candles=self.max_base_candles)
+        return self.resamplers[market]
+
+    def required_base_candles(self, timeframe: str, limit: int, now: Optional[float] = None) -> int:
+        """生成 limit 根某週期K線（含形成中的一根）需要的1分鐘K線數"""
+        now = time.time() if now is None else now
+        seconds = RESOLUTION_SECONDS[timeframe]
+        base_seconds = RESOLUTION_SECONDS['1m']
+        return (limit - 1) * (seconds // base_seconds) + int(now % seconds) // base_seconds + 1
+
+    async def get_klines(self, market: str, timeframe: str, limit: int,
+                         timeout: float = 10) -> Optional[pd.DataFrame]:
+        frames = await self.get_timeframes(market, {timeframe: limit}, timeout)
+        return frames.get(timeframe)
+
+    async def get_timeframes(self, market: str, limits: Dict[str, int],
+                             timeout: float = 10) -> Dict[str, pd.DataFrame]:
+        """
+        獲取多個週期的最新K線（含形成中K線），所有週期共用一次1分鐘K線請求
+
+        Args:
+            market: 交易對
+            limits: 週期 -> 根數，如 {'1m': 100, '5m': 50, '1h': 24}
+
+        Returns:
+            週期 -> DataFrame（沒有數據的週期不返回）
+        """
+        market = market.lower()
+        now = time.time()
+        needed = {tf: self.required_base_candles(tf, limit, now) for tf, limit in limits.items()}
+        covered = [count for count in needed.values() if count <= self.max_base_candles]
+        base_needed = max(covered) if covered else self.max_base_candles
+
+        resampler = await self._refresh_base(market, base_needed, now, timeout)
+        for timeframe, limit in limits.items():
+            if needed[timeframe] > self.max_base_candles and self._seeded.get((market, timeframe), 0) < limit:
+                await self._seed(market, resampler, timeframe, limit, timeout)
+
+        self.stats['served'] += len(limits)
+        frames = {}
+        for timeframe, limit in limits.items():
+            df = resampler.to_dataframe(timeframe, limit)
+            if not df.empty:
+                frames[timeframe] = df
+        return frames
+
+    async def _refresh_base(self, market: str, needed: int, now: float, timeout: float) -> CandleResampler:
+        resampler = self.resampler(market)
+        latest, earliest = resampler.latest_start, resampler.earliest_start
+        params = {'market': market, 'period': 1}
+
+        if latest is not None and (latest - earliest) // resampler.base_seconds + 1 >= min(
+                needed, resampler.max_base_candles):
+            if now - self._refreshed_at.get(market, 0) < self.refresh_interval:
+                return resampler
+            missing = int((now - latest) // resampler.base_seconds) + 2
+            if missing > needed:
+                # 停頓太久，中間的K線已超出需要的範圍：丟棄舊狀態重新加載
+                logger.info(f"🔄 {market} 基礎K線中斷 {missing} 根，重新加載")
+                del self.resamplers[market]
+                self._seeded = {key: value for key, value in self._seeded.items() if key[0] != market}
+                return await self._refresh_base(market, needed, now, timeout)
+            params.update({'timestamp': latest, 'limit': missing})
+        else:
+            params['limit'] = min(needed, self.api_limit)
+
+        response = await self.transport.get(f"{self.base_url}/k", params=params, timeout=timeout)
+        response.raise_for_status()
+        resampler.update_rows(response.json() or [], now)
+        self._refreshed_at[market] = now
+        self.stats['base_requests'] += 1
+        return resampler
+
+    async def _seed(self, market: str, resampler: CandleResampler, timeframe: str, limit: int, timeout: float):
+        logger.info(f"🌱 {market} {timeframe} 超出基礎K線覆蓋範圍，從API播種 {limit} 根歷史")
+        response = await self.transport.get(
+            f"{self.base_url}/k",
+            {'market': market, 'period': RESOLUTION_SECONDS[timeframe] // 60, 'limit': min(limit, self.api_limit)},
+            timeout=timeout)
+        response.raise_for_status()
+        resampler.seed(timeframe, response.json() or [])
+        self._seeded[(market, timeframe)] = limit
+        self.stats['seed_requests'] += 1
+
+
+_feeds: Dict[str, MultiTimeframeKlineFeed] = {}
+_feeds_lock = threading.Lock()
+
+
+def get_kline_feed(base_url: str = MAX_API_BASE_URL) -> MultiTimeframeKlineFeed:
+    """獲取進程共用的多週期K線源（同一API地址共用一份基礎K線）"""
+    key = base_url.rstrip('/')
+    with _feeds_lock:
+        if key not in _feeds:
+            _feeds[key] = MultiTimeframeKlineFeed(key)
+        return _feeds[key]
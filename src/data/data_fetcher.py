@@ -6,7 +6,6 @@ MAX API 數據獲取器
 """
 
 import asyncio
-import aiohttp
 import pandas as pd
 from datetime import datetime, timedelta
 import time
@@ -15,6 +14,8 @@ from typing import Optional, List, Dict, Any
 import json
 from pathlib import Path
 
+from .max_transport import get_max_transport
+
 # 設置日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,19 +25,18 @@ class DataFetcher:
     
     def __init__(self):
         self.base_url = "https://max-api.maicoin.com/api/v2"
-        self.session = None
+        # 進程共用的連接池，同步接口也經由其後台事件循環執行
+        self.transport = get_max_transport()
         self.rate_limit_delay = 0.1  # 100ms between requests
         self.last_request_time = 0
         
     async def __aenter__(self):
         """異步上下文管理器入口"""
-        self.session = aiohttp.ClientSession()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """異步上下文管理器出口"""
-        if self.session:
-            await self.session.close()
+        """異步上下文管理器出口（連接池由共用傳輸層管理，不在此關閉）"""
+        return None
     
     async def _rate_limit(self):
         """實施速率限制"""
@@ -53,12 +53,12 @@ class DataFetcher:
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    logger.error(f"API請求失敗: {response.status} - {url}")
-                    return None
+            response = await self.transport.get(url, params=params)
+            if response.status == 200:
+                return response.json()
+            else:
+                logger.error(f"API請求失敗: {response.status} - {url}")
+                return None
         except Exception as e:
             logger.error(f"請求異常: {e}")
             return None
@@ -238,13 +238,8 @@ class DataFetcher:
         }
         period = period_map.get(timeframe, '60')
         
-        # 使用異步方法獲取數據
-        return asyncio.run(self._fetch_data_async(market, period, limit))
-    
-    async def _fetch_data_async(self, market: str, period: str, limit: int) -> Optional[pd.DataFrame]:
-        """內部異步獲取數據方法"""
-        async with DataFetcher() as fetcher:
-            return await fetcher.get_klines(market, period, limit)
+        # 在共用傳輸層的後台事件循環上執行，復用已建立的連接
+        return self.transport.run_sync(self.get_klines(market, period, limit))
     
     def get_kline_data(self, market='btctwd', timeframe='1h', limit=100):
         """獲取K線數據 (同步方法，兼容舊版本)"""
@@ -280,11 +275,11 @@ async def fetch_current_price(market: str = 'btctwd') -> Optional[float]:
 # 同步版本的便捷函數
 def get_btc_data_sync(period: str = '60', limit: int = 1000) -> Optional[pd.DataFrame]:
     """同步獲取BTC數據"""
-    return asyncio.run(fetch_btc_data(period, limit))
+    return get_max_transport().run_sync(fetch_btc_data(period, limit))
 
 def get_current_price_sync(market: str = 'btctwd') -> Optional[float]:
     """同步獲取當前價格"""
-    return asyncio.run(fetch_current_price(market))
+    return get_max_transport().run_sync(fetch_current_price(market))
 
 if __name__ == "__main__":
     # 測試代碼
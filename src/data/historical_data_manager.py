@@ -5,17 +5,20 @@
 避免每次都重新獲取歷史數據，提升系統效率
 """
 
-import sqlite3
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 import logging
 import asyncio
+import time
 from pathlib import Path
 import json
 
+from .candle_resampler import CandleResampler
 from .max_client import create_max_client
+from .kline_storage import datetime_to_unix_seconds, get_kline_storage, to_unix_seconds
+from .market_stream import RESOLUTION_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +37,9 @@ class HistoricalDataManager:
         
         self.max_client = create_max_client()
         
+        # 進程共用的K線存儲（單一連接、WAL模式）
+        self.storage = get_kline_storage(str(self.db_path))
+        
         # 數據更新配置
         self.update_config = {
             '1m': {'limit': 1440, 'update_interval': 60},      # 1天數據，每分鐘更新
@@ -42,42 +48,20 @@ class HistoricalDataManager:
             '1d': {'limit': 365, 'update_interval': 86400}     # 1年數據，每天更新
         }
         
+        # 基礎週期：其餘週期首次加載歷史後改由基礎K線重採樣延續，不再單獨請求
+        self.base_timeframe = '1m'
+        
         # 初始化數據庫
         self._init_database()
         
         logger.info(f"📊 歷史數據管理器初始化完成，數據庫: {self.db_path}")
     
     def _init_database(self):
-        """初始化數據庫表結構"""
+        """初始化數據庫表結構（K線表由 KlineStorage 建立）"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # 創建K線數據表
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS klines (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        market TEXT NOT NULL,
-                        timeframe TEXT NOT NULL,
-                        timestamp INTEGER NOT NULL,
-                        open REAL NOT NULL,
-                        high REAL NOT NULL,
-                        low REAL NOT NULL,
-                        close REAL NOT NULL,
-                        volume REAL NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(market, timeframe, timestamp)
-                    )
-                ''')
-                
-                # 創建索引
-                cursor.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_klines_market_timeframe_timestamp 
-                    ON klines(market, timeframe, timestamp)
-                ''')
-                
+            with self.storage.transaction() as conn:
                 # 創建數據更新記錄表
-                cursor.execute('''
+                conn.execute('''
                     CREATE TABLE IF NOT EXISTS update_log (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         market TEXT NOT NULL,
@@ -90,7 +74,7 @@ class HistoricalDataManager:
                 ''')
                 
                 # 創建系統配置表
-                cursor.execute('''
+                conn.execute('''
                     CREATE TABLE IF NOT EXISTS system_config (
                         key TEXT PRIMARY KEY,
                         value TEXT NOT NULL,
@@ -98,7 +82,6 @@ class HistoricalDataManager:
                     )
                 ''')
                 
-                conn.commit()
                 logger.info("✅ 數據庫表結構初始化完成")
                 
         except Exception as e:
@@ -148,7 +131,7 @@ class HistoricalDataManager:
     def _check_data_freshness(self, market: str, timeframe: str) -> Tuple[bool, str]:
         """檢查數據新鮮度"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.storage.transaction() as conn:
                 cursor = conn.cursor()
                 
                 # 檢查更新記錄
@@ -191,13 +174,20 @@ class HistoricalDataManager:
             limit = config['limit']
             
             # 轉換時間框架格式
-            period_map = {'1m': 1, '5m': 5, '1h': 60, '1d': 1440}
-            period = period_map.get(timeframe, 1)
+            seconds = RESOLUTION_SECONDS[timeframe]
+            period = seconds // 60
+            
+            # 基礎週期已有近期數據時只補上次之後的K線
+            since = self._latest_timestamp(market, timeframe) if timeframe == self.base_timeframe else None
+            if since is not None and time.time() - since < limit * seconds:
+                limit = int((time.time() - since) // seconds) + 2
+            else:
+                since = None
             
             logger.info(f"📥 從MAX API獲取 {timeframe} 數據 (limit: {limit})...")
             
             # 獲取數據
-            klines_df = await self.max_client._get_recent_klines(market, period, limit)
+            klines_df = await self.max_client._get_recent_klines(market, period, limit, since=since)
             
             if klines_df is None or klines_df.empty:
                 logger.error(f"❌ 獲取 {timeframe} 數據失敗")
@@ -207,7 +197,11 @@ class HistoricalDataManager:
             saved_count = self._save_klines_data(market, timeframe, klines_df)
             
             # 更新記錄
-            self._update_log_record(market, timeframe, saved_count, "success")
+            self._update_log_record(market, timeframe, self._count_records(market, timeframe), "success")
+            
+            # 基礎K線更新後重算受影響的各週期K線
+            if timeframe == self.base_timeframe:
+                self._roll_up_base(market, int(to_unix_seconds(klines_df['timestamp']).min()))
             
             logger.info(f"✅ {timeframe} 數據更新完成，保存 {saved_count} 條記錄")
             return True
@@ -217,39 +211,63 @@ class HistoricalDataManager:
             self._update_log_record(market, timeframe, 0, "failed")
             return False
     
+    def _roll_up_base(self, market: str, since: int) -> Dict[str, int]:
+        """
+        由基礎K線重算 since 之後受影響的各週期K線並寫回數據庫
+        
+        只處理已有歷史的週期；基礎K線沒有完整覆蓋的K線（缺開頭或桶內有缺口）不會被覆寫，
+        數據庫中原有的記錄保持不變
+        
+        Returns:
+            各週期寫入的記錄數
+        """
+        try:
+            derived = [tf for tf in self.update_config
+                       if tf != self.base_timeframe and self._count_records(market, tf) > 0]
+            if not derived:
+                return {}
+            
+            start = min(since - since % RESOLUTION_SECONDS[tf] for tf in derived)
+            base_df = self.storage.read_dataframe(market, self.base_timeframe, start=start)
+            resampler = CandleResampler(derived, base=self.base_timeframe, max_base_candles=len(base_df) + 1)
+            resampler.update_dataframe(base_df)
+            
+            results = {}
+            for timeframe in derived:
+                candles = resampler.candles(timeframe, complete_only=True)
+                if not candles:
+                    continue
+                results[timeframe] = self._save_klines_data(
+                    market, timeframe, resampler.to_dataframe(timeframe, complete_only=True))
+                
+                # 最新一根也由基礎K線生成時才視為已更新，否則留待直接請求
+                latest = resampler.latest_start
+                if candles[-1].start == latest - latest % RESOLUTION_SECONDS[timeframe]:
+                    self._update_log_record(market, timeframe, self._count_records(market, timeframe), "success")
+            
+            logger.info(f"🧮 由 {self.base_timeframe} 重採樣更新: {results}")
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ 重採樣更新失敗: {e}")
+            return {}
+    
+    def _latest_timestamp(self, market: str, timeframe: str) -> Optional[int]:
+        """數據庫中最新一根K線的時間戳"""
+        timestamps = self.storage.read_arrays(market, timeframe, limit=1)['timestamp']
+        return int(timestamps[-1]) if len(timestamps) else None
+    
+    def _count_records(self, market: str, timeframe: str) -> int:
+        """數據庫中某週期的K線數量"""
+        with self.storage.transaction() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM klines WHERE market = ? AND timeframe = ?", (market, timeframe)
+            ).fetchone()[0]
+    
     def _save_klines_data(self, market: str, timeframe: str, df: pd.DataFrame) -> int:
-        """保存K線數據到數據庫"""
+        """保存K線數據到數據庫（批量upsert）"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                saved_count = 0
-                
-                for _, row in df.iterrows():
-                    try:
-                        # 轉換時間戳
-                        if isinstance(row['timestamp'], pd.Timestamp):
-                            timestamp = int(row['timestamp'].timestamp())
-                        else:
-                            timestamp = int(row['timestamp'])
-                        
-                        # 插入數據（使用 INSERT OR REPLACE 避免重複）
-                        conn.execute('''
-                            INSERT OR REPLACE INTO klines 
-                            (market, timeframe, timestamp, open, high, low, close, volume)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            market, timeframe, timestamp,
-                            float(row['open']), float(row['high']), 
-                            float(row['low']), float(row['close']), 
-                            float(row['volume'])
-                        ))
-                        saved_count += 1
-                        
-                    except Exception as e:
-                        logger.warning(f"⚠️ 保存單條記錄失敗: {e}")
-                        continue
-                
-                conn.commit()
-                return saved_count
+            return self.storage.upsert_dataframe(market, timeframe, df)
                 
         except Exception as e:
             logger.error(f"❌ 保存K線數據失敗: {e}")
@@ -258,13 +276,12 @@ class HistoricalDataManager:
     def _update_log_record(self, market: str, timeframe: str, count: int, status: str):
         """更新日誌記錄"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.storage.transaction() as conn:
                 conn.execute('''
                     INSERT OR REPLACE INTO update_log 
                     (market, timeframe, last_update, records_count, status)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (market, timeframe, datetime.now().isoformat(), count, status))
-                conn.commit()
                 
         except Exception as e:
             logger.error(f"❌ 更新日誌記錄失敗: {e}")
@@ -284,34 +301,47 @@ class HistoricalDataManager:
             歷史數據DataFrame
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                query = '''
-                    SELECT timestamp, open, high, low, close, volume
-                    FROM klines 
-                    WHERE market = ? AND timeframe = ?
-                    ORDER BY timestamp DESC
-                    LIMIT ?
-                '''
-                
-                df = pd.read_sql_query(query, conn, params=(market, timeframe, limit))
-                
-                if df.empty:
-                    logger.warning(f"⚠️ 沒有找到 {market} {timeframe} 的歷史數據")
-                    return None
-                
-                # 轉換時間戳
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-                
-                # 按時間正序排列
-                df = df.sort_values('timestamp').reset_index(drop=True)
-                
-                logger.info(f"✅ 獲取歷史數據: {len(df)} 條 {timeframe} 記錄")
-                return df
+            # 主鍵倒序取最新N條，存儲層反轉後即為時間正序
+            df = self.storage.read_dataframe(market, timeframe, limit=limit)
+            
+            if df.empty:
+                logger.warning(f"⚠️ 沒有找到 {market} {timeframe} 的歷史數據")
+                return None
+            
+            logger.info(f"✅ 獲取歷史數據: {len(df)} 條 {timeframe} 記錄")
+            return df
                 
         except Exception as e:
             logger.error(f"❌ 獲取歷史數據失敗: {e}")
             return None
     
+    def get_historical_range(self, market: str, timeframe: str,
+                             start: Optional[datetime] = None,
+                             end: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+        """
+        按時間範圍從數據庫獲取歷史數據（時間正序）
+        
+        Args:
+            market: 交易對
+            timeframe: 時間框架
+            start: 開始時間（含），None 表示不限；naive時間視為UTC
+            end: 結束時間（含），None 表示不限；naive時間視為UTC
+            
+        Returns:
+            歷史數據DataFrame
+        """
+        try:
+            df = self.storage.read_dataframe(
+                market, timeframe,
+                start=datetime_to_unix_seconds(start) if start else None,
+                end=datetime_to_unix_seconds(end) if end else None
+            )
+            return df if not df.empty else None
+            
+        except Exception as e:
+            logger.error(f"❌ 按範圍獲取歷史數據失敗: {e}")
+            return None
+    
     def get_multiple_timeframes(self, market: str = "btctwd", 
                               timeframes: Dict[str, int] = None) -> Dict[str, pd.DataFrame]:
         """
@@ -340,7 +370,7 @@ class HistoricalDataManager:
     def get_data_statistics(self, market: str = "btctwd") -> Dict[str, Any]:
         """獲取數據統計信息"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.storage.transaction() as conn:
                 cursor = conn.cursor()
                 
                 # 獲取各時間框架的數據統計
@@ -421,22 +451,12 @@ class HistoricalDataManager:
         try:
             cutoff_timestamp = int((datetime.now() - timedelta(days=days_to_keep)).timestamp())
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # 刪除舊數據
-                cursor.execute('''
-                    DELETE FROM klines 
-                    WHERE market = ? AND timestamp < ?
-                ''', (market, cutoff_timestamp))
-                
-                deleted_count = cursor.rowcount
-                conn.commit()
-                
-                logger.info(f"🗑️ 清理了 {deleted_count} 條舊數據")
-                
-                # 優化數據庫
-                cursor.execute('VACUUM')
+            # 刪除舊數據
+            deleted_count = self.storage.delete_before(market, cutoff_timestamp)
+            logger.info(f"🗑️ 清理了 {deleted_count} 條舊數據")
+            
+            # 優化數據庫
+            self.storage.vacuum()
                 
         except Exception as e:
             logger.error(f"❌ 清理舊數據失敗: {e}")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K線存儲層 - 進程級連接池 + WAL模式 + 批量寫入
+以 (market, timeframe, timestamp) 為主鍵的 WITHOUT ROWID 表存放K線
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+KLINE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# 連接調優參數
+CONNECTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -65536,        # 64MB頁緩存
+    'mmap_size': 268435456,      # 256MB記憶體映射
+    'busy_timeout': 5000,
+}
+
+KLINES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        market TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        open REAL NOT NULL,
+        high REAL NOT NULL,
+        low REAL NOT NULL,
+        close REAL NOT NULL,
+        volume REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (market, timeframe, timestamp)
+    ) WITHOUT ROWID
+'''
+
+UPSERT_SQL = '''
+    INSERT INTO klines (market, timeframe, timestamp, open, high, low, close, volume)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(market, timeframe, timestamp) DO UPDATE SET
+        open = excluded.open,
+        high = excluded.high,
+        low = excluded.low,
+        close = excluded.close,
+        volume = excluded.volume
+'''
+
+
+class KlineStorage:
+    """K線存儲（每個進程每個數據庫共用一個連接）"""
+
+    def __init__(self, db_path: str = "data/market_history.db", batch_size: int = 50000):
+        """
+        初始化K線存儲
+
+        Args:
+            db_path: 數據庫文件路徑
+            batch_size: 每批 executemany 的行數
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+
+        self.lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._owner_pid: Optional[int] = None
+
+        self._init_schema()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """當前進程的連接（fork後自動重新打開）"""
+        if self._connection is None or self._owner_pid != os.getpid():
+            self._connection = self._open_connection()
+            self._owner_pid = os.getpid()
+        return self._connection
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """打開並調優連接"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma, value in CONNECTION_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        logger.debug(f"🔌 打開K線數據庫連接: {self.db_path} (pid={os.getpid()})")
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """加鎖的事務，成功提交、異常回滾"""
+        with self.lock:
+            conn = self.connection
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _init_schema(self):
+        """建立K線表，並將舊版自增ID表遷移為 WITHOUT ROWID 表"""
+        with self.transaction() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(klines)")]
+
+            if 'id' in columns:
+                logger.info("🔄 遷移舊版K線表為 WITHOUT ROWID 結構...")
+                conn.execute(KLINES_TABLE_SQL.format(table='klines_migrated'))
+                conn.execute('''
+                    INSERT OR REPLACE INTO klines_migrated
+                    (market, timeframe, timestamp, open, high, low, close, volume, created_at)
+                    SELECT market, timeframe, timestamp, open, high, low, close, volume, created_at
+                    FROM klines ORDER BY id
+                ''')
+                conn.execute("DROP TABLE klines")
+                conn.execute("ALTER TABLE klines_migrated RENAME TO klines")
+            else:
+                conn.execute(KLINES_TABLE_SQL.format(table='klines'))
+
+            conn.execute("DROP INDEX IF EXISTS idx_klines_market_timeframe_timestamp")
+
+    def upsert_arrays(self, market: str, timeframe: str, timestamps: np.ndarray,
+                      open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                      close: np.ndarray, volume: np.ndarray) -> int:
+        """
+        從NumPy陣列批量寫入K線（已存在的時間戳會被更新）
+
+        Args:
+            timestamps: Unix秒時間戳
+            open_/high/low/close/volume: 與時間戳等長的價格與成交量
+
+        Returns:
+            寫入的記錄數
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        columns = [np.asarray(values, dtype=np.float64) for values in (open_, high, low, close, volume)]
+        total = len(timestamps)
+
+        if any(len(values) != total for values in columns):
+            raise ValueError("K線欄位長度不一致")
+
+        with self.transaction() as conn:
+            for start in range(0, total, self.batch_size):
+                end = min(start + self.batch_size, total)
+                rows = zip(
+                    repeat(market), repeat(timeframe),
+                    timestamps[start:end].tolist(),
+                    *(values[start:end].tolist() for values in columns)
+                )
+                conn.executemany(UPSERT_SQL, rows)
+
+        return total
+
+    def upsert_dataframe(self, market: str, timeframe: str, df: pd.DataFrame) -> int:
+        """寫入包含 timestamp/open/high/low/close/volume 欄位的DataFrame"""
+        if df is None or df.empty:
+            return 0
+
+        valid = df.dropna(subset=KLINE_COLUMNS)
+        if len(valid) < len(df):
+            logger.warning(f"⚠️ 跳過 {len(df) - len(valid)} 條不完整的K線記錄")
+
+        return self.upsert_arrays(
+            market, timeframe, to_unix_seconds(valid['timestamp']),
+            valid['open'].to_numpy(), valid['high'].to_numpy(), valid['low'].to_numpy(),
+            valid['close'].to_numpy(), valid['volume'].to_numpy()
+        )
+
+    def read_arrays(self, market: str, timeframe: str, start: Optional[int] = None,
+                    end: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        按時間範圍讀取K線為NumPy陣列（時間正序）
+
+        Args:
+            start/end: Unix秒時間戳範圍（含端點），None 表示不限
+            limit: 只取最新的 limit 條
+
+        Returns:
+            欄位名到陣列的字典，timestamp 為int64，其餘為float64
+        """
+        conditions = ["market = ?", "timeframe = ?"]
+        params = [market, timeframe]
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(int(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(int(end))
+
+        # 取最新N條時按主鍵倒序掃描，讀出後反轉即為正序，無需再排序
+        descending = limit is not None
+        query = (
+            f"SELECT timestamp, open, high, low, close, volume FROM klines "
+            f"WHERE {' AND '.join(conditions)} "
+            f"ORDER BY timestamp {'DESC' if descending else 'ASC'}"
+        )
+        if descending:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+
+        data = np.array(rows, dtype=np.float64).reshape(-1, len(KLINE_COLUMNS))
+        if descending:
+            data = data[::-1]
+
+        arrays = {name: np.ascontiguousarray(data[:, i]) for i, name in enumerate(KLINE_COLUMNS)}
+        arrays['timestamp'] = arrays['timestamp'].astype(np.int64)
+        return arrays
+
+    def read_dataframe(self, market: str, timeframe: str, start: Optional[int] = None,
+                       end: Optional[int] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """按時間範圍讀取K線為DataFrame（timestamp 轉為datetime）"""
+        arrays = self.read_arrays(market, timeframe, start, end, limit)
+        df = pd.DataFrame(arrays, columns=KLINE_COLUMNS)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+
+    def delete_before(self, market: str, cutoff_timestamp: int) -> int:
+        """刪除指定時間之前的K線"""
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM klines WHERE market = ? AND timestamp < ?",
+                (market, int(cutoff_timestamp))
+            )
+            return cursor.rowcount
+
+    def vacuum(self):
+        """整理數據庫文件"""
+        with self.lock:
+            self.connection.execute("VACUUM")
+
+    def close(self):
+        """關閉當前進程的連接"""
+        with self.lock:
+            if self._connection is not None and self._owner_pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._owner_pid = None
+
+
+def to_unix_seconds(timestamps: pd.Series) -> np.ndarray:
+    """將datetime或數值時間戳欄位轉為Unix秒（naive時間視為UTC）"""
+    if pd.api.types.is_numeric_dtype(timestamps):
+        return timestamps.to_numpy(dtype=np.int64)
+
+    utc = pd.to_datetime(timestamps, utc=True)
+    return ((utc - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+
+
+def datetime_to_unix_seconds(value: datetime) -> int:
+    """將單個datetime轉為Unix秒（與 to_unix_seconds 一致，naive時間視為UTC）"""
+    return int(to_unix_seconds(pd.Series([value]))[0])
+
+
+_storage_pool: Dict[str, KlineStorage] = {}
+_storage_pool_lock = threading.Lock()
+
+
+def get_kline_storage(db_path: str = "data/market_history.db") -> KlineStorage:
+    """獲取進程共用的K線存儲實例（同一數據庫只打開一個連接）"""
+    key = str(Path(db_path).resolve())
+    with _storage_pool_lock:
+        storage = _storage_pool.get(key)
+        if storage is None:
+            storage = KlineStorage(db_path)
+            _storage_pool[key] = storage
+        return storage
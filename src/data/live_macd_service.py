@@ -10,18 +10,36 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import asyncio
-import aiohttp
+import time
 from typing import Dict, List, Optional
 import logging
 
+from ..core.streaming_indicators import IndicatorCheckpointStore, StreamingIndicatorSet
+from .candle_resampler import get_kline_feed, period_to_timeframe
+from .kline_storage import to_unix_seconds
+from .max_transport import get_max_transport
+
 logger = logging.getLogger(__name__)
 
 class LiveMACDService:
     """實時 MACD 數據服務"""
     
-    def __init__(self, base_url: str = "https://max-api.maicoin.com/api/v2"):
+    def __init__(self, base_url: str = "https://max-api.maicoin.com/api/v2",
+                 checkpoint_path: Optional[str] = None):
+        """
+        Args:
+            base_url: MAX API 地址
+            checkpoint_path: 增量指標存檔路徑，設定後重啟可直接續算
+        """
         self.base_url = base_url
-        self.session = None
+        # 進程共用的連接池
+        self.transport = get_max_transport()
+        # 支持的週期由同一份1分鐘K線重採樣得到
+        self.kline_feed = get_kline_feed(base_url)
+        
+        # 每個 交易對/週期/參數 一份增量指標狀態
+        self.indicator_states: Dict[str, StreamingIndicatorSet] = {}
+        self.checkpoints = IndicatorCheckpointStore(checkpoint_path) if checkpoint_path else None
         
     async def get_live_macd(self, market: str = "btctwd", period: str = "60", 
                            fast_period: int = 12, slow_period: int = 26, 
@@ -40,27 +58,40 @@ class LiveMACDService:
             包含 MACD 數據的字典
         """
         try:
-            # 獲取足夠的 K線數據
-            limit = max(100, slow_period + signal_period + 20)  # 確保有足夠數據
-            klines = await self._fetch_klines(market, period, limit)
+            key = f"{market}_{period}_{fast_period}_{slow_period}_{signal_period}"
+            indicators = self._get_indicator_state(key, fast_period, slow_period, signal_period)
+            committed = indicators.committed_count
             
-            if klines is None or len(klines) < slow_period + signal_period:
-                logger.error(f"數據不足，無法計算 MACD")
+            # 首次需要足夠的 K線預熱，之後只獲取上次之後的 K線
+            limit = max(100, slow_period + signal_period + 20)
+            if indicators.current_timestamp is not None:
+                gap = int((time.time() - indicators.current_timestamp) // (int(period) * 60))
+                limit = min(limit, gap + 2)
+            
+            klines = await self._fetch_klines(market, period, limit)
+            if klines is None or klines.empty:
+                logger.error(f"獲取 K線失敗，無法計算 MACD")
                 return None
             
-            # 計算 MACD
-            macd_data = self._calculate_macd(
-                klines, fast_period, slow_period, signal_period
-            )
+            if (indicators.current_timestamp is not None and
+                    klines['timestamp'].iloc[0] > indicators.current_timestamp):
+                # 與上次狀態之間有缺口，從本批 K線重新預熱
+                indicators.reset()
+                committed = 0
             
-            if macd_data is None:
+            for timestamp, close in zip(klines['timestamp'].tolist(), klines['close'].tolist()):
+                latest = indicators.update(timestamp, close)
+            
+            if indicators.bars < slow_period + signal_period or indicators.previous is None:
+                logger.error(f"數據不足，無法計算 MACD")
                 return None
             
-            # 獲取最新值
-            latest = macd_data.iloc[-1]
+            if self.checkpoints and indicators.committed_count != committed:
+                self.checkpoints.put(key, indicators)
+                self.checkpoints.save()
             
             result = {
-                'timestamp': latest['datetime'],
+                'timestamp': datetime.fromtimestamp(indicators.current_timestamp),
                 'market': market.upper(),
                 'period': f"{period}分鐘",
                 'price': latest['close'],
@@ -69,7 +100,7 @@ class LiveMACDService:
                     'macd_line': round(latest['macd'], 1),
                     'signal_line': round(latest['macd_signal'], 1)
                 },
-                'trend': self._analyze_trend(macd_data),
+                'trend': self._analyze_trend(pd.DataFrame([indicators.previous, latest])),
                 'parameters': {
                     'fast': fast_period,
                     'slow': slow_period,
@@ -84,11 +115,30 @@ class LiveMACDService:
             logger.error(f"❌ 獲取 MACD 數據失敗: {e}")
             return None
     
+    def _get_indicator_state(self, key: str, fast_period: int, slow_period: int,
+                             signal_period: int) -> StreamingIndicatorSet:
+        """獲取增量指標狀態（優先從存檔恢復）"""
+        indicators = self.indicator_states.get(key)
+        if indicators is None:
+            indicators = self.checkpoints.get(key) if self.checkpoints else None
+            if indicators is None:
+                indicators = StreamingIndicatorSet(fast_period, slow_period, signal_period)
+            self.indicator_states[key] = indicators
+        return indicators
+    
     async def _fetch_klines(self, market: str, period: str, limit: int) -> Optional[pd.DataFrame]:
         """獲取 K線數據"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
+            timeframe = period_to_timeframe(int(period))
+            if timeframe is not None:
+                klines = await self.kline_feed.get_klines(market, timeframe, limit)
+                if klines is None:
+                    return None
+                timestamps = to_unix_seconds(klines['timestamp']).tolist()
+                df = klines.drop(columns=['timestamp'])
+                df.insert(0, 'timestamp', timestamps)
+                df.insert(1, 'datetime', [datetime.fromtimestamp(ts) for ts in timestamps])
+                return df
             
             url = f"{self.base_url}/k"
             params = {
@@ -97,34 +147,34 @@ class LiveMACDService:
                 'limit': limit
             }
             
-            async with self.session.get(url, params=params, timeout=10) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    if not data:
-                        return None
-                    
-                    # 轉換為 DataFrame
-                    df_data = []
-                    for item in data:
-                        df_data.append({
-                            'timestamp': int(item[0]),
-                            'datetime': datetime.fromtimestamp(int(item[0])),
-                            'open': float(item[1]),
-                            'high': float(item[2]),
-                            'low': float(item[3]),
-                            'close': float(item[4]),
-                            'volume': float(item[5])
-                        })
-                    
-                    df = pd.DataFrame(df_data)
-                    df = df.sort_values('timestamp').reset_index(drop=True)
-                    
-                    return df
-                else:
-                    logger.error(f"API 錯誤: {response.status}")
+            response = await self.transport.get(url, params=params, timeout=10)
+            if response.status == 200:
+                data = response.json()
+                
+                if not data:
                     return None
-                    
+                
+                # 轉換為 DataFrame
+                df_data = []
+                for item in data:
+                    df_data.append({
+                        'timestamp': int(item[0]),
+                        'datetime': datetime.fromtimestamp(int(item[0])),
+                        'open': float(item[1]),
+                        'high': float(item[2]),
+                        'low': float(item[3]),
+                        'close': float(item[4]),
+                        'volume': float(item[5])
+                    })
+                
+                df = pd.DataFrame(df_data)
+                df = df.sort_values('timestamp').reset_index(drop=True)
+                
+                return df
+            else:
+                logger.error(f"API 錯誤: {response.status}")
+                return None
+                
         except Exception as e:
             logger.error(f"獲取 K線數據失敗: {e}")
             return None
@@ -253,9 +303,11 @@ class LiveMACDService:
 """
     
     async def close(self):
-        """關閉連接"""
-        if self.session:
-            await self.session.close()
+        """保存指標存檔（連接池由進程共用的傳輸層管理，這裡無需關閉）"""
+        if self.checkpoints:
+            for key, indicators in self.indicator_states.items():
+                self.checkpoints.put(key, indicators)
+            self.checkpoints.save()
 
 # 便利函數
 async def get_btc_macd(period: str = "60") -> Optional[Dict]:
@@ -273,6 +325,13 @@ async def get_multiple_timeframes(market: str = "btctwd") -> Dict[str, Dict]:
         timeframes = ["5", "15", "60", "240"]  # 5分鐘, 15分鐘, 1小時, 4小時
         results = {}
         
+        # 一次請求1分鐘K線預熱所有週期，之後各週期直接讀取重採樣結果
+        try:
+            await service.kline_feed.get_timeframes(
+                market, {period_to_timeframe(int(tf)): 100 for tf in timeframes})
+        except Exception as e:
+            logger.warning(f"⚠️ 預熱多週期K線失敗: {e}")
+        
         for tf in timeframes:
             macd_data = await service.get_live_macd(market, tf)
             if macd_data:
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MAX WebSocket 行情流 - 訂閱 ticker/trade/book/kline 頻道並維護每個交易對的內存狀態
+推送到達即更新訂單簿、成交與K線並通知訂閱者，取代30秒一次的輪詢；
+斷線後按指數退避自動重連，並通過 REST K線接口補齊斷線期間（或推送中跳過）的K線。
+"""
+
+import asyncio
+import bisect
+import inspect
+import json
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aiohttp
+import pandas as pd
+
+from .max_transport import MAX_API_BASE_URL, MAXTransport, get_max_transport
+
+logger = logging.getLogger(__name__)
+
+MAX_WS_URL = "wss://max-stream.maicoin.com/ws"
+
+DEFAULT_CHANNELS = ('ticker', 'trade', 'book', 'kline')
+
+RESOLUTION_SECONDS = {
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '4h': 14400, '1d': 86400
+}
+
+
+@dataclass
+class Candle:
+    """單根K線（start 為開盤時間，秒）"""
+    start: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    closed: bool = False
+
+    def to_list(self) -> List[float]:
+        return [self.start, self.open, self.high, self.low, self.close, self.volume]
+
+
+class CandleSeries:
+    """單一週期的K線序列：已收盤K線 + 正在形成的K線"""
+
+    def __init__(self, resolution: str, maxlen: int = 1000):
+        self.resolution = resolution
+        self.seconds = RESOLUTION_SECONDS[resolution]
+        self.maxlen = maxlen
+        self.closed: List[Candle] = []
+        self.current: Optional[Candle] = None
+
+    @property
+    def latest_start(self) -> Optional[int]:
+        if self.current is not None:
+            return self.current.start
+        return self.closed[-1].start if self.closed else None
+
+    def apply(self, candle: Candle) -> Optional[Tuple[int, int]]:
+        """
+        寫入一根K線（推送或補數據），同一開盤時間的K線直接覆蓋
+
+        Returns:
+            與上一根已知K線之間有缺口時返回 (上一根開盤時間, 本根開盤時間)，否則 None
+        """
+        latest = self.latest_start
+        if latest is not None and candle.start < latest:
+            self._insert_closed(candle)
+            return None
+        if self.current is None and latest is not None and candle.start == latest:
+            # 已收盤K線的重複推送（如重連後的訂閱快照）只更新數值
+            self._insert_closed(candle)
+            return None
+
+        gap = None
+        if latest is not None and candle.start - latest > self.seconds:
+            gap = (latest, candle.start)
+        if self.current is not None and candle.start > self.current.start:
+            # 新K線開始，上一根視為收盤
+            self.current.closed = True
+            self._append_closed(self.current)
+            self.current = None
+
+        if candle.closed:
+            self.current = None
+            self._append_closed(candle)
+        else:
+            self.current = candle
+        return gap
+
+    def _append_closed(self, candle: Candle):
+        if self.closed and self.closed[-1].start == candle.start:
+            self.closed[-1] = candle
+        else:
+            self.closed.append(candle)
+        if len(self.closed) > self.maxlen:
+            del self.closed[:len(self.closed) - self.maxlen]
+
+    def _insert_closed(self, candle: Candle):
+        """補入比最新K線更早的K線（已存在則覆蓋）"""
+        candle.closed = True
+        starts = [c.start for c in self.closed]
+        index = bisect.bisect_left(starts, candle.start)
+        if index < len(starts) and starts[index] == candle.start:
+            self.closed[index] = candle
+        elif index > 0 or len(self.closed) < self.maxlen:
+            self.closed.insert(index, candle)
+            if len(self.closed) > self.maxlen:
+                del self.closed[0]
+
+    def missing_starts(self) -> List[int]:
+        """序列內部缺失的K線開盤時間"""
+        starts = [c.start for c in self.candles()]
+        missing = []
+        for previous, following in zip(starts, starts[1:]):
+            missing.extend(range(previous + self.seconds, following, self.seconds))
+        return missing
+
+    def candles(self, include_current: bool = True) -> List[Candle]:
+        if include_current and self.current is not None:
+            return self.closed + [self.current]
+        return list(self.closed)
+
+    def to_dataframe(self, include_current: bool = True) -> pd.DataFrame:
+        rows = [candle.to_list() for candle in self.candles(include_current)]
+        df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+
+
+class OrderBook:
+    """內存訂單簿（價格 -> 數量）"""
+
+    def __init__(self, depth: int = 50):
+        self.depth = depth
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.updated_at: Optional[float] = None
+
+    def apply_snapshot(self, bids: Iterable[Sequence], asks: Iterable[Sequence]):
+        self.bids = {float(price): float(volume) for price, volume in bids if float(volume) > 0}
+        self.asks = {float(price): float(volume) for price, volume in asks if float(volume) > 0}
+
+    def apply_update(self, bids: Iterable[Sequence], asks: Iterable[Sequence]):
+        """增量更新，數量為 0 的檔位被移除"""
+        for side, levels in ((self.bids, bids), (self.asks, asks)):
+            for price, volume in levels:
+                price, volume = float(price), float(volume)
+                if volume > 0:
+                    side[price] = volume
+                else:
+                    side.pop(price, None)
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return max(self.bids) if self.bids else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return min(self.asks) if self.asks else None
+
+    @property
+    def mid_price(self) -> Optional[float]:
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return (self.best_bid + self.best_ask) / 2
+
+    def top(self, levels: int = 5) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+        bids = sorted(self.bids.items(), reverse=True)[:levels]
+        asks = sorted(self.asks.items())[:levels]
+        return bids, asks
+
+
+@dataclass
+class MarketEvent:
+    """推送給訂閱者的行情更新"""
+    channel: str
+    market: str
+    event: str                  # snapshot/update/backfill
+    data: Any
+    exchange_time: float        # 交易所時間戳（秒）
+    received_at: float = field(default_factory=time.time)
+
+    @property
+    def latency(self) -> float:
+        """交易所產生到本地處理的延遲（秒）"""
+        return self.received_at - self.exchange_time
+
+
+class MarketState:
+    """單個交易對的實時狀態"""
+
+    def __init__(self, market: str, resolutions: Sequence[str], book_depth: int = 50,
+                 buffer_size: int = 1000):
+        self.market = market
+        self.ticker: Dict[str, float] = {}
+        self.trades: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self.book = OrderBook(book_depth)
+        self.candles: Dict[str, CandleSeries] = {res: CandleSeries(res, buffer_size) for res in resolutions}
+        self.updated_at: Optional[float] = None
+
+    @property
+    def last_price(self) -> Optional[float]:
+        if self.trades:
+            return self.trades[-1]['price']
+        return self.ticker.get('close')
+
+    def to_market_data(self) -> Dict[str, Any]:
+        """與輪詢版 get_multi_pair_market_data 相容的字段"""
+        price = self.last_price or 0.0
+        return {
+            'timestamp': datetime.fromtimestamp(self.updated_at or time.time()),
+            'current_price': price,
+            'volume_24h': self.ticker.get('volume', 0.0),
+            'high_24h': self.ticker.get('high', price),
+            'low_24h': self.ticker.get('low', price),
+            'bid': self.book.best_bid or price,
+            'ask': self.book.best_ask or price,
+            'data_source': 'MAX_STREAM'
+        }
+
+
+class MarketDataStream:
+    """MAX WebSocket 行情流"""
+
+    def __init__(self, markets: Iterable[str], channels: Sequence[str] = DEFAULT_CHANNELS,
+                 resolutions: Sequence[str] = ('1m',), url: str = MAX_WS_URL,
+                 rest_base_url: str = MAX_API_BASE_URL, transport: Optional[MAXTransport] = None,
+                 book_depth: int = 50, buffer_size: int = 1000, reconnect_delay: float = 1.0,
+                 max_reconnect_delay: float = 30.0, heartbeat: float = 20.0, backfill_limit: int = 1000):
+        """
+        初始化行情流
+
+        Args:
+            markets: 交易對（btctwd 或 BTCTWD）
+            channels: 訂閱的頻道
+            resolutions: kline 頻道訂閱的週期
+            url: WebSocket 地址
+            rest_base_url: 補數據用的 REST 地址
+            transport: 共用傳輸層（默認進程共用實例）
+            reconnect_delay/max_reconnect_delay: 重連退避的初始/最大等待秒數
+            heartbeat: WebSocket ping 間隔
+            backfill_limit: 單次補K線的最大根數
+        """
+        self.markets = [market.lower() for market in markets]
+        self.channels = tuple(channels)
+        self.resolutions = tuple(resolutions) if 'kline' in self.channels else ()
+        self.url = url
+        self.rest_base_url = rest_base_url.rstrip('/')
+        self.transport = transport or get_max_transport()
+        self.book_depth = book_depth
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.heartbeat = heartbeat
+        self.backfill_limit = backfill_limit
+
+        self.states: Dict[str, MarketState] = {
+            market: MarketState(market, self.resolutions, book_depth, buffer_size) for market in self.markets}
+        self._subscribers: List[Tuple[Callable, Optional[set], Optional[set]]] = []
+
+        self.connected = asyncio.Event()
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        self._backfills: set = set()
+        self._stopping = False
+        self._random = random.Random()
+
+        self.stats = {
+            'connections': 0,
+            'reconnects': 0,
+            'messages': 0,
+            'message_errors': 0,
+            'backfilled_candles': 0,
+            'last_latency': 0.0,
+            'max_latency': 0.0
+        }
+
+    # ---------------------------------------------------------------- 訂閱者
+
+    def subscribe(self, callback: Callable[[MarketEvent], Any], channels: Optional[Iterable[str]] = None,
+                  markets: Optional[Iterable[str]] = None) -> Callable[[], None]:
+        """
+        註冊更新回調（同步函數或協程函數），可按頻道/交易對過濾
+
+        Returns:
+            取消訂閱的函數
+        """
+        entry = (callback,
+                 set(channels) if channels is not None else None,
+                 {market.lower() for market in markets} if markets is not None else None)
+        self._subscribers.append(entry)
+
+        def unsubscribe():
+            if entry in self._subscribers:
+                self._subscribers.remove(entry)
+        return unsubscribe
+
+    async def _publish(self, event: MarketEvent):
+        for callback, channels, markets in list(self._subscribers):
+            if channels is not None and event.channel not in channels:
+                continue
+            if markets is not None and event.market not in markets:
+                continue
+            try:
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"❌ 行情訂閱者處理 {event.channel}/{event.market} 失敗: {e}")
+
+    def state(self, market: str) -> MarketState:
+        return self.states[market.lower()]
+
+    # ---------------------------------------------------------------- 連接
+
+    def _subscription_message(self) -> Dict[str, Any]:
+        subscriptions = []
+        for market in self.markets:
+            for channel in self.channels:
+                if channel == 'kline':
+                    subscriptions.extend({'channel': 'kline', 'market': market, 'resolution': resolution}
+                                         for resolution in self.resolutions)
+                elif channel == 'book':
+                    subscriptions.append({'channel': 'book', 'market': market, 'depth': self.book_depth})
+                else:
+                    subscriptions.append({'channel': channel, 'market': market})
+        return {'action': 'sub', 'subscriptions': subscriptions, 'id': 'aimax-market-stream'}
+
+    def start(self) -> asyncio.Task:
+        """在當前事件循環啟動行情流（後台任務）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """停止行情流並等待後台任務結束"""
+        self._stopping = True
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+        for task in list(self._backfills):
+            task.cancel()
+        if self._task is not None:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        """連接、訂閱並處理推送，斷線後自動重連並補數據，直到 stop()"""
+        self._stopping = False
+        delay = self.reconnect_delay
+        while not self._stopping:
+            try:
+                async with self.transport.session().ws_connect(self.url, heartbeat=self.heartbeat) as ws:
+                    self._ws = ws
+                    await ws.send_json(self._subscription_message())
+                    if self.stats['connections']:
+                        self.stats['reconnects'] += 1
+                        logger.info(f"🔄 行情流已重連（第{self.stats['reconnects']}次），開始補數據")
+                        await self._backfill_all()
+                    self.stats['connections'] += 1
+                    self.connected.set()
+                    delay = self.reconnect_delay
+
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            await self._handle_text(message.data)
+                        elif message.type == aiohttp.WSMsgType.ERROR:
+                            break
+            except asyncio.CancelledError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                logger.warning(f"⚠️ 行情流連接失敗: {e!r}")
+            finally:
+                self._ws = None
+                self.connected.clear()
+
+            if self._stopping:
+                break
+            await asyncio.sleep(delay * self._random.uniform(0.8, 1.0))
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    # ---------------------------------------------------------------- 消息處理
+
+    async def _handle_text(self, text: str):
+        """解析並處理一條推送；格式異常的消息記錄後跳過，不中斷行情流"""
+        try:
+            await self._handle(json.loads(text))
+        except Exception as e:
+            self.stats['message_errors'] += 1
+            logger.warning(f"⚠️ 無法處理行情推送，已跳過: {e!r} {text[:200]}")
+
+    async def _handle(self, message: Dict[str, Any]):
+        event_type = message.get('e')
+        if event_type == 'error':
+            logger.error(f"❌ 行情流錯誤: {message.get('E')}")
+            return
+        channel, market = message.get('c'), message.get('M')
+        if channel is None or market not in self.states:
+            return
+
+        self.stats['messages'] += 1
+        state = self.states[market]
+        exchange_time = message.get('T', time.time() * 1000) / 1000
+
+        if channel == 'ticker':
+            ticker = message['tk']
+            state.ticker = {'open': float(ticker['O']), 'high': float(ticker['H']), 'low': float(ticker['L']),
+                            'close': float(ticker['C']), 'volume': float(ticker['v'])}
+            data = state.ticker
+        elif channel == 'trade':
+            data = [{'price': float(trade['p']), 'volume': float(trade['v']),
+                     'timestamp': trade['T'] / 1000, 'side': trade.get('tr')} for trade in message['t']]
+            state.trades.extend(data)
+        elif channel == 'book':
+            if event_type == 'snapshot':
+                state.book.apply_snapshot(message.get('b', []), message.get('a', []))
+            else:
+                state.book.apply_update(message.get('b', []), message.get('a', []))
+            state.book.updated_at = exchange_time
+            data = state.book
+        elif channel == 'kline':
+            kline = message['k']
+            series = state.candles.get(kline['R'])
+            if series is None:
+                return
+            data = Candle(int(kline['ST']) // 1000, float(kline['O']), float(kline['H']), float(kline['L']),
+                          float(kline['C']), float(kline['v']), bool(kline.get('x', False)))
+            gap = series.apply(data)
+            if gap is not None:
+                self._schedule_backfill(market, series.resolution, gap[0])
+        else:
+            return
+
+        state.updated_at = exchange_time
+        event = MarketEvent(channel, market, event_type, data, exchange_time)
+        self.stats['last_latency'] = event.latency
+        self.stats['max_latency'] = max(self.stats['max_latency'], event.latency)
+        await self._publish(event)
+
+    # ---------------------------------------------------------------- 補數據
+
+    def _schedule_backfill(self, market: str, resolution: str, since: int):
+        logger.info(f"🧩 {market} {resolution} K線推送出現缺口，從 {since} 開始補數據")
+        task = asyncio.create_task(self._backfill(market, resolution, since))
+        self._backfills.add(task)
+        task.add_done_callback(self._backfills.discard)
+
+    async def _backfill_all(self):
+        for market, state in self.states.items():
+            for resolution, series in state.candles.items():
+                if series.latest_start is not None:
+                    await self._backfill(market, resolution, series.latest_start)
+
+    async def _backfill(self, market: str, resolution: str, since: int) -> int:
+        """從 since（含）開始經 REST 補齊K線並通知訂閱者，返回寫入根數"""
+        series = self.states[market].candles[resolution]
+        limit = min(int((time.time() - since) // series.seconds) + 2, self.backfill_limit)
+        try:
+            response = await self.transport.get(
+                f"{self.rest_base_url}/k",
+                {'market': market, 'period': series.seconds // 60, 'timestamp': since, 'limit': limit},
+                use_cache=False)
+            response.raise_for_status()
+            rows = response.json() or []
+        except Exception as e:
+            logger.error(f"❌ {market} {resolution} 補K線失敗: {e}")
+            return 0
+
+        now = time.time()
+        candles = []
+        for row in sorted(rows, key=lambda item: item[0]):
+            start = int(row[0])
+            if start < since:
+                continue
+            candle = Candle(start, *(float(value) for value in row[1:6]), closed=start + series.seconds <= now)
+            series.apply(candle)
+            candles.append(candle)
+
+        self.stats['backfilled_candles'] += len(candles)
+        if candles:
+            await self._publish(MarketEvent('kline', market, 'backfill', candles, now))
+        return len(candles)
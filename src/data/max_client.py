@@ -11,9 +11,13 @@ import numpy as np
 from datetime import datetime, timedelta
 import time
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import asyncio
-import aiohttp
+
+from ..core.streaming_indicators import StreamingIndicatorSet
+from .candle_resampler import get_kline_feed
+from .kline_storage import to_unix_seconds
+from .max_transport import get_max_transport
 
 logger = logging.getLogger(__name__)
 
@@ -22,13 +26,19 @@ class MAXDataClient:
     
     def __init__(self, base_url: str = "https://max-api.maicoin.com/api/v2"):
         self.base_url = base_url
-        self.session = None
+        # 進程共用的連接池（保持連接、端點並發限制、重試退避）
+        self.transport = get_max_transport()
+        # 多週期K線由同一份1分鐘K線重採樣得到
+        self.kline_feed = get_kline_feed(base_url)
         
         # API請求設置
         self.request_delay = 0.1
         self.max_retries = 3
         self.timeout = 10
         
+        # 各交易對/時間框架的增量技術指標狀態
+        self.indicator_states: Dict[Tuple[str, str], StreamingIndicatorSet] = {}
+        
         logger.info("📊 MAX數據客戶端初始化完成")
     
     async def get_enhanced_market_data(self, market: str = "btctwd") -> Dict[str, Any]:
@@ -39,15 +49,14 @@ class MAXDataClient:
             包含豐富技術指標的市場數據
         """
         try:
-            # 並行獲取多種數據
+            # 並行獲取ticker與K線（5分鐘/1小時K線由1分鐘K線重採樣）
             tasks = [
                 self._get_current_ticker(market),
-                self._get_recent_klines(market, period=1, limit=100),  # 1分鐘K線
-                self._get_recent_klines(market, period=5, limit=50),   # 5分鐘K線
-                self._get_recent_klines(market, period=60, limit=24),  # 1小時K線
+                self._get_timeframe_klines(market, {'1m': 100, '5m': 50, '1h': 24}),
             ]
             
-            ticker, klines_1m, klines_5m, klines_1h = await asyncio.gather(*tasks)
+            ticker, klines = await asyncio.gather(*tasks)
+            klines_1m, klines_5m, klines_1h = (klines.get(tf) for tf in ('1m', '5m', '1h'))
             
             if not all([ticker, klines_1m is not None, klines_5m is not None]):
                 logger.error("❌ 獲取市場數據失敗")
@@ -55,7 +64,7 @@ class MAXDataClient:
             
             # 計算技術指標
             enhanced_data = self._calculate_technical_indicators(
-                ticker, klines_1m, klines_5m, klines_1h
+                ticker, klines_1m, klines_5m, klines_1h, market
             )
             
             # 添加市場微觀結構數據
@@ -74,74 +83,80 @@ class MAXDataClient:
     async def _get_current_ticker(self, market: str) -> Optional[Dict]:
         """獲取當前ticker數據"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/tickers/{market}"
             
-            async with self.session.get(url, timeout=self.timeout) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return {
-                        'symbol': market.upper(),
-                        'timestamp': datetime.now(),
-                        'last_price': float(data['last']),
-                        'volume': float(data['vol']),
-                        'high': float(data['high']),
-                        'low': float(data['low']),
-                        'open': float(data['open']),
-                        'bid': float(data.get('buy', data['last'])),
-                        'ask': float(data.get('sell', data['last']))
-                    }
-                else:
-                    logger.error(f"❌ Ticker API錯誤: {response.status}")
-                    return None
-                    
+            response = await self.transport.get(url, timeout=self.timeout)
+            if response.status == 200:
+                data = response.json()
+                return {
+                    'symbol': market.upper(),
+                    'timestamp': datetime.now(),
+                    'last_price': float(data['last']),
+                    'volume': float(data['vol']),
+                    'high': float(data['high']),
+                    'low': float(data['low']),
+                    'open': float(data['open']),
+                    'bid': float(data.get('buy', data['last'])),
+                    'ask': float(data.get('sell', data['last']))
+                }
+            else:
+                logger.error(f"❌ Ticker API錯誤: {response.status}")
+                return None
+                
         except Exception as e:
             logger.error(f"❌ 獲取ticker失敗: {e}")
             return None
     
-    async def _get_recent_klines(self, market: str, period: int, limit: int) -> Optional[pd.DataFrame]:
-        """獲取最近的K線數據"""
+    async def _get_timeframe_klines(self, market: str, limits: Dict[str, int]) -> Dict[str, pd.DataFrame]:
+        """獲取多個週期的K線（共用一次1分鐘K線請求）"""
+        try:
+            return await self.kline_feed.get_timeframes(market, limits, timeout=self.timeout)
+        except Exception as e:
+            logger.error(f"❌ 獲取多週期K線失敗: {e}")
+            return {}
+    
+    async def _get_recent_klines(self, market: str, period: int, limit: int,
+                                 since: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """獲取最近的K線數據（指定 since 時從該時間戳開始）"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/k"
             params = {
                 'market': market,
                 'period': period,
                 'limit': limit
             }
+            if since is not None:
+                params['timestamp'] = int(since)
             
-            async with self.session.get(url, params=params, timeout=self.timeout) as response:
-                if response.status == 200:
-                    data = await response.json()
+            response = await self.transport.get(url, params=params, timeout=self.timeout)
+            if response.status == 200:
+                data = response.json()
+                
+                if data and isinstance(data, list):
+                    df = pd.DataFrame(data, columns=[
+                        'timestamp', 'open', 'high', 'low', 'close', 'volume'
+                    ])
                     
-                    if data and isinstance(data, list):
-                        df = pd.DataFrame(data, columns=[
-                            'timestamp', 'open', 'high', 'low', 'close', 'volume'
-                        ])
-                        
-                        # 數據類型轉換
-                        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-                        for col in ['open', 'high', 'low', 'close', 'volume']:
-                            df[col] = pd.to_numeric(df[col], errors='coerce')
-                        
-                        df = df.sort_values('timestamp').reset_index(drop=True)
-                        return df
-                    else:
-                        return None
+                    # 數據類型轉換
+                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+                    for col in ['open', 'high', 'low', 'close', 'volume']:
+                        df[col] = pd.to_numeric(df[col], errors='coerce')
+                    
+                    df = df.sort_values('timestamp').reset_index(drop=True)
+                    return df
                 else:
-                    logger.error(f"❌ K線API錯誤: {response.status}")
                     return None
-                    
+            else:
+                logger.error(f"❌ K線API錯誤: {response.status}")
+                return None
+                
         except Exception as e:
             logger.error(f"❌ 獲取K線失敗: {e}")
             return None
     
     def _calculate_technical_indicators(self, ticker: Dict, klines_1m: pd.DataFrame, 
-                                      klines_5m: pd.DataFrame, klines_1h: pd.DataFrame) -> Dict[str, Any]:
+                                      klines_5m: pd.DataFrame, klines_1h: pd.DataFrame,
+                                      market: str = "btctwd") -> Dict[str, Any]:
         """計算技術指標"""
         try:
             current_price = ticker['last_price']
@@ -167,7 +182,7 @@ class MAXDataClient:
             
             # 技術指標（基於5分鐘數據）
             if len(klines_5m) >= 20:
-                tech_indicators = self._calculate_indicators_for_timeframe(klines_5m)
+                tech_indicators = self._calculate_indicators_for_timeframe(klines_5m, market)
                 base_data.update(tech_indicators)
             
             # 趨勢指標（基於1小時數據）
@@ -181,59 +196,68 @@ class MAXDataClient:
             logger.error(f"❌ 計算技術指標失敗: {e}")
             return {'current_price': ticker['last_price'], 'timestamp': ticker['timestamp']}
     
-    def _calculate_indicators_for_timeframe(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """為特定時間框架計算技術指標"""
+    def _calculate_indicators_for_timeframe(self, df: pd.DataFrame, market: str = "btctwd",
+                                            timeframe: str = '5m') -> Dict[str, Any]:
+        """為特定交易對/時間框架計算技術指標（增量更新，只處理上次之後的K線）"""
         try:
             indicators = {}
+            key = (market, timeframe)
+            state = self.indicator_states.get(key)
+            if state is None:
+                state = StreamingIndicatorSet(adjust=True, ema_spans=(10, 20), ma_windows=(10, 20),
+                                              rsi_period=14, bollinger_window=20)
+                self.indicator_states[key] = state
+            
+            timestamps = to_unix_seconds(df['timestamp'])
+            closes = df['close'].to_numpy(dtype=float)
+            
+            start = 0
+            if state.current_timestamp is not None:
+                if timestamps[0] > state.current_timestamp:
+                    # 與上次狀態之間有缺口，從本批K線重新計算
+                    state.reset()
+                else:
+                    start = int(np.searchsorted(timestamps, state.current_timestamp, side='left'))
+            
+            for timestamp, close in zip(timestamps[start:].tolist(), closes[start:].tolist()):
+                state.update(timestamp, close)
+            values = state.latest
+            bars = state.bars
             
             # RSI
-            if len(df) >= 14:
-                delta = df['close'].diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                indicators['rsi'] = float(rsi.iloc[-1]) if not pd.isna(rsi.iloc[-1]) else 50
+            if bars >= 14:
+                indicators['rsi'] = float(values['rsi']) if not pd.isna(values['rsi']) else 50
             
             # 移動平均線
-            if len(df) >= 20:
-                indicators['sma_10'] = float(df['close'].rolling(10).mean().iloc[-1])
-                indicators['sma_20'] = float(df['close'].rolling(20).mean().iloc[-1])
-                indicators['ema_10'] = float(df['close'].ewm(span=10).mean().iloc[-1])
-                indicators['ema_20'] = float(df['close'].ewm(span=20).mean().iloc[-1])
+            if bars >= 20:
+                indicators['sma_10'] = float(values['ma_10'])
+                indicators['sma_20'] = float(values['ma_20'])
+                indicators['ema_10'] = float(values['ema_10'])
+                indicators['ema_20'] = float(values['ema_20'])
             
             # MACD
-            if len(df) >= 26:
-                ema_12 = df['close'].ewm(span=12).mean()
-                ema_26 = df['close'].ewm(span=26).mean()
-                macd_line = ema_12 - ema_26
-                signal_line = macd_line.ewm(span=9).mean()
-                histogram = macd_line - signal_line
-                
-                indicators['macd'] = float(macd_line.iloc[-1])
-                indicators['macd_signal'] = float(signal_line.iloc[-1])
-                indicators['macd_histogram'] = float(histogram.iloc[-1])
+            if bars >= 26:
+                indicators['macd'] = float(values['macd'])
+                indicators['macd_signal'] = float(values['macd_signal'])
+                indicators['macd_histogram'] = float(values['macd_hist'])
                 
                 # MACD趨勢判斷
-                if macd_line.iloc[-1] > signal_line.iloc[-1]:
-                    indicators['macd_trend'] = "金叉向上" if histogram.iloc[-1] > 0 else "金叉"
+                if values['macd'] > values['macd_signal']:
+                    indicators['macd_trend'] = "金叉向上" if values['macd_hist'] > 0 else "金叉"
                 else:
-                    indicators['macd_trend'] = "死叉向下" if histogram.iloc[-1] < 0 else "死叉"
+                    indicators['macd_trend'] = "死叉向下" if values['macd_hist'] < 0 else "死叉"
             
             # 布林帶
-            if len(df) >= 20:
-                sma_20 = df['close'].rolling(20).mean()
-                std_20 = df['close'].rolling(20).std()
-                upper_band = sma_20 + (std_20 * 2)
-                lower_band = sma_20 - (std_20 * 2)
+            if bars >= 20:
+                upper_band = values['bollinger_upper']
+                lower_band = values['bollinger_lower']
                 
-                current_price = df['close'].iloc[-1]
-                indicators['bollinger_upper'] = float(upper_band.iloc[-1])
-                indicators['bollinger_lower'] = float(lower_band.iloc[-1])
-                indicators['bollinger_middle'] = float(sma_20.iloc[-1])
+                indicators['bollinger_upper'] = float(upper_band)
+                indicators['bollinger_lower'] = float(lower_band)
+                indicators['bollinger_middle'] = float(values['bollinger_middle'])
                 
                 # 布林帶位置
-                bb_position = (current_price - lower_band.iloc[-1]) / (upper_band.iloc[-1] - lower_band.iloc[-1])
+                bb_position = (values['close'] - lower_band) / (upper_band - lower_band)
                 indicators['bollinger_position'] = float(bb_position)
             
             return indicators
@@ -335,9 +359,7 @@ class MAXDataClient:
             return {}
     
     async def close(self):
-        """關閉連接"""
-        if self.session:
-            await self.session.close()
+        """關閉連接（連接池由進程共用的傳輸層管理，這裡無需關閉）"""
     
     def format_data_for_ai(self, market_data: Dict[str, Any]) -> str:
         """將市場數據格式化為AI友好的格式"""
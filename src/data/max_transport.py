@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MAX API 共用傳輸層 - 進程內所有組件共用同一組保持連接的HTTP連接池
+按端點限制並發、記錄請求延遲直方圖，並對限流/服務端錯誤/連接錯誤自動退避重試。
+異步代碼直接 await request()；同步代碼調用 request_sync()，請求在後台事件循環線程上執行，
+與其他同步調用共用暖連接，不再每次 asyncio.run 新建會話。
+公開行情端點（ticker/K線/深度等）前置合併層：同一事件循環內並發的相同請求共用一次在途請求，
+成功響應按端點緩存一段時間（K線緩存到當前K線收盤），多個消費者在同一交易週期內只打一次API。
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+MAX_API_BASE_URL = "https://max-api.maicoin.com/api/v2"
+
+# 延遲直方圖桶上界（毫秒），最後一桶收集所有更慢的請求
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class MAXTransportError(Exception):
+    """請求返回非成功狀態碼"""
+
+    def __init__(self, status: int, message: str, url: str = ""):
+        super().__init__(f"HTTP {status}: {message} ({url})")
+        self.status = status
+        self.url = url
+
+
+@dataclass
+class TransportConfig:
+    """傳輸層配置"""
+    base_url: str = MAX_API_BASE_URL
+    max_connections: int = 64             # 連接池總連接數
+    max_connections_per_host: int = 16
+    keepalive_timeout: float = 60.0       # 空閒連接保留秒數
+    timeout: float = 10.0                 # 單次請求超時
+    default_concurrency: int = 8          # 未單獨配置的端點的並發上限
+    endpoint_concurrency: Dict[str, int] = field(default_factory=lambda: {'k': 4, 'orders': 2})
+    max_retries: int = 3
+    backoff_base: float = 0.2             # 第 n 次重試等待 backoff_base * 2^n 秒（帶抖動）
+    backoff_max: float = 5.0
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+    # 公開端點的響應緩存秒數，不在表中的端點不緩存也不合併；K線另按週期計算
+    cache_ttl: Dict[str, float] = field(default_factory=lambda: {
+        'tickers': 1.0, 'depth': 0.5, 'trades': 0.5, 'markets': 300.0})
+    cache_klines: bool = True
+    kline_max_ttl: Optional[float] = 60.0   # K線緩存到收盤，但最長不超過此秒數（None 為不設上限）
+    cache_max_entries: int = 1024
+    headers: Dict[str, str] = field(default_factory=lambda: {'User-Agent': 'AImax-Trading-System/1.0'})
+
+
+@dataclass
+class MAXResponse:
+    """已讀取完畢的響應（連接歸還連接池後仍可使用）"""
+    status: int
+    body: bytes
+    url: str
+    headers: Dict[str, str]
+    latency: float
+    attempts: int
+    source: str = 'network'               # network/cache/coalesced
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise MAXTransportError(self.status, self.text[:200], self.url)
+
+
+class LatencyHistogram:
+    """單個端點的請求延遲直方圖"""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency: float, ok: bool = True, retries: int = 0):
+        latency_ms = latency * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+        self.count += 1
+        self.errors += 0 if ok else 1
+        self.retries += retries
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, q: float) -> float:
+        """按桶內線性插值估計分位數（毫秒）"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets_ms[index - 1] if index > 0 else 0.0
+                upper = self.buckets_ms[index] if index < len(self.buckets_ms) else self.max_ms
+                upper = min(upper, self.max_ms)
+                return lower + (upper - lower) * max(rank - cumulative, 0) / count
+            cumulative += count
+        return self.max_ms
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p90_ms': self.percentile(0.9),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max_ms
+        }
+
+
+class ResponseCache:
+    """公開端點的短時響應緩存及命中/合併/未命中計數"""
+
+    def __init__(self, config: TransportConfig):
+        self.config = config
+        self._entries: 'OrderedDict[tuple, Tuple[float, MAXResponse]]' = OrderedDict()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def cacheable(self, endpoint: str) -> bool:
+        return endpoint in self.config.cache_ttl or (endpoint == 'k' and self.config.cache_klines)
+
+    def ttl(self, endpoint: str, params: Optional[Mapping[str, Any]] = None) -> float:
+        """緩存秒數：K線緩存到當前週期收盤（受 kline_max_ttl 限制），其他端點取固定值"""
+        if endpoint == 'k':
+            period = int((params or {}).get('period', 1)) * 60
+            until_close = period - time.time() % period
+            if self.config.kline_max_ttl is not None:
+                return min(until_close, self.config.kline_max_ttl)
+            return until_close
+        return self.config.cache_ttl.get(endpoint, 0.0)
+
+    @staticmethod
+    def key(url: str, params: Optional[Mapping[str, Any]] = None) -> tuple:
+        return url, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+    def get(self, key: tuple) -> Optional[MAXResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key: tuple, response: MAXResponse, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, response)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.config.cache_max_entries:
+                now = time.monotonic()
+                for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[stale]
+                while len(self._entries) > self.config.cache_max_entries:
+                    self._entries.popitem(last=False)
+
+    def count(self, endpoint: str, outcome: str):
+        with self._lock:
+            counters = self._counters.get(endpoint)
+            if counters is None:
+                counters = self._counters[endpoint] = {'hits': 0, 'coalesced': 0, 'misses': 0}
+            counters[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_endpoint = {endpoint: dict(counters) for endpoint, counters in self._counters.items()}
+            entries = len(self._entries)
+        totals = {outcome: sum(counters[outcome] for counters in by_endpoint.values())
+                  for outcome in ('hits', 'coalesced', 'misses')}
+        served = sum(totals.values())
+        totals['saved_ratio'] = (totals['hits'] + totals['coalesced']) / served if served else 0.0
+        return {**totals, 'entries': entries, 'by_endpoint': by_endpoint}
+
+    def clear(self, reset_counters: bool = False):
+        with self._lock:
+            self._entries.clear()
+            if reset_counters:
+                self._counters.clear()
+
+
+@dataclass
+class _LoopState:
+    """每個事件循環各自的會話、端點信號量與在途請求（aiohttp 會話不能跨循環使用）"""
+    session: aiohttp.ClientSession
+    semaphores: Dict[str, asyncio.Semaphore]
+    guard: Any
+    in_flight: Dict[tuple, asyncio.Task] = field(default_factory=dict)
+
+
+def _retrieve_exception(task: asyncio.Task):
+    """所有等待方都已取消時取回共用任務的異常，避免「異常未被取回」警告"""
+    if not task.cancelled():
+        task.exception()
+
+
+async def _close_on_loop_shutdown(session: aiohttp.ClientSession):
+    """掛在事件循環的異步生成器登記表上，asyncio.run 結束時關閉會話"""
+    try:
+        yield
+    finally:
+        await session.close()
+
+
+class MAXTransport:
+    """MAX API 共用傳輸層"""
+
+    def __init__(self, config: Optional[TransportConfig] = None):
+        self.config = config or TransportConfig()
+        self._states: Dict[asyncio.AbstractEventLoop, _LoopState] = {}
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self.cache = ResponseCache(self.config)
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+        # 同步外觀使用的後台事件循環
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_thread: Optional[threading.Thread] = None
+
+    # ---------------------------------------------------------------- 連接
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is not None and not state.session.closed:
+            return state
+
+        with self._lock:
+            # 順帶清理已關閉循環留下的狀態
+            for stale in [other for other in self._states if other.is_closed()]:
+                self._states.pop(stale).session.detach()
+
+        connector = aiohttp.TCPConnector(limit=self.config.max_connections,
+                                         limit_per_host=self.config.max_connections_per_host,
+                                         keepalive_timeout=self.config.keepalive_timeout,
+                                         ttl_dns_cache=300)
+        session = aiohttp.ClientSession(connector=connector, headers=self.config.headers,
+                                        timeout=aiohttp.ClientTimeout(total=self.config.timeout))
+        state = _LoopState(session, {}, _close_on_loop_shutdown(session))
+        try:
+            # 推進到 yield 處，使循環登記該生成器並在 shutdown_asyncgens 時關閉它
+            state.guard.__anext__().send(None)
+        except StopIteration:
+            pass
+        self._states[loop] = state
+        return state
+
+    def session(self) -> aiohttp.ClientSession:
+        """當前事件循環上的共用會話（供 WebSocket 等需要直接使用會話的場景）"""
+        return self._state().session
+
+    def endpoint_name(self, url: str) -> str:
+        """端點名：API 路徑的第一段（/api/v2/tickers/btctwd -> tickers）"""
+        path = urlsplit(url).path
+        base_path = urlsplit(self.config.base_url).path.rstrip('/')
+        if base_path and path.startswith(base_path + '/'):
+            path = path[len(base_path):]
+        segments = [segment for segment in path.split('/') if segment]
+        return segments[0] if segments else '/'
+
+    def _semaphore(self, state: _LoopState, endpoint: str) -> asyncio.Semaphore:
+        semaphore = state.semaphores.get(endpoint)
+        if semaphore is None:
+            limit = self.config.endpoint_concurrency.get(endpoint, self.config.default_concurrency)
+            semaphore = asyncio.Semaphore(limit)
+            state.semaphores[endpoint] = semaphore
+        return semaphore
+
+    def _url(self, path_or_url: str) -> str:
+        if path_or_url.startswith(('http://', 'https://')):
+            return path_or_url
+        return f"{self.config.base_url.rstrip('/')}/{path_or_url.lstrip('/')}"
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.config.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.config.backoff_base * (2 ** attempt), self.config.backoff_max)
+        return delay * self._random.uniform(0.5, 1.0)
+
+    # ---------------------------------------------------------------- 異步外觀
+
+    async def request(self, method: str, path_or_url: str, params: Optional[Mapping[str, Any]] = None,
+                      json_body: Any = None, headers: Optional[Mapping[str, str]] = None,
+                      timeout: Optional[float] = None, endpoint: Optional[str] = None,
+                      use_cache: bool = True) -> MAXResponse:
+        """
+        發送請求並讀取完整響應
+
+        未簽名的公開端點 GET 先查緩存，再與同一事件循環內的相同在途請求合併，
+        都沒有時才真正發出請求；只有成功響應會被緩存。
+
+        Args:
+            method: HTTP 方法
+            path_or_url: 相對 base_url 的路徑或完整 URL
+            params: 查詢參數
+            json_body: JSON 請求體
+            headers: 附加請求頭（如簽名）
+            timeout: 覆蓋默認超時
+            endpoint: 覆蓋按路徑推導的端點名（用於並發限制與延遲統計）
+            use_cache: False 時跳過緩存與合併，強制發出新請求
+
+        Returns:
+            MAXResponse；非成功狀態碼在重試用盡後照常返回，由調用方判斷。
+            連接錯誤在重試用盡後拋出最後一次的異常。
+        """
+        state = self._state()
+        url = self._url(path_or_url)
+        endpoint = endpoint or self.endpoint_name(url)
+        method = method.upper()
+
+        if not (use_cache and method == 'GET' and not headers and self.cache.cacheable(endpoint)):
+            return await self._send(state, method, url, endpoint, params, json_body, headers, timeout)
+
+        key = self.cache.key(url, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.count(endpoint, 'hits')
+            return replace(cached, source='cache')
+
+        pending = state.in_flight.get(key)
+        if pending is not None:
+            self.cache.count(endpoint, 'coalesced')
+            # shield：等待方被取消時不影響其他共用者
+            return replace(await asyncio.shield(pending), source='coalesced')
+
+        # 在途請求在獨立任務中執行，不屬於任何一個調用方：發起者被取消時其他共用者仍拿到結果
+        self.cache.count(endpoint, 'misses')
+        task = asyncio.get_running_loop().create_task(
+            self._send_shared(state, key, method, url, endpoint, params, json_body, timeout))
+        task.add_done_callback(_retrieve_exception)
+        state.in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _send_shared(self, state: _LoopState, key: tuple, method: str, url: str, endpoint: str,
+                           params: Optional[Mapping[str, Any]], json_body: Any,
+                           timeout: Optional[float]) -> MAXResponse:
+        """合併請求的共用任務：發出請求，成功響應寫入緩存，完成後移出在途表"""
+        try:
+            response = await self._send(state, method, url, endpoint, params, json_body, None, timeout)
+            if response.ok:
+                self.cache.put(key, response, self.cache.ttl(endpoint, params))
+            return response
+        finally:
+            state.in_flight.pop(key, None)
+
+    async def _send(self, state: _LoopState, method: str, url: str, endpoint: str,
+                    params: Optional[Mapping[str, Any]], json_body: Any,
+                    headers: Optional[Mapping[str, str]], timeout: Optional[float]) -> MAXResponse:
+        """實際發出請求（端點並發限制 + 重試退避 + 延遲統計）"""
+        # 非冪等請求只在明確被限流（未被處理）時重試
+        retry_statuses = self.config.retry_statuses if method in ('GET', 'HEAD') else (429,)
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+
+        started = time.perf_counter()
+        attempt = 0
+        async with self._semaphore(state, endpoint):
+            while True:
+                try:
+                    async with state.session.request(method, url, params=params, json=json_body,
+                                                     headers=headers, timeout=request_timeout) as response:
+                        body = await response.read()
+                        status = response.status
+                        response_headers = dict(response.headers)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if method not in ('GET', 'HEAD') or attempt >= self.config.max_retries:
+                        self._record(endpoint, time.perf_counter() - started, False, attempt)
+                        raise
+                    logger.warning(f"⚠️ MAX {endpoint} 連接錯誤，第{attempt + 1}次重試: {e!r}")
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+                    continue
+
+                if status in retry_statuses and attempt < self.config.max_retries:
+                    logger.warning(f"⚠️ MAX {endpoint} 返回 {status}，第{attempt + 1}次重試")
+                    await asyncio.sleep(self._backoff(attempt, response_headers.get('Retry-After')))
+                    attempt += 1
+                    continue
+                break
+
+        latency = time.perf_counter() - started
+        self._record(endpoint, latency, 200 <= status < 300, attempt)
+        return MAXResponse(status, body, url, response_headers, latency, attempt + 1)
+
+    async def get(self, path_or_url: str, params: Optional[Mapping[str, Any]] = None, **kwargs) -> MAXResponse:
+        return await self.request('GET', path_or_url, params=params, **kwargs)
+
+    async def get_json(self, path_or_url: str, params: Optional[Mapping[str, Any]] = None, **kwargs) -> Any:
+        """GET 並解析 JSON，非成功狀態碼拋出 MAXTransportError"""
+        response = await self.get(path_or_url, params, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def close(self):
+        """關閉當前事件循環上的會話"""
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            for task in list(state.in_flight.values()):
+                task.cancel()
+            await state.session.close()
+
+    # ---------------------------------------------------------------- 同步外觀
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._sync_loop is None or self._sync_loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="max-transport", daemon=True)
+                thread.start()
+                self._sync_loop, self._sync_thread = loop, thread
+            return self._sync_loop
+
+    def run_sync(self, coroutine):
+        """在後台事件循環上執行協程並等待結果（同步代碼復用異步邏輯時使用）"""
+        loop = self._background_loop()
+        if threading.current_thread() is self._sync_thread:
+            coroutine.close()
+            raise RuntimeError("不能在傳輸層後台線程內調用同步接口")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    def request_sync(self, method: str, path_or_url: str, **kwargs) -> MAXResponse:
+        """request() 的同步版本，在後台事件循環上共用連接池"""
+        return self.run_sync(self.request(method, path_or_url, **kwargs))
+
+    def get_sync(self, path_or_url: str, params: Optional[Mapping[str, Any]] = None, **kwargs) -> MAXResponse:
+        return self.run_sync(self.get(path_or_url, params, **kwargs))
+
+    def get_json_sync(self, path_or_url: str, params: Optional[Mapping[str, Any]] = None, **kwargs) -> Any:
+        return self.run_sync(self.get_json(path_or_url, params, **kwargs))
+
+    def close_sync(self):
+        """關閉後台事件循環及其會話"""
+        with self._lock:
+            loop, thread = self._sync_loop, self._sync_thread
+            self._sync_loop = self._sync_thread = None
+        if loop is None or loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    # ---------------------------------------------------------------- 統計
+
+    def _record(self, endpoint: str, latency: float, ok: bool, retries: int):
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            histogram.record(latency, ok, retries)
+
+    def histogram(self, endpoint: str) -> Optional[LatencyHistogram]:
+        return self._histograms.get(endpoint)
+
+    def latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """各端點的請求數、錯誤/重試次數與延遲分位數"""
+        with self._lock:
+            return {endpoint: histogram.summary() for endpoint, histogram in self._histograms.items()}
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """緩存命中、合併與未命中次數（總計及按端點）"""
+        return self.cache.stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._histograms.clear()
+        self.cache.clear(reset_counters=True)
+
+
+_transport: Optional[MAXTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_max_transport() -> MAXTransport:
+    """獲取進程共用的MAX傳輸層"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = MAXTransport()
+        return _transport
+
+
+def close_max_transport():
+    """關閉進程共用傳輸層的同步外觀（程序退出前調用）"""
+    global _transport
+    with _transport_lock:
+        transport, _transport = _transport, None
+    if transport is not None:
+        transport.close_sync()
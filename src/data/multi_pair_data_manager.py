@@ -16,17 +16,20 @@ import logging
 import json
 from dataclasses import dataclass, asdict
 import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 
 try:
     from .multi_pair_max_client import MultiPairMAXClient, create_multi_pair_client
     from .trading_pair_manager import TradingPairManager, create_trading_pair_manager
     from .historical_data_manager import HistoricalDataManager
+    from .market_stream import MarketDataStream
 except ImportError:
     # 用於直接運行測試
     from multi_pair_max_client import MultiPairMAXClient, create_multi_pair_client
     from trading_pair_manager import TradingPairManager, create_trading_pair_manager
     from historical_data_manager import HistoricalDataManager
+    from market_stream import MarketDataStream
 
 logger = logging.getLogger(__name__)
 
@@ -76,6 +79,12 @@ class MultiPairDataManager:
         self.sync_interval = 300  # 5分鐘同步一次
         self.is_running = False
         
+        # WebSocket 行情流（不可用時回退到30秒輪詢）
+        self.use_streaming = True
+        self.market_stream: Optional[MarketDataStream] = None
+        self.stream_write_interval = 1.0  # 推送寫庫的最小間隔（秒/交易對）
+        self._last_stream_write: Dict[str, float] = {}
+        
         # 數據同步協調器
         self.sync_coordinator = DataSyncCoordinator()
         
@@ -339,8 +348,11 @@ class MultiPairDataManagerMethods:
             # 創建並發任務
             tasks = []
             
-            # 實時數據獲取任務
-            tasks.append(asyncio.create_task(self._real_time_data_loop()))
+            # 實時數據獲取任務（優先使用推送）
+            if self.use_streaming:
+                tasks.append(asyncio.create_task(self._streaming_data_loop()))
+            else:
+                tasks.append(asyncio.create_task(self._real_time_data_loop()))
             
             # 歷史數據同步任務
             tasks.append(asyncio.create_task(self._historical_sync_loop()))
@@ -381,6 +393,44 @@ class MultiPairDataManagerMethods:
                 logger.error(f"❌ 實時數據循環錯誤: {e}")
                 await asyncio.sleep(60)  # 錯誤時等待更長時間
     
+    async def _streaming_data_loop(self):
+        """WebSocket 實時數據：推送到達即處理，連接失敗時回退到輪詢循環"""
+        logger.info("📡 啟動WebSocket實時數據流")
+        
+        try:
+            self.market_stream = MarketDataStream(
+                list(self.stream_configs.keys()),
+                channels=('ticker', 'trade', 'book')
+            )
+            self.market_stream.subscribe(self._on_stream_update)
+            stream_task = self.market_stream.start()
+            
+            while self.is_running and not stream_task.done():
+                await asyncio.sleep(1)
+            
+            if not stream_task.done():
+                await self.market_stream.stop()
+            elif self.is_running:
+                # 行情流任務在運行期間意外結束：取出其異常並回退到輪詢
+                error = None if stream_task.cancelled() else stream_task.exception()
+                raise RuntimeError(f"行情流任務意外結束: {error!r}")
+            
+        except Exception as e:
+            logger.error(f"❌ WebSocket實時數據流失敗，回退到輪詢: {e}")
+            if self.is_running:
+                await self._real_time_data_loop()
+    
+    async def _on_stream_update(self, event):
+        """行情推送回調：按交易對節流後寫入實時數據"""
+        pair = event.market.upper()
+        now = time.time()
+        if now - self._last_stream_write.get(pair, 0) < self.stream_write_interval:
+            return
+        
+        self._last_stream_write[pair] = now
+        state = self.market_stream.state(event.market)
+        await self._process_real_time_data(pair, state.to_market_data())
+    
     async def _process_real_time_data(self, pair: str, data: Dict[str, Any]):
         """處理單個交易對的實時數據"""
         try:
@@ -547,12 +597,7 @@ class MultiPairDataManagerMethods:
             limit_map = {'1m': 1440, '5m': 2016, '1h': 720, '1d': 365}
             limit = limit_map.get(timeframe, 100)
             
-            # 確保session已初始化
-            if not self.max_client.session:
-                import aiohttp
-                self.max_client.session = aiohttp.ClientSession()
-            
-            # 從API獲取數據
+            # 從API獲取數據（經由共用傳輸層的連接池）
             klines_df = await self.max_client._get_klines(pair, period, limit)
             
             if klines_df is None or klines_df.empty:
@@ -837,6 +882,10 @@ class MultiPairDataManagerMethods:
         logger.info("🛑 停止多交易對數據流...")
         self.is_running = False
         
+        if self.market_stream is not None:
+            await self.market_stream.stop()
+            self.market_stream = None
+        
         # 等待所有任務完成
         await asyncio.sleep(2)
         
@@ -6,7 +6,6 @@
 """
 
 import asyncio
-import aiohttp
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -17,6 +16,9 @@ from dataclasses import dataclass, asdict
 import json
 from pathlib import Path
 
+from .candle_resampler import get_kline_feed
+from .max_transport import get_max_transport
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -52,7 +54,10 @@ class MultiPairMAXClient:
     
     def __init__(self, base_url: str = "https://max-api.maicoin.com/api/v2"):
         self.base_url = base_url
-        self.session: Optional[aiohttp.ClientSession] = None
+        # 進程共用的連接池（保持連接、端點並發限制、重試退避）
+        self.transport = get_max_transport()
+        # 多週期K線由同一份1分鐘K線重採樣得到
+        self.kline_feed = get_kline_feed(base_url)
         
         # 支持的交易對配置
         self.pair_configs: Dict[str, TradingPairConfig] = {}
@@ -188,9 +193,6 @@ class MultiPairMAXClient:
     
     async def _fetch_pairs_data_parallel(self, pairs: List[str]) -> Dict[str, Dict[str, Any]]:
         """並行獲取多個交易對數據"""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
-        
         # 創建並發任務
         tasks = []
         for pair in pairs:
@@ -227,17 +229,16 @@ class MultiPairMAXClient:
                 
                 start_time = time.time()
                 
-                # 並行獲取多種數據
+                # 並行獲取ticker與K線（5分鐘/1小時K線由1分鐘K線重採樣）
                 tasks = [
                     self._get_ticker(pair),
-                    self._get_klines(pair, period=1, limit=100),   # 1分鐘
-                    self._get_klines(pair, period=5, limit=50),    # 5分鐘
-                    self._get_klines(pair, period=60, limit=24),   # 1小時
+                    self._get_timeframe_klines(pair, {'1m': 100, '5m': 50, '1h': 24}),
                 ]
                 
-                ticker, klines_1m, klines_5m, klines_1h = await asyncio.gather(
-                    *tasks, return_exceptions=True
-                )
+                ticker, klines = await asyncio.gather(*tasks, return_exceptions=True)
+                if isinstance(klines, Exception):
+                    klines = {}
+                klines_1m, klines_5m, klines_1h = (klines.get(tf) for tf in ('1m', '5m', '1h'))
                 
                 # 檢查結果
                 if isinstance(ticker, Exception) or not ticker:
@@ -272,26 +273,35 @@ class MultiPairMAXClient:
             url = f"{self.base_url}/tickers/{pair.lower()}"
             config = self.pair_configs[pair]
             
-            async with self.session.get(url, timeout=config.timeout) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return {
-                        'symbol': pair,
-                        'timestamp': datetime.now(),
-                        'last_price': float(data['last']),
-                        'volume': float(data['vol']),
-                        'high': float(data['high']),
-                        'low': float(data['low']),
-                        'open': float(data['open']),
-                        'bid': float(data.get('buy', data['last'])),
-                        'ask': float(data.get('sell', data['last']))
-                    }
-                else:
-                    raise Exception(f"HTTP {response.status}")
-                    
+            response = await self.transport.get(url, timeout=config.timeout)
+            if response.status == 200:
+                data = response.json()
+                return {
+                    'symbol': pair,
+                    'timestamp': datetime.now(),
+                    'last_price': float(data['last']),
+                    'volume': float(data['vol']),
+                    'high': float(data['high']),
+                    'low': float(data['low']),
+                    'open': float(data['open']),
+                    'bid': float(data.get('buy', data['last'])),
+                    'ask': float(data.get('sell', data['last']))
+                }
+            else:
+                raise Exception(f"HTTP {response.status}")
+                
         except Exception as e:
             raise Exception(f"Ticker API錯誤: {e}")
     
+    async def _get_timeframe_klines(self, pair: str, limits: Dict[str, int]) -> Dict[str, pd.DataFrame]:
+        """獲取多個週期的K線（共用一次1分鐘K線請求）"""
+        try:
+            config = self.pair_configs[pair]
+            return await self.kline_feed.get_timeframes(pair, limits, timeout=config.timeout)
+        except Exception as e:
+            logger.debug(f"多週期K線獲取失敗 {pair}: {e}")
+            return {}
+    
     async def _get_klines(self, pair: str, period: int, limit: int) -> Optional[pd.DataFrame]:
         """獲取K線數據"""
         try:
@@ -303,27 +313,27 @@ class MultiPairMAXClient:
             }
             config = self.pair_configs[pair]
             
-            async with self.session.get(url, params=params, timeout=config.timeout) as response:
-                if response.status == 200:
-                    data = await response.json()
+            response = await self.transport.get(url, params=params, timeout=config.timeout)
+            if response.status == 200:
+                data = response.json()
+                
+                if data and isinstance(data, list):
+                    df = pd.DataFrame(data, columns=[
+                        'timestamp', 'open', 'high', 'low', 'close', 'volume'
+                    ])
                     
-                    if data and isinstance(data, list):
-                        df = pd.DataFrame(data, columns=[
-                            'timestamp', 'open', 'high', 'low', 'close', 'volume'
-                        ])
-                        
-                        # 數據類型轉換
-                        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-                        for col in ['open', 'high', 'low', 'close', 'volume']:
-                            df[col] = pd.to_numeric(df[col], errors='coerce')
-                        
-                        df = df.sort_values('timestamp').reset_index(drop=True)
-                        return df
-                    else:
-                        return None
-                else:
-                    raise Exception(f"HTTP {response.status}")
+                    # 數據類型轉換
+                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+                    for col in ['open', 'high', 'low', 'close', 'volume']:
+                        df[col] = pd.to_numeric(df[col], errors='coerce')
                     
+                    df = df.sort_values('timestamp').reset_index(drop=True)
+                    return df
+                else:
+                    return None
+            else:
+                raise Exception(f"HTTP {response.status}")
+                
         except Exception as e:
             logger.debug(f"K線獲取失敗 {pair} {period}m: {e}")
             return None
@@ -565,10 +575,7 @@ class MultiPairMAXClient:
         }
     
     async def close(self):
-        """關閉連接"""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        """關閉客戶端（連接池由進程共用的傳輸層管理，這裡無需關閉）"""
         logger.info("🔒 多交易對MAX客戶端已關閉")
 
 
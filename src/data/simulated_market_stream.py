@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模擬 MAX 行情推送服務器 - 供行情流在本地測試訂閱、推送、斷線重連與K線補數據
+WebSocket 端按 MAX v3 推送格式（c/M/e/T 字段）廣播行情，
+同時提供 REST /api/v2/k 接口返回已記錄的K線（包括斷線期間未推送出去的K線）。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import WSMsgType, web
+
+from .market_stream import RESOLUTION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedMAXStreamServer:
+    """本地模擬行情服務器"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.clients: List[web.WebSocketResponse] = []
+        self.subscriptions: Dict[web.WebSocketResponse, List[Dict[str, Any]]] = {}
+        self.connection_count = 0
+        self.rest_requests: List[Dict[str, str]] = []
+
+        # 服務器端的行情狀態（用於訂閱快照與 REST 查詢）
+        self.tickers: Dict[str, Dict[str, str]] = {}
+        self.books: Dict[str, Tuple[List[List[str]], List[List[str]]]] = {}
+        self.klines: Dict[Tuple[str, str], Dict[int, List[float]]] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    # ---------------------------------------------------------------- 服務器
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/ws', self._websocket)
+        app.router.add_get('/api/v2/k', self._klines)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"🧪 模擬行情服務器啟動: {self.ws_url}")
+
+    async def stop(self):
+        await self.drop_connections()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws"
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v2"
+
+    async def drop_connections(self):
+        """斷開所有客戶端（模擬網絡中斷）"""
+        for ws in list(self.clients):
+            await ws.close()
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.clients.append(ws)
+        self.connection_count += 1
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                payload = message.json()
+                if payload.get('action') == 'sub':
+                    subscriptions = payload.get('subscriptions', [])
+                    self.subscriptions[ws] = subscriptions
+                    await ws.send_json({'e': 'subscribed', 's': subscriptions, 'i': payload.get('id'),
+                                        'T': self._now_ms()})
+                    await self._send_snapshots(ws, subscriptions)
+        finally:
+            self.clients.remove(ws)
+            self.subscriptions.pop(ws, None)
+        return ws
+
+    async def _klines(self, request: web.Request) -> web.Response:
+        query = dict(request.query)
+        self.rest_requests.append(query)
+        resolution = next(res for res, seconds in RESOLUTION_SECONDS.items()
+                          if seconds == int(query.get('period', 1)) * 60)
+        candles = self.klines.get((query['market'], resolution), {})
+        limit = int(query.get('limit', 30))
+        if 'timestamp' in query:
+            since = int(query['timestamp'])
+            rows = [candles[start] for start in sorted(candles) if start >= since][:limit]
+        else:
+            # 不帶 timestamp 時與 MAX 一致，返回最新的 limit 根
+            rows = [candles[start] for start in sorted(candles)][-limit:]
+        return web.json_response(rows)
+
+    async def _send_snapshots(self, ws: web.WebSocketResponse, subscriptions: Sequence[Dict[str, Any]]):
+        for subscription in subscriptions:
+            channel, market = subscription['channel'], subscription['market']
+            if channel == 'ticker' and market in self.tickers:
+                await ws.send_json(self._message('ticker', market, 'snapshot', tk=self.tickers[market]))
+            elif channel == 'book' and market in self.books:
+                bids, asks = self.books[market]
+                await ws.send_json(self._message('book', market, 'snapshot', b=bids, a=asks))
+            elif channel == 'kline':
+                candles = self.klines.get((market, subscription['resolution']), {})
+                if candles:
+                    latest = max(candles)
+                    await ws.send_json(self._kline_message(market, subscription['resolution'], candles[latest],
+                                                           'snapshot', closed=False))
+
+    # ---------------------------------------------------------------- 推送
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+    def _message(self, channel: str, market: str, event: str, **payload) -> Dict[str, Any]:
+        return {'c': channel, 'M': market, 'e': event, 'T': self._now_ms(), **payload}
+
+    def _kline_message(self, market: str, resolution: str, row: Sequence[float], event: str,
+                       closed: bool) -> Dict[str, Any]:
+        start, open_, high, low, close, volume = row
+        seconds = RESOLUTION_SECONDS[resolution]
+        kline = {'ST': int(start) * 1000, 'ET': (int(start) + seconds) * 1000 - 1, 'M': market, 'R': resolution,
+                 'O': str(open_), 'H': str(high), 'L': str(low), 'C': str(close), 'v': str(volume), 'x': closed}
+        return self._message('kline', market, event, k=kline)
+
+    async def _broadcast(self, message: Dict[str, Any], **match):
+        for ws in list(self.clients):
+            for subscription in self.subscriptions.get(ws, []):
+                if all(subscription.get(key) == value for key, value in match.items()):
+                    if not ws.closed:
+                        await ws.send_json(message)
+                    break
+
+    async def publish_ticker(self, market: str, open_: float, high: float, low: float, close: float,
+                             volume: float):
+        ticker = {'M': market, 'O': str(open_), 'H': str(high), 'L': str(low), 'C': str(close),
+                  'v': str(volume), 'V': str(volume * close)}
+        self.tickers[market] = ticker
+        await self._broadcast(self._message('ticker', market, 'update', tk=ticker), channel='ticker', market=market)
+
+    async def publish_trade(self, market: str, price: float, volume: float, side: str = 'up'):
+        trade = {'p': str(price), 'v': str(volume), 'T': self._now_ms(), 'tr': side}
+        await self._broadcast(self._message('trade', market, 'update', t=[trade]), channel='trade', market=market)
+
+    async def publish_book(self, market: str, bids: Sequence[Sequence[float]], asks: Sequence[Sequence[float]],
+                           snapshot: bool = False):
+        bids = [[str(price), str(volume)] for price, volume in bids]
+        asks = [[str(price), str(volume)] for price, volume in asks]
+        if snapshot or market not in self.books:
+            self.books[market] = (bids, asks)
+        await self._broadcast(self._message('book', market, 'snapshot' if snapshot else 'update', b=bids, a=asks),
+                              channel='book', market=market)
+
+    async def publish_kline(self, market: str, resolution: str, start: int, open_: float, high: float,
+                            low: float, close: float, volume: float, closed: bool = False, broadcast: bool = True):
+        """
+        記錄並推送一根K線
+
+        broadcast=False 時只記錄不推送，模擬客戶端漏收（可由 REST 補回）
+        """
+        row = [int(start), open_, high, low, close, volume]
+        self.klines.setdefault((market, resolution), {})[int(start)] = row
+        if broadcast:
+            await self._broadcast(self._kline_message(market, resolution, row, 'update', closed),
+                                  channel='kline', market=market, resolution=resolution)
+
+    def load_klines(self, market: str, resolution: str, rows: Sequence[Sequence[float]]):
+        """直接加載一批K線（只供 REST 查詢，不推送）"""
+        candles = self.klines.setdefault((market, resolution), {})
+        for row in rows:
+            candles[int(row[0])] = [int(row[0]), *row[1:6]]
+
+    async def wait_for_clients(self, count: int = 1, timeout: float = 5.0):
+        """等待指定數量的客戶端完成訂閱"""
+        deadline = time.monotonic() + timeout
+        while len(self.subscriptions) < count:
+            if time.monotonic() > deadline:
+                raise asyncio.TimeoutError("等待客戶端訂閱超時")
+            await asyncio.sleep(0.005)
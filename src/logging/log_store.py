@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AImax 分段日誌存儲 - 結構化日誌的索引化後端
+日誌按天及大小切分為多個 JSONL 段文件，每段附帶定長二進制索引
+（時間戳、文件偏移、長度、級別、分類）。查詢先按段的時間範圍跳過無關段，
+再在索引上向量化過濾，最後只 seek 讀取命中的行，無需逐行解析整個文件。
+"""
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+# 索引記錄：時間戳(Unix秒)、段內字節偏移、行長度、級別代碼、分類代碼
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('level', 'u1'),
+    ('category', 'u1'),
+])
+
+UNKNOWN_CODE = 255
+
+SEGMENT_PATTERN = re.compile(r'^structured_(\d{8})_(\d{4})\.jsonl$')
+
+
+@dataclass
+class SegmentInfo:
+    """段文件摘要"""
+    name: str
+    day: str
+    sequence: int
+    count: int = 0
+    size_bytes: int = 0
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+
+    def overlaps(self, start: Optional[float], end: Optional[float]) -> bool:
+        if self.count == 0:
+            return False
+        if start is not None and self.end_time < start:
+            return False
+        if end is not None and self.start_time > end:
+            return False
+        return True
+
+
+class SegmentedLogStore:
+    """分段 + 旁路索引的結構化日誌存儲"""
+
+    def __init__(self, root: Path, levels: Sequence[str], categories: Sequence[str],
+                 segment_max_bytes: int = 16 * 1024 * 1024):
+        """
+        初始化存儲
+
+        Args:
+            root: 段文件目錄
+            levels: 級別名稱列表（按位置編碼進索引）
+            categories: 分類名稱列表（按位置編碼進索引）
+            segment_max_bytes: 單個段文件的大小上限，超出後切換新段
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.level_codes = {name: code for code, name in enumerate(levels)}
+        self.category_codes = {name: code for code, name in enumerate(categories)}
+        self.segment_max_bytes = segment_max_bytes
+
+        self._lock = threading.RLock()
+        self._segments: List[SegmentInfo] = []
+        self._index_cache: Dict[str, np.ndarray] = {}
+        self._load_segments()
+
+    # ---------------------------------------------------------------- 段管理
+
+    def _data_path(self, name: str) -> Path:
+        return self.root / name
+
+    def _index_path(self, name: str) -> Path:
+        return self.root / (name[:-len('.jsonl')] + '.idx')
+
+    def _load_segments(self):
+        """掃描目錄並由索引文件重建每段摘要（截斷寫了一半的索引記錄）"""
+        for path in sorted(self.root.glob('structured_*.jsonl')):
+            match = SEGMENT_PATTERN.match(path.name)
+            if not match:
+                continue
+            segment = SegmentInfo(path.name, match.group(1), int(match.group(2)))
+            index_path = self._index_path(path.name)
+            if index_path.exists():
+                remainder = index_path.stat().st_size % INDEX_DTYPE.itemsize
+                if remainder:
+                    with open(index_path, 'r+b') as f:
+                        f.truncate(index_path.stat().st_size - remainder)
+                index = self._read_index(segment)
+                if len(index):
+                    segment.count = len(index)
+                    segment.start_time = float(index['timestamp'].min())
+                    segment.end_time = float(index['timestamp'].max())
+                    segment.size_bytes = int(index['offset'][-1] + index['length'][-1])
+            # 丟棄沒有索引的尾部行，保證後續追加的偏移正確
+            if path.stat().st_size > segment.size_bytes:
+                with open(path, 'r+b') as f:
+                    f.truncate(segment.size_bytes)
+            self._segments.append(segment)
+
+    def _read_index(self, segment: SegmentInfo) -> np.ndarray:
+        """讀取段索引；已寫滿的段緩存在內存中"""
+        cached = self._index_cache.get(segment.name)
+        if cached is not None and len(cached) == segment.count:
+            return cached
+        index_path = self._index_path(segment.name)
+        if not index_path.exists():
+            return np.empty(0, dtype=INDEX_DTYPE)
+        count = index_path.stat().st_size // INDEX_DTYPE.itemsize
+        index = np.fromfile(index_path, dtype=INDEX_DTYPE, count=count)
+        if self._segments and segment is not self._segments[-1]:
+            self._index_cache[segment.name] = index
+        return index
+
+    def _needs_new_segment(self, segment: Optional[SegmentInfo], day: str,
+                           pending_bytes: int, line_bytes: int) -> bool:
+        """跨入新的一天或段大小超限時需要新段（遲到的前一天日誌仍寫入當前段）"""
+        if segment is None or day > segment.day:
+            return True
+        used = segment.size_bytes + pending_bytes
+        return used > 0 and used + line_bytes > self.segment_max_bytes
+
+    def _open_new_segment(self, day: str) -> SegmentInfo:
+        current = self._segments[-1] if self._segments else None
+        if current is not None and current.day >= day:
+            day, sequence = current.day, current.sequence + 1
+        else:
+            sequence = 0
+        segment = SegmentInfo(f'structured_{day}_{sequence:04d}.jsonl', day, sequence)
+        self._segments.append(segment)
+        return segment
+
+    # ---------------------------------------------------------------- 寫入
+
+    def append_batch(self, records: List[Dict[str, Any]]):
+        """
+        批量追加日誌（每段只打開一次文件）
+
+        Args:
+            records: 已序列化為基本類型的日誌字典，timestamp 為 ISO 格式字符串
+        """
+        if not records:
+            return
+
+        with self._lock:
+            position = 0
+            while position < len(records):
+                segment = self._segments[-1] if self._segments else None
+                lines, index_rows, batch_bytes = [], [], 0
+
+                for record in records[position:]:
+                    timestamp = datetime.fromisoformat(record['timestamp'])
+                    line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+                    if self._needs_new_segment(segment, timestamp.strftime('%Y%m%d'), batch_bytes, len(line)):
+                        if lines:
+                            break
+                        segment = self._open_new_segment(timestamp.strftime('%Y%m%d'))
+                    index_rows.append((timestamp.timestamp(), segment.size_bytes + batch_bytes, len(line),
+                                       self.level_codes.get(record.get('level'), UNKNOWN_CODE),
+                                       self.category_codes.get(record.get('category'), UNKNOWN_CODE)))
+                    lines.append(line)
+                    batch_bytes += len(line)
+
+                # 先寫數據再寫索引：崩潰時最多留下沒有索引的尾部行
+                with open(self._data_path(segment.name), 'ab') as f:
+                    f.write(b''.join(lines))
+                    f.flush()
+                with open(self._index_path(segment.name), 'ab') as f:
+                    np.array(index_rows, dtype=INDEX_DTYPE).tofile(f)
+
+                times = [row[0] for row in index_rows]
+                segment.start_time = min(times) if segment.start_time is None else min(segment.start_time, min(times))
+                segment.end_time = max(times) if segment.end_time is None else max(segment.end_time, max(times))
+                segment.count += len(index_rows)
+                segment.size_bytes += batch_bytes
+                position += len(index_rows)
+
+    # ---------------------------------------------------------------- 查詢
+
+    def _matching_rows(self, segment: SegmentInfo, start: Optional[float], end: Optional[float],
+                       level: Optional[str], category: Optional[str]) -> np.ndarray:
+        index = self._read_index(segment)
+        mask = np.ones(len(index), dtype=bool)
+        if start is not None:
+            mask &= index['timestamp'] >= start
+        if end is not None:
+            mask &= index['timestamp'] <= end
+        if level is not None:
+            mask &= index['level'] == self.level_codes.get(level, UNKNOWN_CODE)
+        if category is not None:
+            mask &= index['category'] == self.category_codes.get(category, UNKNOWN_CODE)
+        return index[mask]
+
+    def iter_records(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                     level: Optional[str] = None, category: Optional[str] = None,
+                     search_text: Optional[str] = None, newest_first: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        按條件逐條返回日誌（段內按時間排序）
+
+        只有索引命中的行會被讀取和解析；search_text 在解析後的消息上過濾
+        """
+        start = start_time.timestamp() if start_time else None
+        end = end_time.timestamp() if end_time else None
+        needle = search_text.lower() if search_text else None
+
+        with self._lock:
+            segments = [segment for segment in self._segments if segment.overlaps(start, end)]
+        if newest_first:
+            segments.reverse()
+
+        for segment in segments:
+            with self._lock:
+                rows = self._matching_rows(segment, start, end, level, category)
+            if not len(rows):
+                continue
+            order = np.argsort(rows['timestamp'], kind='stable')
+            if newest_first:
+                order = order[::-1]
+
+            with open(self._data_path(segment.name), 'rb') as f:
+                for row in rows[order]:
+                    f.seek(int(row['offset']))
+                    try:
+                        record = json.loads(f.read(int(row['length'])))
+                    except ValueError:
+                        continue
+                    if needle and needle not in record.get('message', '').lower():
+                        continue
+                    yield record
+
+    def query(self, limit: int = 100, **filters) -> List[Dict[str, Any]]:
+        """返回最新的 limit 條匹配日誌（按時間倒序）"""
+        results = []
+        for record in self.iter_records(newest_first=True, **filters):
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+    # ---------------------------------------------------------------- 維護
+
+    def segments(self) -> List[SegmentInfo]:
+        """當前所有段的摘要"""
+        with self._lock:
+            return list(self._segments)
+
+    def drop_segments_before(self, cutoff: datetime) -> int:
+        """刪除最後一條日誌早於 cutoff 的整段，返回刪除段數"""
+        cutoff_ts = cutoff.timestamp()
+        with self._lock:
+            expired = [segment for segment in self._segments[:-1]
+                       if segment.count == 0 or segment.end_time < cutoff_ts]
+            for segment in expired:
+                for path in (self._data_path(segment.name), self._index_path(segment.name)):
+                    if path.exists():
+                        os.remove(path)
+                self._index_cache.pop(segment.name, None)
+                self._segments.remove(segment)
+            return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """存儲統計"""
+        with self._lock:
+            return {
+                'segments': len(self._segments),
+                'total_entries': sum(segment.count for segment in self._segments),
+                'total_bytes': sum(segment.size_bytes for segment in self._segments),
+            }
@@ -19,6 +19,8 @@ import threading
 import queue
 import traceback
 
+from .log_store import SegmentedLogStore
+
 # 添加項目路徑
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
@@ -60,10 +62,10 @@ class LogEntry:
 class StructuredLogger:
     """結構化日誌記錄器"""
     
-    def __init__(self):
+    def __init__(self, logs_dir: Optional[Path] = None):
         self.project_root = Path(__file__).parent.parent.parent
-        self.logs_dir = self.project_root / "logs"
-        self.logs_dir.mkdir(exist_ok=True)
+        self.logs_dir = Path(logs_dir) if logs_dir else self.project_root / "logs"
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
         
         # 日誌配置
         self.config = {
@@ -74,9 +76,20 @@ class StructuredLogger:
             'enable_console': True,
             'enable_file': True,
             'enable_json': True,
-            'retention_days': 30
+            'retention_days': 30,
+            'segment_max_bytes': 16 * 1024 * 1024,  # 結構化日誌段大小上限
+            'write_batch_size': 500  # 工作線程每次批量寫入的最大條數
         }
         
+        # 結構化日誌存儲（按天/大小分段，附帶時間、級別、分類索引）
+        self.log_store = SegmentedLogStore(
+            self.logs_dir / "structured",
+            levels=[level.value for level in LogLevel],
+            categories=[cat.value for cat in LogCategory],
+            segment_max_bytes=self.config['segment_max_bytes']
+        )
+        self._import_legacy_log()
+        
         # 日誌隊列（用於異步寫入）
         self.log_queue = queue.Queue()
         self.log_worker_thread = None
@@ -94,6 +107,50 @@ class StructuredLogger:
         self.setup_loggers()
         self.start_log_worker()
     
+    def _import_legacy_log(self):
+        """
+        將舊版 aimax_structured.jsonl 中的JSON日誌導入分段存儲（只導入一次）
+
+        已導入的字節位置記錄在 structured/legacy_import.json 中，舊文件本身保持不動；
+        其中的純文本行（如 "[system] ..."）不是結構化日誌，直接跳過
+        """
+        legacy_file = self.logs_dir / "aimax_structured.jsonl"
+        if not legacy_file.exists():
+            return
+        
+        marker_file = self.log_store.root / "legacy_import.json"
+        imported_bytes = 0
+        if marker_file.exists():
+            try:
+                with open(marker_file, encoding='utf-8') as f:
+                    imported_bytes = int(json.load(f).get('imported_bytes', 0))
+            except (ValueError, OSError):
+                imported_bytes = 0
+        if legacy_file.stat().st_size <= imported_bytes:
+            return
+        
+        records = []
+        with open(legacy_file, 'rb') as f:
+            f.seek(imported_bytes)
+            data = f.read()
+        # 只處理完整的行，末尾未寫完的行留到下次
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+                datetime.fromisoformat(record['timestamp'])
+            except (ValueError, TypeError, KeyError):
+                continue
+            records.append(record)
+        
+        records.sort(key=lambda record: record['timestamp'])
+        if records:
+            self.log_store.append_batch(records)
+        
+        with open(marker_file, 'w', encoding='utf-8') as f:
+            json.dump({'source': legacy_file.name, 'imported_bytes': imported_bytes + end,
+                       'imported_records': len(records)}, f)
+    
     def setup_loggers(self):
         """設置日誌記錄器"""
         # 創建主日誌記錄器
@@ -136,17 +193,7 @@ class StructuredLogger:
                 file_handler.setFormatter(file_formatter)
                 self.logger.addHandler(file_handler)
         
-        # JSON結構化日誌處理器
-        if self.config['enable_json']:
-            json_log_file = self.logs_dir / "aimax_structured.jsonl"
-            json_handler = logging.handlers.RotatingFileHandler(
-                json_log_file,
-                maxBytes=self.config['max_file_size'],
-                backupCount=self.config['backup_count'],
-                encoding='utf-8'
-            )
-            json_handler.setLevel(logging.DEBUG)
-            self.logger.addHandler(json_handler)
+        # JSON結構化日誌由工作線程直接寫入 self.log_store，不再掛文本處理器
     
     def start_log_worker(self):
         """啟動日誌工作線程"""
@@ -158,31 +205,74 @@ class StructuredLogger:
         self.log_worker_thread.start()
     
     def stop_log_worker(self):
-        """停止日誌工作線程"""
+        """停止日誌工作線程（先寫完隊列中的日誌）"""
+        if self.worker_active:
+            self.flush()
         self.worker_active = False
         if self.log_worker_thread:
             self.log_worker_thread.join(timeout=5)
     
     def _log_worker(self):
-        """日誌工作線程"""
+        """日誌工作線程：取出隊列中積壓的日誌後一次性批量寫入"""
         while self.worker_active:
             try:
-                # 從隊列獲取日誌條目
-                log_entry = self.log_queue.get(timeout=1)
-                
-                # 寫入結構化日誌
-                self._write_structured_log(log_entry)
-                
-                # 更新統計
+                batch = [self.log_queue.get(timeout=1)]
+            except queue.Empty:
+                continue
+            
+            while len(batch) < self.config['write_batch_size']:
+                try:
+                    batch.append(self.log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            self._process_batch(batch)
+    
+    def _process_batch(self, batch: List[LogEntry]):
+        """批量寫入一組日誌條目並更新統計"""
+        try:
+            # 寫入結構化日誌
+            self._write_structured_batch(batch)
+            
+            # 更新統計
+            for log_entry in batch:
                 self._update_log_stats(log_entry)
                 
+        except Exception as e:
+            # 避免日誌系統本身的錯誤影響主程序
+            print(f"日誌工作線程錯誤: {e}")
+        finally:
+            for _ in batch:
                 self.log_queue.task_done()
-                
-            except queue.Empty:
-                continue
-            except Exception as e:
-                # 避免日誌系統本身的錯誤影響主程序
-                print(f"日誌工作線程錯誤: {e}")
+    
+    def _worker_running(self) -> bool:
+        return bool(self.worker_active and self.log_worker_thread
+                    and self.log_worker_thread.is_alive())
+    
+    def flush(self):
+        """
+        等待隊列中的日誌全部寫入
+
+        工作線程未運行（未啟動、已停止或異常退出）時，在當前線程直接寫入隊列中的日誌，
+        不會無限期阻塞
+        """
+        with self.log_queue.all_tasks_done:
+            while self.log_queue.unfinished_tasks and self._worker_running():
+                self.log_queue.all_tasks_done.wait(timeout=0.5)
+        
+        if self._worker_running():
+            return
+        
+        while True:
+            batch = []
+            while len(batch) < self.config['write_batch_size']:
+                try:
+                    batch.append(self.log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._process_batch(batch)
     
     def log(self, level: LogLevel, category: LogCategory, message: str,
             extra_data: Dict[str, Any] = None, correlation_id: str = None):
@@ -223,20 +313,24 @@ class StructuredLogger:
         standard_level = getattr(logging, level.value)
         self.logger.log(standard_level, f"[{category.value}] {message}")
     
+    @staticmethod
+    def _to_record(log_entry: LogEntry) -> Dict[str, Any]:
+        """轉換為可JSON序列化的字典"""
+        log_dict = asdict(log_entry)
+        log_dict['timestamp'] = log_entry.timestamp.isoformat()
+        log_dict['level'] = log_entry.level.value
+        log_dict['category'] = log_entry.category.value
+        return log_dict
+    
+    def _write_structured_batch(self, log_entries: List[LogEntry]):
+        """批量寫入結構化日誌"""
+        if self.config['enable_json']:
+            self.log_store.append_batch([self._to_record(entry) for entry in log_entries])
+    
     def _write_structured_log(self, log_entry: LogEntry):
-        """寫入結構化日誌"""
+        """寫入單條結構化日誌"""
         try:
-            # 轉換為JSON格式
-            log_dict = asdict(log_entry)
-            log_dict['timestamp'] = log_entry.timestamp.isoformat()
-            log_dict['level'] = log_entry.level.value
-            log_dict['category'] = log_entry.category.value
-            
-            # 寫入JSON日誌文件
-            json_log_file = self.logs_dir / "aimax_structured.jsonl"
-            with open(json_log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_dict, ensure_ascii=False) + '\n')
-                
+            self._write_structured_batch([log_entry])
         except Exception as e:
             print(f"寫入結構化日誌失敗: {e}")
     
@@ -278,50 +372,16 @@ class StructuredLogger:
     def query_logs(self, start_time: datetime = None, end_time: datetime = None,
                    level: LogLevel = None, category: LogCategory = None,
                    search_text: str = None, limit: int = 100) -> List[Dict[str, Any]]:
-        """查詢日誌"""
+        """查詢日誌（按時間倒序返回最新的 limit 條）"""
         try:
-            json_log_file = self.logs_dir / "aimax_structured.jsonl"
-            
-            if not json_log_file.exists():
-                return []
-            
-            logs = []
-            with open(json_log_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        log_dict = json.loads(line.strip())
-                        
-                        # 時間過濾
-                        log_time = datetime.fromisoformat(log_dict['timestamp'])
-                        if start_time and log_time < start_time:
-                            continue
-                        if end_time and log_time > end_time:
-                            continue
-                        
-                        # 級別過濾
-                        if level and log_dict['level'] != level.value:
-                            continue
-                        
-                        # 分類過濾
-                        if category and log_dict['category'] != category.value:
-                            continue
-                        
-                        # 文本搜索
-                        if search_text and search_text.lower() not in log_dict['message'].lower():
-                            continue
-                        
-                        logs.append(log_dict)
-                        
-                        if len(logs) >= limit:
-                            break
-                            
-                    except json.JSONDecodeError:
-                        continue
-            
-            # 按時間倒序排列
-            logs.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            return logs
+            return self.log_store.query(
+                start_time=start_time,
+                end_time=end_time,
+                level=level.value if level else None,
+                category=category.value if category else None,
+                search_text=search_text,
+                limit=limit
+            )
             
         except Exception as e:
             self.error(LogCategory.SYSTEM, f"查詢日誌失敗: {e}")
@@ -336,7 +396,8 @@ class StructuredLogger:
             'errors_last_hour': self.log_stats['errors_last_hour'],
             'last_reset_time': self.log_stats['last_reset_time'].isoformat(),
             'queue_size': self.log_queue.qsize(),
-            'worker_active': self.worker_active
+            'worker_active': self.worker_active,
+            'store': self.log_store.get_stats()
         }
     
     def cleanup_old_logs(self, days: int = None):
@@ -355,36 +416,52 @@ class StructuredLogger:
             except Exception as e:
                 self.warning(LogCategory.SYSTEM, f"清理日誌文件失敗: {log_file} - {e}")
         
+        # 結構化日誌按整段刪除
+        try:
+            cleaned_files += self.log_store.drop_segments_before(cutoff_date)
+        except Exception as e:
+            self.warning(LogCategory.SYSTEM, f"清理結構化日誌段失敗: {e}")
+        
         self.info(LogCategory.SYSTEM, f"清理了 {cleaned_files} 個舊日誌文件")
         return cleaned_files
     
     def export_logs(self, start_time: datetime, end_time: datetime,
                    export_format: str = 'json') -> Optional[Path]:
-        """導出日誌"""
+        """導出日誌（逐段流式寫出，按時間正序）"""
         try:
-            logs = self.query_logs(start_time, end_time, limit=10000)
-            
-            if not logs:
-                return None
-            
             # 生成導出文件名
             start_str = start_time.strftime('%Y%m%d_%H%M%S')
             end_str = end_time.strftime('%Y%m%d_%H%M%S')
             export_file = self.logs_dir / f"export_{start_str}_to_{end_str}.{export_format}"
             
+            exported = 0
+            records = self.log_store.iter_records(start_time, end_time)
+            
             if export_format == 'json':
                 with open(export_file, 'w', encoding='utf-8') as f:
-                    json.dump(logs, f, indent=2, ensure_ascii=False)
+                    f.write('[')
+                    for record in records:
+                        f.write(',\n' if exported else '\n')
+                        f.write(json.dumps(record, indent=2, ensure_ascii=False))
+                        exported += 1
+                    f.write('\n]' if exported else ']')
             
             elif export_format == 'csv':
                 import csv
                 with open(export_file, 'w', newline='', encoding='utf-8') as f:
-                    if logs:
-                        writer = csv.DictWriter(f, fieldnames=logs[0].keys())
-                        writer.writeheader()
-                        writer.writerows(logs)
+                    writer = None
+                    for record in records:
+                        if writer is None:
+                            writer = csv.DictWriter(f, fieldnames=record.keys())
+                            writer.writeheader()
+                        writer.writerow(record)
+                        exported += 1
+            
+            if not exported:
+                export_file.unlink(missing_ok=True)
+                return None
             
-            self.info(LogCategory.SYSTEM, f"導出日誌成功: {export_file}")
+            self.info(LogCategory.SYSTEM, f"導出日誌成功: {export_file} ({exported} 條)")
             return export_file
             
         except Exception as e:
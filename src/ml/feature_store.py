@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式特徵庫 - 每個交易對/時間框架一個目錄，每個特徵列一個可記憶體映射的檔案
+訓練與回測直接讀取已計算的特徵，新K線到達時只覆寫/追加尾部
+
+目錄格式:
+    <market>_<timeframe>/meta.json   版本（特徵定義指紋）、記錄數、列名與dtype
+    <market>_<timeframe>/<列名>.col  該列的原始小端數組
+    寫入時先寫列數據，最後原子替換 meta.json，讀取端只看到已提交的記錄數
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEATURE_STORE_FORMAT = 1
+META_FILE = "meta.json"
+
+
+class FeatureStore:
+    """列式特徵庫"""
+
+    def __init__(self, root: str = "data/features"):
+        """
+        初始化特徵庫
+
+        Args:
+            root: 特徵庫目錄
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+
+    def path_for(self, market: str, timeframe: str) -> Path:
+        """交易對/時間框架對應的目錄"""
+        return self.root / f"{market.lower()}_{timeframe}"
+
+    def read_meta(self, market: str, timeframe: str) -> Optional[Dict]:
+        """讀取元數據，不存在或格式不符時返回 None"""
+        path = self.path_for(market, timeframe) / META_FILE
+        if not path.exists():
+            return None
+        try:
+            meta = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ 特徵庫元數據損壞 {path}: {e}")
+            return None
+        return meta if meta.get('format') == FEATURE_STORE_FORMAT else None
+
+    def load(self, market: str, timeframe: str, version: Optional[str] = None,
+             start: Optional[int] = None, end: Optional[int] = None,
+             limit: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        以零拷貝只讀視圖載入特徵列
+
+        Args:
+            version: 期望的特徵定義版本，與已存版本不同時視為失效
+            start/end: Unix秒時間戳範圍（含端點），None 表示不限
+            limit: 只取最新的 limit 條
+
+        Returns:
+            列名到只讀NumPy視圖的字典；不存在或版本失效時返回 None
+        """
+        meta = self.read_meta(market, timeframe)
+        if meta is None or (version is not None and meta['version'] != version):
+            return None
+
+        directory = self.path_for(market, timeframe)
+        count = meta['count']
+        columns = {}
+        for name, dtype in meta['columns']:
+            if count == 0:
+                columns[name] = np.empty(0, dtype=dtype)
+            else:
+                columns[name] = np.memmap(directory / f"{name}.col", dtype=dtype, mode='r', shape=(count,))
+
+        timestamps = columns['timestamp']
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = count if end is None else int(np.searchsorted(timestamps, end, side='right'))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    def load_dataframe(self, market: str, timeframe: str, version: Optional[str] = None,
+                       start: Optional[int] = None, end: Optional[int] = None,
+                       limit: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """載入特徵為DataFrame（timestamp 轉為datetime）"""
+        columns = self.load(market, timeframe, version, start, end, limit)
+        if columns is None:
+            return None
+        df = pd.DataFrame({name: np.asarray(values) for name, values in columns.items()})
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+
+    def write(self, market: str, timeframe: str, columns: Dict[str, np.ndarray],
+              version: str, first_row: int = 0) -> int:
+        """
+        從 first_row 起覆寫特徵列並截斷其後的記錄
+
+        Args:
+            columns: 列名到數組的字典，必須包含按時間正序的 timestamp（Unix秒）
+            version: 特徵定義版本
+            first_row: 覆寫起點；0 表示重建，大於0時列名與版本必須與已存內容一致
+
+        Returns:
+            寫入後的總記錄數
+        """
+        directory = self.path_for(market, timeframe)
+        rows = len(columns['timestamp'])
+        with self._write_lock:
+            meta = self.read_meta(market, timeframe)
+            if first_row > 0:
+                if meta is None or meta['version'] != version or first_row > meta['count']:
+                    raise ValueError(f"無法從第 {first_row} 行續寫 {market} {timeframe} 特徵庫")
+                if [name for name, _ in meta['columns']] != list(columns):
+                    raise ValueError(f"{market} {timeframe} 特徵列與已存內容不一致")
+                dtypes = dict(meta['columns'])
+            else:
+                # 重建前先撤銷元數據，寫入中斷時不會把新舊混合的列當作有效數據
+                self.invalidate(market, timeframe)
+                dtypes = {name: np.asarray(values).dtype.newbyteorder('<').str for name, values in columns.items()}
+
+            directory.mkdir(parents=True, exist_ok=True)
+            new_count = first_row + rows
+            for name, values in columns.items():
+                data = np.ascontiguousarray(values, dtype=dtypes[name])
+                with open(directory / f"{name}.col", 'r+b' if first_row > 0 else 'wb') as f:
+                    f.seek(first_row * data.itemsize)
+                    f.write(data.tobytes())
+                    f.truncate(new_count * data.itemsize)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self._write_meta(directory, {
+                'format': FEATURE_STORE_FORMAT,
+                'version': version,
+                'count': new_count,
+                'columns': [[name, dtypes[name]] for name in columns]
+            })
+
+        logger.debug(f"📦 {market} {timeframe} 特徵庫從第 {first_row} 行寫入 {rows} 行，共 {new_count} 行")
+        return new_count
+
+    @staticmethod
+    def _write_meta(directory: Path, meta: Dict):
+        """原子替換元數據（提交記錄數）"""
+        tmp_path = directory / f"{META_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, directory / META_FILE)
+
+    def invalidate(self, market: str, timeframe: str):
+        """使交易對/時間框架的特徵失效（列檔案在下次重建時覆寫）"""
+        meta_path = self.path_for(market, timeframe) / META_FILE
+        if meta_path.exists():
+            meta_path.unlink()
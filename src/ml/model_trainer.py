@@ -28,6 +28,7 @@ except ImportError:
     print("⚠️ scikit-learn未安裝，請運行: pip install scikit-learn")
 
 from .training_data_extractor import create_training_data_extractor
+from .training_orchestrator import ModelTrainingOrchestrator, TimeSeriesFold, walk_forward_folds
 
 logger = logging.getLogger(__name__)
 
@@ -107,19 +108,33 @@ class ModelTrainer:
             'time_features': ['hour', 'day_of_week', 'is_weekend']
         }
         
+        # 時間序列驗證配置
+        self.validation_config = {
+            'n_splits': 5,          # 前進式驗證折疊數
+            'test_ratio': 0.2,      # 最後保留的測試比例（按時間）
+            'purge': 10,            # 訓練段末尾剔除的樣本數（不小於標籤的前瞻K線數）
+            'max_train_size': None, # 滾動訓練窗口長度，None 表示使用全部歷史
+            'max_workers': None     # 並行訓練進程數，None 表示CPU核心數
+        }
+        
         logger.info("🤖 機器學習模型訓練器初始化完成")
     
     async def train_all_models(self, 
                              market: str = "btctwd",
                              days: int = 30,
-                             target_column: str = "signal_3class") -> Dict[str, Any]:
+                             target_column: str = "signal_3class",
+                             timeframe: str = "5m") -> Dict[str, Any]:
         """
         訓練所有模型
         
+        候選模型在進程池中並行訓練：按時間保留最後一段作為測試集，之前的數據做前進式折疊驗證，
+        訓練段末尾剔除 purge 個樣本，避免前瞻標籤洩漏到測試段
+        
         Args:
             market: 交易對
             days: 訓練數據天數
             target_column: 目標列名
+            timeframe: K線週期
             
         Returns:
             訓練結果字典
@@ -132,53 +147,55 @@ class ModelTrainer:
             logger.info(f"🚀 開始訓練所有模型: {market}, {days}天數據")
             
             # 步驟1: 提取訓練數據
-            training_data = await self._prepare_training_data(market, days)
+            training_data = await self._prepare_training_data(market, days, timeframe)
             if training_data is None:
                 logger.error("❌ 無法獲取訓練數據")
                 return {}
             
-            # 步驟2: 準備特徵和標籤
+            # 步驟2: 準備特徵和標籤（特徵矩陣只計算一次，所有折疊與模型共用）
             X, y, feature_names = self._prepare_features_and_labels(training_data, target_column)
             if X is None:
                 logger.error("❌ 特徵準備失敗")
                 return {}
             
-            # 步驟3: 分割訓練和測試數據
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42, stratify=y
-            )
+            # 步驟3: 按時間切分保留測試段與前進式驗證折疊
+            holdout, folds = self._build_time_series_folds(len(X))
             
-            # 步驟4: 特徵標準化
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_test_scaled = scaler.transform(X_test)
+            # 步驟4: 並行訓練所有模型（每折的標準化器只在訓練段擬合）
+            orchestrator = ModelTrainingOrchestrator(
+                {name: config['model'] for name, config in self.model_configs.items()},
+                max_workers=self.validation_config['max_workers']
+            )
+            runs = orchestrator.run(X, y, folds, holdout)
             
-            # 步驟5: 訓練所有模型
+            # 步驟5: 匯總各模型結果
             results = {}
-            for model_name, config in self.model_configs.items():
-                logger.info(f"🔄 訓練模型: {model_name}")
-                
-                model_result = self._train_single_model(
-                    model_name, config,
-                    X_train_scaled, X_test_scaled, y_train, y_test,
-                    feature_names
-                )
-                
+            for model_name, run in runs.items():
+                model_result = self._build_model_result(model_name, run, feature_names)
                 if model_result:
                     results[model_name] = model_result
             
             # 步驟6: 選擇最佳模型
             best_model_name = self._select_best_model(results)
             results['best_model'] = best_model_name
-            results['scaler'] = scaler
+            results['scaler'] = next((run['holdout']['scaler'] for run in runs.values() if run['holdout']), None)
             results['feature_names'] = feature_names
             results['training_info'] = {
                 'market': market,
                 'days': days,
+                'timeframe': timeframe,
                 'target_column': target_column,
-                'training_samples': len(X_train),
-                'test_samples': len(X_test),
+                'training_samples': holdout.train_size,
+                'test_samples': holdout.test_size,
                 'features_count': len(feature_names),
+                'validation': {
+                    'method': 'walk_forward',
+                    'folds': len(folds),
+                    'purge': self.validation_config['purge'],
+                    'fold_test_size': folds[0].test_size
+                },
+                'workers': orchestrator.max_workers,
+                'elapsed_seconds': orchestrator.stats['elapsed_seconds'],
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -192,7 +209,7 @@ class ModelTrainer:
             logger.error(f"❌ 模型訓練失敗: {e}")
             return {}
     
-    async def _prepare_training_data(self, market: str, days: int) -> Optional[pd.DataFrame]:
+    async def _prepare_training_data(self, market: str, days: int, timeframe: str = "5m") -> Optional[pd.DataFrame]:
         """準備訓練數據"""
         try:
             logger.info("📊 準備訓練數據...")
@@ -200,7 +217,7 @@ class ModelTrainer:
             training_data = await self.data_extractor.extract_training_dataset(
                 market=market,
                 days=days,
-                timeframe="5m"
+                timeframe=timeframe
             )
             
             if training_data is None or training_data.empty:
@@ -243,7 +260,8 @@ class ModelTrainer:
             y = y[valid_mask]
             
             logger.info(f"✅ 特徵準備完成: {X.shape[0]} 樣本, {X.shape[1]} 特徵")
-            logger.info(f"📊 標籤分佈: {np.bincount(y.astype(int))}")
+            labels, counts = np.unique(y.astype(int), return_counts=True)
+            logger.info(f"📊 標籤分佈: {dict(zip(labels.tolist(), counts.tolist()))}")
             
             return X, y, feature_columns
             
@@ -251,34 +269,34 @@ class ModelTrainer:
             logger.error(f"❌ 準備特徵和標籤失敗: {e}")
             return None, None, None
     
-    def _train_single_model(self,
-                          model_name: str,
-                          config: Dict[str, Any],
-                          X_train: np.ndarray,
-                          X_test: np.ndarray,
-                          y_train: np.ndarray,
-                          y_test: np.ndarray,
-                          feature_names: List[str]) -> Optional[Dict[str, Any]]:
-        """訓練單個模型"""
+    def _build_time_series_folds(self, n_samples: int) -> Tuple[TimeSeriesFold, List[TimeSeriesFold]]:
+        """按時間切分：最後 test_ratio 為保留測試段，之前的數據做前進式折疊"""
+        config = self.validation_config
+        purge = config['purge']
+        test_start = int(n_samples * (1 - config['test_ratio']))
+        train_stop = test_start - purge
+        holdout = TimeSeriesFold(config['n_splits'], ((0, train_stop),), (test_start, n_samples))
+        folds = walk_forward_folds(train_stop, config['n_splits'], purge=purge,
+                                   max_train_size=config['max_train_size'])
+        return holdout, folds
+    
+    def _build_model_result(self,
+                            model_name: str,
+                            run: Dict[str, Any],
+                            feature_names: List[str]) -> Optional[Dict[str, Any]]:
+        """由並行訓練結果生成單個模型的結果（保留段上擬合的模型為最終模型）"""
         try:
-            model = config['model']
-            
-            # 訓練模型
-            model.fit(X_train, y_train)
-            
-            # 預測
-            y_pred_train = model.predict(X_train)
-            y_pred_test = model.predict(X_test)
-            
-            # 計算性能指標
-            train_accuracy = accuracy_score(y_train, y_pred_train)
-            test_accuracy = accuracy_score(y_test, y_pred_test)
+            for error in run['errors']:
+                logger.error(f"❌ 訓練 {model_name} 失敗: {error}")
+            final = run['holdout']
+            if final is None:
+                return None
             
-            # 交叉驗證
-            cv_scores = cross_val_score(model, X_train, y_train, cv=5)
+            model = final['model']
+            y_test, y_pred_test = final['y_test'], final['y_pred']
             
             # 分類報告
-            classification_rep = classification_report(y_test, y_pred_test, output_dict=True)
+            classification_rep = classification_report(y_test, y_pred_test, output_dict=True, zero_division=0)
             
             # 特徵重要性（如果模型支持）
             feature_importance = None
@@ -289,20 +307,26 @@ class ModelTrainer:
             
             result = {
                 'model': model,
-                'train_accuracy': train_accuracy,
-                'test_accuracy': test_accuracy,
-                'cv_mean': cv_scores.mean(),
-                'cv_std': cv_scores.std(),
+                'train_accuracy': final['train_score'],
+                'test_accuracy': final['test_score'],
+                'cv_mean': run['cv_mean'],
+                'cv_std': run['cv_std'],
+                'cv_scores': run['cv_scores'],
                 'classification_report': classification_rep,
                 'confusion_matrix': confusion_matrix(y_test, y_pred_test).tolist(),
-                'feature_importance': feature_importance
+                'feature_importance': feature_importance,
+                'throughput': run['throughput']
             }
             
-            logger.info(f"✅ {model_name} 訓練完成 - 測試準確率: {test_accuracy:.4f}")
+            throughput = run['throughput']
+            logger.info(f"✅ {model_name} 訓練完成 - 測試準確率: {final['test_score']:.4f}, "
+                        f"前進式驗證: {run['cv_mean']:.4f}±{run['cv_std']:.4f}, "
+                        f"擬合 {throughput['fit_samples_per_second']:,.0f} 樣本/秒, "
+                        f"預測 {throughput['predict_samples_per_second']:,.0f} 樣本/秒")
             return result
             
         except Exception as e:
-            logger.error(f"❌ 訓練 {model_name} 失敗: {e}")
+            logger.error(f"❌ 匯總 {model_name} 結果失敗: {e}")
             return None
     
     def _select_best_model(self, results: Dict[str, Any]) -> str:
@@ -358,7 +382,9 @@ class ModelTrainer:
                         'test_accuracy': result['test_accuracy'],
                         'cv_mean': result['cv_mean'],
                         'cv_std': result['cv_std'],
-                        'classification_report': result['classification_report']
+                        'cv_scores': result.get('cv_scores', []),
+                        'classification_report': result['classification_report'],
+                        'throughput': result.get('throughput', {})
                     }
             
             report_file = self.model_dir / f"{market}_training_report_{timestamp}.json"
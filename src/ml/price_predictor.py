@@ -27,8 +27,27 @@ except ImportError:
     TENSORFLOW_AVAILABLE = False
     print("⚠️ TensorFlow未安裝，請運行: pip install tensorflow")
 
+from .sequence_windows import SequenceWindowDataset
+
 logger = logging.getLogger(__name__)
 
+if TENSORFLOW_AVAILABLE:
+    class _KerasWindowBatches(tf.keras.utils.Sequence):
+        """把 SequenceWindowDataset 包裝為 Keras 流式讀取的批次序列"""
+        
+        def __init__(self, dataset: SequenceWindowDataset):
+            super().__init__()
+            self.dataset = dataset
+        
+        def __len__(self):
+            return self.dataset.num_batches
+        
+        def __getitem__(self, index):
+            return self.dataset.batch(index)
+        
+        def on_epoch_end(self):
+            self.dataset.on_epoch_end()
+
 class LSTMPricePredictor:
     """LSTM價格預測器"""
     
@@ -47,12 +66,14 @@ class LSTMPricePredictor:
             'sequence_length': 60,  # 使用60個時間點預測下一個
             'features': ['close', 'volume', 'high', 'low'],  # 使用的特徵
             'prediction_horizon': 1,  # 預測未來1個時間點
+            'prediction_horizons': None,  # 同時預測多個時間點（如 [1, 5, 15]），None 時只用 prediction_horizon
             'lstm_units': [50, 50],  # LSTM層單元數
             'dropout_rate': 0.2,
             'batch_size': 32,
             'epochs': 100,
             'validation_split': 0.2,
-            'learning_rate': 0.001
+            'learning_rate': 0.001,
+            'inference_batch_size': 256  # 推理時單次前向傳播的最大序列數
         }
         
         # 模型組件
@@ -76,23 +97,13 @@ class LSTMPricePredictor:
             df: 包含價格數據的DataFrame
             
         Returns:
-            X_train, X_test, y_train, y_test
+            X_train, X_test, y_train, y_test（均為標準化特徵矩陣的視圖，不複製序列數據）
         """
         try:
             logger.info("📊 準備LSTM訓練數據...")
             
-            # 選擇特徵列
-            feature_data = df[self.config['features']].values
-            
-            # 標準化特徵
-            if self.scaler is None:
-                self.scaler = MinMaxScaler()
-                scaled_data = self.scaler.fit_transform(feature_data)
-            else:
-                scaled_data = self.scaler.transform(feature_data)
-            
             # 創建序列數據
-            X, y = self._create_sequences(scaled_data)
+            X, y = self._create_sequences(self._scale_features(df))
             
             # 分割訓練和測試數據
             split_idx = int(len(X) * 0.8)
@@ -106,17 +117,50 @@ class LSTMPricePredictor:
             logger.error(f"❌ 數據準備失敗: {e}")
             return None, None, None, None
     
-    def _create_sequences(self, data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        """創建LSTM序列數據"""
-        try:
-            X, y = [], []
-            seq_len = self.config['sequence_length']
+    def prepare_datasets(self, df: pd.DataFrame,
+                         train_ratio: float = 0.8) -> Tuple[Optional[SequenceWindowDataset], Optional[SequenceWindowDataset]]:
+        """
+        準備可流式訓練的窗口數據集
+        
+        Args:
+            df: 包含價格數據的DataFrame
+            train_ratio: 按時間順序劃入訓練集的比例
             
-            for i in range(seq_len, len(data)):
-                X.append(data[i-seq_len:i])
-                y.append(data[i, 0])  # 預測收盤價
+        Returns:
+            (訓練集, 測試集)，可直接傳給 train/predict
+        """
+        try:
+            dataset = SequenceWindowDataset.from_array(
+                self._scale_features(df), self.config['sequence_length'], self._prediction_horizons(),
+                batch_size=self.config['batch_size']
+            )
+            train_set, test_set = dataset.split(train_ratio)
+            logger.info(f"✅ 窗口數據集準備完成: 訓練 {train_set.num_samples} 個序列, 測試 {test_set.num_samples} 個序列")
+            return train_set, test_set
             
-            return np.array(X), np.array(y)
+        except Exception as e:
+            logger.error(f"❌ 窗口數據集準備失敗: {e}")
+            return None, None
+    
+    def _scale_features(self, df: pd.DataFrame) -> np.ndarray:
+        """選擇特徵列並標準化（首次調用時擬合標準化器）"""
+        feature_data = df[self.config['features']].values
+        if self.scaler is None:
+            self.scaler = MinMaxScaler()
+            return self.scaler.fit_transform(feature_data)
+        return self.scaler.transform(feature_data)
+    
+    def _prediction_horizons(self) -> List[int]:
+        """預測的時間點列表"""
+        return list(self.config.get('prediction_horizons') or [self.config['prediction_horizon']])
+    
+    def _create_sequences(self, data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """創建LSTM序列數據（滑動窗口視圖，與原矩陣共用內存）"""
+        try:
+            dataset = SequenceWindowDataset.from_array(
+                data, self.config['sequence_length'], self._prediction_horizons()
+            )
+            return dataset.windows, dataset.targets
             
         except Exception as e:
             logger.error(f"❌ 創建序列數據失敗: {e}")
@@ -150,8 +194,8 @@ class LSTMPricePredictor:
             model.add(Dropout(self.config['dropout_rate']))
             model.add(BatchNormalization())
             
-            # 輸出層
-            model.add(Dense(units=1))
+            # 輸出層（每個預測時間點一個輸出）
+            model.add(Dense(units=len(self._prediction_horizons())))
             
             # 編譯模型
             model.compile(
@@ -168,15 +212,17 @@ class LSTMPricePredictor:
             logger.error(f"❌ 構建LSTM模型失敗: {e}")
             return False
     
-    def train(self, X_train: np.ndarray, y_train: np.ndarray, 
-              X_val: np.ndarray = None, y_val: np.ndarray = None) -> bool:
+    def train(self, X_train, y_train: np.ndarray = None, 
+              X_val=None, y_val: np.ndarray = None) -> bool:
         """
         訓練LSTM模型
         
+        訓練數據以小批次流式讀取，序列窗口不會被整體複製
+        
         Args:
-            X_train: 訓練特徵
-            y_train: 訓練標籤
-            X_val: 驗證特徵
+            X_train: 訓練特徵（數組或 SequenceWindowDataset）
+            y_train: 訓練標籤（X_train 為數據集時不需要）
+            X_val: 驗證特徵（數組或 SequenceWindowDataset）
             y_val: 驗證標籤
             
         Returns:
@@ -204,18 +250,20 @@ class LSTMPricePredictor:
                 )
             ]
             
-            # 訓練模型
-            if X_val is not None and y_val is not None:
-                validation_data = (X_val, y_val)
+            train_set = self._as_dataset(X_train, y_train)
+            if X_val is not None:
+                val_set = self._as_dataset(X_val, y_val)
             else:
-                validation_data = None
+                # 與 validation_split 相同：取訓練數據最後一段作為驗證集
+                split_idx = int(train_set.num_samples * (1 - self.config['validation_split']))
+                train_set, val_set = train_set.subset(0, split_idx), train_set.subset(split_idx)
+            train_set = train_set.subset(0, shuffle=True)
             
+            # 訓練模型
             history = self.model.fit(
-                X_train, y_train,
-                batch_size=self.config['batch_size'],
+                _KerasWindowBatches(train_set),
                 epochs=self.config['epochs'],
-                validation_split=self.config['validation_split'] if validation_data is None else 0,
-                validation_data=validation_data,
+                validation_data=_KerasWindowBatches(val_set) if val_set.num_samples else None,
                 callbacks=callbacks,
                 verbose=1
             )
@@ -228,34 +276,48 @@ class LSTMPricePredictor:
             logger.error(f"❌ LSTM模型訓練失敗: {e}")
             return False
     
-    def predict(self, X: np.ndarray) -> Optional[np.ndarray]:
+    def _as_dataset(self, X, y: np.ndarray = None) -> SequenceWindowDataset:
+        if isinstance(X, SequenceWindowDataset):
+            return X
+        return SequenceWindowDataset(X, y, batch_size=self.config['batch_size'])
+    
+    def _forward(self, X) -> np.ndarray:
+        """分批前向傳播，每批最多 inference_batch_size 個序列，返回 (樣本, 預測時間點) 的標準化輸出"""
+        windows = X.windows if isinstance(X, SequenceWindowDataset) else X
+        batch_size = self.config.get('inference_batch_size') or len(windows)
+        outputs = [
+            np.asarray(self.model.predict_on_batch(np.ascontiguousarray(windows[start:start + batch_size])))
+            for start in range(0, len(windows), batch_size)
+        ]
+        width = len(self._prediction_horizons())
+        return np.concatenate(outputs).reshape(-1, width) if outputs else np.empty((0, width))
+    
+    def _inverse_close(self, values: np.ndarray, scaler=None) -> np.ndarray:
+        """把標準化的收盤價（任意形狀）反標準化"""
+        scaler = self.scaler if scaler is None else scaler
+        if scaler is None:
+            return values
+        dummy_features = np.zeros((values.size, len(self.config['features'])))
+        dummy_features[:, 0] = values.reshape(-1)  # 收盤價在第一列
+        return scaler.inverse_transform(dummy_features)[:, 0].reshape(values.shape)
+    
+    def predict(self, X) -> Optional[np.ndarray]:
         """
         使用LSTM模型進行預測
         
         Args:
-            X: 輸入特徵
+            X: 輸入特徵（數組或 SequenceWindowDataset）
             
         Returns:
-            預測結果
+            預測結果，形狀為 (樣本, 預測時間點數)
         """
         try:
             if not TENSORFLOW_AVAILABLE or self.model is None:
                 logger.error("❌ 模型未準備好，無法預測")
                 return None
             
-            # 進行預測
-            predictions = self.model.predict(X, verbose=0)
-            
-            # 反標準化預測結果
-            if self.scaler is not None:
-                # 創建與原始特徵相同形狀的數組進行反標準化
-                dummy_features = np.zeros((len(predictions), len(self.config['features'])))
-                dummy_features[:, 0] = predictions.flatten()  # 收盤價在第一列
-                
-                inverse_scaled = self.scaler.inverse_transform(dummy_features)
-                predictions = inverse_scaled[:, 0].reshape(-1, 1)
-            
-            return predictions
+            # 進行預測並反標準化
+            return self._inverse_close(self._forward(X))
             
         except Exception as e:
             logger.error(f"❌ LSTM預測失敗: {e}")
@@ -271,39 +333,68 @@ class LSTMPricePredictor:
         Returns:
             預測結果字典
         """
-        try:
-            if sequence.shape != (self.config['sequence_length'], len(self.config['features'])):
-                logger.error(f"❌ 輸入序列形狀錯誤: {sequence.shape}")
-                return None
-            
-            # 標準化輸入
-            if self.scaler is not None:
-                sequence_scaled = self.scaler.transform(sequence)
-            else:
-                sequence_scaled = sequence
-            
-            # 預測
-            X_input = sequence_scaled.reshape(1, self.config['sequence_length'], len(self.config['features']))
-            prediction = self.predict(X_input)
+        return self.predict_batch({'sequence': sequence}).get('sequence')
+    
+    def predict_batch(self, sequences: Dict[str, np.ndarray],
+                      scalers: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        一次前向傳播預測多個交易對的所有預測時間點
+        
+        Args:
+            sequences: 交易對 -> 未標準化的輸入序列 (sequence_length, 特徵數)
+            scalers: 交易對 -> 標準化器（未提供的交易對使用本模型的標準化器）
             
-            if prediction is not None:
-                predicted_price = float(prediction[0, 0])
-                
-                # 計算信心度（基於訓練歷史）
-                confidence = self._calculate_prediction_confidence(sequence_scaled)
-                
-                return {
-                    'predicted_price': predicted_price,
-                    'confidence': confidence,
-                    'timestamp': datetime.now().isoformat(),
+        Returns:
+            交易對 -> 預測結果字典（形狀錯誤的序列不返回）
+        """
+        try:
+            if not TENSORFLOW_AVAILABLE or self.model is None:
+                logger.error("❌ 模型未準備好，無法預測")
+                return {}
+            
+            scalers = scalers or {}
+            expected_shape = (self.config['sequence_length'], len(self.config['features']))
+            markets, inputs = [], []
+            for market, sequence in sequences.items():
+                sequence = np.asarray(sequence, dtype=float)
+                if sequence.shape != expected_shape:
+                    logger.error(f"❌ {market} 輸入序列形狀錯誤: {sequence.shape}")
+                    continue
+                scaler = scalers.get(market, self.scaler)
+                markets.append(market)
+                inputs.append(scaler.transform(sequence) if scaler is not None else sequence)
+            if not inputs:
+                return {}
+            
+            outputs = self._forward(np.stack(inputs))
+            horizons = self._prediction_horizons()
+            timestamp = datetime.now().isoformat()
+            results = {}
+            for market, scaled, output in zip(markets, inputs, outputs):
+                prices = self._inverse_close(output, scalers.get(market))
+                results[market] = {
+                    'predicted_price': float(prices[0]),
+                    'horizon_predictions': {horizon: float(price) for horizon, price in zip(horizons, prices)},
+                    'confidence': self._calculate_prediction_confidence(scaled),
+                    'timestamp': timestamp,
                     'model_type': 'LSTM'
                 }
-            
-            return None
+            return results
             
         except Exception as e:
-            logger.error(f"❌ 單次預測失敗: {e}")
-            return None
+            logger.error(f"❌ 批量預測失敗: {e}")
+            return {}
+    
+    def predict_markets(self, market_data: Dict[str, pd.DataFrame],
+                        scalers: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """以各交易對最新的 sequence_length 根K線做一次批量預測（數據不足的交易對跳過）"""
+        sequence_length = self.config['sequence_length']
+        sequences = {
+            market: df[self.config['features']].to_numpy(dtype=float)[-sequence_length:]
+            for market, df in market_data.items()
+            if df is not None and len(df) >= sequence_length
+        }
+        return self.predict_batch(sequences, scalers)
     
     def _calculate_prediction_confidence(self, sequence: np.ndarray) -> float:
         """計算預測信心度"""
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+序列窗口數據集 - 以步幅視圖（strided view）構建LSTM輸入序列
+所有窗口共用同一份特徵矩陣，不複製 sequence_length 倍的數據；
+小批次按需切出，只有打亂順序時才複製單個批次。
+"""
+
+import logging
+import math
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def strided_windows(data: np.ndarray, sequence_length: int, count: Optional[int] = None) -> np.ndarray:
+    """
+    特徵矩陣的滑動窗口視圖
+
+    Args:
+        data: (時間點, 特徵) 矩陣
+        sequence_length: 窗口長度
+        count: 窗口數量（默認取滿）
+
+    Returns:
+        形狀為 (count, sequence_length, 特徵) 的只讀視圖，第 i 個窗口為 data[i:i+sequence_length]
+    """
+    data = np.ascontiguousarray(data)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    available = max(len(data) - sequence_length + 1, 0)
+    count = available if count is None else max(min(count, available), 0)
+    return np.lib.stride_tricks.as_strided(
+        data, shape=(count, sequence_length, data.shape[1]),
+        strides=(data.strides[0], data.strides[0], data.strides[1]), writeable=False
+    )
+
+
+class SequenceWindowDataset:
+    """
+    LSTM序列窗口數據集
+
+    窗口與目標都是原始矩陣的視圖；提供與 Keras Sequence 相同的
+    __len__ / __getitem__ / on_epoch_end 接口，可直接流式餵給訓練
+    """
+
+    def __init__(self, windows: np.ndarray, targets: np.ndarray, batch_size: int = 32,
+                 shuffle: bool = False, seed: Optional[int] = None):
+        """
+        Args:
+            windows: (樣本, sequence_length, 特徵) 數組或視圖
+            targets: (樣本,) 或 (樣本, 預測週期數) 數組
+            batch_size: 小批次大小
+            shuffle: 每個epoch是否打亂樣本順序
+            seed: 打亂順序的隨機種子
+        """
+        if len(windows) != len(targets):
+            raise ValueError(f"窗口數 {len(windows)} 與目標數 {len(targets)} 不一致")
+        self.windows = windows
+        self.targets = targets
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+        self._order = self._rng.permutation(len(windows)) if shuffle else None
+
+    @classmethod
+    def from_array(cls, data: np.ndarray, sequence_length: int, horizons: Sequence[int] = (1,),
+                   target_column: int = 0, **options) -> 'SequenceWindowDataset':
+        """
+        由特徵矩陣建立數據集
+
+        第 i 個樣本的輸入為 data[i:i+sequence_length]，預測週期 h 的目標為
+        data[i+sequence_length+h-1, target_column]；只有一個預測週期時目標為一維
+        """
+        data = np.ascontiguousarray(data)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        horizons = [int(h) for h in horizons]
+        if not horizons or min(horizons) < 1:
+            raise ValueError(f"預測週期必須為正整數: {horizons}")
+
+        count = max(len(data) - sequence_length - max(horizons) + 1, 0)
+        windows = strided_windows(data, sequence_length, count)
+        column = data[:, target_column]
+        starts = sequence_length - 1
+        if len(horizons) == 1:
+            targets = column[starts + horizons[0]:starts + horizons[0] + count]
+        else:
+            targets = np.stack([column[starts + h:starts + h + count] for h in horizons], axis=1)
+        return cls(windows, targets, **options)
+
+    # ---------------------------------------------------------------- 切分
+
+    def subset(self, start: int, stop: Optional[int] = None, **options) -> 'SequenceWindowDataset':
+        """連續樣本範圍的子數據集（仍是同一矩陣的視圖）"""
+        settings = {'batch_size': self.batch_size, 'shuffle': False, **options}
+        return SequenceWindowDataset(self.windows[start:stop], self.targets[start:stop], **settings)
+
+    def split(self, ratio: float = 0.8) -> Tuple['SequenceWindowDataset', 'SequenceWindowDataset']:
+        """按時間順序切分為前後兩段（不打亂，避免未來數據洩漏到訓練段）"""
+        split_idx = int(self.num_samples * ratio)
+        return self.subset(0, split_idx), self.subset(split_idx)
+
+    # ---------------------------------------------------------------- 批次
+
+    def __len__(self) -> int:
+        return self.num_batches
+
+    @property
+    def num_samples(self) -> int:
+        return len(self.windows)
+
+    @property
+    def num_batches(self) -> int:
+        return math.ceil(len(self.windows) / self.batch_size) if self.batch_size else 0
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.batch(index)
+
+    def batch(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """第 index 個小批次；按順序時為零複製切片，打亂時只複製該批次"""
+        if not 0 <= index < self.num_batches:
+            raise IndexError(f"批次索引超出範圍: {index}")
+        start = index * self.batch_size
+        stop = min(start + self.batch_size, len(self.windows))
+        if self._order is None:
+            return self.windows[start:stop], self.targets[start:stop]
+        rows = self._order[start:stop]
+        return self.windows[rows], self.targets[rows]
+
+    def on_epoch_end(self):
+        """每個epoch結束後重新打亂樣本順序"""
+        if self.shuffle:
+            self._order = self._rng.permutation(len(self.windows))
+
+    def batches(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        for index in range(self.num_batches):
+            yield self.batch(index)
@@ -4,6 +4,9 @@
 訓練數據提取器 - 從歷史資料庫提取適合機器學習的訓練數據
 """
 
+import hashlib
+import inspect
+import json
 import logging
 import pandas as pd
 import numpy as np
@@ -14,22 +17,33 @@ import sqlite3
 
 from ..data.historical_data_manager import create_historical_manager
 from ..data.technical_indicators import create_technical_calculator
+from ..data.kline_storage import to_unix_seconds
+from .feature_store import FeatureStore
 
 logger = logging.getLogger(__name__)
 
+# 增量計算特徵時向前重算的K線數：最長滾動窗口為50，EMA(26)的權重衰減到浮點精度以下約需360根
+FEATURE_WARMUP_ROWS = 500
+# 標籤最長前瞻K線數（future_return_10），最後這些行在新K線到達後需要重算
+LABEL_LOOKAHEAD_ROWS = 10
+
 class TrainingDataExtractor:
     """訓練數據提取器"""
     
-    def __init__(self, db_path: str = "data/market_history.db"):
+    def __init__(self, db_path: str = "data/market_history.db",
+                 feature_store_dir: Optional[str] = "data/features"):
         """
         初始化訓練數據提取器
         
         Args:
             db_path: 歷史數據庫路徑
+            feature_store_dir: 特徵庫目錄，None 表示每次完整重算特徵
         """
         self.db_path = Path(db_path)
         self.historical_manager = create_historical_manager(str(db_path))
         self.technical_calculator = create_technical_calculator()
+        self.feature_store = FeatureStore(feature_store_dir) if feature_store_dir else None
+        self._feature_version = None
         
         # 特徵配置
         self.feature_config = {
@@ -73,22 +87,21 @@ class TrainingDataExtractor:
             # 步驟1: 確保歷史數據完整性
             await self.historical_manager.ensure_historical_data(market, [timeframe])
             
-            # 步驟2: 獲取原始歷史數據
-            raw_data = self._get_raw_historical_data(market, timeframe, days)
-            if raw_data is None or raw_data.empty:
-                logger.error("❌ 無法獲取原始歷史數據")
-                return None
-            
-            # 步驟3: 計算技術指標
-            enhanced_data = self._calculate_technical_features(raw_data)
+            # 步驟2: 從特徵庫讀取特徵和標籤（只補算新增的K線）
+            feature_data = self.load_features(market, timeframe, limit=self._window_length(timeframe, days))
             
-            # 步驟4: 生成衍生特徵
-            feature_data = self._generate_derived_features(enhanced_data)
+            if feature_data is None or feature_data.empty:
+                # 步驟3: 特徵庫不可用時獲取原始歷史數據並完整計算
+                raw_data = self._get_raw_historical_data(market, timeframe, days)
+                if raw_data is None or raw_data.empty:
+                    logger.error("❌ 無法獲取原始歷史數據")
+                    return None
+                feature_data = self._compute_feature_frame(raw_data)
             
-            # 步驟5: 創建訓練標籤
-            labeled_data = self._create_training_labels(feature_data)
+            # 步驟4: 創建依賴提取窗口的標籤
+            labeled_data = self._create_window_labels(feature_data)
             
-            # 步驟6: 數據清洗和驗證
+            # 步驟5: 數據清洗和驗證
             clean_data = self._clean_and_validate_data(labeled_data)
             
             logger.info(f"✅ 訓練數據集提取完成: {len(clean_data)} 條記錄")
@@ -98,18 +111,123 @@ class TrainingDataExtractor:
             logger.error(f"❌ 提取訓練數據集失敗: {e}")
             return None
     
+    @staticmethod
+    def _window_length(timeframe: str, days: int) -> int:
+        """提取天數對應的K線數量"""
+        periods_per_day = {
+            '1m': 1440,
+            '5m': 288,
+            '1h': 24,
+            '1d': 1
+        }
+        return periods_per_day.get(timeframe, 288) * days
+    
+    def get_feature_version(self) -> str:
+        """特徵定義指紋：特徵配置或計算方法的源碼變化時改變，使特徵庫自動失效"""
+        if self._feature_version is None:
+            parts = [json.dumps(self.feature_config, sort_keys=True),
+                     str(FEATURE_WARMUP_ROWS), str(LABEL_LOOKAHEAD_ROWS)]
+            for method in (self._compute_feature_frame, self._calculate_technical_features,
+                           self._calculate_rsi, self._generate_derived_features, self._create_training_labels):
+                try:
+                    parts.append(inspect.getsource(method))
+                except (OSError, TypeError):
+                    parts.append(method.__qualname__)
+            self._feature_version = hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()[:16]
+        return self._feature_version
+    
+    def update_feature_store(self, market: str, timeframe: str = "5m") -> int:
+        """
+        把數據庫中的新K線補算進特徵庫
+        
+        只重算最後 LABEL_LOOKAHEAD_ROWS+1 行（未收盤K線與前瞻標籤未完整的行）及其後的新K線，
+        並向前多取 FEATURE_WARMUP_ROWS 根K線預熱指標；特徵定義變化或歷史K線不連續時完整重建
+        
+        Returns:
+            重算的行數
+        """
+        if self.feature_store is None:
+            return 0
+        
+        storage = self.historical_manager.storage
+        version = self.get_feature_version()
+        stored = self.feature_store.load(market, timeframe, version)
+        # 複製時間戳後釋放記憶體映射視圖：寫入時要截斷列檔案，Windows 上仍被映射的檔案無法截斷
+        timestamps = None if stored is None else np.array(stored['timestamp'])
+        del stored
+        
+        first_row = warm_start = 0
+        raw = None
+        if timestamps is not None and len(timestamps):
+            first_row = max(len(timestamps) - LABEL_LOOKAHEAD_ROWS - 1, 0)
+            warm_start = max(first_row - FEATURE_WARMUP_ROWS, 0)
+            raw = storage.read_dataframe(market, timeframe, start=int(timestamps[warm_start]))
+            overlap = to_unix_seconds(raw['timestamp'])[:len(timestamps) - warm_start]
+            if not np.array_equal(overlap, timestamps[warm_start:]):
+                logger.warning(f"⚠️ {market} {timeframe} 歷史K線與特徵庫不一致，完整重建")
+                raw = None
+                first_row = warm_start = 0
+        else:
+            logger.info(f"🔧 建立 {market} {timeframe} 特徵庫")
+        
+        if raw is None:
+            raw = storage.read_dataframe(market, timeframe)
+        if raw.empty:
+            return 0
+        
+        frame = self._compute_feature_frame(raw)
+        missing = [name for name in self.get_feature_names() if name not in frame.columns]
+        if missing:
+            logger.error(f"❌ 特徵計算不完整，未寫入特徵庫: 缺少 {missing}")
+            return 0
+        
+        tail = frame.iloc[first_row - warm_start:]
+        columns = {name: tail[name].to_numpy() for name in tail.columns}
+        columns['timestamp'] = to_unix_seconds(tail['timestamp'])
+        self.feature_store.write(market, timeframe, columns, version, first_row)
+        return len(tail)
+    
+    def load_features(self,
+                      market: str = "btctwd",
+                      timeframe: str = "5m",
+                      start: Optional[int] = None,
+                      end: Optional[int] = None,
+                      limit: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        讀取已計算的特徵和前瞻標籤（先把新K線補算進特徵庫），供訓練與回測使用
+        
+        Args:
+            market: 交易對
+            timeframe: 時間框架
+            start/end: Unix秒時間戳範圍（含端點），None 表示不限
+            limit: 只取最新的 limit 條
+            
+        Returns:
+            特徵DataFrame；未啟用特徵庫或讀取失敗時返回 None
+        """
+        if self.feature_store is None:
+            return None
+        try:
+            self.update_feature_store(market, timeframe)
+            df = self.feature_store.load_dataframe(market, timeframe, self.get_feature_version(), start, end, limit)
+            if df is not None:
+                logger.info(f"📦 從特徵庫讀取 {market} {timeframe} 特徵: {len(df)} 條記錄")
+            return df
+        except Exception as e:
+            logger.error(f"❌ 讀取特徵庫失敗: {e}")
+            return None
+    
+    def _compute_feature_frame(self, raw_data: pd.DataFrame) -> pd.DataFrame:
+        """計算技術指標、衍生特徵與前瞻標籤（不含依賴提取窗口的標籤）"""
+        enhanced_data = self._calculate_technical_features(raw_data)
+        feature_data = self._generate_derived_features(enhanced_data)
+        return self._create_training_labels(feature_data)
+    
     def _get_raw_historical_data(self, market: str, timeframe: str, days: int) -> Optional[pd.DataFrame]:
         """獲取原始歷史數據"""
         try:
             # 計算需要的數據量
-            periods_per_day = {
-                '1m': 1440,
-                '5m': 288,
-                '1h': 24,
-                '1d': 1
-            }
-            
-            limit = periods_per_day.get(timeframe, 288) * days
+            limit = self._window_length(timeframe, days)
             
             # 從數據庫獲取數據
             df = self.historical_manager.get_historical_data(market, timeframe, limit)
@@ -249,16 +367,27 @@ class TrainingDataExtractor:
             # 二分類：買入(1)、不買入(0)
             labeled_df['signal_binary'] = (future_return_5 > buy_threshold).astype(int)
             
-            # 風險標籤
+            logger.info("✅ 訓練標籤創建完成")
+            return labeled_df
+            
+        except Exception as e:
+            logger.error(f"❌ 創建訓練標籤失敗: {e}")
+            return df
+    
+    def _create_window_labels(self, df: pd.DataFrame) -> pd.DataFrame:
+        """創建依賴整個提取窗口統計量的標籤（不存入特徵庫）"""
+        try:
+            labeled_df = df.copy()
+            
+            # 風險標籤：波動率高於窗口內80分位
             volatility_5 = labeled_df['volatility_5']
             high_vol_threshold = volatility_5.quantile(0.8)
             labeled_df['high_risk'] = (volatility_5 > high_vol_threshold).astype(int)
             
-            logger.info("✅ 訓練標籤創建完成")
             return labeled_df
             
         except Exception as e:
-            logger.error(f"❌ 創建訓練標籤失敗: {e}")
+            logger.error(f"❌ 創建風險標籤失敗: {e}")
             return df
     
     def _clean_and_validate_data(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -367,9 +496,10 @@ class TrainingDataExtractor:
 
 
 # 創建全局實例
-def create_training_data_extractor(db_path: str = "data/market_history.db") -> TrainingDataExtractor:
+def create_training_data_extractor(db_path: str = "data/market_history.db",
+                                   feature_store_dir: Optional[str] = "data/features") -> TrainingDataExtractor:
     """創建訓練數據提取器實例"""
-    return TrainingDataExtractor(db_path)
+    return TrainingDataExtractor(db_path, feature_store_dir)
 
 
 # 測試代碼
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型訓練編排器 - 多個候選模型在進程池中並行訓練，以時間序列折疊驗證
+特徵矩陣只計算一次並放入共享記憶體；每個折疊的標準化器只在訓練段擬合，
+擬合結果與標準化後的矩陣在進程內緩存，同一折疊的所有模型共用。
+"""
+
+import copy
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.parameter_sweep import SharedMarketData
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TimeSeriesFold:
+    """時間序列折疊：訓練段由若干連續區間組成，測試段為一個連續區間"""
+    index: int
+    train_ranges: Tuple[Tuple[int, int], ...]
+    test_range: Tuple[int, int]
+
+    @property
+    def train_size(self) -> int:
+        return sum(stop - start for start, stop in self.train_ranges)
+
+    @property
+    def test_size(self) -> int:
+        return self.test_range[1] - self.test_range[0]
+
+    def train_indices(self) -> np.ndarray:
+        return np.concatenate([np.arange(start, stop) for start, stop in self.train_ranges]) \
+            if self.train_ranges else np.empty(0, dtype=int)
+
+
+def walk_forward_folds(n_samples: int, n_splits: int = 5, test_size: Optional[int] = None,
+                       purge: int = 0, max_train_size: Optional[int] = None,
+                       start: int = 0) -> List[TimeSeriesFold]:
+    """
+    前進式（walk-forward）折疊：每個測試段之前的數據作為訓練段
+
+    Args:
+        n_samples: 樣本數（按時間排序）
+        n_splits: 折疊數，測試段為最後 n_splits 個等長區間
+        test_size: 測試段長度，默認 (n_samples - start) // (n_splits + 1)
+        purge: 訓練段末尾剔除的樣本數（標籤的前瞻長度），避免標籤跨入測試段
+        max_train_size: 訓練段最大長度（滾動窗口），默認使用全部歷史
+        start: 可用樣本的起點
+    """
+    available = n_samples - start
+    test_size = test_size or available // (n_splits + 1)
+    if test_size <= 0 or test_size * n_splits >= available:
+        raise ValueError(f"樣本數 {available} 不足以切分 {n_splits} 個長度 {test_size} 的測試段")
+
+    folds = []
+    for index in range(n_splits):
+        test_start = n_samples - (n_splits - index) * test_size
+        train_stop = test_start - purge
+        train_start = start if max_train_size is None else max(start, train_stop - max_train_size)
+        if train_stop <= train_start:
+            raise ValueError(f"第 {index} 折剔除 {purge} 個樣本後沒有訓練數據")
+        folds.append(TimeSeriesFold(index, ((train_start, train_stop),), (test_start, test_start + test_size)))
+    return folds
+
+
+def purged_kfold(n_samples: int, n_splits: int = 5, purge: int = 0, embargo: int = 0) -> List[TimeSeriesFold]:
+    """
+    清洗（purged）K折：測試段前剔除 purge 個樣本、測試段後禁用 embargo 個樣本，其餘作為訓練段
+    """
+    bounds = np.linspace(0, n_samples, n_splits + 1).astype(int)
+    folds = []
+    for index in range(n_splits):
+        test_start, test_stop = int(bounds[index]), int(bounds[index + 1])
+        ranges = [(0, max(test_start - purge, 0)), (min(test_stop + embargo, n_samples), n_samples)]
+        folds.append(TimeSeriesFold(index, tuple(r for r in ranges if r[1] > r[0]), (test_start, test_stop)))
+    return folds
+
+
+class FoldScaler:
+    """標準化（與 StandardScaler 相同：總體標準差，零方差特徵不縮放）"""
+
+    def fit(self, X: np.ndarray) -> 'FoldScaler':
+        self.mean_ = X.mean(axis=0)
+        scale = X.std(axis=0)
+        self.scale_ = np.where(scale > 0, scale, 1.0)
+        return self
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (X - self.mean_) / self.scale_
+
+    def fit_transform(self, X: np.ndarray) -> np.ndarray:
+        return self.fit(X).transform(X)
+
+
+def accuracy(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    return float(np.mean(y_true == y_pred)) if len(y_true) else 0.0
+
+
+# 子進程狀態（由進程池 initializer 設定）
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(descriptor, shape: Tuple[int, int], estimators: Dict[str, Any],
+                 scoring: Callable[[np.ndarray, np.ndarray], float]):
+    shm, data = SharedMarketData.attach(descriptor)
+    _setup_state(data['X'].reshape(shape), data['y'], estimators, scoring, shm=shm)
+
+
+def _setup_state(X: np.ndarray, y: np.ndarray, estimators: Dict[str, Any],
+                 scoring: Callable[[np.ndarray, np.ndarray], float], shm=None):
+    _worker_state.clear()
+    _worker_state.update(X=X, y=y, estimators=estimators, scoring=scoring, shm=shm, folds={})
+
+
+def _fold_matrices(fold: TimeSeriesFold):
+    """折疊的標準化矩陣（同一進程內按折疊緩存，所有模型共用）"""
+    key = (fold.train_ranges, fold.test_range)
+    cache = _worker_state['folds']
+    if key in cache:
+        return cache[key], True
+
+    X, y = _worker_state['X'], _worker_state['y']
+    train_rows = fold.train_indices()
+    test_slice = slice(*fold.test_range)
+    scaler = FoldScaler()
+    cache[key] = (scaler, scaler.fit_transform(X[train_rows]), y[train_rows],
+                  scaler.transform(X[test_slice]), y[test_slice])
+    return cache[key], False
+
+
+def _run_task(model_name: str, fold: TimeSeriesFold, keep_model: bool) -> Dict[str, Any]:
+    cache_hit = False
+    try:
+        (scaler, X_train, y_train, X_test, y_test), cache_hit = _fold_matrices(fold)
+        model = copy.deepcopy(_worker_state['estimators'][model_name])
+
+        started = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        train_pred = model.predict(X_train)
+        test_pred = model.predict(X_test)
+        predict_seconds = time.perf_counter() - started
+
+        scoring = _worker_state['scoring']
+        result = {
+            'model_name': model_name,
+            'fold': fold.index,
+            'train_score': scoring(y_train, train_pred),
+            'test_score': scoring(y_test, test_pred),
+            'train_samples': len(y_train),
+            'test_samples': len(y_test),
+            'fit_seconds': fit_seconds,
+            'predict_seconds': predict_seconds,
+            'cache_hit': cache_hit,
+            'pid': os.getpid(),
+            'error': None
+        }
+        if keep_model:
+            result.update(model=model, scaler=scaler, y_test=y_test, y_pred=test_pred)
+        return result
+    except Exception as e:
+        return {'model_name': model_name, 'fold': fold.index, 'cache_hit': cache_hit, 'error': str(e)}
+
+
+class ModelTrainingOrchestrator:
+    """候選模型的並行訓練與時間序列驗證"""
+
+    def __init__(self,
+                 estimators: Dict[str, Any],
+                 max_workers: Optional[int] = None,
+                 scoring: Callable[[np.ndarray, np.ndarray], float] = accuracy):
+        """
+        初始化訓練編排器
+
+        Args:
+            estimators: 模型名到未訓練模型（需可pickle，提供 fit/predict）的映射，每個任務使用其深拷貝
+            max_workers: 進程數，預設為CPU核心數；1 表示在當前進程內執行
+            scoring: 模組級評分函數 scoring(y_true, y_pred)
+        """
+        self.estimators = estimators
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.scoring = scoring
+        self.stats = {'tasks': 0, 'failed': 0, 'cache_hits': 0, 'elapsed_seconds': 0.0}
+
+    def run(self, X: np.ndarray, y: np.ndarray, folds: List[TimeSeriesFold],
+            holdout: Optional[TimeSeriesFold] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        以折疊驗證所有模型，並在保留段上擬合最終模型
+
+        Args:
+            X: 特徵矩陣（按時間排序）
+            y: 標籤
+            folds: 交叉驗證折疊
+            holdout: 保留測試折疊；其訓練段擬合的模型作為最終模型返回
+
+        Returns:
+            模型名 -> {'cv_scores', 'cv_mean', 'cv_std', 'holdout', 'throughput', 'errors'}
+        """
+        X = np.ascontiguousarray(X, dtype=float)
+        y = np.ascontiguousarray(y)
+        tasks = [(name, fold, False) for fold in folds for name in self.estimators]
+        if holdout is not None:
+            tasks += [(name, holdout, True) for name in self.estimators]
+
+        started = time.perf_counter()
+        logger.info(f"🚀 開始並行訓練: {len(self.estimators)} 個模型 × {len(folds)} 折"
+                    f"{' + 保留段' if holdout is not None else ''}, {self.max_workers} 個進程")
+        outputs = self._execute(X, y, tasks)
+        self.stats['elapsed_seconds'] = time.perf_counter() - started
+        self.stats['tasks'] = len(tasks)
+        self.stats['failed'] = sum(1 for output in outputs if output['error'])
+        self.stats['cache_hits'] = sum(1 for output in outputs if output.get('cache_hit'))
+
+        results = {}
+        for name in self.estimators:
+            runs = [output for output in outputs if output['model_name'] == name]
+            results[name] = self._summarize(runs, holdout)
+        logger.info(f"✅ 並行訓練完成: {len(tasks)} 個任務, 耗時 {self.stats['elapsed_seconds']:.2f}s")
+        return results
+
+    def _execute(self, X: np.ndarray, y: np.ndarray, tasks: List[Tuple[str, TimeSeriesFold, bool]]) -> List[Dict]:
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            _setup_state(X, y, self.estimators, self.scoring)
+            try:
+                return [_run_task(*task) for task in tasks]
+            finally:
+                _worker_state.clear()
+
+        shared = SharedMarketData({'X': X.reshape(-1), 'y': y})
+        try:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks)), initializer=_init_worker,
+                                     initargs=(shared.descriptor, X.shape, self.estimators, self.scoring)) as pool:
+                futures = [pool.submit(_run_task, *task) for task in tasks]
+                return [future.result() for future in as_completed(futures)]
+        finally:
+            shared.close()
+
+    @staticmethod
+    def _summarize(runs: List[Dict[str, Any]], holdout: Optional[TimeSeriesFold]) -> Dict[str, Any]:
+        succeeded = [run for run in runs if not run['error']]
+        cv_runs = sorted((run for run in succeeded if 'model' not in run), key=lambda run: run['fold'])
+        cv_scores = [run['test_score'] for run in cv_runs]
+        final = next((run for run in succeeded if 'model' in run), None)
+
+        fit_seconds = sum(run['fit_seconds'] for run in succeeded)
+        predict_seconds = sum(run['predict_seconds'] for run in succeeded)
+        fitted = sum(run['train_samples'] for run in succeeded)
+        predicted = sum(run['train_samples'] + run['test_samples'] for run in succeeded)
+        return {
+            'cv_scores': cv_scores,
+            'cv_mean': float(np.mean(cv_scores)) if cv_scores else 0.0,
+            'cv_std': float(np.std(cv_scores)) if cv_scores else 0.0,
+            'holdout': final,
+            'throughput': {
+                'fit_seconds': fit_seconds,
+                'predict_seconds': predict_seconds,
+                'fit_samples_per_second': fitted / fit_seconds if fit_seconds > 0 else 0.0,
+                'predict_samples_per_second': predicted / predict_seconds if predict_seconds > 0 else 0.0
+            },
+            'errors': [f"fold {run['fold']}: {run['error']}" for run in runs if run['error']]
+        }
@@ -8,18 +8,22 @@ import asyncio
 import logging
 import time
 import threading
+import zlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Tuple
 from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import hashlib
 from collections import OrderedDict
+from pathlib import Path
 import sqlite3
 import pickle
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_NAMESPACE = 'default'
+
 @dataclass
 class CacheEntry:
     """緩存條目"""
@@ -28,6 +32,7 @@ class CacheEntry:
     timestamp: datetime
     access_count: int
     size_bytes: int
+    namespace: str = DEFAULT_NAMESPACE
 
 class DataCacheOptimizer:
     """數據緩存優化器 - 專為AImax系統設計"""
@@ -36,22 +41,36 @@ class DataCacheOptimizer:
         """
         初始化數據緩存優化器
         
+        內存層是按字節預算淘汰的LRU：寫入和移除時即時累計總字節數，淘汰時只彈出最久未使用的條目。
+        每個值只序列化一次，這份（可選壓縮的）字節既用於計量大小，也用於批量寫回SQLite持久層
+        
         Args:
             config_path: 緩存配置文件路徑
         """
         self.config = self._load_config(config_path)
         
-        # 內存緩存
-        self.memory_cache = OrderedDict()
+        # 內存緩存（OrderedDict 尾部為最近使用）
+        self.memory_cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
         self.cache_stats = {
             'hits': 0,
             'misses': 0,
             'evictions': 0,
-            'total_size': 0
+            'total_size': 0,
+            'persistent_writes': 0,
+            'persistent_flushes': 0
         }
+        self.namespace_stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
         
-        # 持久化緩存
+        # 持久化緩存（單一連接；寫入先進入緩衝區，按批次寫回）
+        # _pending_lock 只保護緩衝區且持有時間極短，事件循環線程上的寫入不會等待數據庫事務；
+        # 需要同時持有時先取 _db_lock 再取 _pending_lock
         self.db_path = self.config.get('db_path', 'AImax/data/cache/data_cache.db')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending_writes: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._last_flush = time.monotonic()
         self._init_persistent_cache()
         
         # 並行處理配置
@@ -81,9 +100,18 @@ class DataCacheOptimizer:
                 'cleanup_interval_seconds': 300,  # 清理間隔5分鐘
                 'max_workers': 4,              # 並行工作線程數
                 'enable_persistent_cache': True,
+                'enable_compression': True,    # 序列化結果超過閾值時以zlib壓縮
+                'compression_min_bytes': 4096, # 壓縮閾值
+                'compression_level': 1,        # zlib壓縮級別（1最快）
+                'write_batch_size': 64,        # 持久層每批寫入條目數
+                'write_behind_seconds': 2.0,   # 緩衝寫入的最長延遲
                 'db_path': 'AImax/data/cache/data_cache.db'
             }
     
+    @property
+    def _persistent_enabled(self) -> bool:
+        return self._conn is not None
+    
     def _init_persistent_cache(self):
         """初始化持久化緩存"""
         try:
@@ -91,26 +119,30 @@ class DataCacheOptimizer:
                 return
             
             # 確保目錄存在
-            import os
-            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-            
-            # 創建數據庫表
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS cache_entries (
-                        key TEXT PRIMARY KEY,
-                        data BLOB,
-                        timestamp TEXT,
-                        access_count INTEGER,
-                        size_bytes INTEGER
-                    )
-                ''')
-                conn.commit()
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            
+            # 創建數據庫表（單一連接在線程池與清理線程間共用，由 _db_lock 串行化）
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    data BLOB,
+                    timestamp TEXT,
+                    access_count INTEGER,
+                    size_bytes INTEGER
+                )
+            ''')
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache_entries)")}
+            if 'compressed' not in columns:
+                self._conn.execute("ALTER TABLE cache_entries ADD COLUMN compressed INTEGER DEFAULT 0")
+            self._conn.commit()
             
             logger.info(f"✅ 持久化緩存初始化完成: {self.db_path}")
             
         except Exception as e:
             logger.error(f"❌ 持久化緩存初始化失敗: {e}")
+            self._conn = None
     
     def start_cleanup_service(self):
         """啟動緩存清理服務"""
@@ -151,6 +183,7 @@ class DataCacheOptimizer:
             while self.cleanup_active:
                 self._cleanup_expired_cache()
                 self._cleanup_oversized_cache()
+                self.flush_persistent_cache()
                 time.sleep(interval)
                 
         except Exception as e:
@@ -163,27 +196,25 @@ class DataCacheOptimizer:
             cutoff_time = datetime.now() - timedelta(seconds=ttl_seconds)
             
             # 清理內存緩存
-            expired_keys = []
-            for key, entry in self.memory_cache.items():
-                if entry.timestamp < cutoff_time:
-                    expired_keys.append(key)
-            
-            for key in expired_keys:
-                del self.memory_cache[key]
-                self.cache_stats['evictions'] += 1
+            with self._lock:
+                expired_keys = [key for key, entry in self.memory_cache.items() if entry.timestamp < cutoff_time]
+                for key in expired_keys:
+                    entry = self._remove_entry(key)
+                    self.cache_stats['evictions'] += 1
+                    self._namespace(entry.namespace)['evictions'] += 1
             
             if expired_keys:
                 logger.info(f"🧹 清理過期內存緩存: {len(expired_keys)} 項")
             
             # 清理持久化緩存
-            if self.config.get('enable_persistent_cache', True):
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute(
+            if self._persistent_enabled:
+                with self._db_lock:
+                    cursor = self._conn.execute(
                         'DELETE FROM cache_entries WHERE timestamp < ?',
                         (cutoff_time.isoformat(),)
                     )
                     deleted_count = cursor.rowcount
-                    conn.commit()
+                    self._conn.commit()
                     
                     if deleted_count > 0:
                         logger.info(f"🧹 清理過期持久化緩存: {deleted_count} 項")
@@ -192,45 +223,97 @@ class DataCacheOptimizer:
             logger.error(f"❌ 清理過期緩存失敗: {e}")
     
     def _cleanup_oversized_cache(self):
-        """清理超大緩存"""
+        """清理超大緩存（寫入時已即時淘汰，這裡只在配置被調小後補做）"""
         try:
-            max_size = self.config.get('max_memory_cache_size', 100)
-            
-            # 如果緩存超過限制，移除最少使用的項目
-            while len(self.memory_cache) > max_size:
-                # OrderedDict的第一個項目是最舊的
-                oldest_key = next(iter(self.memory_cache))
-                del self.memory_cache[oldest_key]
-                self.cache_stats['evictions'] += 1
-            
-            # 檢查內存使用
-            total_size_mb = sum(entry.size_bytes for entry in self.memory_cache.values()) / 1024 / 1024
-            max_memory_mb = self.config.get('max_memory_size_mb', 500)
-            
-            if total_size_mb > max_memory_mb:
-                # 移除大型緩存項
-                sorted_entries = sorted(
-                    self.memory_cache.items(),
-                    key=lambda x: x[1].size_bytes,
-                    reverse=True
-                )
-                
-                removed_count = 0
-                for key, entry in sorted_entries:
-                    if total_size_mb <= max_memory_mb:
-                        break
-                    
-                    total_size_mb -= entry.size_bytes / 1024 / 1024
-                    del self.memory_cache[key]
-                    self.cache_stats['evictions'] += 1
-                    removed_count += 1
-                
-                if removed_count > 0:
-                    logger.info(f"🧹 清理大型緩存項: {removed_count} 項")
+            with self._lock:
+                removed_count = self._enforce_limits()
+            
+            if removed_count > 0:
+                logger.info(f"🧹 清理超限緩存項: {removed_count} 項")
             
         except Exception as e:
             logger.error(f"❌ 清理超大緩存失敗: {e}")
     
+    def _max_memory_bytes(self) -> int:
+        return int(self.config.get('max_memory_size_mb', 500) * 1024 * 1024)
+    
+    def _remove_entry(self, cache_key: str) -> Optional[CacheEntry]:
+        """移除條目並扣減字節計數（調用方持有 _lock）"""
+        entry = self.memory_cache.pop(cache_key, None)
+        if entry is not None:
+            self.cache_stats['total_size'] -= entry.size_bytes
+        return entry
+    
+    def _enforce_limits(self) -> int:
+        """從最久未使用的一端淘汰，直到條目數與字節數都在預算內（調用方持有 _lock）"""
+        max_entries = self.config.get('max_memory_cache_size', 100)
+        max_bytes = self._max_memory_bytes()
+        removed_count = 0
+        while self.memory_cache and (len(self.memory_cache) > max_entries
+                                     or self.cache_stats['total_size'] > max_bytes):
+            _, entry = self.memory_cache.popitem(last=False)
+            self.cache_stats['total_size'] -= entry.size_bytes
+            self.cache_stats['evictions'] += 1
+            self._namespace(entry.namespace)['evictions'] += 1
+            removed_count += 1
+        return removed_count
+    
+    def _store_in_memory(self, entry: CacheEntry):
+        """寫入內存層；單個值超過整個預算時不放入內存"""
+        with self._lock:
+            self._remove_entry(entry.key)
+            if entry.size_bytes > self._max_memory_bytes():
+                logger.debug(f"⚠️ 緩存值超過內存預算，只寫入持久層: {entry.key}")
+                return
+            self.memory_cache[entry.key] = entry
+            self.cache_stats['total_size'] += entry.size_bytes
+            self._enforce_limits()
+    
+    def _serialize(self, data: Any) -> Tuple[bytes, int, bool]:
+        """序列化一次，返回 (寫入持久層的字節, 未壓縮大小, 是否壓縮)"""
+        raw = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.config.get('enable_compression', True) and len(raw) >= self.config.get('compression_min_bytes', 4096):
+            packed = zlib.compress(raw, self.config.get('compression_level', 1))
+            if len(packed) < len(raw):
+                return packed, len(raw), True
+        return raw, len(raw), False
+    
+    @staticmethod
+    def _deserialize(blob: bytes, compressed: bool) -> Any:
+        return pickle.loads(zlib.decompress(blob) if compressed else blob)
+    
+    @staticmethod
+    def namespace_of(cache_key: str) -> str:
+        """由 get_cache_key 生成的鍵解析命名空間（數據類型）"""
+        if cache_key.startswith('cache_') and cache_key.count('_') >= 2:
+            return cache_key[len('cache_'):cache_key.rindex('_')]
+        return DEFAULT_NAMESPACE
+    
+    def _namespace(self, namespace: str) -> Dict[str, Any]:
+        """命名空間的統計計數（調用方持有 _lock）"""
+        stats = self.namespace_stats.get(namespace)
+        if stats is None:
+            stats = self.namespace_stats[namespace] = {
+                'hits': 0, 'memory_hits': 0, 'persistent_hits': 0, 'misses': 0,
+                'stores': 0, 'evictions': 0, 'stored_bytes': 0, 'persisted_bytes': 0,
+                'get_seconds': 0.0, 'max_get_seconds': 0.0, 'set_seconds': 0.0
+            }
+        return stats
+    
+    def _record_get(self, namespace: str, outcome: str, seconds: float):
+        """記錄一次讀取（outcome 為 memory / persistent / miss）"""
+        with self._lock:
+            stats = self._namespace(namespace)
+            if outcome == 'miss':
+                self.cache_stats['misses'] += 1
+                stats['misses'] += 1
+            else:
+                self.cache_stats['hits'] += 1
+                stats['hits'] += 1
+                stats[f'{outcome}_hits'] += 1
+            stats['get_seconds'] += seconds
+            stats['max_get_seconds'] = max(stats['max_get_seconds'], seconds)
+    
     def get_cache_key(self, data_type: str, params: Dict[str, Any]) -> str:
         """生成緩存鍵"""
         try:
@@ -245,106 +328,121 @@ class DataCacheOptimizer:
             logger.error(f"❌ 生成緩存鍵失敗: {e}")
             return f"cache_{data_type}_{int(time.time())}"
     
-    async def get_cached_data(self, cache_key: str) -> Optional[Any]:
+    async def get_cached_data(self, cache_key: str, namespace: Optional[str] = None) -> Optional[Any]:
         """獲取緩存數據"""
+        started = time.perf_counter()
+        namespace = namespace or self.namespace_of(cache_key)
         try:
+            ttl = timedelta(seconds=self.config.get('cache_ttl_seconds', 3600))
+            
             # 首先檢查內存緩存
-            if cache_key in self.memory_cache:
-                entry = self.memory_cache[cache_key]
-                
-                # 檢查是否過期
-                ttl_seconds = self.config.get('cache_ttl_seconds', 3600)
-                if datetime.now() - entry.timestamp < timedelta(seconds=ttl_seconds):
-                    # 更新訪問統計
-                    entry.access_count += 1
-                    # 移動到末尾（LRU）
-                    self.memory_cache.move_to_end(cache_key)
-                    self.cache_stats['hits'] += 1
-                    
-                    logger.debug(f"🎯 內存緩存命中: {cache_key}")
-                    return entry.data
-                else:
-                    # 過期，移除
-                    del self.memory_cache[cache_key]
-            
-            # 檢查持久化緩存
-            if self.config.get('enable_persistent_cache', True):
-                persistent_data = await self._get_persistent_cache(cache_key)
-                if persistent_data is not None:
-                    # 加載到內存緩存
-                    await self.set_cached_data(cache_key, persistent_data)
-                    self.cache_stats['hits'] += 1
+            with self._lock:
+                entry = self.memory_cache.get(cache_key)
+                if entry is not None:
+                    if datetime.now() - entry.timestamp < ttl:
+                        # 更新訪問統計並移動到末尾（LRU）
+                        entry.access_count += 1
+                        self.memory_cache.move_to_end(cache_key)
+                    else:
+                        # 過期，移除
+                        self._remove_entry(cache_key)
+                        entry = None
+            
+            if entry is not None:
+                self._record_get(namespace, 'memory', time.perf_counter() - started)
+                logger.debug(f"🎯 內存緩存命中: {cache_key}")
+                return entry.data
+            
+            # 檢查持久化緩存（含尚未寫回的緩衝區）
+            if self._persistent_enabled:
+                record = await self._get_persistent_cache(cache_key)
+                if record is not None:
+                    data, timestamp, access_count, size_bytes = record
+                    # 加載到內存緩存：保留原寫入時間（不延長有效期），也不重新序列化寫回
+                    self._store_in_memory(CacheEntry(cache_key, data, timestamp, access_count + 1,
+                                                     size_bytes, namespace))
+                    self._record_get(namespace, 'persistent', time.perf_counter() - started)
                     
                     logger.debug(f"🎯 持久化緩存命中: {cache_key}")
-                    return persistent_data
+                    return data
             
             # 緩存未命中
-            self.cache_stats['misses'] += 1
+            self._record_get(namespace, 'miss', time.perf_counter() - started)
             logger.debug(f"❌ 緩存未命中: {cache_key}")
             return None
             
         except Exception as e:
             logger.error(f"❌ 獲取緩存數據失敗: {e}")
-            self.cache_stats['misses'] += 1
+            self._record_get(namespace, 'miss', time.perf_counter() - started)
             return None
     
-    async def set_cached_data(self, cache_key: str, data: Any):
+    async def set_cached_data(self, cache_key: str, data: Any, namespace: Optional[str] = None):
         """設置緩存數據"""
+        started = time.perf_counter()
+        namespace = namespace or self.namespace_of(cache_key)
         try:
-            # 計算數據大小
-            data_bytes = pickle.dumps(data)
-            size_bytes = len(data_bytes)
+            # 只序列化一次：未壓縮大小用於內存計量，（壓縮後的）字節寫入持久層
+            blob, size_bytes, compressed = self._serialize(data)
             
-            # 創建緩存條目
+            # 創建緩存條目並存儲到內存緩存
             entry = CacheEntry(
                 key=cache_key,
                 data=data,
                 timestamp=datetime.now(),
                 access_count=1,
-                size_bytes=size_bytes
+                size_bytes=size_bytes,
+                namespace=namespace
             )
+            self._store_in_memory(entry)
             
-            # 存儲到內存緩存
-            self.memory_cache[cache_key] = entry
-            self.memory_cache.move_to_end(cache_key)  # 移動到末尾
-            
-            # 更新統計
-            self.cache_stats['total_size'] += size_bytes
+            # 存儲到持久化緩存（先寫入緩衝區，再按批次寫回）
+            if self._persistent_enabled:
+                await self._set_persistent_cache(cache_key, blob, compressed, entry)
             
-            # 存儲到持久化緩存
-            if self.config.get('enable_persistent_cache', True):
-                await self._set_persistent_cache(cache_key, data, entry)
+            with self._lock:
+                stats = self._namespace(namespace)
+                stats['stores'] += 1
+                stats['stored_bytes'] += size_bytes
+                stats['persisted_bytes'] += len(blob)
+                stats['set_seconds'] += time.perf_counter() - started
             
-            logger.debug(f"💾 緩存數據已存儲: {cache_key} ({size_bytes} bytes)")
+            logger.debug(f"💾 緩存數據已存儲: {cache_key} ({size_bytes} bytes, 持久層 {len(blob)} bytes)")
             
         except Exception as e:
             logger.error(f"❌ 設置緩存數據失敗: {e}")
     
-    async def _get_persistent_cache(self, cache_key: str) -> Optional[Any]:
-        """從持久化緩存獲取數據"""
+    async def _get_persistent_cache(self, cache_key: str) -> Optional[Tuple[Any, datetime, int, int]]:
+        """從持久化緩存獲取數據，返回 (數據, 寫入時間, 訪問次數, 未壓縮大小)"""
         try:
+            ttl = timedelta(seconds=self.config.get('cache_ttl_seconds', 3600))
+            
             def get_from_db():
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute(
-                        'SELECT data, timestamp FROM cache_entries WHERE key = ?',
-                        (cache_key,)
-                    )
-                    row = cursor.fetchone()
+                with self._db_lock:
+                    with self._pending_lock:
+                        pending = self._pending_writes.get(cache_key)
+                    if pending is not None:
+                        row = pending[1:]
+                    else:
+                        row = self._conn.execute(
+                            'SELECT data, timestamp, access_count, size_bytes, compressed '
+                            'FROM cache_entries WHERE key = ?',
+                            (cache_key,)
+                        ).fetchone()
+                        if row is None:
+                            return None
+                    data_blob, timestamp_str, access_count, size_bytes, compressed = row
+                    timestamp = datetime.fromisoformat(timestamp_str)
                     
-                    if row:
-                        data_blob, timestamp_str = row
-                        timestamp = datetime.fromisoformat(timestamp_str)
-                        
-                        # 檢查是否過期
-                        ttl_seconds = self.config.get('cache_ttl_seconds', 3600)
-                        if datetime.now() - timestamp < timedelta(seconds=ttl_seconds):
-                            return pickle.loads(data_blob)
-                        else:
-                            # 過期，刪除
-                            conn.execute('DELETE FROM cache_entries WHERE key = ?', (cache_key,))
-                            conn.commit()
-                    
-                    return None
+                    # 檢查是否過期
+                    if datetime.now() - timestamp >= ttl:
+                        # 過期，刪除
+                        with self._pending_lock:
+                            self._pending_writes.pop(cache_key, None)
+                        self._conn.execute('DELETE FROM cache_entries WHERE key = ?', (cache_key,))
+                        self._conn.commit()
+                        return None
+                
+                return self._deserialize(data_blob, bool(compressed)), timestamp, access_count or 0, size_bytes
             
             # 在線程池中執行數據庫操作
             loop = asyncio.get_event_loop()
@@ -354,32 +452,68 @@ class DataCacheOptimizer:
             logger.error(f"❌ 從持久化緩存獲取數據失敗: {e}")
             return None
     
-    async def _set_persistent_cache(self, cache_key: str, data: Any, entry: CacheEntry):
-        """設置持久化緩存"""
+    async def _set_persistent_cache(self, cache_key: str, blob: bytes, compressed: bool, entry: CacheEntry):
+        """設置持久化緩存（寫入緩衝區，達到批次大小或延遲上限時批量寫回）"""
         try:
-            def set_to_db():
-                data_blob = pickle.dumps(data)
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute('''
-                        INSERT OR REPLACE INTO cache_entries 
-                        (key, data, timestamp, access_count, size_bytes)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (
-                        cache_key,
-                        data_blob,
-                        entry.timestamp.isoformat(),
-                        entry.access_count,
-                        entry.size_bytes
-                    ))
-                    conn.commit()
+            with self._pending_lock:
+                self._pending_writes.pop(cache_key, None)
+                self._pending_writes[cache_key] = (
+                    cache_key,
+                    blob,
+                    entry.timestamp.isoformat(),
+                    entry.access_count,
+                    entry.size_bytes,
+                    int(compressed)
+                )
+                due = (len(self._pending_writes) >= self.config.get('write_batch_size', 64)
+                       or time.monotonic() - self._last_flush >= self.config.get('write_behind_seconds', 2.0))
             
-            # 在線程池中執行數據庫操作
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(self.thread_pool, set_to_db)
+            if due:
+                # 在線程池中執行數據庫操作
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(self.thread_pool, self.flush_persistent_cache)
             
         except Exception as e:
             logger.error(f"❌ 設置持久化緩存失敗: {e}")
     
+    def flush_persistent_cache(self) -> int:
+        """
+        把緩衝區中的寫入以單個事務批量寫回SQLite，返回寫入條目數
+        
+        緩衝區在 _pending_lock 下整體換出後立即釋放該鎖，事務期間新的寫入照常進入新緩衝區；
+        寫回失敗時把未被更新的條目放回緩衝區
+        """
+        if not self._persistent_enabled:
+            return 0
+        with self._db_lock:
+            with self._pending_lock:
+                self._last_flush = time.monotonic()
+                if not self._pending_writes:
+                    return 0
+                batch, self._pending_writes = self._pending_writes, OrderedDict()
+            
+            try:
+                self._conn.executemany('''
+                    INSERT OR REPLACE INTO cache_entries
+                    (key, data, timestamp, access_count, size_bytes, compressed)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', list(batch.values()))
+                self._conn.commit()
+            except Exception as e:
+                logger.error(f"❌ 批量寫入持久化緩存失敗: {e}")
+                with self._pending_lock:
+                    for key, row in batch.items():
+                        self._pending_writes.setdefault(key, row)
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+                return 0
+        
+        with self._lock:
+            self.cache_stats['persistent_writes'] += len(batch)
+            self.cache_stats['persistent_flushes'] += 1
+        logger.debug(f"💾 持久化緩存批量寫入: {len(batch)} 項")
+        return len(batch)
+    
     async def parallel_data_fetch(self, fetch_tasks: List[Callable]) -> List[Any]:
         """並行數據獲取"""
         try:
@@ -425,7 +559,7 @@ class DataCacheOptimizer:
                 # 在線程池中執行同步函數
                 loop = asyncio.get_event_loop()
                 return await loop.run_in_executor(self.thread_pool, fetch_func)
-                
+            
         except Exception as e:
             logger.error(f"❌ 執行獲取任務 {task_id} 失敗: {e}")
             raise
@@ -438,7 +572,7 @@ class DataCacheOptimizer:
             cache_key = self.get_cache_key(data_type, params)
             
             # 嘗試從緩存獲取
-            cached_data = await self.get_cached_data(cache_key)
+            cached_data = await self.get_cached_data(cache_key, namespace=data_type)
             if cached_data is not None:
                 logger.debug(f"🎯 使用緩存數據: {data_type}")
                 return cached_data
@@ -453,7 +587,7 @@ class DataCacheOptimizer:
                 new_data = await loop.run_in_executor(self.thread_pool, fetch_func)
             
             # 存儲到緩存
-            await self.set_cached_data(cache_key, new_data)
+            await self.set_cached_data(cache_key, new_data, namespace=data_type)
             
             return new_data
             
@@ -464,58 +598,109 @@ class DataCacheOptimizer:
     def get_cache_stats(self) -> Dict[str, Any]:
         """獲取緩存統計信息"""
         try:
-            total_requests = self.cache_stats['hits'] + self.cache_stats['misses']
-            hit_rate = self.cache_stats['hits'] / max(1, total_requests)
-            
-            # 計算內存使用
-            memory_usage_mb = sum(entry.size_bytes for entry in self.memory_cache.values()) / 1024 / 1024
-            
-            return {
-                'cache_hits': self.cache_stats['hits'],
-                'cache_misses': self.cache_stats['misses'],
-                'hit_rate': hit_rate,
-                'evictions': self.cache_stats['evictions'],
-                'memory_cache_size': len(self.memory_cache),
-                'memory_usage_mb': memory_usage_mb,
-                'max_memory_cache_size': self.config.get('max_memory_cache_size', 100),
-                'max_memory_size_mb': self.config.get('max_memory_size_mb', 500),
-                'cleanup_active': self.cleanup_active,
-                'persistent_cache_enabled': self.config.get('enable_persistent_cache', True)
-            }
+            with self._lock:
+                total_requests = self.cache_stats['hits'] + self.cache_stats['misses']
+                hit_rate = self.cache_stats['hits'] / max(1, total_requests)
+                
+                return {
+                    'cache_hits': self.cache_stats['hits'],
+                    'cache_misses': self.cache_stats['misses'],
+                    'hit_rate': hit_rate,
+                    'evictions': self.cache_stats['evictions'],
+                    'memory_cache_size': len(self.memory_cache),
+                    'memory_usage_mb': self.cache_stats['total_size'] / 1024 / 1024,
+                    'max_memory_cache_size': self.config.get('max_memory_cache_size', 100),
+                    'max_memory_size_mb': self.config.get('max_memory_size_mb', 500),
+                    'cleanup_active': self.cleanup_active,
+                    'persistent_cache_enabled': self._persistent_enabled,
+                    'pending_writes': len(self._pending_writes),
+                    'persistent_writes': self.cache_stats['persistent_writes'],
+                    'persistent_flushes': self.cache_stats['persistent_flushes'],
+                    'namespaces': self.get_namespace_stats()
+                }
             
         except Exception as e:
             logger.error(f"❌ 獲取緩存統計失敗: {e}")
             return {'error': str(e)}
     
+    def get_namespace_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按命名空間（數據類型）統計命中率、讀寫延遲與壓縮率"""
+        with self._lock:
+            result = {}
+            for namespace, stats in self.namespace_stats.items():
+                requests = stats['hits'] + stats['misses']
+                result[namespace] = {
+                    'hits': stats['hits'],
+                    'memory_hits': stats['memory_hits'],
+                    'persistent_hits': stats['persistent_hits'],
+                    'misses': stats['misses'],
+                    'hit_rate': stats['hits'] / max(1, requests),
+                    'stores': stats['stores'],
+                    'evictions': stats['evictions'],
+                    'avg_get_ms': stats['get_seconds'] * 1000 / max(1, requests),
+                    'max_get_ms': stats['max_get_seconds'] * 1000,
+                    'avg_set_ms': stats['set_seconds'] * 1000 / max(1, stats['stores']),
+                    'compression_ratio': stats['persisted_bytes'] / max(1, stats['stored_bytes'])
+                }
+            return result
+    
+    def get_performance_stats(self) -> Dict[str, Any]:
+        """監控面板使用的緩存性能摘要（命中率為百分比）"""
+        stats = self.get_cache_stats()
+        if 'error' in stats:
+            return stats
+        return {
+            'hit_rate': stats['hit_rate'] * 100,
+            'memory_usage_mb': stats['memory_usage_mb'],
+            'memory_cache_size': stats['memory_cache_size'],
+            'evictions': stats['evictions'],
+            'pending_writes': stats['pending_writes'],
+            'namespaces': stats['namespaces']
+        }
+    
     def clear_cache(self, cache_type: str = 'all'):
         """清空緩存"""
         try:
             if cache_type in ['all', 'memory']:
-                cleared_count = len(self.memory_cache)
-                self.memory_cache.clear()
-                self.cache_stats['evictions'] += cleared_count
+                with self._lock:
+                    cleared_count = len(self.memory_cache)
+                    for entry in self.memory_cache.values():
+                        self._namespace(entry.namespace)['evictions'] += 1
+                    self.memory_cache.clear()
+                    self.cache_stats['total_size'] = 0
+                    self.cache_stats['evictions'] += cleared_count
                 logger.info(f"🧹 清空內存緩存: {cleared_count} 項")
             
-            if cache_type in ['all', 'persistent'] and self.config.get('enable_persistent_cache', True):
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute('DELETE FROM cache_entries')
+            if cache_type in ['all', 'persistent'] and self._persistent_enabled:
+                with self._db_lock:
+                    with self._pending_lock:
+                        self._pending_writes.clear()
+                    cursor = self._conn.execute('DELETE FROM cache_entries')
                     deleted_count = cursor.rowcount
-                    conn.commit()
-                    logger.info(f"🧹 清空持久化緩存: {deleted_count} 項")
+                    self._conn.commit()
+                logger.info(f"🧹 清空持久化緩存: {deleted_count} 項")
             
         except Exception as e:
             logger.error(f"❌ 清空緩存失敗: {e}")
     
+    def close(self):
+        """寫回緩衝區並關閉持久化連接"""
+        self.stop_cleanup_service()
+        self.flush_persistent_cache()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
     def __del__(self):
         """清理資源"""
         try:
-            self.stop_cleanup_service()
+            self.close()
             if hasattr(self, 'thread_pool'):
                 self.thread_pool.shutdown(wait=False)
         except:
             pass
 
-
 def create_data_cache_optimizer() -> DataCacheOptimizer:
     """創建數據緩存優化器實例"""
     return DataCacheOptimizer()
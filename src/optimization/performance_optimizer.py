@@ -14,11 +14,17 @@ from typing import Dict, List, Optional, Any, Callable
 from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import json
+import hashlib
 import psutil
 import numpy as np
 from collections import deque
 import queue
 
+try:
+    from ..ai.llm_response_cache import LLMResponseCache, get_llm_response_cache, quantize_market_state
+except ImportError:
+    from ai.llm_response_cache import LLMResponseCache, get_llm_response_cache, quantize_market_state
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -71,6 +77,16 @@ class AIPerformanceOptimizer:
         self.cache_misses = 0
         self.cache_max_size = self.config.get('cache_max_size', 100)
         
+        # 真實LLM回應緩存（與 EnhancedAIManager 共用同一實例）
+        self.llm_response_cache: Optional[LLMResponseCache] = None
+        if self.config.get('llm_cache_enabled', True):
+            self.llm_response_cache = get_llm_response_cache(
+                self.config.get('llm_cache_db_path', 'data/cache/llm_response_cache.db'),
+                ttl_seconds=self.config.get('llm_cache_ttl_seconds', 300),
+                max_entries=self.config.get('llm_cache_max_entries', 1000),
+                max_bytes=int(self.config.get('llm_cache_max_mb', 8) * 1024 * 1024)
+            )
+        
         # 性能監控
         self.monitoring_active = False
         self.monitor_thread = None
@@ -103,6 +119,11 @@ class AIPerformanceOptimizer:
                 },
                 'parallel_ai_enabled': True,
                 'ai_cache_enabled': True,
+                'llm_cache_enabled': True,
+                'llm_cache_db_path': 'data/cache/llm_response_cache.db',
+                'llm_cache_ttl_seconds': 300,
+                'llm_cache_max_entries': 1000,
+                'llm_cache_max_mb': 8,
                 'preload_models': True
             }
     
@@ -120,6 +141,9 @@ class AIPerformanceOptimizer:
         try:
             logger.info("🚀 開始AI推理並行優化...")
             
+            if getattr(ai_manager, 'response_cache', None) is not None:
+                self.attach_llm_cache(ai_manager.response_cache)
+            
             # 測量原始性能（順序執行）
             start_time = time.time()
             try:
@@ -311,26 +335,20 @@ class AIPerformanceOptimizer:
             }
     
     def _generate_cache_key(self, market_data: Dict[str, Any]) -> str:
-        """生成緩存鍵"""
+        """生成緩存鍵（與LLM回應緩存使用相同的指標量化規則）"""
         try:
-            # 基於關鍵市場數據生成緩存鍵
-            key_data = {
-                'price': market_data.get('current_price', 0),
-                'change': market_data.get('price_change_1m', 0),
-                'volume': market_data.get('volume_ratio', 1.0)
-            }
-            
-            # 簡化鍵以提高緩存命中率
-            price_bucket = int(key_data['price'] / 10000) * 10000  # 價格區間
-            change_bucket = round(key_data['change'], 1)  # 變化率精度
-            volume_bucket = round(key_data['volume'], 1)  # 成交量比率精度
-            
-            return f"ai_cache_{price_bucket}_{change_bucket}_{volume_bucket}"
+            state = quantize_market_state(market_data)
+            digest = hashlib.sha256(json.dumps(state).encode('utf-8')).hexdigest()[:16]
+            return f"ai_cache_{digest}"
             
         except Exception as e:
             logger.error(f"❌ 生成緩存鍵失敗: {e}")
             return f"ai_cache_default_{int(time.time())}"
     
+    def attach_llm_cache(self, cache: LLMResponseCache):
+        """接入AI管理器實際使用的LLM回應緩存，使其命中率出現在性能報告中"""
+        self.llm_response_cache = cache
+    
     def _update_cache(self, cache_key: str, results: List[Dict[str, Any]]):
         """更新AI分析緩存"""
         try:
@@ -506,6 +524,11 @@ class AIPerformanceOptimizer:
                 self._cleanup_cache()
                 optimizations_applied.append(f"清理AI緩存: {cache_size_before} → {len(self.ai_cache)}")
             
+            if self.llm_response_cache is not None:
+                expired = self.llm_response_cache.purge_expired()
+                if expired:
+                    optimizations_applied.append(f"清理過期LLM回應: {expired} 條")
+            
             # 2. 清理性能指標歷史
             if len(self.metrics_history) > 500:
                 metrics_before = len(self.metrics_history)
@@ -611,7 +634,9 @@ class AIPerformanceOptimizer:
                     'cache_hits': self.cache_hits,
                     'cache_misses': self.cache_misses,
                     'hit_rate': cache_hit_rate,
-                    'parallel_enabled': self.config.get('parallel_ai_enabled', True)
+                    'parallel_enabled': self.config.get('parallel_ai_enabled', True),
+                    'llm_response_cache': (self.llm_response_cache.get_stats()
+                                           if self.llm_response_cache is not None else None)
                 },
                 'system_resources': {
                     'current_memory_mb': current_memory,
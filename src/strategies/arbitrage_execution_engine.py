@@ -9,11 +9,16 @@ import logging
 import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 import json
 import time
 
+try:
+    from .arbitrage_graph import split_pair
+except ImportError:
+    from arbitrage_graph import split_pair
+
 logger = logging.getLogger(__name__)
 
 class ExecutionStatus(Enum):
@@ -40,6 +45,11 @@ class ExecutionStrategy(Enum):
     TWAP = "twap"               # 時間加權平均價格
     VWAP = "vwap"               # 成交量加權平均價格
 
+class LegExecutionMode(Enum):
+    """套利各腿的提交方式"""
+    SEQUENTIAL = "sequential"    # 逐腿順序提交
+    CONCURRENT = "concurrent"    # 按資金依賴並發提交
+
 @dataclass
 class OrderRequest:
     """訂單請求"""
@@ -55,6 +65,7 @@ class OrderRequest:
     execution_strategy: ExecutionStrategy = ExecutionStrategy.ADAPTIVE
     max_slippage: float = 0.005  # 最大滑點 0.5%
     timeout: int = 30  # 超時時間(秒)
+    reference_price: Optional[float] = None  # 機會發現時的參考價格（市價單也保留）
     
 @dataclass
 class OrderResult:
@@ -71,6 +82,16 @@ class OrderResult:
     error_message: Optional[str] = None
     exchange_order_id: Optional[str] = None
     timestamp: datetime = field(default_factory=datetime.now)
+    submitted_at: Optional[float] = None   # 提交時間 (perf_counter)
+    filled_at: Optional[float] = None      # 成交回報時間 (perf_counter)
+    fill_latency: float = 0.0              # 提交到成交的延遲(秒)
+    
+    @property
+    def fill_ratio(self) -> float:
+        """成交數量佔請求數量的比例"""
+        if self.request.quantity <= 0:
+            return 1.0 if self.status == ExecutionStatus.COMPLETED else 0.0
+        return self.executed_quantity / self.request.quantity
     
 @dataclass
 class ArbitrageExecution:
@@ -86,6 +107,9 @@ class ArbitrageExecution:
     total_fees: float = 0.0
     execution_results: List[OrderResult] = field(default_factory=list)
     error_message: Optional[str] = None
+    leg_mode: LegExecutionMode = LegExecutionMode.SEQUENTIAL
+    leg_dependencies: List[List[int]] = field(default_factory=list)  # 每腿依賴的前序腿
+    exposure_time: float = 0.0  # 首腿成交到末腿成交的暴露時間(秒)
 
 @dataclass
 class ExecutionConfig:
@@ -110,6 +134,11 @@ class ExecutionConfig:
     monitoring_interval: float = 0.1  # 監控間隔(秒)
     max_retry_attempts: int = 3
     retry_delay: float = 1.0
+    
+    # 多腿執行
+    leg_execution_mode: LegExecutionMode = LegExecutionMode.SEQUENTIAL
+    inter_order_delay: float = 0.1    # 順序模式下的訂單間隔(秒)
+    min_fill_ratio: float = 0.5       # 低於此成交比例視為該腿失敗
 
 class ArbitrageExecutionEngine:
     """套利執行引擎"""
@@ -133,7 +162,9 @@ class ArbitrageExecutionEngine:
             'total_fees': 0.0,
             'avg_execution_time': 0.0,
             'success_rate': 0.0,
-            'avg_slippage': 0.0
+            'avg_slippage': 0.0,
+            'avg_leg_latency': 0.0,
+            'avg_exposure_time': 0.0
         }
         
         # 路由和優化
@@ -141,6 +172,10 @@ class ArbitrageExecutionEngine:
         self.exchange_fees: Dict[str, float] = {}     # 交易所手續費
         self.market_conditions: Dict[str, Dict] = {}  # 市場條件
         
+        # 交易所接入（未設置時使用內置模擬執行）與各交易所幣種餘額
+        self.exchange_client = None
+        self.balances: Optional[Dict[str, Dict[str, float]]] = None
+        
         # 監控狀態
         self.is_running = False
         
@@ -148,6 +183,16 @@ class ArbitrageExecutionEngine:
         logger.info(f"   默認策略: {config.default_strategy.value}")
         logger.info(f"   最大並發: {config.max_concurrent_executions}")
         logger.info(f"   智能路由: {'啟用' if config.enable_smart_routing else '禁用'}")
+        logger.info(f"   多腿執行: {config.leg_execution_mode.value}")
+    
+    def set_exchange_client(self, exchange_client):
+        """設置下單客戶端（需提供 async submit_order(order)，可選 async cancel_order(order_id)）"""
+        self.exchange_client = exchange_client
+        logger.info("🔌 套利執行引擎已連接交易所客戶端")
+    
+    def set_balances(self, balances: Dict[str, Dict[str, float]]):
+        """設置各交易所可用餘額 {exchange: {currency: amount}}，用於判斷哪些腿可以並發提交"""
+        self.balances = {exchange: dict(amounts) for exchange, amounts in balances.items()}
     
     async def start(self):
         """啟動執行引擎"""
@@ -185,7 +230,8 @@ class ArbitrageExecutionEngine:
         logger.info("✅ 套利執行引擎已停止")
     
     async def execute_arbitrage(self, opportunity_id: str, execution_path: List[Dict[str, Any]], 
-                              strategy: ExecutionStrategy = None) -> str:
+                              strategy: ExecutionStrategy = None,
+                              leg_mode: Optional[LegExecutionMode] = None) -> str:
         """執行套利交易"""
         try:
             execution_id = f"exec_{opportunity_id}_{int(time.time() * 1000)}"
@@ -193,6 +239,8 @@ class ArbitrageExecutionEngine:
             # 使用默認策略
             if strategy is None:
                 strategy = self.config.default_strategy
+            if leg_mode is None:
+                leg_mode = self.config.leg_execution_mode
             
             logger.info(f"🚀 開始執行套利: {execution_id}")
             logger.info(f"   機會ID: {opportunity_id}")
@@ -212,7 +260,8 @@ class ArbitrageExecutionEngine:
                 opportunity_id=opportunity_id,
                 strategy=strategy,
                 orders=orders,
-                start_time=datetime.now()
+                start_time=datetime.now(),
+                leg_mode=leg_mode
             )
             
             # 添加到活躍執行
@@ -235,7 +284,11 @@ class ArbitrageExecutionEngine:
             logger.info(f"⚡ 開始異步執行套利: {execution.execution_id}")
             
             # 執行所有訂單
-            success = await self._execute_orders_sequence(execution)
+            if execution.leg_mode == LegExecutionMode.CONCURRENT:
+                success = await self._execute_orders_concurrent(execution)
+            else:
+                success = await self._execute_orders_sequence(execution)
+            execution.exposure_time = self._calculate_exposure_time(execution.execution_results)
             
             # 更新執行狀態
             execution.end_time = datetime.now()
@@ -317,7 +370,8 @@ class ArbitrageExecutionEngine:
                     price=price if order_type == OrderType.LIMIT else None,
                     execution_strategy=strategy,
                     max_slippage=self.config.max_slippage,
-                    timeout=self.config.order_timeout
+                    timeout=self.config.order_timeout,
+                    reference_price=step.get('price') or None
                 )
                 
                 orders.append(order)
@@ -406,7 +460,7 @@ class ArbitrageExecutionEngine:
                 
                 # 訂單間延遲 (避免過快執行)
                 if i < len(execution.orders) - 1:
-                    await asyncio.sleep(0.1)
+                    await asyncio.sleep(self.config.inter_order_delay)
             
             logger.info(f"✅ 所有訂單執行完成")
             return True
@@ -416,6 +470,100 @@ class ArbitrageExecutionEngine:
             execution.error_message = str(e)
             return False
     
+    async def _execute_orders_concurrent(self, execution: ArbitrageExecution) -> bool:
+        """
+        按資金依賴並發執行訂單
+        
+        無依賴的腿同時提交；依賴前序腿產出資金的腿在前序腿成交後立即提交，
+        數量按前序腿的成交比例縮放。任一腿失敗時未提交的腿取消、掛單中的腿撤單，
+        已成交的腿以市價反向對沖。
+        """
+        orders = execution.orders
+        dependencies = build_leg_dependencies(orders, self.balances)
+        execution.leg_dependencies = dependencies
+        results: List[Optional[OrderResult]] = [None] * len(orders)
+        done = [asyncio.Event() for _ in orders]
+        in_flight: Dict[int, OrderRequest] = {}
+        failure: List[str] = []
+        
+        logger.info(f"📋 並發執行 {len(orders)} 個訂單，依賴: {dependencies}")
+        
+        async def run_leg(index: int):
+            order = orders[index]
+            try:
+                for parent in dependencies[index]:
+                    await done[parent].wait()
+                
+                if failure:
+                    results[index] = self._cancelled_result(order, f"其他腿失敗，取消提交: {failure[0]}")
+                    return
+                
+                # 相對原始數量的成交比例沿依賴鏈累積
+                ratio = min((results[parent].executed_quantity / orders[parent].quantity
+                             for parent in dependencies[index] if orders[parent].quantity > 0), default=1.0)
+                if ratio < 1.0:
+                    order = replace(order, quantity=order.quantity * ratio)
+                
+                in_flight[index] = order
+                result = await self._execute_single_order(order)
+                in_flight.pop(index, None)
+                
+                if result.status == ExecutionStatus.COMPLETED and result.fill_ratio < self.config.min_fill_ratio:
+                    result.status = ExecutionStatus.FAILED
+                    result.error_message = f"成交比例過低: {result.fill_ratio:.1%}"
+                results[index] = result
+                
+                if result.status != ExecutionStatus.COMPLETED and not failure:
+                    failure.append(f"{order.pair} {order.action}: {result.error_message}")
+                    logger.error(f"   ❌ 訂單執行失敗: {result.error_message}")
+                    await self._cancel_in_flight_orders(in_flight)
+                    
+            except Exception as e:
+                results[index] = self._cancelled_result(order, str(e), ExecutionStatus.FAILED)
+                if not failure:
+                    failure.append(str(e))
+                    await self._cancel_in_flight_orders(in_flight)
+            finally:
+                done[index].set()
+        
+        await asyncio.gather(*(run_leg(i) for i in range(len(orders))))
+        execution.execution_results = [result for result in results if result is not None]
+        
+        if failure:
+            execution.error_message = f"關鍵訂單執行失敗: {failure[0]}"
+            filled = [result for result in execution.execution_results if result.executed_quantity > 0]
+            if filled:
+                await self._rollback_executed_orders(filled)
+            return False
+        
+        logger.info(f"✅ 所有訂單執行完成，暴露時間: {self._calculate_exposure_time(execution.execution_results) * 1000:.1f} ms")
+        return True
+    
+    async def _cancel_in_flight_orders(self, in_flight: Dict[int, OrderRequest]):
+        """撤銷仍在掛單中的訂單（交易所客戶端支持撤單時）"""
+        cancel = getattr(self.exchange_client, 'cancel_order', None)
+        if cancel is None:
+            return
+        for order in list(in_flight.values()):
+            try:
+                if await cancel(order.order_id):
+                    logger.info(f"   🚫 撤銷掛單: {order.order_id}")
+            except Exception as e:
+                logger.error(f"   ❌ 撤銷訂單失敗 {order.order_id}: {e}")
+    
+    def _cancelled_result(self, order: OrderRequest, reason: str,
+                          status: ExecutionStatus = ExecutionStatus.CANCELLED) -> OrderResult:
+        """未提交即取消的訂單結果"""
+        result = OrderResult(order_id=order.order_id, request=order, status=status, error_message=reason)
+        self.order_results[order.order_id] = result
+        return result
+    
+    @staticmethod
+    def _calculate_exposure_time(results: List[OrderResult]) -> float:
+        """首腿成交到末腿成交的時間（期間持有未對沖的部位）"""
+        filled = [result.filled_at for result in results if result.filled_at is not None]
+        return max(filled) - min(filled) if len(filled) > 1 else 0.0
+    
     async def _execute_single_order(self, order: OrderRequest) -> OrderResult:
         """執行單個訂單"""
         start_time = time.time()
@@ -430,10 +578,16 @@ class ArbitrageExecutionEngine:
                 status=ExecutionStatus.EXECUTING
             )
             
-            # 模擬訂單執行
-            success, execution_data = await self._simulate_order_execution(order)
+            # 提交訂單（已連接交易所客戶端時下單，否則模擬執行）
+            result.submitted_at = time.perf_counter()
+            if self.exchange_client is not None:
+                success, execution_data = await self._submit_to_exchange(order)
+            else:
+                success, execution_data = await self._simulate_order_execution(order)
             
             if success:
+                result.filled_at = time.perf_counter()
+                result.fill_latency = result.filled_at - result.submitted_at
                 result.status = ExecutionStatus.COMPLETED
                 result.executed_quantity = execution_data['quantity']
                 result.executed_price = execution_data['price']
@@ -449,7 +603,8 @@ class ArbitrageExecutionEngine:
                 logger.debug(f"      手續費: {result.fees:.2f}")
                 
             else:
-                result.status = ExecutionStatus.FAILED
+                result.status = (ExecutionStatus.CANCELLED if execution_data.get('status') == 'cancelled'
+                                 else ExecutionStatus.FAILED)
                 result.error_message = execution_data.get('error', 'Unknown error')
                 
                 logger.debug(f"   ❌ 訂單執行失敗: {result.error_message}")
@@ -475,6 +630,20 @@ class ArbitrageExecutionEngine:
             
             return result
     
+    async def _submit_to_exchange(self, order: OrderRequest) -> Tuple[bool, Dict[str, Any]]:
+        """通過交易所客戶端下單並等待成交回報"""
+        try:
+            report = await asyncio.wait_for(self.exchange_client.submit_order(order), timeout=order.timeout)
+        except asyncio.TimeoutError:
+            cancel = getattr(self.exchange_client, 'cancel_order', None)
+            if cancel is not None:
+                await cancel(order.order_id)
+            return False, {'error': f'訂單超時 ({order.timeout}秒)'}
+        
+        if report.get('status') in ('filled', 'partially_filled') and report.get('quantity', 0) > 0:
+            return True, report
+        return False, report
+    
     async def _simulate_order_execution(self, order: OrderRequest) -> Tuple[bool, Dict[str, Any]]:
         """模擬訂單執行"""
         try:
@@ -537,7 +706,7 @@ class ArbitrageExecutionEngine:
             
             # 反向執行已完成的訂單
             for result in reversed(executed_results):
-                if result.status == ExecutionStatus.COMPLETED:
+                if result.executed_quantity > 0:
                     # 創建反向訂單
                     reverse_action = 'sell' if result.request.action == 'buy' else 'buy'
                     
@@ -704,6 +873,11 @@ class ArbitrageExecutionEngine:
                 
                 if count > 0:
                     self.execution_stats['avg_execution_time'] = total_time / count
+                
+                exposures = [execution.exposure_time for execution in recent_executions
+                             if len(execution.execution_results) > 1]
+                if exposures:
+                    self.execution_stats['avg_exposure_time'] = sum(exposures) / len(exposures)
             
             # 計算平均滑點
             if self.order_results:
@@ -712,6 +886,10 @@ class ArbitrageExecutionEngine:
                 
                 if slippages:
                     self.execution_stats['avg_slippage'] = sum(slippages) / len(slippages)
+                
+                latencies = [order.fill_latency for order in recent_orders if order.filled_at is not None]
+                if latencies:
+                    self.execution_stats['avg_leg_latency'] = sum(latencies) / len(latencies)
             
         except Exception as e:
             logger.error(f"❌ 更新執行統計失敗: {e}")
@@ -824,6 +1002,9 @@ class ArbitrageExecutionEngine:
                     'total_fees': exec.total_fees,
                     'net_profit': exec.total_profit - exec.total_fees,
                     'execution_time': (exec.end_time - exec.start_time).total_seconds() if exec.start_time and exec.end_time else 0,
+                    'leg_mode': exec.leg_mode.value,
+                    'exposure_time': exec.exposure_time,
+                    'leg_latencies': [result.fill_latency for result in exec.execution_results],
                     'error_message': exec.error_message,
                     'timestamp': exec.start_time.isoformat() if exec.start_time else None
                 }
@@ -861,6 +1042,48 @@ class ArbitrageExecutionEngine:
             return False
 
 
+def build_leg_dependencies(orders: List[OrderRequest],
+                           balances: Optional[Dict[str, Dict[str, float]]] = None) -> List[List[int]]:
+    """
+    由執行路徑推導各腿的資金依賴
+    
+    每腿消耗 (交易所, 付出幣種) 的資金：買入付出計價幣，賣出付出基礎幣。
+    餘額足夠支付時該腿可立即提交；否則依賴最近一條在同一交易所產出該幣種的前序腿。
+    未提供餘額時只依據前序腿的產出判斷；無法解析的交易對保守地依賴上一腿。
+    
+    Returns:
+        每腿依賴的前序腿序號列表
+    """
+    available = {(exchange, currency): amount
+                 for exchange, amounts in (balances or {}).items()
+                 for currency, amount in amounts.items()}
+    producers: Dict[Tuple[str, str], int] = {}
+    dependencies: List[List[int]] = []
+    
+    for index, order in enumerate(orders):
+        try:
+            base, quote = split_pair(order.pair)
+        except ValueError:
+            dependencies.append([index - 1] if index else [])
+            continue
+        
+        source, target = (quote, base) if order.action == 'buy' else (base, quote)
+        price = order.price or order.reference_price or 0.0
+        need = order.quantity * price if order.action == 'buy' else order.quantity
+        key = (order.exchange, source)
+        
+        if balances is not None and need > 0 and available.get(key, 0.0) >= need:
+            available[key] -= need
+            dependencies.append([])
+        elif key in producers:
+            dependencies.append([producers[key]])
+        else:
+            dependencies.append([])
+        producers[(order.exchange, target)] = index
+    
+    return dependencies
+
+
 # 創建套利執行引擎實例
 def create_arbitrage_execution_engine(config: ExecutionConfig) -> ArbitrageExecutionEngine:
     """創建套利執行引擎實例"""
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+套利貨幣圖 - 以交易所全部報價建立幣種有向圖並增量維護盈利環
+每個交易對產生兩條邊：賣出 base→quote 匯率為 bid·(1-費率)，買入 quote→base 匯率為 (1-費率)/ask，
+邊權為 -log(匯率)，權重和為負的環即扣除手續費後仍盈利的套利路徑。
+每筆報價只標記權重變化的邊；檢測時只圍繞這些邊搜索：先以逐層 Bellman-Ford 反向鬆弛
+求出各節點在剩餘步數內回到起點的最短距離作為下界，再深度優先枚舉並剪枝，
+從而找出經過變化邊的全部盈利環；未觸及的環權重不變，直接沿用緩存結果。
+"""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 拆分交易對時識別的計價幣種（長的優先匹配，USDTTWD -> USDT/TWD）
+QUOTE_CURRENCIES = ("USDT", "USDC", "TWD", "BTC", "ETH")
+
+EdgeKey = Tuple[str, str]
+
+
+def split_pair(pair: str) -> Tuple[str, str]:
+    """拆分交易對為 (base, quote)，支持 BTC/TWD 與 BTCTWD 兩種寫法"""
+    normalized = pair.upper().replace('-', '/')
+    if '/' in normalized:
+        base, quote = normalized.split('/', 1)
+        return base, quote
+    for quote in sorted(QUOTE_CURRENCIES, key=len, reverse=True):
+        if normalized.endswith(quote) and len(normalized) > len(quote):
+            return normalized[:-len(quote)], quote
+    raise ValueError(f"無法識別交易對的計價幣種: {pair}")
+
+
+@dataclass
+class GraphEdge:
+    """幣種兌換邊"""
+    source: str
+    target: str
+    pair: str
+    action: str          # 'buy' 為以 quote 買入 base，'sell' 為賣出 base 換 quote
+    price: float         # 成交價（買入用 ask，賣出用 bid）
+    rate: float          # 每單位 source 換得的 target（已扣手續費）
+    weight: float        # -log(rate)
+    capacity: float      # 盤口可成交量，以 source 幣種計
+
+
+@dataclass
+class ArbitrageCycle:
+    """盈利兌換環（從 currencies[0] 出發，依次兌換後回到起點）"""
+    currencies: Tuple[str, ...]
+    edges: List[GraphEdge]
+    log_return: float = field(init=False)
+
+    def __post_init__(self):
+        self.log_return = -sum(edge.weight for edge in self.edges)
+
+    @property
+    def profit_percentage(self) -> float:
+        return math.expm1(self.log_return)
+
+    @property
+    def pairs(self) -> List[str]:
+        return [edge.pair for edge in self.edges]
+
+    def rotate_to(self, currency: str) -> 'ArbitrageCycle':
+        """以指定幣種為起點的同一個環（不含該幣種時原樣返回）"""
+        if currency not in self.currencies:
+            return self
+        start = self.currencies.index(currency)
+        return ArbitrageCycle(self.currencies[start:] + self.currencies[:start],
+                              self.edges[start:] + self.edges[:start])
+
+    def max_input(self) -> float:
+        """受各腿盤口量限制的最大投入（起點幣種）"""
+        limit, conversion = math.inf, 1.0
+        for edge in self.edges:
+            limit = min(limit, edge.capacity / conversion)
+            conversion *= edge.rate
+        return limit
+
+    def legs(self, amount: float) -> List[Dict]:
+        """投入 amount（起點幣種）時每一腿的交易明細"""
+        legs = []
+        for edge in self.edges:
+            volume = amount if edge.action == 'sell' else amount / edge.price
+            legs.append({
+                'action': edge.action,
+                'pair': edge.pair,
+                'price': edge.price,
+                'volume': volume,
+                'from_currency': edge.source,
+                'to_currency': edge.target,
+                'amount_in': amount
+            })
+            amount *= edge.rate
+        return legs
+
+
+def _canonical(currencies: Tuple[str, ...]) -> Tuple[str, ...]:
+    start = currencies.index(min(currencies))
+    return currencies[start:] + currencies[:start]
+
+
+class CurrencyGraph:
+    """單一交易所的幣種兌換圖"""
+
+    def __init__(self, fee: float = 0.001, min_length: int = 3, max_length: int = 4,
+                 min_profit: float = 0.0):
+        """
+        初始化貨幣圖
+
+        Args:
+            fee: 每腿手續費率
+            min_length/max_length: 搜索的環長（兌換次數）範圍
+            min_profit: 環的最小收益率，低於此值不記錄
+        """
+        if min_length < 2 or max_length < min_length:
+            raise ValueError("環長範圍無效")
+        self.fee = fee
+        self.min_length = min_length
+        self.max_length = max_length
+        self.min_log_return = math.log1p(min_profit)
+
+        self._out: Dict[str, Dict[str, GraphEdge]] = {}
+        self._in: Dict[str, Dict[str, GraphEdge]] = {}
+        self._pair_edges: Dict[str, Tuple[EdgeKey, EdgeKey]] = {}
+        self._touched: Set[EdgeKey] = set()
+
+        self._cycles: Dict[Tuple[str, ...], ArbitrageCycle] = {}
+        self._edge_cycles: Dict[EdgeKey, Set[Tuple[str, ...]]] = {}
+
+    # ---------------------------------------------------------------- 報價
+
+    @property
+    def currencies(self) -> List[str]:
+        return list(self._out)
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(targets) for targets in self._out.values())
+
+    def update_quote(self, pair: str, bid: float, ask: float,
+                     bid_volume: float = math.inf, ask_volume: float = math.inf) -> int:
+        """
+        更新交易對報價，返回權重發生變化的邊數
+
+        bid_volume/ask_volume 為盤口可成交的 base 數量
+        """
+        if bid <= 0 or ask <= 0:
+            self.remove_pair(pair)
+            return 0
+
+        base, quote = split_pair(pair)
+        sell = GraphEdge(base, quote, pair, 'sell', bid, bid * (1 - self.fee),
+                         -math.log(bid * (1 - self.fee)), bid_volume)
+        buy = GraphEdge(quote, base, pair, 'buy', ask, (1 - self.fee) / ask,
+                        -math.log((1 - self.fee) / ask), ask_volume * ask)
+        self._pair_edges[pair] = ((base, quote), (quote, base))
+
+        changed = 0
+        for edge in (sell, buy):
+            previous = self._out.get(edge.source, {}).get(edge.target)
+            self._out.setdefault(edge.source, {})[edge.target] = edge
+            self._in.setdefault(edge.target, {})[edge.source] = edge
+            self._out.setdefault(edge.target, {})
+            self._in.setdefault(edge.source, {})
+            if previous is None or previous.weight != edge.weight:
+                self._touched.add((edge.source, edge.target))
+                changed += 1
+            elif previous.capacity != edge.capacity:
+                self._refresh_capacity(edge)
+        return changed
+
+    def remove_pair(self, pair: str):
+        """移除交易對的兩條邊"""
+        for source, target in self._pair_edges.pop(pair, ()):
+            if self._out.get(source, {}).pop(target, None) is not None:
+                self._in[target].pop(source, None)
+                self._touched.add((source, target))
+
+    def _refresh_capacity(self, edge: GraphEdge):
+        """只有盤口量變化時就地替換緩存環中的邊（收益率不變）"""
+        key = (edge.source, edge.target)
+        for cycle_key in self._edge_cycles.get(key, ()):
+            cycle = self._cycles[cycle_key]
+            cycle.edges = [edge if (e.source, e.target) == key else e for e in cycle.edges]
+
+    # ---------------------------------------------------------------- 環搜索
+
+    def find_cycles(self) -> List[ArbitrageCycle]:
+        """處理自上次調用以來變化的邊，返回當前全部盈利環（按收益率降序）"""
+        touched, self._touched = self._touched, set()
+
+        # 經過變化邊的舊環全部作廢，由下面的搜索重新發現
+        for key in touched:
+            for cycle_key in list(self._edge_cycles.get(key, ())):
+                self._drop(cycle_key)
+
+        for source, target in touched:
+            edge = self._out.get(source, {}).get(target)
+            if edge is not None:
+                for cycle in self._cycles_through(edge):
+                    self._store(cycle)
+
+        return sorted(self._cycles.values(), key=lambda cycle: cycle.log_return, reverse=True)
+
+    def _cycles_through(self, edge: GraphEdge) -> List[ArbitrageCycle]:
+        """經過 edge 的全部盈利簡單環"""
+        start, first = edge.source, edge.target
+        hops = self.max_length - 1
+
+        # 逐層反向 Bellman-Ford：bound[h][x] = x 在不超過 h 步內回到 start 的最短距離
+        bound: List[Dict[str, float]] = [{start: 0.0}]
+        frontier = {start: 0.0}
+        for _ in range(hops):
+            layer = dict(bound[-1])
+            relaxed = {}
+            for node, distance in frontier.items():
+                for previous, in_edge in self._in.get(node, {}).items():
+                    candidate = in_edge.weight + distance
+                    if candidate < layer.get(previous, math.inf):
+                        layer[previous] = candidate
+                        relaxed[previous] = candidate
+            bound.append(layer)
+            frontier = relaxed
+            if not frontier:
+                bound.extend([layer] * (hops - len(bound) + 1))
+                break
+
+        # 深度優先枚舉，部分路徑權重 + 剩餘步數下界不足以盈利時剪枝
+        threshold = -self.min_log_return
+        cycles: List[ArbitrageCycle] = []
+        path_nodes = [start, first]
+        path_edges = [edge]
+
+        def extend(node: str, weight: float):
+            remaining = hops - (len(path_edges) - 1)
+            if weight + bound[remaining].get(node, math.inf) >= threshold:
+                return
+            for target, next_edge in self._out.get(node, {}).items():
+                total = weight + next_edge.weight
+                if target == start:
+                    if len(path_edges) + 1 >= self.min_length and total < threshold:
+                        cycles.append(ArbitrageCycle(tuple(path_nodes), path_edges + [next_edge]))
+                    continue
+                if remaining > 1 and target not in path_nodes:
+                    path_nodes.append(target)
+                    path_edges.append(next_edge)
+                    extend(target, total)
+                    path_nodes.pop()
+                    path_edges.pop()
+
+        extend(first, edge.weight)
+        return cycles
+
+    def _store(self, cycle: ArbitrageCycle):
+        key = _canonical(cycle.currencies)
+        if key in self._cycles:
+            return
+        self._cycles[key] = cycle
+        for edge in cycle.edges:
+            self._edge_cycles.setdefault((edge.source, edge.target), set()).add(key)
+
+    def _drop(self, key: Tuple[str, ...]):
+        cycle = self._cycles.pop(key, None)
+        if cycle is None:
+            return
+        for edge in cycle.edges:
+            keys = self._edge_cycles.get((edge.source, edge.target))
+            if keys is not None:
+                keys.discard(key)
@@ -15,6 +15,11 @@ import math
 import itertools
 from collections import defaultdict, deque
 
+try:
+    from .arbitrage_graph import ArbitrageCycle, CurrencyGraph
+except ImportError:
+    from arbitrage_graph import ArbitrageCycle, CurrencyGraph
+
 logger = logging.getLogger(__name__)
 
 class ArbitrageType(Enum):
@@ -83,6 +88,9 @@ class ArbitrageConfig:
     enable_cross_exchange: bool = True
     enable_triangular: bool = True
     enable_statistical: bool = False
+    trading_fee: float = 0.001               # 每腿手續費率（三角/環形套利）
+    max_cycle_length: int = 4                # 環形套利最多兌換次數
+    base_currency: str = "TWD"               # 環形套利的起點幣種
 
 class ArbitrageOpportunityDetector:
     """套利機會識別系統"""
@@ -93,6 +101,7 @@ class ArbitrageOpportunityDetector:
         # 價格數據存儲
         self.price_data: Dict[str, Dict[str, PriceData]] = defaultdict(dict)  # {exchange: {pair: PriceData}}
         self.price_history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=100))  # 價格歷史
+        self.currency_graphs: Dict[str, CurrencyGraph] = {}  # {exchange: 幣種兌換圖}
         
         # 套利機會
         self.active_opportunities: Dict[str, ArbitrageOpportunity] = {}
@@ -197,22 +206,45 @@ class ArbitrageOpportunityDetector:
                     price_data = await self._fetch_price_data(exchange, pair)
                     
                     if price_data:
-                        # 存儲價格數據
-                        self.price_data[exchange][pair] = price_data
-                        
-                        # 更新價格歷史
-                        history_key = f"{exchange}_{pair}"
-                        self.price_history[history_key].append({
-                            'timestamp': price_data.timestamp,
-                            'mid_price': price_data.mid_price,
-                            'spread': price_data.spread
-                        })
+                        self.update_price_data(price_data)
             
             self.last_update_time = datetime.now()
             
         except Exception as e:
             logger.error(f"❌ 更新價格數據失敗: {e}")
     
+    def update_price_data(self, price_data: PriceData):
+        """寫入一筆報價：保存最新價格、價格歷史，並更新該交易所的幣種兌換圖"""
+        self.price_data[price_data.exchange][price_data.pair] = price_data
+        
+        history_key = f"{price_data.exchange}_{price_data.pair}"
+        self.price_history[history_key].append({
+            'timestamp': price_data.timestamp,
+            'mid_price': price_data.mid_price,
+            'spread': price_data.spread
+        })
+        
+        try:
+            self._currency_graph(price_data.exchange).update_quote(
+                price_data.pair, price_data.bid_price, price_data.ask_price,
+                price_data.bid_volume, price_data.ask_volume
+            )
+        except ValueError as e:
+            logger.debug(f"⚠️ 交易對未加入兌換圖: {e}")
+    
+    def _currency_graph(self, exchange: str) -> CurrencyGraph:
+        """獲取交易所的幣種兌換圖"""
+        graph = self.currency_graphs.get(exchange)
+        if graph is None:
+            graph = CurrencyGraph(
+                fee=self.config.trading_fee,
+                min_length=3,
+                max_length=self.config.max_cycle_length,
+                min_profit=self.config.min_profit_percentage
+            )
+            self.currency_graphs[exchange] = graph
+        return graph
+    
     async def _fetch_price_data(self, exchange: str, pair: str) -> Optional[PriceData]:
         """獲取價格數據 (模擬)"""
         try:
@@ -223,7 +255,10 @@ class ArbitrageOpportunityDetector:
             base_prices = {
                 "BTCTWD": 3500000,
                 "ETHTWD": 120000,
-                "USDTTWD": 31.5
+                "USDTTWD": 31.5,
+                "BTCUSDT": 3500000 / 31.5,
+                "ETHUSDT": 120000 / 31.5,
+                "ETHBTC": 120000 / 3500000
             }
             
             base_price = base_prices.get(pair, 100000)
@@ -447,16 +482,17 @@ class ArbitrageOpportunityDetector:
             return 0.8  # 默認高風險
     
     async def _detect_triangular_arbitrage(self) -> List[ArbitrageOpportunity]:
-        """檢測三角套利機會"""
+        """檢測三角/環形套利機會：各交易所兌換圖中長度3到 max_cycle_length 的盈利環"""
         opportunities = []
         
         try:
-            # 三角套利需要至少3個相關的交易對
-            triangular_sets = self._find_triangular_sets()
-            
-            for triangle_set in triangular_sets:
-                for exchange in self.config.exchanges:
-                    opportunity = await self._calculate_triangular_opportunity(exchange, triangle_set)
+            for exchange in self.config.exchanges:
+                graph = self.currency_graphs.get(exchange)
+                if graph is None:
+                    continue
+                
+                for cycle in graph.find_cycles():
+                    opportunity = self._calculate_cycle_opportunity(exchange, cycle)
                     if opportunity:
                         opportunities.append(opportunity)
             
@@ -465,85 +501,45 @@ class ArbitrageOpportunityDetector:
         
         return opportunities
     
-    def _find_triangular_sets(self) -> List[Tuple[str, str, str]]:
-        """尋找三角套利組合"""
-        triangular_sets = []
-        
+    def _calculate_cycle_opportunity(self, exchange: str,
+                                     cycle: ArbitrageCycle) -> Optional[ArbitrageOpportunity]:
+        """由兌換環計算套利機會（資金以 base_currency 計，不經過該幣種的環跳過）"""
         try:
-            # 基於現有交易對尋找三角組合
-            pairs = self.config.trading_pairs
-            
-            # 簡化版本：假設有BTC/TWD, ETH/TWD, USDT/TWD
-            if all(pair in pairs for pair in ["BTCTWD", "ETHTWD", "USDTTWD"]):
-                triangular_sets.append(("BTCTWD", "ETHTWD", "USDTTWD"))
-            
-        except Exception as e:
-            logger.error(f"❌ 尋找三角套利組合失敗: {e}")
-        
-        return triangular_sets
-    
-    async def _calculate_triangular_opportunity(self, exchange: str, 
-                                             triangle_set: Tuple[str, str, str]) -> Optional[ArbitrageOpportunity]:
-        """計算三角套利機會"""
-        try:
-            pair_a, pair_b, pair_c = triangle_set
-            
-            # 檢查價格數據是否可用
-            if (exchange not in self.price_data or 
-                not all(pair in self.price_data[exchange] for pair in triangle_set)):
+            # 資金上限以 base_currency 計，不經過它的環既無法直接動用資金也無法與上限比較
+            if self.config.base_currency not in cycle.currencies:
+                logger.debug(f"⚠️ 兌換環不經過 {self.config.base_currency}，跳過: "
+                             f"{'→'.join(cycle.currencies)}")
                 return None
+            cycle = cycle.rotate_to(self.config.base_currency)
             
-            price_a = self.price_data[exchange][pair_a]
-            price_b = self.price_data[exchange][pair_b]
-            price_c = self.price_data[exchange][pair_c]
-            
-            # 計算三角套利路徑
-            path1_profit = self._calculate_triangular_path_profit(
-                [(price_a, 'buy'), (price_b, 'sell'), (price_c, 'buy')], 100000
-            )
-            
-            path2_profit = self._calculate_triangular_path_profit(
-                [(price_b, 'buy'), (price_a, 'sell'), (price_c, 'buy')], 100000
-            )
-            
-            # 選擇更有利的路徑
-            if path1_profit['profit'] > path2_profit['profit'] and path1_profit['profit'] > 0:
-                selected_path = path1_profit
-                execution_path = [
-                    {'action': 'buy', 'exchange': exchange, 'pair': pair_a, 'price': price_a.ask_price},
-                    {'action': 'sell', 'exchange': exchange, 'pair': pair_b, 'price': price_b.bid_price},
-                    {'action': 'buy', 'exchange': exchange, 'pair': pair_c, 'price': price_c.ask_price}
-                ]
-            elif path2_profit['profit'] > 0:
-                selected_path = path2_profit
-                execution_path = [
-                    {'action': 'buy', 'exchange': exchange, 'pair': pair_b, 'price': price_b.ask_price},
-                    {'action': 'sell', 'exchange': exchange, 'pair': pair_a, 'price': price_a.bid_price},
-                    {'action': 'buy', 'exchange': exchange, 'pair': pair_c, 'price': price_c.ask_price}
-                ]
-            else:
+            profit_percentage = cycle.profit_percentage
+            if profit_percentage < self.config.min_profit_percentage:
                 return None
             
-            profit_percentage = selected_path['profit'] / selected_path['initial_capital']
-            
-            # 檢查是否滿足最小利潤要求
-            if profit_percentage < self.config.min_profit_percentage:
+            # 投入受單筆資金上限和各腿盤口量限制
+            required_capital = min(self.config.max_capital_per_trade, cycle.max_input())
+            if required_capital <= 0:
                 return None
             
+            execution_path = [dict(leg, exchange=exchange) for leg in cycle.legs(required_capital)]
+            
             # 風險評估
-            risk_score = self._calculate_triangular_risk(price_a, price_b, price_c)
+            prices = [self.price_data[exchange][pair] for pair in cycle.pairs
+                      if pair in self.price_data.get(exchange, {})]
+            risk_score = self._calculate_triangular_risk(*prices)
             
             # 創建套利機會
-            opportunity_id = f"triangular_{exchange}_{int(datetime.now().timestamp())}"
+            opportunity_id = (f"triangular_{exchange}_{'-'.join(cycle.currencies)}_"
+                              f"{int(datetime.now().timestamp())}")
             
             return ArbitrageOpportunity(
                 opportunity_id=opportunity_id,
                 arbitrage_type=ArbitrageType.TRIANGULAR,
-                pairs=list(triangle_set),
+                pairs=cycle.pairs,
                 exchanges=[exchange],
-                expected_profit=selected_path['profit'],
+                expected_profit=required_capital * profit_percentage,
                 profit_percentage=profit_percentage,
-                required_capital=selected_path['initial_capital'],
+                required_capital=required_capital,
                 execution_path=execution_path,
                 risk_score=risk_score,
                 confidence=max(0.4, 1.0 - risk_score),
@@ -555,54 +551,22 @@ class ArbitrageOpportunityDetector:
             logger.error(f"❌ 計算三角套利機會失敗: {e}")
             return None
     
-    def _calculate_triangular_path_profit(self, path: List[Tuple[PriceData, str]], 
-                                        initial_capital: float) -> Dict[str, float]:
-        """計算三角套利路徑利潤"""
-        try:
-            current_amount = initial_capital
-            
-            for price_data, action in path:
-                if action == 'buy':
-                    current_amount = current_amount / price_data.ask_price
-                else:  # sell
-                    current_amount = current_amount * price_data.bid_price
-                
-                # 扣除手續費 (假設0.1%)
-                current_amount *= 0.999
-            
-            profit = current_amount - initial_capital
-            
-            return {
-                'initial_capital': initial_capital,
-                'final_amount': current_amount,
-                'profit': profit
-            }
-            
-        except Exception as e:
-            logger.error(f"❌ 計算三角套利路徑利潤失敗: {e}")
-            return {'initial_capital': initial_capital, 'final_amount': 0, 'profit': -initial_capital}
-    
-    def _calculate_triangular_risk(self, price_a: PriceData, price_b: PriceData, 
-                                 price_c: PriceData) -> float:
-        """計算三角套利風險"""
+    def _calculate_triangular_risk(self, *prices: PriceData) -> float:
+        """計算三角/環形套利風險（每一腿的報價）"""
         try:
             risk_factors = []
             
-            # 點差風險
-            avg_spread = (price_a.spread + price_b.spread + price_c.spread) / 3
-            avg_price = (price_a.mid_price + price_b.mid_price + price_c.mid_price) / 3
-            spread_risk = avg_spread / avg_price
+            # 點差風險（各腿相對點差的平均）
+            spread_risk = sum(price.spread / price.mid_price for price in prices) / len(prices)
             risk_factors.append(min(1.0, spread_risk * 50))
             
             # 流動性風險
-            min_volume = min(price_a.ask_volume, price_a.bid_volume,
-                           price_b.ask_volume, price_b.bid_volume,
-                           price_c.ask_volume, price_c.bid_volume)
+            min_volume = min(min(price.ask_volume, price.bid_volume) for price in prices)
             liquidity_risk = 1.0 / (1.0 + min_volume)
             risk_factors.append(liquidity_risk)
             
-            # 執行複雜度風險
-            execution_risk = 0.6
+            # 執行複雜度風險（每多一腿增加0.1）
+            execution_risk = min(1.0, 0.6 + 0.1 * (len(prices) - 3))
             risk_factors.append(execution_risk)
             
             return sum(risk_factors) / len(risk_factors)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模擬交易所 - 供套利執行引擎在本地測試並發下單
+按交易對配置提交到成交的延遲、部分成交比例與拒單，掛單期間可被撤銷，
+並記錄每筆訂單的提交/成交時間以便核對各腿的並發程度。
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SimulatedOrder:
+    """模擬交易所中的訂單記錄"""
+    order_id: str
+    exchange_order_id: str
+    exchange: str
+    pair: str
+    action: str
+    quantity: float
+    submitted_at: float
+    status: str = "open"          # open/filled/partially_filled/cancelled/rejected
+    filled_quantity: float = 0.0
+    filled_at: Optional[float] = None
+
+
+class SimulatedExchange:
+    """本地模擬交易所"""
+
+    def __init__(self, prices: Mapping[str, float],
+                 latency: Union[float, Mapping[str, float]] = 0.05,
+                 fill_ratio: Union[float, Mapping[str, float]] = 1.0,
+                 reject_pairs: Optional[Mapping[str, str]] = None,
+                 fee_rate: float = 0.001, latency_jitter: float = 0.0,
+                 seed: Optional[int] = None):
+        """
+        初始化模擬交易所
+
+        Args:
+            prices: 各交易對成交價
+            latency: 提交到成交的延遲（秒），可按交易對配置
+            fill_ratio: 成交比例，小於1時為部分成交（剩餘數量撤銷），可按交易對配置
+            reject_pairs: 被拒單的交易對及錯誤信息
+            fee_rate: 手續費率
+            latency_jitter: 延遲的隨機抖動比例
+        """
+        self.prices = dict(prices)
+        self.latency = latency
+        self.fill_ratio = fill_ratio
+        self.reject_pairs = dict(reject_pairs or {})
+        self.fee_rate = fee_rate
+        self.latency_jitter = latency_jitter
+        self._random = random.Random(seed)
+        self._sequence = itertools.count(1)
+
+        self.orders: Dict[str, SimulatedOrder] = {}
+        self._cancel_events: Dict[str, asyncio.Event] = {}
+
+    @staticmethod
+    def _lookup(setting: Union[float, Mapping[str, float]], pair: str, default: float) -> float:
+        if isinstance(setting, Mapping):
+            return setting.get(pair, default)
+        return setting
+
+    async def submit_order(self, order) -> Dict[str, Any]:
+        """
+        提交訂單並等待成交（或被撤銷）
+
+        Returns:
+            status 為 filled/partially_filled/cancelled/rejected 的成交回報
+        """
+        record = SimulatedOrder(
+            order_id=order.order_id,
+            exchange_order_id=f"{order.exchange}_sim_{next(self._sequence)}",
+            exchange=order.exchange,
+            pair=order.pair,
+            action=order.action,
+            quantity=order.quantity,
+            submitted_at=time.perf_counter()
+        )
+        self.orders[order.order_id] = record
+        cancel_event = asyncio.Event()
+        self._cancel_events[order.order_id] = cancel_event
+
+        delay = self._lookup(self.latency, order.pair, 0.05)
+        if self.latency_jitter:
+            delay *= 1 + self._random.uniform(-self.latency_jitter, self.latency_jitter)
+
+        try:
+            await asyncio.wait_for(cancel_event.wait(), timeout=max(delay, 0.0))
+            record.status = "cancelled"
+            return {'status': 'cancelled', 'error': '訂單已撤銷', 'exchange_order_id': record.exchange_order_id}
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._cancel_events.pop(order.order_id, None)
+
+        if order.pair in self.reject_pairs:
+            record.status = "rejected"
+            return {'status': 'rejected', 'error': self.reject_pairs[order.pair],
+                    'exchange_order_id': record.exchange_order_id}
+
+        ratio = min(max(self._lookup(self.fill_ratio, order.pair, 1.0), 0.0), 1.0)
+        price = order.price or order.reference_price or self.prices.get(order.pair, 0.0)
+        quantity = order.quantity * ratio
+        record.filled_quantity = quantity
+        record.filled_at = time.perf_counter()
+        record.status = "filled" if ratio >= 1.0 else "partially_filled"
+
+        reference = order.reference_price or price
+        return {
+            'status': record.status,
+            'quantity': quantity,
+            'price': price,
+            'fees': quantity * price * self.fee_rate,
+            'slippage': (price - reference) / reference if reference else 0.0,
+            'exchange_order_id': record.exchange_order_id
+        }
+
+    async def cancel_order(self, order_id: str) -> bool:
+        """撤銷仍在掛單中的訂單"""
+        event = self._cancel_events.get(order_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def order_log(self) -> List[SimulatedOrder]:
+        """按提交順序返回全部訂單"""
+        return sorted(self.orders.values(), key=lambda record: record.submitted_at)
@@ -21,6 +21,7 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from src.strategy.strategy_config_manager import StrategyConfig, strategy_config_manager
 from src.data.simple_data_fetcher import DataFetcher
+from src.data.candle_archive import get_candle_archive
 
 logger = logging.getLogger(__name__)
 
@@ -61,6 +62,7 @@ class BacktestEngine:
     
     def __init__(self):
         self.data_fetcher = DataFetcher()
+        self.candle_archive = get_candle_archive()
         self.project_root = Path(__file__).parent.parent.parent
         
     def run_backtest(self, strategy_id: str, symbol: str = 'BTCUSDT', 
@@ -75,7 +77,7 @@ class BacktestEngine:
         
         try:
             # 獲取歷史數據
-            df = self.data_fetcher.get_historical_data(symbol, '1h', days * 24)
+            df = self._load_history(symbol, days * 24)
             if df.empty:
                 logger.error("❌ 無法獲取歷史數據")
                 return None
@@ -122,6 +124,16 @@ class BacktestEngine:
             logger.error(f"❌ 回測失敗: {e}")
             return None    
 
+    def _load_history(self, symbol: str, limit: int) -> pd.DataFrame:
+        """從本地K線檔案庫讀取1小時K線，缺少或過期的部分由數據獲取器補齊並寫回檔案庫"""
+        market = symbol.lower()
+        fetch_limit = self.candle_archive.candles_to_fetch(market, '1h', limit, 3600)
+        fresh = self.data_fetcher.get_historical_data(symbol, '1h', fetch_limit)
+        self.candle_archive.extend(market, '1h', fresh, 3600)
+        
+        df = self.candle_archive.load_dataframe(market, '1h')
+        return df.iloc[-limit:].set_index('timestamp')
+
     def _generate_signals(self, df: pd.DataFrame, strategy: StrategyConfig) -> List[Dict[str, Any]]:
         """生成交易信號"""
         try:
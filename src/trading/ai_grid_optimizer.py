@@ -21,10 +21,12 @@ sys.path.insert(0, str(project_root))
 
 try:
     from .simple_grid_engine import GridConfig, SimpleGridEngine, create_simple_grid_engine
+    from .batch_grid_backtester import BatchGridBacktester
     from ..ai.enhanced_ai_manager import create_enhanced_ai_manager
     from ..data.historical_data_manager import HistoricalDataManager
 except ImportError:
     from simple_grid_engine import GridConfig, SimpleGridEngine, create_simple_grid_engine
+    from batch_grid_backtester import BatchGridBacktester
     from AImax.src.ai.enhanced_ai_manager import create_enhanced_ai_manager
     from AImax.src.data.historical_data_manager import HistoricalDataManager
 
@@ -51,6 +53,8 @@ class GridOptimizationConfig:
     max_order_amount: float = 20000        # 最大訂單金額
     optimization_iterations: int = 5       # 優化迭代次數
     ai_confidence_threshold: float = 0.6   # AI信心度閾值
+    backtest_balance: float = 100000       # 回測初始資金
+    backtest_workers: int = 1              # 批量回測進程數 (候選很多時分塊並行)
 
 @dataclass
 class OptimizationResult:
@@ -78,6 +82,13 @@ class AIGridOptimizer:
         # 市場數據緩存
         self.market_data_cache: Dict[str, Any] = {}
         
+        # 批量回測器與最近一次候選回測結果
+        self.batch_backtester = BatchGridBacktester(
+            initial_balance=config.backtest_balance,
+            workers=config.backtest_workers
+        )
+        self.candidate_backtests: List[Tuple[GridConfig, Dict[str, Any]]] = []
+        
         logger.info(f"🤖 AI網格優化器初始化完成: {config.pair}")
     
     async def optimize_grid_parameters(self, current_price: float, 
@@ -467,12 +478,17 @@ class AIGridOptimizer:
         try:
             logger.info(f"🎯 AI評估 {len(candidates)} 個候選配置...")
             
+            # 所有候選在同一條價格路徑上一次性批量回測
+            prices = historical_data.get("price_data", [])
+            backtests = self.batch_backtester.run(candidates, prices) if prices else [None] * len(candidates)
+            self.candidate_backtests = list(zip(candidates, backtests))
+            
             best_config = None
             best_score = -float('inf')
             
-            for i, config in enumerate(candidates):
+            for i, (config, backtest) in enumerate(self.candidate_backtests):
                 # 計算配置評分
-                score = await self._calculate_config_score(config, market_analysis, historical_data)
+                score = await self._calculate_config_score(config, market_analysis, historical_data, backtest)
                 
                 logger.debug(f"   候選{i+1}: 間距{config.grid_spacing:.1f}%, "
                            f"層級{config.grid_levels}, 評分{score:.2f}")
@@ -494,7 +510,8 @@ class AIGridOptimizer:
     
     async def _calculate_config_score(self, config: GridConfig, 
                                     market_analysis: Dict[str, Any],
-                                    historical_data: Dict[str, Any]) -> float:
+                                    historical_data: Dict[str, Any],
+                                    backtest: Optional[Dict[str, Any]] = None) -> float:
         """計算配置評分"""
         try:
             score = 0.0
@@ -555,7 +572,7 @@ class AIGridOptimizer:
             
             # 5. 歷史表現預測 (10%)
             # 基於歷史數據預測表現
-            historical_score = self._predict_historical_performance(config, historical_data)
+            historical_score = self._predict_historical_performance(config, historical_data, backtest)
             score += historical_score * 10
             
             return max(0, score)
@@ -565,28 +582,23 @@ class AIGridOptimizer:
             return 50.0  # 默認中等評分
     
     def _predict_historical_performance(self, config: GridConfig, 
-                                      historical_data: Dict[str, Any]) -> float:
+                                      historical_data: Dict[str, Any],
+                                      backtest: Optional[Dict[str, Any]] = None) -> float:
         """預測歷史表現"""
         try:
-            prices = historical_data.get("price_data", [])
-            if not prices:
+            prices = np.asarray(historical_data.get("price_data", []), dtype=float)
+            if len(prices) == 0:
                 return 0.5
             
-            # 計算價格在網格區間內的時間比例
-            in_range_count = 0
-            for price in prices:
-                if config.lower_limit <= price <= config.upper_limit:
-                    in_range_count += 1
-            
-            range_utilization = in_range_count / len(prices)
+            # 計算價格在網格區間內的時間比例（批量回測已算出時直接使用）
+            if backtest and "range_utilization" in backtest:
+                range_utilization = backtest["range_utilization"]
+            else:
+                range_utilization = float(np.mean((prices >= config.lower_limit) & (prices <= config.upper_limit)))
             
             # 計算預期觸發次數
-            price_changes = []
-            for i in range(1, len(prices)):
-                change = abs(prices[i] - prices[i-1]) / prices[i-1]
-                price_changes.append(change)
-            
-            avg_change = np.mean(price_changes) if price_changes else 0.01
+            price_changes = np.abs(np.diff(prices)) / prices[:-1]
+            avg_change = float(np.mean(price_changes)) if len(price_changes) else 0.01
             expected_triggers = avg_change / (config.grid_spacing / 100)
             
             # 綜合評分
@@ -600,61 +612,21 @@ class AIGridOptimizer:
     
     async def _backtest_config(self, config: GridConfig, 
                              historical_data: Dict[str, Any]) -> Dict[str, Any]:
-        """回測配置"""
+        """回測配置（候選評估時已批量回測過的配置直接複用結果）"""
         try:
             logger.info(f"📈 開始回測配置...")
             
-            # 創建網格引擎
-            engine = create_simple_grid_engine(config)
-            engine.set_balance(100000)  # 設置10萬TWD測試資金
-            
-            if not engine.initialize_grid():
-                return {"error": "網格初始化失敗"}
-            
-            # 使用歷史價格進行回測
             prices = historical_data.get("price_data", [])
             if not prices:
                 return {"error": "無歷史價格數據"}
             
-            # 執行回測
-            total_profit = 0.0
-            max_drawdown = 0.0
-            peak_balance = 100000
-            trade_count = 0
-            
-            for price in prices:
-                result = await engine.update_price(price)
-                
-                if result.get("triggered_actions"):
-                    trade_count += len(result["triggered_actions"])
-                
-                # 計算當前餘額
-                status = engine.get_status()
-                current_balance = status["available_balance"] + status["current_position"] * price
-                total_profit = current_balance - 100000
-                
-                # 計算最大回撤
-                if current_balance > peak_balance:
-                    peak_balance = current_balance
-                
-                drawdown = (peak_balance - current_balance) / peak_balance
-                max_drawdown = max(max_drawdown, drawdown)
-            
-            # 計算最終狀態
-            final_status = engine.get_status()
-            
-            backtest_results = {
-                "total_profit": total_profit,
-                "max_drawdown": max_drawdown,
-                "trade_count": trade_count,
-                "win_rate": 0.6,  # 簡化計算
-                "sharpe_ratio": total_profit / max(max_drawdown, 0.01),
-                "final_position": final_status["current_position"],
-                "final_balance": final_status["available_balance"],
-                "grid_utilization": trade_count / len(prices) if prices else 0
-            }
+            backtest_results = next((result for candidate, result in self.candidate_backtests
+                                     if candidate is config and result is not None), None)
+            if backtest_results is None:
+                backtest_results = self.batch_backtester.run([config], prices)[0]
             
-            logger.info(f"📊 回測完成: 盈利{total_profit:.2f}, 回撤{max_drawdown:.2%}, 交易{trade_count}次")
+            logger.info(f"📊 回測完成: 盈利{backtest_results['total_profit']:.2f}, "
+                        f"回撤{backtest_results['max_drawdown']:.2%}, 交易{backtest_results['trade_count']}次")
             
             return backtest_results
             
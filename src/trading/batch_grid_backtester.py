@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量網格回測器 - 在同一條價格路徑上同時回測多個網格配置
+各候選配置的網格價格排成 (候選數 x 層級數) 矩陣，逐筆價格以數組運算
+一次處理所有候選的穿越、成交與權益回撤，交易規則與 SimpleGridEngine 一致。
+候選數量很大時可按進程分塊並行。
+"""
+
+import bisect
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .simple_grid_engine import GridConfig
+
+logger = logging.getLogger(__name__)
+
+
+def build_level_matrix(configs: Sequence[GridConfig]) -> np.ndarray:
+    """
+    按 SimpleGridEngine.initialize_grid 的規則生成網格價格矩陣
+
+    每行為一個候選的網格價格（按價格升序），層級數不足的位置以 NaN 填充
+    """
+    rows = []
+    for config in configs:
+        spacing = config.grid_spacing / 100
+        upper_levels = config.grid_levels // 2
+        lower_levels = config.grid_levels - upper_levels
+        prices = [config.base_price * (1 + i * spacing)
+                  for i in range(-lower_levels, upper_levels + 1) if i != 0]
+        rows.append(sorted(p for p in prices if config.lower_limit <= p <= config.upper_limit))
+
+    width = max((len(row) for row in rows), default=0)
+    matrix = np.full((len(rows), max(width, 1)), np.nan)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix
+
+
+def simulate_grid_batch(configs: Sequence[GridConfig], prices: Sequence[float],
+                        initial_balance: float = 100000.0) -> List[Dict[str, Any]]:
+    """
+    在一條價格路徑上回測一批網格配置
+
+    每個網格層級最多觸發一次買入和一次賣出；下跌按價格升序買入，直到倉位或資金不足；
+    上漲按價格升序賣出，每筆賣出 min(10%持倉, 訂單金額/網格價)。
+
+    Returns:
+        每個候選一個結果字典：total_profit, max_drawdown, trade_count, grid_utilization,
+        range_utilization 等（鍵與 AIGridOptimizer 的回測結果一致）
+    """
+    prices = np.asarray(prices, dtype=float)
+    count = len(configs)
+    if count == 0:
+        return []
+    if len(prices) == 0:
+        return [{"error": "無歷史價格數據"} for _ in configs]
+
+    levels = build_level_matrix(configs)
+    amount = np.array([config.order_amount for config in configs], dtype=float)
+    max_position = np.array([config.max_position for config in configs], dtype=float)
+    lower = np.array([config.lower_limit for config in configs], dtype=float)
+    upper = np.array([config.upper_limit for config in configs], dtype=float)
+    buy_quantity = amount[:, None] / levels
+
+    buy_filled = np.zeros(levels.shape, dtype=bool)
+    sell_filled = np.zeros(levels.shape, dtype=bool)
+    position = np.zeros(count)
+    balance = np.full(count, float(initial_balance))
+    peak = np.full(count, float(initial_balance))
+    max_drawdown = np.zeros(count)
+    buy_count = np.zeros(count, dtype=np.int64)
+    sell_count = np.zeros(count, dtype=np.int64)
+    winning_sells = np.zeros(count, dtype=np.int64)
+    rows = np.arange(count)
+
+    # 所有候選的網格價格（排序），用於快速跳過沒有穿越任何網格線的價格
+    all_levels = np.unique(levels[~np.isnan(levels)]).tolist()
+
+    old = np.array([config.base_price for config in configs], dtype=float)
+    for step, price in enumerate(prices.tolist()):
+        if step == 0:
+            crossing = True
+        else:
+            low, high = (price, old) if price < old else (old, price)
+            crossing = (low != high and
+                        bisect.bisect_left(all_levels, low) < bisect.bisect_right(all_levels, high))
+
+        if crossing:
+            old_column = old[:, None] if step == 0 else old
+
+            # 買入：old > 網格價 >= price，按價格升序成交到倉位或資金不足為止
+            buy_mask = (levels < old_column) & (levels >= price) & ~buy_filled
+            if buy_mask.any():
+                quantity = np.where(buy_mask, buy_quantity, 0.0)
+                earlier_quantity = np.cumsum(quantity, axis=1) - quantity
+                earlier_count = np.cumsum(buy_mask, axis=1) - buy_mask
+                affordable = ((position[:, None] + earlier_quantity < max_position[:, None]) &
+                              (balance[:, None] - earlier_count * amount[:, None] >= amount[:, None]))
+                fired = buy_mask & affordable
+                filled = fired.sum(axis=1)
+                buy_filled |= fired
+                position += np.where(fired, quantity, 0.0).sum(axis=1)
+                balance -= filled * amount
+                buy_count += filled
+
+            # 賣出：old < 網格價 <= price，倉位逐筆遞減，按層級序號逐輪向量化處理
+            sell_mask = (levels > old_column) & (levels <= price) & ~sell_filled & (position > 0)[:, None]
+            while sell_mask.any():
+                active = sell_mask.any(axis=1)
+                column = np.argmax(sell_mask, axis=1)
+                level_price = levels[rows, column]
+                sell_quantity = np.where(active, np.minimum(position * 0.1, amount / level_price), 0.0)
+                fired = active & (sell_quantity > 0)
+
+                proceeds = sell_quantity * level_price
+                position -= np.where(fired, sell_quantity, 0.0)
+                balance += np.where(fired, proceeds, 0.0)
+                sell_count += fired
+                winning_sells += fired & (proceeds - amount > 0)
+                sell_filled[rows[fired], column[fired]] = True
+                sell_mask[rows[active], column[active]] = False
+
+        # 權益與最大回撤
+        equity = balance + position * price
+        np.maximum(peak, equity, out=peak)
+        np.maximum(max_drawdown, (peak - equity) / peak, out=max_drawdown)
+        old = price
+
+    final_price = float(prices[-1])
+    total_profit = balance + position * final_price - initial_balance
+    trade_count = buy_count + sell_count
+    in_range = ((prices[None, :] >= lower[:, None]) & (prices[None, :] <= upper[:, None])).mean(axis=1)
+
+    results = []
+    for i in range(count):
+        results.append({
+            "total_profit": float(total_profit[i]),
+            "max_drawdown": float(max_drawdown[i]),
+            "trade_count": int(trade_count[i]),
+            "buy_count": int(buy_count[i]),
+            "sell_count": int(sell_count[i]),
+            "win_rate": float(winning_sells[i] / sell_count[i]) if sell_count[i] else 0.0,
+            "sharpe_ratio": float(total_profit[i] / max(max_drawdown[i], 0.01)),
+            "final_position": float(position[i]),
+            "final_balance": float(balance[i]),
+            "grid_utilization": float(trade_count[i] / len(prices)),
+            "range_utilization": float(in_range[i])
+        })
+    return results
+
+
+class BatchGridBacktester:
+    """批量網格回測器"""
+
+    def __init__(self, initial_balance: float = 100000.0, workers: int = 1,
+                 min_chunk_size: int = 256):
+        """
+        初始化回測器
+
+        Args:
+            initial_balance: 每個候選的初始資金
+            workers: 進程數，大於1且候選數超過 min_chunk_size 時按進程分塊並行
+            min_chunk_size: 每個進程至少分到的候選數
+        """
+        self.initial_balance = initial_balance
+        self.workers = max(1, workers)
+        self.min_chunk_size = max(1, min_chunk_size)
+
+    def run(self, configs: Sequence[GridConfig], prices: Sequence[float],
+            workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """回測所有候選配置，結果順序與 configs 一致"""
+        configs = list(configs)
+        workers = max(1, workers if workers is not None else self.workers)
+        chunks = min(workers, len(configs) // self.min_chunk_size)
+
+        if chunks <= 1:
+            return simulate_grid_batch(configs, prices, self.initial_balance)
+
+        prices = np.asarray(prices, dtype=float)
+        bounds = np.linspace(0, len(configs), chunks + 1).astype(int)
+        parts = [configs[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        logger.info(f"⚙️ 批量網格回測: {len(configs)} 個候選分 {chunks} 個進程")
+        with ProcessPoolExecutor(max_workers=chunks) as executor:
+            futures = [executor.submit(simulate_grid_batch, part, prices, self.initial_balance)
+                       for part in parts]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+        return results
@@ -15,8 +15,19 @@ import json
 import math
 import numpy as np
 
+from .portfolio_risk_engine import PortfolioRiskEngine
+
 logger = logging.getLogger(__name__)
 
+# 沒有收益率數據時使用的先驗日波動率
+PRIOR_DAILY_VOLATILITY = {
+    "BTCTWD": 0.04,   # 4%日波動率
+    "ETHTWD": 0.05,   # 5%日波動率
+    "USDTTWD": 0.001, # 0.1%日波動率
+    "LTCTWD": 0.06,   # 6%日波動率
+    "BCHTWD": 0.07    # 7%日波動率
+}
+
 class RiskCategory(Enum):
     """風險類別"""
     MARKET_RISK = "market_risk"           # 市場風險
@@ -62,6 +73,9 @@ class GlobalRiskMetrics:
     daily_var_95: float = 0.0
     daily_var_99: float = 0.0
     expected_shortfall: float = 0.0
+    portfolio_volatility: float = 0.0      # 組合日波動率 (TWD)
+    historical_var_95: float = 0.0         # 歷史模擬 95% VaR
+    historical_var_99: float = 0.0         # 歷史模擬 99% VaR
     
     # 時間戳
     timestamp: datetime = field(default_factory=datetime.now)
@@ -86,6 +100,13 @@ class GlobalRiskConfig:
     risk_check_interval: float = 5.0       # 風險檢查間隔(秒)
     correlation_update_interval: float = 60.0 # 相關性更新間隔(秒)
     
+    # 風險模型
+    ewma_decay: float = 0.94               # EWMA協方差衰減係數
+    return_history_size: int = 1000        # 歷史模擬收益率窗口
+    returns_per_day: float = 1440.0        # 每天收益率期數 (1分鐘價格為1440)
+    var_method: str = "parametric"         # VaR方法: parametric / historical
+    min_historical_returns: int = 100      # 歷史模擬法所需最少收益率期數
+    
     # 警報閾值
     alert_thresholds: Dict[AlertLevel, float] = field(default_factory=lambda: {
         AlertLevel.INFO: 0.7,
@@ -113,6 +134,13 @@ class GlobalRiskManager:
         self.correlation_matrix: Dict[str, Dict[str, float]] = {}
         self.price_history: Dict[str, List[float]] = {}
         
+        # 矩陣化風險引擎（敞口、EWMA協方差與收益率窗口）
+        self.risk_engine = PortfolioRiskEngine(
+            decay=config.ewma_decay,
+            history_size=config.return_history_size,
+            periods_per_day=config.returns_per_day
+        )
+        
         # 風險限制狀態
         self.risk_violations: List[Dict[str, Any]] = []
         self.active_alerts: Dict[str, Dict[str, Any]] = {}
@@ -186,6 +214,7 @@ class GlobalRiskManager:
             
             # 註冊敞口
             self.risk_exposures[exposure_id] = exposure
+            self._ensure_risk_pair(pair)
             
             # 更新策略和交易對敞口
             self.strategy_exposures[strategy] = self.strategy_exposures.get(strategy, 0) + amount
@@ -273,6 +302,68 @@ class GlobalRiskManager:
             logger.error(f"❌ 移除風險敞口失敗: {e}")
             return False
     
+    def _ensure_risk_pair(self, pair: str):
+        """以先驗波動率和基礎相關性將交易對加入風險引擎"""
+        if not self.risk_engine.has_pair(pair):
+            self.risk_engine.add_pair(
+                pair,
+                PRIOR_DAILY_VOLATILITY.get(pair, 0.03),
+                {other: self._get_base_correlation(pair, other) for other in self.risk_engine.pairs}
+            )
+    
+    def load_return_history(self, returns: Dict[str, List[float]]):
+        """由已存儲的收益率序列 {pair: [單期收益率]} 初始化協方差與歷史窗口"""
+        try:
+            for pair in returns:
+                self._ensure_risk_pair(pair)
+            self.risk_engine.seed_returns(returns)
+            logger.info(f"📊 載入收益率歷史: {len(returns)} 個交易對, {self.risk_engine.history_length} 期")
+        except Exception as e:
+            logger.error(f"❌ 載入收益率歷史失敗: {e}")
+    
+    def load_risk_analytics(self, risk_analytics, timeframe: str = "1m",
+                            pairs: Optional[List[str]] = None):
+        """
+        由共享的風險分析服務載入收益率窗口（對數收益率轉為單期簡單收益率）
+        
+        Args:
+            risk_analytics: RiskAnalyticsService
+            timeframe: 收益率時間框架，應與 returns_per_day 一致
+            pairs: 要載入的交易對，默認為已登記敞口的交易對
+        """
+        returns = {}
+        for pair in (pairs if pairs is not None else list(self.pair_exposures)):
+            risk_analytics.refresh(pair, timeframe)
+            log_returns = risk_analytics.returns(pair, timeframe)
+            if len(log_returns):
+                returns[pair] = np.expm1(log_returns)
+        self.load_return_history(returns)
+    
+    async def update_market_prices(self, prices: Dict[str, float]) -> bool:
+        """
+        推送同一時點各交易對的最新價格
+        
+        由相鄰價格計算單期收益率並增量更新協方差，隨後重算風險指標
+        """
+        try:
+            returns = {}
+            for pair, price in prices.items():
+                history = self.price_history.setdefault(pair, [])
+                if history and history[-1] > 0:
+                    returns[pair] = price / history[-1] - 1
+                history.append(price)
+                if len(history) > 1000:
+                    self.price_history[pair] = history[-500:]
+                self._ensure_risk_pair(pair)
+            
+            self.risk_engine.update_returns(returns)
+            await self._update_risk_metrics()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ 更新市場價格失敗: {e}")
+            return False
+    
     async def _check_exposure_limits(self, pair: str, strategy: str, amount: float) -> bool:
         """檢查敞口限制"""
         try:
@@ -318,6 +409,9 @@ class GlobalRiskManager:
             
             metrics.concentration_ratio = metrics.max_single_pair_exposure / metrics.total_exposure if metrics.total_exposure > 0 else 0
             
+            # 同步敞口到風險引擎
+            self.risk_engine.set_exposures(self.pair_exposures)
+            
             # 計算相關性指標
             metrics.portfolio_correlation = await self._calculate_portfolio_correlation()
             metrics.diversification_ratio = await self._calculate_diversification_ratio()
@@ -325,6 +419,9 @@ class GlobalRiskManager:
             # 計算VaR指標
             metrics.daily_var_95, metrics.daily_var_99 = await self._calculate_var()
             metrics.expected_shortfall = await self._calculate_expected_shortfall()
+            metrics.portfolio_volatility = self.risk_engine.portfolio_volatility()
+            metrics.historical_var_95 = self.risk_engine.historical_var(0.95)
+            metrics.historical_var_99 = self.risk_engine.historical_var(0.99)
             
             # 更新當前指標
             self.current_metrics = metrics
@@ -341,142 +438,62 @@ class GlobalRiskManager:
             logger.error(f"❌ 更新風險指標失敗: {e}")
     
     async def _calculate_portfolio_correlation(self) -> float:
-        """計算投資組合相關性"""
+        """計算投資組合相關性（兩兩相關性按敞口權重加權的平均）"""
         try:
-            if len(self.pair_exposures) < 2:
-                return 0.0
-            
-            pairs = list(self.pair_exposures.keys())
-            correlations = []
-            
-            for i in range(len(pairs)):
-                for j in range(i + 1, len(pairs)):
-                    pair_a, pair_b = pairs[i], pairs[j]
-                    correlation = self.correlation_matrix.get(pair_a, {}).get(pair_b, 0.0)
-                    
-                    # 根據敞口加權
-                    weight_a = self.pair_exposures[pair_a] / self.current_metrics.total_exposure
-                    weight_b = self.pair_exposures[pair_b] / self.current_metrics.total_exposure
-                    weighted_correlation = correlation * weight_a * weight_b
-                    
-                    correlations.append(weighted_correlation)
-            
-            return sum(correlations) / len(correlations) if correlations else 0.0
+            return self.risk_engine.weighted_correlation()
             
         except Exception as e:
             logger.error(f"❌ 計算投資組合相關性失敗: {e}")
             return 0.0
     
     async def _calculate_diversification_ratio(self) -> float:
-        """計算分散化比率"""
+        """計算分散化比率 (加權平均波動率 / 投資組合波動率)"""
         try:
-            if not self.pair_exposures or len(self.pair_exposures) < 2:
-                return 1.0  # 單一資產，無分散化
-            
-            # 計算權重
-            total_exposure = sum(self.pair_exposures.values())
-            weights = {pair: exposure / total_exposure for pair, exposure in self.pair_exposures.items()}
-            
-            # 計算加權平均波動率
-            weighted_volatility = 0.0
-            for pair, weight in weights.items():
-                # 模擬波動率數據
-                volatility = self._get_pair_volatility(pair)
-                weighted_volatility += weight * volatility
-            
-            # 計算投資組合波動率（考慮相關性）
-            portfolio_variance = 0.0
-            pairs = list(weights.keys())
-            
-            for i, pair_a in enumerate(pairs):
-                for j, pair_b in enumerate(pairs):
-                    weight_a = weights[pair_a]
-                    weight_b = weights[pair_b]
-                    vol_a = self._get_pair_volatility(pair_a)
-                    vol_b = self._get_pair_volatility(pair_b)
-                    
-                    if i == j:
-                        correlation = 1.0
-                    else:
-                        correlation = self.correlation_matrix.get(pair_a, {}).get(pair_b, 0.0)
-                    
-                    portfolio_variance += weight_a * weight_b * vol_a * vol_b * correlation
-            
-            portfolio_volatility = math.sqrt(portfolio_variance)
-            
-            # 分散化比率 = 加權平均波動率 / 投資組合波動率
-            diversification_ratio = weighted_volatility / portfolio_volatility if portfolio_volatility > 0 else 1.0
-            
-            return min(diversification_ratio, 2.0)  # 限制最大值
+            return self.risk_engine.diversification_ratio(cap=2.0)  # 限制最大值
             
         except Exception as e:
             logger.error(f"❌ 計算分散化比率失敗: {e}")
             return 1.0
     
     def _get_pair_volatility(self, pair: str) -> float:
-        """獲取交易對波動率"""
+        """獲取交易對日波動率（EWMA估計，未知交易對使用先驗值）"""
         try:
-            # 模擬波動率數據
-            volatility_map = {
-                "BTCTWD": 0.04,   # 4%日波動率
-                "ETHTWD": 0.05,   # 5%日波動率
-                "USDTTWD": 0.001, # 0.1%日波動率
-                "LTCTWD": 0.06,   # 6%日波動率
-                "BCHTWD": 0.07    # 7%日波動率
-            }
-            return volatility_map.get(pair, 0.03)  # 默認3%
+            volatility = self.risk_engine.volatility(pair)
+            if volatility is not None:
+                return volatility
+            return PRIOR_DAILY_VOLATILITY.get(pair, 0.03)  # 默認3%
             
         except Exception as e:
             logger.error(f"❌ 獲取交易對波動率失敗: {e}")
             return 0.03
     
+    def _use_historical_var(self) -> bool:
+        return (self.config.var_method == "historical" and
+                self.risk_engine.history_length >= self.config.min_historical_returns)
+    
     async def _calculate_var(self) -> Tuple[float, float]:
-        """計算VaR (Value at Risk)"""
+        """計算VaR (Value at Risk)：參數法基於EWMA協方差，歷史法基於收益率窗口"""
         try:
             if not self.pair_exposures:
                 return 0.0, 0.0
             
-            # 簡化的VaR計算
-            total_exposure = sum(self.pair_exposures.values())
-            
-            # 計算投資組合日波動率
-            portfolio_volatility = 0.0
-            total_weight = 0.0
-            
-            for pair, exposure in self.pair_exposures.items():
-                weight = exposure / total_exposure
-                volatility = self._get_pair_volatility(pair)
-                portfolio_volatility += weight * volatility
-                total_weight += weight
-            
-            if total_weight > 0:
-                portfolio_volatility /= total_weight
-            
-            # VaR計算 (假設正態分布)
-            # 95% VaR = 1.645 * 波動率 * 敞口
-            # 99% VaR = 2.326 * 波動率 * 敞口
-            var_95 = 1.645 * portfolio_volatility * total_exposure
-            var_99 = 2.326 * portfolio_volatility * total_exposure
-            
-            return var_95, var_99
+            if self._use_historical_var():
+                return self.risk_engine.historical_var(0.95), self.risk_engine.historical_var(0.99)
+            return self.risk_engine.parametric_var(0.95), self.risk_engine.parametric_var(0.99)
             
         except Exception as e:
             logger.error(f"❌ 計算VaR失敗: {e}")
             return 0.0, 0.0
     
     async def _calculate_expected_shortfall(self) -> float:
-        """計算預期損失 (Expected Shortfall)"""
+        """計算99%預期損失 (Expected Shortfall)"""
         try:
             if not self.pair_exposures:
                 return 0.0
             
-            # 簡化的ES計算
-            _, var_99 = await self._calculate_var()
-            
-            # ES通常比VaR高20-30%
-            expected_shortfall = var_99 * 1.25
-            
-            return expected_shortfall
+            if self._use_historical_var():
+                return self.risk_engine.historical_es(0.99)
+            return self.risk_engine.parametric_es(0.99)
             
         except Exception as e:
             logger.error(f"❌ 計算預期損失失敗: {e}")
@@ -640,33 +657,15 @@ class GlobalRiskManager:
                 await asyncio.sleep(1.0)
     
     async def _update_correlation_matrix(self):
-        """更新相關性矩陣"""
+        """由風險引擎的EWMA協方差刷新相關性矩陣"""
         try:
-            # 模擬相關性矩陣更新
-            import random
+            pairs = self.risk_engine.pairs
+            correlation = self.risk_engine.correlation()
             
-            pairs = list(set(exp.pair for exp in self.risk_exposures.values()))
-            
-            for pair_a in pairs:
-                if pair_a not in self.correlation_matrix:
-                    self.correlation_matrix[pair_a] = {}
-                
-                for pair_b in pairs:
-                    if pair_a != pair_b:
-                        # 模擬相關性計算
-                        if pair_b not in self.correlation_matrix[pair_a]:
-                            # 基於交易對類型設置基礎相關性
-                            base_correlation = self._get_base_correlation(pair_a, pair_b)
-                            # 添加隨機波動
-                            correlation = base_correlation + random.uniform(-0.1, 0.1)
-                            correlation = max(-1.0, min(1.0, correlation))  # 限制在[-1, 1]
-                            
-                            self.correlation_matrix[pair_a][pair_b] = correlation
-                            
-                            # 確保對稱性
-                            if pair_b not in self.correlation_matrix:
-                                self.correlation_matrix[pair_b] = {}
-                            self.correlation_matrix[pair_b][pair_a] = correlation
+            self.correlation_matrix = {
+                pair_a: {pair_b: float(correlation[i, j]) for j, pair_b in enumerate(pairs) if i != j}
+                for i, pair_a in enumerate(pairs)
+            }
             
         except Exception as e:
             logger.error(f"❌ 更新相關性矩陣失敗: {e}")
@@ -711,14 +710,8 @@ class GlobalRiskManager:
             )
             
             # 更新平均相關性
-            if self.correlation_matrix:
-                correlations = []
-                for pair_a in self.correlation_matrix:
-                    for pair_b, correlation in self.correlation_matrix[pair_a].items():
-                        correlations.append(abs(correlation))
-                
-                if correlations:
-                    self.risk_stats['avg_correlation'] = sum(correlations) / len(correlations)
+            if len(self.risk_engine.pairs) >= 2:
+                self.risk_stats['avg_correlation'] = self.risk_engine.average_abs_correlation()
             
             # 更新分散化分數
             self.risk_stats['diversification_score'] = self.current_metrics.diversification_ratio
@@ -761,7 +754,10 @@ class GlobalRiskManager:
                     'diversification_ratio': self.current_metrics.diversification_ratio,
                     'daily_var_95': self.current_metrics.daily_var_95,
                     'daily_var_99': self.current_metrics.daily_var_99,
-                    'expected_shortfall': self.current_metrics.expected_shortfall
+                    'expected_shortfall': self.current_metrics.expected_shortfall,
+                    'portfolio_volatility': self.current_metrics.portfolio_volatility,
+                    'historical_var_95': self.current_metrics.historical_var_95,
+                    'historical_var_99': self.current_metrics.historical_var_99
                 },
                 'exposures': {
                     'total_exposures': len(self.risk_exposures),
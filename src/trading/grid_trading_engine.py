@@ -6,6 +6,7 @@
 """
 
 import asyncio
+import bisect
 import logging
 import json
 import time
@@ -111,10 +112,33 @@ class GridTradingEngine:
         # 績效統計
         self.performance = GridPerformance()
         
+        # 按價格排序的網格索引與緊湊的可觸發標記（由 _rebuild_level_index 與 grid_levels 同步）
+        self._level_prices: List[float] = []
+        self._level_numbers: List[int] = []
+        self._buy_armed = np.zeros(0, dtype=bool)
+        self._sell_armed = np.zeros(0, dtype=bool)
+        
         # 價格監控
         self.current_price = config.base_price
         self.price_history: List[Tuple[datetime, float]] = []
         
+        # 價格窗口的增量統計（回撤與收益率的 Welford 均值/平方差和，窗口截斷時重算）
+        self._window_peak = 0.0
+        self._window_drawdown = 0.0
+        self._return_mean = 0.0
+        self._return_m2 = 0.0
+        self._return_count = 0
+        
+        # 成交的增量累計
+        self._buy_cost = 0.0          # 買入成本 (含手續費)
+        self._buy_quantity = 0.0      # 買入數量
+        self._sell_proceeds = 0.0     # 賣出所得 (扣手續費)
+        self._filled_orders = 0       # 成交訂單數
+        self._profitable_sells = 0    # 盈利的賣出訂單數
+        
+        # 模擬訂單執行延遲 (秒)
+        self.simulated_order_latency = 0.1
+        
         # 風險控制
         self.current_position = 0.0  # 當前倉位
         self.available_balance = 0.0  # 可用餘額
@@ -183,12 +207,24 @@ class GridTradingEngine:
                         price=level_price
                     )
             
+            self._rebuild_level_index()
+            
             logger.info(f"📊 計算網格層級: {len(self.grid_levels)} 個有效層級")
             
         except Exception as e:
             logger.error(f"❌ 計算網格層級失敗: {e}")
             raise
     
+    def _rebuild_level_index(self):
+        """按價格重建網格索引與可觸發標記（直接修改 grid_levels 後需調用）"""
+        ordered = sorted(self.grid_levels.items(), key=lambda item: item[1].price)
+        self._level_prices = [grid_level.price for _, grid_level in ordered]
+        self._level_numbers = [level_num for level_num, _ in ordered]
+        self._buy_armed = np.array([not grid_level.buy_filled and grid_level.buy_order_id is None
+                                    for _, grid_level in ordered], dtype=bool)
+        self._sell_armed = np.array([not grid_level.sell_filled and grid_level.sell_order_id is None
+                                     for _, grid_level in ordered], dtype=bool)
+    
     def _validate_grid_config(self) -> bool:
         """驗證網格配置"""
         try:
@@ -225,11 +261,7 @@ class GridTradingEngine:
         try:
             old_price = self.current_price
             self.current_price = new_price
-            self.price_history.append((datetime.now(), new_price))
-            
-            # 保持價格歷史在合理範圍內
-            if len(self.price_history) > 1000:
-                self.price_history = self.price_history[-500:]
+            self._record_price(new_price)
             
             # 檢查網格觸發
             triggered_actions = await self._check_grid_triggers(old_price, new_price)
@@ -249,36 +281,88 @@ class GridTradingEngine:
             logger.error(f"❌ 價格更新失敗: {e}")
             return {"price_updated": False, "error": str(e)}
     
+    def _record_price(self, price: float):
+        """記錄價格並增量更新窗口回撤與收益率統計"""
+        if self.price_history:
+            prev_price = self.price_history[-1][1]
+            ret = (price - prev_price) / prev_price
+            self._return_count += 1
+            delta = ret - self._return_mean
+            self._return_mean += delta / self._return_count
+            self._return_m2 += delta * (ret - self._return_mean)
+            if price > self._window_peak:
+                self._window_peak = price
+            drawdown = (self._window_peak - price) / self._window_peak
+            if drawdown > self._window_drawdown:
+                self._window_drawdown = drawdown
+        else:
+            self._window_peak = price
+        
+        self.price_history.append((datetime.now(), price))
+        
+        # 保持價格歷史在合理範圍內
+        if len(self.price_history) > 1000:
+            self.price_history = self.price_history[-500:]
+            self._reset_window_stats()
+    
+    def _reset_window_stats(self):
+        """價格窗口截斷後重算回撤與收益率累計"""
+        prices = np.array([price for _, price in self.price_history], dtype=float)
+        peaks = np.maximum.accumulate(prices)
+        returns = np.diff(prices) / prices[:-1]
+        self._window_peak = float(peaks[-1])
+        self._window_drawdown = float(((peaks - prices) / peaks).max())
+        self._return_mean = float(returns.mean()) if len(returns) else 0.0
+        self._return_m2 = float(((returns - self._return_mean) ** 2).sum())
+        self._return_count = len(returns)
+    
     async def _check_grid_triggers(self, old_price: float, new_price: float) -> List[Dict[str, Any]]:
-        """檢查網格觸發"""
+        """
+        檢查網格觸發
+        
+        在排序的網格價格上二分定位 old_price 到 new_price 之間被穿過的層級，
+        只處理其中仍可觸發的層級；沒有穿過網格線的價格更新為 O(log n)
+        """
         triggered_actions = []
         
         try:
             if self.status != GridStatus.ACTIVE:
                 return triggered_actions
             
-            # 檢查每個網格層級
-            for level_num, grid_level in self.grid_levels.items():
-                level_price = grid_level.price
-                
-                # 檢查買入觸發 (價格下跌穿過網格線)
-                if (old_price > level_price >= new_price and 
-                    not grid_level.buy_filled and 
-                    grid_level.buy_order_id is None):
-                    
-                    buy_action = await self._trigger_buy_order(level_num, grid_level)
-                    if buy_action:
-                        triggered_actions.append(buy_action)
-                
-                # 檢查賣出觸發 (價格上漲穿過網格線)
-                if (old_price < level_price <= new_price and 
-                    not grid_level.sell_filled and 
-                    grid_level.sell_order_id is None and
-                    self.current_position > 0):
+            if new_price < old_price:
+                # 買入觸發 (價格下跌穿過網格線): new_price <= 網格價 < old_price
+                lo = bisect.bisect_left(self._level_prices, new_price)
+                hi = bisect.bisect_left(self._level_prices, old_price)
+                armed, is_buy = self._buy_armed, True
+            elif new_price > old_price and self.current_position > 0:
+                # 賣出觸發 (價格上漲穿過網格線): old_price < 網格價 <= new_price
+                lo = bisect.bisect_right(self._level_prices, old_price)
+                hi = bisect.bisect_right(self._level_prices, new_price)
+                armed, is_buy = self._sell_armed, False
+            else:
+                lo = hi = 0
+            
+            if lo < hi:
+                for offset in np.flatnonzero(armed[lo:hi]):
+                    index = lo + int(offset)
+                    level_num = self._level_numbers[index]
+                    grid_level = self.grid_levels[level_num]
                     
-                    sell_action = await self._trigger_sell_order(level_num, grid_level)
-                    if sell_action:
-                        triggered_actions.append(sell_action)
+                    if is_buy:
+                        if not grid_level.buy_filled and grid_level.buy_order_id is None:
+                            buy_action = await self._trigger_buy_order(level_num, grid_level)
+                            if buy_action:
+                                triggered_actions.append(buy_action)
+                        self._buy_armed[index] = not grid_level.buy_filled and grid_level.buy_order_id is None
+                    else:
+                        # 倉位在上漲過程中只減不增，賣完即可停止
+                        if self.current_position <= 0:
+                            break
+                        if not grid_level.sell_filled and grid_level.sell_order_id is None:
+                            sell_action = await self._trigger_sell_order(level_num, grid_level)
+                            if sell_action:
+                                triggered_actions.append(sell_action)
+                        self._sell_armed[index] = not grid_level.sell_filled and grid_level.sell_order_id is None
             
             # 檢查止損止盈
             stop_actions = await self._check_stop_conditions(new_price)
@@ -430,7 +514,8 @@ class GridTradingEngine:
         """執行訂單 (模擬)"""
         try:
             # 模擬訂單執行延遲
-            await asyncio.sleep(0.1)
+            if self.simulated_order_latency > 0:
+                await asyncio.sleep(self.simulated_order_latency)
             
             # 模擬成交 (實際應該調用交易所API)
             order.status = OrderStatus.FILLED
@@ -443,15 +528,26 @@ class GridTradingEngine:
             if order.order_type == OrderType.BUY:
                 self.current_position += order.quantity
                 self.available_balance -= (order.quantity * order.price + order.commission)
+                self._buy_cost += order.filled_quantity * order.filled_price + order.commission
+                self._buy_quantity += order.filled_quantity
             else:
                 self.current_position -= order.quantity
                 self.available_balance += (order.quantity * order.price - order.commission)
+                self._sell_proceeds += order.filled_quantity * order.filled_price - order.commission
             
             # 移動到歷史記錄
             self.order_history.append(order)
+            self._filled_orders += 1
             if order.order_id in self.active_orders:
                 del self.active_orders[order.order_id]
             
+            # 賣出盈利在成交時確定
+            trade_profit = 0.0
+            if order.order_type == OrderType.SELL:
+                trade_profit = self._calculate_trade_profit(order)
+                if trade_profit > 0:
+                    self._profitable_sells += 1
+            
             # 更新網格層級狀態
             grid_level = self.grid_levels.get(order.grid_level)
             if grid_level:
@@ -460,7 +556,7 @@ class GridTradingEngine:
                 else:
                     grid_level.sell_filled = True
                     # 計算盈利
-                    grid_level.profit_realized += self._calculate_trade_profit(order)
+                    grid_level.profit_realized += trade_profit
                 
                 grid_level.last_update = datetime.now()
             
@@ -601,18 +697,10 @@ class GridTradingEngine:
         return None
     
     def _update_performance_stats(self):
-        """更新績效統計"""
+        """更新績效統計（基於成交累計與價格窗口的增量統計，每次價格更新 O(1)）"""
         try:
             # 計算已實現盈利
-            realized_profit = sum(
-                order.filled_quantity * order.filled_price - order.commission
-                for order in self.order_history
-                if order.status == OrderStatus.FILLED and order.order_type == OrderType.SELL
-            ) - sum(
-                order.filled_quantity * order.filled_price + order.commission
-                for order in self.order_history
-                if order.status == OrderStatus.FILLED and order.order_type == OrderType.BUY
-            )
+            realized_profit = self._sell_proceeds - self._buy_cost
             
             # 計算未實現盈利
             unrealized_profit = 0.0
@@ -626,16 +714,11 @@ class GridTradingEngine:
             self.performance.total_profit = realized_profit + unrealized_profit
             
             # 計算交易統計
-            filled_orders = [o for o in self.order_history if o.status == OrderStatus.FILLED]
-            self.performance.total_trades = len(filled_orders)
+            self.performance.total_trades = self._filled_orders
             
             if self.performance.total_trades > 0:
-                profitable_trades = sum(1 for order in filled_orders 
-                                      if order.order_type == OrderType.SELL and 
-                                      self._calculate_trade_profit(order) > 0)
-                
-                self.performance.successful_trades = profitable_trades
-                self.performance.win_rate = profitable_trades / (self.performance.total_trades / 2)  # 除以2因為買賣成對
+                self.performance.successful_trades = self._profitable_sells
+                self.performance.win_rate = self._profitable_sells / (self.performance.total_trades / 2)  # 除以2因為買賣成對
                 self.performance.average_profit_per_trade = realized_profit / (self.performance.total_trades / 2)
             
             # 計算最大回撤
@@ -651,69 +734,27 @@ class GridTradingEngine:
     
     def _calculate_average_buy_price(self) -> float:
         """計算平均買入價格"""
-        try:
-            buy_orders = [o for o in self.order_history 
-                         if o.status == OrderStatus.FILLED and o.order_type == OrderType.BUY]
-            
-            if not buy_orders:
-                return self.config.base_price
-            
-            total_cost = sum(o.filled_quantity * o.filled_price + o.commission for o in buy_orders)
-            total_quantity = sum(o.filled_quantity for o in buy_orders)
-            
-            return total_cost / total_quantity if total_quantity > 0 else self.config.base_price
-            
-        except Exception:
+        if self._buy_quantity <= 0:
             return self.config.base_price
+        return self._buy_cost / self._buy_quantity
     
     def _calculate_max_drawdown(self) -> float:
-        """計算最大回撤"""
-        try:
-            if len(self.price_history) < 2:
-                return 0.0
-            
-            peak = self.price_history[0][1]
-            max_drawdown = 0.0
-            
-            for _, price in self.price_history:
-                if price > peak:
-                    peak = price
-                
-                drawdown = (peak - price) / peak
-                max_drawdown = max(max_drawdown, drawdown)
-            
-            return max_drawdown
-            
-        except Exception:
+        """計算價格窗口內的最大回撤"""
+        if len(self.price_history) < 2:
             return 0.0
+        return self._window_drawdown
     
     def _calculate_sharpe_ratio(self) -> float:
-        """計算夏普比率"""
-        try:
-            if len(self.price_history) < 30:  # 需要足夠的數據點
-                return 0.0
-            
-            # 計算收益率序列
-            returns = []
-            for i in range(1, len(self.price_history)):
-                prev_price = self.price_history[i-1][1]
-                curr_price = self.price_history[i][1]
-                returns.append((curr_price - prev_price) / prev_price)
-            
-            if not returns:
-                return 0.0
-            
-            # 計算平均收益率和標準差
-            avg_return = np.mean(returns)
-            std_return = np.std(returns)
-            
-            # 假設無風險利率為0
-            sharpe_ratio = avg_return / std_return if std_return > 0 else 0.0
-            
-            return sharpe_ratio
-            
-        except Exception:
+        """計算價格窗口內收益率的夏普比率"""
+        if len(self.price_history) < 30 or self._return_count == 0:  # 需要足夠的數據點
             return 0.0
+        
+        # 計算平均收益率和標準差
+        avg_return = self._return_mean
+        std_return = np.sqrt(max(self._return_m2 / self._return_count, 0.0))
+        
+        # 假設無風險利率為0
+        return avg_return / std_return if std_return > 0 else 0.0
     
     def pause_grid(self) -> bool:
         """暫停網格"""
@@ -747,6 +788,8 @@ class GridTradingEngine:
             # 取消所有活躍訂單
             cancelled_orders = []
             for order_id, order in self.active_orders.items():
+                if order.status == OrderStatus.FILLED:
+                    continue  # 已成交訂單保留在歷史中
                 order.status = OrderStatus.CANCELLED
                 cancelled_orders.append(order_id)
             
@@ -6,7 +6,6 @@
 """
 
 import asyncio
-import aiohttp
 import hmac
 import hashlib
 import time
@@ -19,6 +18,11 @@ from enum import Enum
 import base64
 from urllib.parse import urlencode
 
+try:
+    from ..data.max_transport import get_max_transport
+except ImportError:
+    from data.max_transport import get_max_transport
+
 logger = logging.getLogger(__name__)
 
 class OrderType(Enum):
@@ -99,7 +103,9 @@ class LiveMAXAPIConnector:
         
         # 連接狀態
         self.is_connected = False
-        self.session: Optional[aiohttp.ClientSession] = None
+        # 進程共用的連接池（保持連接、端點並發限制、重試退避）
+        self.transport = get_max_transport()
+        self.timeout = 30
         
         # 訂單追蹤
         self.active_orders: Dict[int, OrderResponse] = {}
@@ -120,10 +126,6 @@ class LiveMAXAPIConnector:
     async def connect(self) -> bool:
         """建立API連接"""
         try:
-            # 創建HTTP會話
-            timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(timeout=timeout)
-            
             # 測試API連接
             if await self._test_connection():
                 self.is_connected = True
@@ -145,10 +147,6 @@ class LiveMAXAPIConnector:
     async def disconnect(self) -> None:
         """斷開API連接"""
         try:
-            if self.session:
-                await self.session.close()
-                self.session = None
-            
             self.is_connected = False
             logger.info("🔌 MAX API連接已斷開")
             
@@ -161,15 +159,15 @@ class LiveMAXAPIConnector:
             # 測試公開API
             url = f"{self.base_url}/api/v2/markets"
             
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    logger.info(f"📊 獲取到 {len(data)} 個交易市場")
-                    return True
-                else:
-                    logger.error(f"❌ API測試失敗，狀態碼: {response.status}")
-                    return False
-                    
+            response = await self.transport.request("GET", url, timeout=self.timeout)
+            if response.status == 200:
+                data = response.json()
+                logger.info(f"📊 獲取到 {len(data)} 個交易市場")
+                return True
+            else:
+                logger.error(f"❌ API測試失敗，狀態碼: {response.status}")
+                return False
+                
         except Exception as e:
             logger.error(f"❌ 連接測試異常: {e}")
             return False
@@ -225,22 +223,22 @@ class LiveMAXAPIConnector:
             
             url = f"{self.base_url}{path}"
             
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    accounts = await response.json()
-                    
-                    # 更新帳戶餘額
-                    for account in accounts:
-                        currency = account['currency']
-                        balance = float(account['balance'])
-                        self.account_balance[currency] = balance
-                    
-                    logger.info(f"💰 帳戶餘額更新: {self.account_balance}")
-                    return True
-                else:
-                    logger.error(f"❌ 獲取帳戶信息失敗，狀態碼: {response.status}")
-                    return False
-                    
+            response = await self.transport.request("GET", url, headers=headers, timeout=self.timeout)
+            if response.status == 200:
+                accounts = response.json()
+                
+                # 更新帳戶餘額
+                for account in accounts:
+                    currency = account['currency']
+                    balance = float(account['balance'])
+                    self.account_balance[currency] = balance
+                
+                logger.info(f"💰 帳戶餘額更新: {self.account_balance}")
+                return True
+            else:
+                logger.error(f"❌ 獲取帳戶信息失敗，狀態碼: {response.status}")
+                return False
+                
         except Exception as e:
             logger.error(f"❌ 獲取帳戶信息異常: {e}")
             return False
@@ -250,21 +248,21 @@ class LiveMAXAPIConnector:
         try:
             url = f"{self.base_url}/api/v2/tickers"
             
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    tickers = await response.json()
-                    
-                    # 更新價格數據
-                    for market, ticker in tickers.items():
-                        if 'last' in ticker:
-                            self.current_prices[market] = float(ticker['last'])
-                    
-                    logger.info(f"📈 價格數據更新: {len(self.current_prices)} 個市場")
-                    return True
-                else:
-                    logger.error(f"❌ 獲取價格失敗，狀態碼: {response.status}")
-                    return False
-                    
+            response = await self.transport.request("GET", url, timeout=self.timeout)
+            if response.status == 200:
+                tickers = response.json()
+                
+                # 更新價格數據
+                for market, ticker in tickers.items():
+                    if 'last' in ticker:
+                        self.current_prices[market] = float(ticker['last'])
+                
+                logger.info(f"📈 價格數據更新: {len(self.current_prices)} 個市場")
+                return True
+            else:
+                logger.error(f"❌ 獲取價格失敗，狀態碼: {response.status}")
+                return False
+                
         except Exception as e:
             logger.error(f"❌ 獲取價格異常: {e}")
             return False
@@ -422,40 +420,41 @@ class LiveMAXAPIConnector:
             
             url = f"{self.base_url}{path}"
             
-            async with self.session.post(url, headers=headers, json=params) as response:
-                if response.status == 201:  # 創建成功
-                    order_data = await response.json()
-                    
-                    # 解析訂單回應
-                    order_response = OrderResponse(
-                        id=order_data['id'],
-                        market=order_data['market'],
-                        side=order_data['side'],
-                        order_type=order_data['ord_type'],
-                        volume=float(order_data['volume']),
-                        price=float(order_data['price']) if order_data.get('price') else None,
-                        state=order_data['state'],
-                        created_at=datetime.fromisoformat(order_data['created_at'].replace('Z', '+00:00')),
-                        trades_count=order_data.get('trades_count', 0),
-                        remaining_volume=float(order_data.get('remaining_volume', 0)),
-                        executed_volume=float(order_data.get('executed_volume', 0)),
-                        avg_price=float(order_data['avg_price']) if order_data.get('avg_price') else None,
-                        client_oid=order_data.get('client_oid')
-                    )
-                    
-                    # 記錄訂單
-                    self.active_orders[order_response.id] = order_response
-                    self.order_history.append(order_response)
-                    self.daily_trade_count += 1
-                    
-                    logger.info(f"✅ 真實訂單提交成功 - ID: {order_response.id}")
-                    return True, order_response, "訂單提交成功"
-                    
-                else:
-                    error_text = await response.text()
-                    logger.error(f"❌ 下單失敗，狀態碼: {response.status}, 錯誤: {error_text}")
-                    return False, None, f"下單失敗: {error_text}"
-                    
+            response = await self.transport.request("POST", url, headers=headers, json_body=params,
+                                                    timeout=self.timeout)
+            if response.status == 201:  # 創建成功
+                order_data = response.json()
+                
+                # 解析訂單回應
+                order_response = OrderResponse(
+                    id=order_data['id'],
+                    market=order_data['market'],
+                    side=order_data['side'],
+                    order_type=order_data['ord_type'],
+                    volume=float(order_data['volume']),
+                    price=float(order_data['price']) if order_data.get('price') else None,
+                    state=order_data['state'],
+                    created_at=datetime.fromisoformat(order_data['created_at'].replace('Z', '+00:00')),
+                    trades_count=order_data.get('trades_count', 0),
+                    remaining_volume=float(order_data.get('remaining_volume', 0)),
+                    executed_volume=float(order_data.get('executed_volume', 0)),
+                    avg_price=float(order_data['avg_price']) if order_data.get('avg_price') else None,
+                    client_oid=order_data.get('client_oid')
+                )
+                
+                # 記錄訂單
+                self.active_orders[order_response.id] = order_response
+                self.order_history.append(order_response)
+                self.daily_trade_count += 1
+                
+                logger.info(f"✅ 真實訂單提交成功 - ID: {order_response.id}")
+                return True, order_response, "訂單提交成功"
+                
+            else:
+                error_text = response.text
+                logger.error(f"❌ 下單失敗，狀態碼: {response.status}, 錯誤: {error_text}")
+                return False, None, f"下單失敗: {error_text}"
+                
         except Exception as e:
             logger.error(f"❌ 真實下單異常: {e}")
             return False, None, str(e)
@@ -479,35 +478,35 @@ class LiveMAXAPIConnector:
             
             url = f"{self.base_url}{path}"
             
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    order_data = await response.json()
-                    
-                    order_response = OrderResponse(
-                        id=order_data['id'],
-                        market=order_data['market'],
-                        side=order_data['side'],
-                        order_type=order_data['ord_type'],
-                        volume=float(order_data['volume']),
-                        price=float(order_data['price']) if order_data.get('price') else None,
-                        state=order_data['state'],
-                        created_at=datetime.fromisoformat(order_data['created_at'].replace('Z', '+00:00')),
-                        trades_count=order_data.get('trades_count', 0),
-                        remaining_volume=float(order_data.get('remaining_volume', 0)),
-                        executed_volume=float(order_data.get('executed_volume', 0)),
-                        avg_price=float(order_data['avg_price']) if order_data.get('avg_price') else None,
-                        client_oid=order_data.get('client_oid')
-                    )
-                    
-                    # 更新本地記錄
-                    if order_id in self.active_orders:
-                        self.active_orders[order_id] = order_response
-                    
-                    return True, order_response, "訂單狀態查詢成功"
-                else:
-                    error_text = await response.text()
-                    return False, None, f"查詢失敗: {error_text}"
-                    
+            response = await self.transport.request("GET", url, headers=headers, timeout=self.timeout)
+            if response.status == 200:
+                order_data = response.json()
+                
+                order_response = OrderResponse(
+                    id=order_data['id'],
+                    market=order_data['market'],
+                    side=order_data['side'],
+                    order_type=order_data['ord_type'],
+                    volume=float(order_data['volume']),
+                    price=float(order_data['price']) if order_data.get('price') else None,
+                    state=order_data['state'],
+                    created_at=datetime.fromisoformat(order_data['created_at'].replace('Z', '+00:00')),
+                    trades_count=order_data.get('trades_count', 0),
+                    remaining_volume=float(order_data.get('remaining_volume', 0)),
+                    executed_volume=float(order_data.get('executed_volume', 0)),
+                    avg_price=float(order_data['avg_price']) if order_data.get('avg_price') else None,
+                    client_oid=order_data.get('client_oid')
+                )
+                
+                # 更新本地記錄
+                if order_id in self.active_orders:
+                    self.active_orders[order_id] = order_response
+                
+                return True, order_response, "訂單狀態查詢成功"
+            else:
+                error_text = response.text
+                return False, None, f"查詢失敗: {error_text}"
+                
         except Exception as e:
             logger.error(f"❌ 查詢訂單狀態異常: {e}")
             return False, None, str(e)
@@ -534,18 +533,18 @@ class LiveMAXAPIConnector:
             
             url = f"{self.base_url}{path}"
             
-            async with self.session.delete(url, headers=headers) as response:
-                if response.status == 200:
-                    # 從活躍訂單中移除
-                    if order_id in self.active_orders:
-                        del self.active_orders[order_id]
-                    
-                    logger.info(f"✅ 訂單取消成功 - ID: {order_id}")
-                    return True, "訂單取消成功"
-                else:
-                    error_text = await response.text()
-                    return False, f"取消失敗: {error_text}"
-                    
+            response = await self.transport.request("DELETE", url, headers=headers, timeout=self.timeout)
+            if response.status == 200:
+                # 從活躍訂單中移除
+                if order_id in self.active_orders:
+                    del self.active_orders[order_id]
+                
+                logger.info(f"✅ 訂單取消成功 - ID: {order_id}")
+                return True, "訂單取消成功"
+            else:
+                error_text = response.text
+                return False, f"取消失敗: {error_text}"
+                
         except Exception as e:
             logger.error(f"❌ 取消訂單異常: {e}")
             return False, str(e)
@@ -567,30 +566,30 @@ class LiveMAXAPIConnector:
             
             url = f"{self.base_url}{path}"
             
-            async with self.session.get(url, headers=headers, params=params) as response:
-                if response.status == 200:
-                    trades_data = await response.json()
-                    
-                    trades = []
-                    for trade_data in trades_data:
-                        trade = TradeExecution(
-                            id=trade_data['id'],
-                            order_id=trade_data['order_id'],
-                            market=trade_data['market'],
-                            side=trade_data['side'],
-                            volume=float(trade_data['volume']),
-                            price=float(trade_data['price']),
-                            fee=float(trade_data['fee']),
-                            fee_currency=trade_data['fee_currency'],
-                            created_at=datetime.fromisoformat(trade_data['created_at'].replace('Z', '+00:00'))
-                        )
-                        trades.append(trade)
-                    
-                    return trades
-                else:
-                    logger.error(f"❌ 獲取交易歷史失敗，狀態碼: {response.status}")
-                    return []
-                    
+            response = await self.transport.request("GET", url, headers=headers, params=params, timeout=self.timeout)
+            if response.status == 200:
+                trades_data = response.json()
+                
+                trades = []
+                for trade_data in trades_data:
+                    trade = TradeExecution(
+                        id=trade_data['id'],
+                        order_id=trade_data['order_id'],
+                        market=trade_data['market'],
+                        side=trade_data['side'],
+                        volume=float(trade_data['volume']),
+                        price=float(trade_data['price']),
+                        fee=float(trade_data['fee']),
+                        fee_currency=trade_data['fee_currency'],
+                        created_at=datetime.fromisoformat(trade_data['created_at'].replace('Z', '+00:00'))
+                    )
+                    trades.append(trade)
+                
+                return trades
+            else:
+                logger.error(f"❌ 獲取交易歷史失敗，狀態碼: {response.status}")
+                return []
+                
         except Exception as e:
             logger.error(f"❌ 獲取交易歷史異常: {e}")
             return []
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投資組合風險引擎 - 以矩陣運算維護多交易對的敞口、波動率與協方差
+協方差採用 EWMA (RiskMetrics) 估計，可由已存儲的收益率一次性初始化，
+之後每筆收益率做秩一增量更新；收益率同時寫入環形緩衝區供歷史模擬。
+組合方差、分散化比率、參數法/歷史模擬法 VaR 與預期損失均為向量運算。
+"""
+
+import logging
+import math
+from statistics import NormalDist
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_STANDARD_NORMAL = NormalDist()
+
+
+class PortfolioRiskEngine:
+    """EWMA 協方差投資組合風險引擎"""
+
+    def __init__(self, decay: float = 0.94, history_size: int = 1000,
+                 periods_per_day: float = 1440.0, default_volatility: float = 0.03):
+        """
+        初始化風險引擎
+
+        Args:
+            decay: EWMA 衰減係數 λ
+            history_size: 歷史模擬使用的收益率環形緩衝區長度
+            periods_per_day: 每天的收益率期數（1分鐘收益率為1440），用於換算日度風險
+            default_volatility: 未提供先驗時新交易對的日波動率
+        """
+        if not 0 < decay < 1:
+            raise ValueError("EWMA 衰減係數必須在 (0, 1) 之間")
+        self.decay = decay
+        self.history_size = history_size
+        self.periods_per_day = periods_per_day
+        self.default_volatility = default_volatility
+
+        self._index: Dict[str, int] = {}
+        self._pairs: List[str] = []
+        self._covariance = np.zeros((0, 0))          # 單期收益率協方差
+        self._exposures = np.zeros(0)
+        self._observations = np.zeros(0, dtype=np.int64)
+
+        # 收益率環形緩衝區與對應的組合損益（敞口不變時逐行增量維護）
+        self._returns = np.zeros((history_size, 0))
+        self._cursor = 0
+        self._filled = 0
+        self._pnl = np.zeros(history_size)
+        self._pnl_valid = True
+
+    # ---------------------------------------------------------------- 交易對與敞口
+
+    @property
+    def pairs(self) -> List[str]:
+        return list(self._pairs)
+
+    def has_pair(self, pair: str) -> bool:
+        return pair in self._index
+
+    def add_pair(self, pair: str, daily_volatility: Optional[float] = None,
+                 correlations: Optional[Mapping[str, float]] = None) -> int:
+        """
+        加入交易對並以先驗波動率/相關性初始化協方差的新行列
+
+        Args:
+            daily_volatility: 先驗日波動率
+            correlations: 與已有交易對的先驗相關性 {pair: correlation}，缺省為0
+        """
+        if pair in self._index:
+            return self._index[pair]
+
+        n = len(self._pairs)
+        volatility = (daily_volatility if daily_volatility is not None else self.default_volatility)
+        period_vol = volatility / math.sqrt(self.periods_per_day)
+
+        covariance = np.zeros((n + 1, n + 1))
+        covariance[:n, :n] = self._covariance
+        existing_vol = np.sqrt(np.clip(np.diag(self._covariance), 0.0, None))
+        prior = np.array([(correlations or {}).get(other, 0.0) for other in self._pairs])
+        covariance[n, :n] = covariance[:n, n] = prior * existing_vol * period_vol
+        covariance[n, n] = period_vol ** 2
+        self._covariance = covariance
+
+        self._index[pair] = n
+        self._pairs.append(pair)
+        self._exposures = np.append(self._exposures, 0.0)
+        self._observations = np.append(self._observations, 0)
+        self._returns = np.hstack([self._returns, np.zeros((self.history_size, 1))])
+        return n
+
+    def set_exposure(self, pair: str, amount: float):
+        """設置單個交易對敞口（未知交易對以默認先驗加入）"""
+        index = self.add_pair(pair)
+        if self._exposures[index] != amount:
+            self._exposures[index] = amount
+            self._pnl_valid = False
+
+    def set_exposures(self, exposures: Mapping[str, float]):
+        """同步全部敞口，未出現在 exposures 中的交易對敞口歸零"""
+        for pair in exposures:
+            self.add_pair(pair)
+        target = np.zeros(len(self._pairs))
+        for pair, amount in exposures.items():
+            target[self._index[pair]] = amount
+        if not np.array_equal(target, self._exposures):
+            self._exposures = target
+            self._pnl_valid = False
+
+    @property
+    def exposures(self) -> np.ndarray:
+        return self._exposures.copy()
+
+    # ---------------------------------------------------------------- 收益率
+
+    def seed_returns(self, returns: Mapping[str, Sequence[float]]):
+        """
+        由已存儲的收益率序列初始化 EWMA 協方差與歷史緩衝區
+
+        各序列按尾部對齊並截取共同長度；協方差 = λ^T·先驗 + Σ (1-λ)λ^(T-1-t)·r_t r_tᵀ
+        未提供序列的交易對與歷史緩衝區一致地記為0收益，整個矩陣同步衰減以保持半正定
+        """
+        series = {pair: np.asarray(values, dtype=float) for pair, values in returns.items() if len(values)}
+        if not series:
+            return
+        length = min(len(values) for values in series.values())
+        columns = [self.add_pair(pair) for pair in series]
+        matrix = np.column_stack([values[-length:] for values in series.values()])
+
+        weights = (1 - self.decay) * self.decay ** np.arange(length - 1, -1, -1, dtype=float)
+        self._covariance *= self.decay ** length
+        self._covariance[np.ix_(columns, columns)] += (matrix * weights[:, None]).T @ matrix
+        self._observations[columns] += length
+
+        rows = np.zeros((length, len(self._pairs)))
+        rows[:, columns] = matrix
+        self._append_rows(rows)
+
+    def update_returns(self, returns: Mapping[str, float]):
+        """
+        加入同一時點的一組收益率（秩一更新）
+
+        未出現的交易對與歷史緩衝區一致地記為0收益：整個矩陣按 λ 衰減後只在出現的
+        交易對上加入外積，只更新子塊會使交叉協方差失去衰減而破壞半正定性
+        """
+        if not returns:
+            return
+        columns = [self.add_pair(pair) for pair in returns]
+        values = np.fromiter(returns.values(), dtype=float, count=len(columns))
+
+        self._covariance *= self.decay
+        self._covariance[np.ix_(columns, columns)] += (1 - self.decay) * np.outer(values, values)
+        self._observations[columns] += 1
+
+        row = np.zeros(len(self._pairs))
+        row[columns] = values
+        self._append_rows(row[None, :])
+
+    def _append_rows(self, rows: np.ndarray):
+        rows = rows[-self.history_size:]
+        count = len(rows)
+        positions = (self._cursor + np.arange(count)) % self.history_size
+        self._returns[positions] = rows
+        if self._pnl_valid:
+            self._pnl[positions] = rows @ self._exposures
+        self._cursor = int((self._cursor + count) % self.history_size)
+        self._filled = min(self.history_size, self._filled + count)
+
+    @property
+    def history_length(self) -> int:
+        return self._filled
+
+    def return_history(self) -> np.ndarray:
+        """按時間順序返回緩衝區中的收益率 (期數 x 交易對)"""
+        if self._filled < self.history_size:
+            return self._returns[:self._filled].copy()
+        return np.roll(self._returns, -self._cursor, axis=0)
+
+    # ---------------------------------------------------------------- 協方差視圖
+
+    def covariance(self, horizon_days: float = 1.0) -> np.ndarray:
+        """指定期限（天）的收益率協方差矩陣"""
+        return self._covariance * self.periods_per_day * horizon_days
+
+    def volatilities(self, horizon_days: float = 1.0) -> np.ndarray:
+        return np.sqrt(np.clip(np.diag(self.covariance(horizon_days)), 0.0, None))
+
+    def volatility(self, pair: str, horizon_days: float = 1.0) -> Optional[float]:
+        index = self._index.get(pair)
+        if index is None:
+            return None
+        return float(math.sqrt(max(self._covariance[index, index], 0.0) * self.periods_per_day * horizon_days))
+
+    def correlation(self) -> np.ndarray:
+        vol = np.sqrt(np.clip(np.diag(self._covariance), 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self._covariance / np.outer(vol, vol)
+        corr = np.nan_to_num(np.clip(corr, -1.0, 1.0))
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def observations(self, pair: str) -> int:
+        index = self._index.get(pair)
+        return int(self._observations[index]) if index is not None else 0
+
+    # ---------------------------------------------------------------- 組合指標
+
+    def portfolio_variance(self, horizon_days: float = 1.0) -> float:
+        """組合損益方差 xᵀΣx（TWD²）"""
+        x = self._exposures
+        return float(x @ self._covariance @ x) * self.periods_per_day * horizon_days
+
+    def portfolio_volatility(self, horizon_days: float = 1.0) -> float:
+        return math.sqrt(max(self.portfolio_variance(horizon_days), 0.0))
+
+    def _active(self) -> np.ndarray:
+        return np.flatnonzero(self._exposures != 0)
+
+    def diversification_ratio(self, cap: Optional[float] = 2.0) -> float:
+        """分散化比率 = Σ|w|σ / sqrt(wᵀΣw)，少於兩個有敞口的交易對時為1"""
+        active = self._active()
+        if len(active) < 2:
+            return 1.0
+        weights = self._exposures[active] / np.abs(self._exposures[active]).sum()
+        sigma = self._covariance[np.ix_(active, active)]
+        portfolio_vol = math.sqrt(max(float(weights @ sigma @ weights), 0.0))
+        weighted_vol = float(np.abs(weights) @ np.sqrt(np.clip(np.diag(sigma), 0.0, None)))
+        ratio = weighted_vol / portfolio_vol if portfolio_vol > 0 else 1.0
+        return min(ratio, cap) if cap is not None else ratio
+
+    def weighted_correlation(self) -> float:
+        """有敞口交易對兩兩相關性按敞口權重乘積加權後的平均值"""
+        active = self._active()
+        if len(active) < 2:
+            return 0.0
+        weights = self._exposures[active] / np.abs(self._exposures[active]).sum()
+        corr = self.correlation()[np.ix_(active, active)]
+        upper = np.triu_indices(len(active), 1)
+        return float(np.mean(corr[upper] * np.outer(weights, weights)[upper]))
+
+    def average_abs_correlation(self) -> float:
+        """所有交易對兩兩相關性絕對值的平均"""
+        n = len(self._pairs)
+        if n < 2:
+            return 0.0
+        return float(np.abs(self.correlation()[~np.eye(n, dtype=bool)]).mean())
+
+    def parametric_var(self, confidence: float = 0.95, horizon_days: float = 1.0) -> float:
+        """正態假設下的 VaR = z·σ_p"""
+        return _STANDARD_NORMAL.inv_cdf(confidence) * self.portfolio_volatility(horizon_days)
+
+    def parametric_es(self, confidence: float = 0.95, horizon_days: float = 1.0) -> float:
+        """正態假設下的預期損失 = σ_p·φ(z)/(1-α)"""
+        z = _STANDARD_NORMAL.inv_cdf(confidence)
+        return self.portfolio_volatility(horizon_days) * _STANDARD_NORMAL.pdf(z) / (1 - confidence)
+
+    def historical_pnl(self) -> np.ndarray:
+        """按當前敞口重估緩衝區內每期的組合損益（敞口變化後重算一次）"""
+        if not self._pnl_valid:
+            self._pnl = self._returns @ self._exposures
+            self._pnl_valid = True
+        if self._filled < self.history_size:
+            return self._pnl[:self._filled]
+        return self._pnl
+
+    def _historical_losses(self, confidence: float, horizon_days: float):
+        losses = -self.historical_pnl()
+        if len(losses) == 0:
+            return None, 0.0, 1.0
+        var = float(np.quantile(losses, confidence))
+        return losses, var, math.sqrt(self.periods_per_day * horizon_days)
+
+    def historical_var(self, confidence: float = 0.95, horizon_days: float = 1.0) -> float:
+        """歷史模擬 VaR：單期損失分位數按時間平方根換算到指定期限"""
+        losses, var, scale = self._historical_losses(confidence, horizon_days)
+        return max(var, 0.0) * scale if losses is not None else 0.0
+
+    def historical_es(self, confidence: float = 0.95, horizon_days: float = 1.0) -> float:
+        """歷史模擬預期損失：超過 VaR 的單期損失均值按時間平方根換算"""
+        losses, var, scale = self._historical_losses(confidence, horizon_days)
+        if losses is None:
+            return 0.0
+        return max(float(losses[losses >= var].mean()), 0.0) * scale
@@ -6,7 +6,6 @@
 連接台灣MAX交易所，獲取真實的交易數據
 """
 
-import requests
 import json
 import time
 import hmac
@@ -14,6 +13,11 @@ import hashlib
 from datetime import datetime
 from typing import Dict, List, Optional
 
+try:
+    from ..data.max_transport import get_max_transport
+except ImportError:
+    from data.max_transport import get_max_transport
+
 class RealMaxClient:
     """真實MAX交易所API客戶端"""
     
@@ -22,17 +26,14 @@ class RealMaxClient:
         self.api_key = api_key
         self.secret_key = secret_key
         
-        # 公開API不需要認證
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'AImax-Trading-System/1.0'
-        })
+        # 公開API不需要認證；請求經由進程共用連接池的同步接口發送
+        self.transport = get_max_transport()
     
     def get_ticker(self, market: str = "btctwd") -> Dict:
         """獲取實時價格數據"""
         try:
             url = f"{self.base_url}/api/v2/tickers/{market}"
-            response = self.session.get(url, timeout=10)
+            response = self.transport.get_sync(url, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -64,7 +65,7 @@ class RealMaxClient:
                 'limit': limit
             }
             
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.transport.get_sync(url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -92,7 +93,7 @@ class RealMaxClient:
                 'limit': limit
             }
             
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.transport.get_sync(url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -160,7 +161,7 @@ class RealMaxClient:
             }
             
             url = f"{self.base_url}{path}"
-            response = self.session.get(url, headers=headers, timeout=10)
+            response = self.transport.get_sync(url, headers=headers, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -209,7 +210,7 @@ class RealMaxClient:
             }
             
             url = f"{self.base_url}{path}"
-            response = self.session.get(url, headers=headers, params=params, timeout=10)
+            response = self.transport.get_sync(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
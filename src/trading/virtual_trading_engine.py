@@ -78,10 +78,9 @@ class VirtualTradingEngine:
             print(f"⚠️ MAX API失敗: {e}")
         
         try:
-            # 備用方法：使用HTTP請求獲取MAX API
-            import requests
-            response = requests.get('https://max-api.maicoin.com/api/v2/tickers/btctwd', timeout=10)
-            if response.status_code == 200:
+            # 備用方法：直接經由共用連接池請求MAX API
+            response = self.max_client.transport.get_sync('tickers/btctwd', timeout=10)
+            if response.status == 200:
                 data = response.json()
                 price = float(data['last'])
                 print(f"📊 MAX API價格 (HTTP): NT$ {price:,.0f}")